@@ -34,6 +34,21 @@ class ServoWorkMode():
     SERVO_CSP_MODE = 8  #循环同步位置模式  CSP
     SERVO_CSV_MODE = 9  #循环同步速度模式  CSV
     SERVO_CST_MODE = 10 #循环同步转矩模式  CST
+
+class ServoStatusWord():
+    READY_TO_SWITCH_ON = 0x0001   #准备好启动
+    SWITCHED_ON = 0x0002          #已启动
+    OPERATION_ENABLED = 0x0004    #运行使能
+    FAULT = 0x0008                #故障
+    VOLTAGE_ENABLED = 0x0010      #主回路上电
+    QUICK_STOP = 0x0020           #快速停止（0 表示快速停止中）
+    SWITCH_ON_DISABLED = 0x0040   #启动禁止
+    REMOTE = 0x0200               #远程控制
+    TARGET_REACHED = 0x0400       #目标到达
+    SETPOINT_ACK = 0x1000         #PP模式：设定点确认
+    HOMING_ATTAINED = 0x1000      #HM模式：原点回归完成
+    FOLLOWING_ERROR = 0x2000      #PP/CSP模式：跟随误差
+    HOMING_ERROR = 0x2000         #HM模式：原点回归错误
         
 class ServoSDK_Error():
     ServoSDK_NoError = 0                #没有错误
@@ -68,6 +83,114 @@ class ServoSDK_Error():
     ServoSDK_NoAvailableDevice = 29     #没有可用的设备
     ServoSDK_Unknown = 255          #未知错误
 
+'''
+ * 调用钩子
+ * 所有 Nim_* 封装函数都通过 SDKHandle 调用底层库。注册钩子后，SDKHandle 会被
+ * 替换为一个拦截代理，每次调用底层函数后按注册顺序通知钩子：
+ *     hook(strFuncName, args, nRes, t0_ns, t1_ns)
+ * args 为传给底层函数的原始参数（输出参数为 ctypes.byref 对象，可用
+ * call_arg_value 取值），t0_ns/t1_ns 为 time.monotonic_ns() 调用前后的时间戳。
+ * 没有钩子时不做任何包装，不增加调用开销。
+'''
+_callHooks = []
+
+class _HookedFunction(object):
+    __slots__ = ('_func', '_name')
+
+    def __init__(self, func, name):
+        self._func = func
+        self._name = name
+
+    @property
+    def restype(self):
+        return self._func.restype
+
+    @restype.setter
+    def restype(self, value):
+        self._func.restype = value
+
+    @property
+    def argtypes(self):
+        return self._func.argtypes
+
+    @argtypes.setter
+    def argtypes(self, value):
+        self._func.argtypes = value
+
+    def __call__(self, *args):
+        t0 = time.monotonic_ns()
+        nRes = self._func(*args)
+        t1 = time.monotonic_ns()
+        for hook in _callHooks:
+            try:
+                hook(self._name, args, nRes, t0, t1)
+            except Exception:
+                # 钩子异常不能影响电机控制流程
+                pass
+        return nRes
+
+class _HookedLibrary(object):
+    def __init__(self, lib):
+        self._lib = lib
+
+    def __getattr__(self, name):
+        func = getattr(self._lib, name)
+        if not name.startswith('Nim_'):
+            return func
+        hooked = _HookedFunction(func, name)
+        setattr(self, name, hooked)
+        return hooked
+
+def _unwrap_library(lib):
+    if isinstance(lib, _HookedLibrary):
+        return lib._lib
+    return lib
+
+def _wrap_library(lib):
+    if lib is None or not _callHooks or isinstance(lib, _HookedLibrary):
+        return lib
+    return _HookedLibrary(lib)
+
+def add_call_hook(hook):
+    """
+    注册SDK调用钩子
+    参数:
+    hook - 回调函数 hook(strFuncName, args, nRes, t0_ns, t1_ns)
+    """
+    global SDKHandle
+    if hook not in _callHooks:
+        _callHooks.append(hook)
+    SDKHandle = _wrap_library(SDKHandle)
+
+def remove_call_hook(hook):
+    """
+    注销SDK调用钩子，全部注销后恢复为直接调用底层库
+    """
+    global SDKHandle
+    if hook in _callHooks:
+        _callHooks.remove(hook)
+    if not _callHooks:
+        SDKHandle = _unwrap_library(SDKHandle)
+
+def attach_library(lib):
+    """
+    使用指定的库对象代替 NimServoSDK 动态库（例如本地模拟器）
+    必须在 Nim_init 之前调用，Nim_init 检测到已加载的库后不再加载动态库
+    参数:
+    lib - 提供 Nim_* 函数属性的库对象，None 表示卸载
+    """
+    global SDKHandle
+    global _SDKlibraryHandle
+    _SDKlibraryHandle = None
+    SDKHandle = _wrap_library(lib)
+
+def call_arg_value(arg):
+    """
+    取调用钩子参数的值：输出参数(ctypes.byref)返回其当前值，ctypes数值返回value，其它原样返回
+    """
+    obj = getattr(arg, '_obj', arg)
+    return getattr(obj, 'value', obj)
+
 '''
  * @brief SDK初始化
  * @param strSdkPath SDK库加载路径
@@ -98,6 +221,9 @@ def Nim_init(strSdkPath):
                 _SDKlibraryHandle = ctypes.CDLL(so_path)
                 SDKHandle = _SDKlibraryHandle  # 在Linux系统中直接使用同一个句柄
 
+            # 已注册调用钩子时包装新加载的库
+            SDKHandle = _wrap_library(SDKHandle)
+
         if SDKHandle is None:
             print("错误: 无法加载SDK库")
             return -1
@@ -346,6 +472,17 @@ def Nim_set_param_value(hMaster, nodeId, strParamNO, nValue, bSDO):
 
     return _Nim_set_param_value(hMaster, nodeId, strParamNO, nValue, bSDO)
 
+'''
+ * @brief 生成对象字典参数编号，用于 Nim_get_param_value / Nim_set_param_value
+ * @param index 对象索引，如 0x6041
+ * @param subIndex 子索引
+ * @return 参数编号(bytes)：子索引为0时为 b"H6041"，否则为 b"H607D.01"
+ '''
+def param_no(index, subIndex=0):
+    if subIndex:
+        return ("H%04X.%02X" % (index, subIndex)).encode('utf-8')
+    return ("H%04X" % index).encode('utf-8')
+
 '''
  * @brief 电机抱机
  * @param hMaster 主站对象句柄
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SDK调用审计日志
+
+以固定长度二进制记录的形式记录每一次 Nim_* 调用（单调时间戳、耗时、节点、
+函数编号、数值参数、返回码、输出值），由后台线程批量写入文件，开销足够低，
+可以在PDO周期下常开。
+
+文件格式:
+    文件头  : 8字节魔数 b'NIMAUDT1' + uint32 JSON长度 + JSON(函数表、记录格式等)
+    记录    : 每条 RECORD_SIZE(64) 字节，格式见 RECORD_FORMAT
+
+用法:
+    log = AuditLog("audit.bin")
+    log.start()
+    ...
+    log.stop()
+
+解码:
+    python audit_log.py audit.bin -o audit.csv
+    python audit_log.py audit.bin --npy audit.npy
+"""
+
+import collections, csv, itertools, json, math, os, struct, sys, threading, time
+import NimServoSDK
+from NimServoSDK import call_arg_value
+from sdk_functions import MASTER_FUNCS, NO_HANDLE_FUNCS, sdk_function_names
+
+AUDIT_MAGIC = b'NIMAUDT1'
+AUDIT_VERSION = 1
+
+# t_ns, dur_ns, seq, func_id, node, result, nargs, args[3], out
+RECORD_FORMAT = '<QIIHhiB7x3dd'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_FIELDS = ('t_ns', 'dur_ns', 'seq', 'func_id', 'node', 'result', 'nargs',
+                 'arg0', 'arg1', 'arg2', 'out')
+MAX_ARGS = 3
+UNKNOWN_FUNC_ID = 0xFFFF
+
+_record = struct.Struct(RECORD_FORMAT)
+_nan = float('nan')
+
+
+def split_call_args(strFuncName, args):
+    """
+    把底层调用参数拆分为 (节点, 数值参数列表, 输出值列表)
+    字符串参数（连接字符串、参数编号等）不记录
+    """
+    if strFuncName in NO_HANDLE_FUNCS:
+        node = -1
+        rest = args
+    elif strFuncName in MASTER_FUNCS:
+        node = -1
+        rest = args[1:]
+    else:
+        node = args[1] if len(args) > 1 else -1
+        rest = args[2:]
+    values = []
+    outs = []
+    for arg in rest:
+        if hasattr(arg, '_obj'):
+            outs.append(call_arg_value(arg))
+        elif isinstance(arg, (int, float)):
+            values.append(arg)
+    return node, values, outs
+
+
+class AuditLog(object):
+    def __init__(self, path, batch_size=1024, flush_interval=0.05, max_pending=65536):
+        """
+        初始化审计日志
+        参数:
+        path - 日志文件路径（覆盖写入）
+        batch_size - 每批写入的最大记录数
+        flush_interval - 后台线程刷新间隔(秒)
+        max_pending - 待写入记录上限，超出后丢弃并计数
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.functions = sdk_function_names()
+        self._func_ids = dict((name, i) for i, name in enumerate(self.functions))
+        self._pending = collections.deque()
+        self._seq = itertools.count()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._file = None
+        self.records_written = 0
+        self.records_dropped = 0
+
+    def start(self):
+        """
+        打开日志文件、写入文件头并开始记录
+        """
+        if self._thread is not None:
+            return
+        self._file = open(self.path, 'wb')
+        header = json.dumps({
+            'version': AUDIT_VERSION,
+            'record_format': RECORD_FORMAT,
+            'record_size': RECORD_SIZE,
+            'fields': RECORD_FIELDS,
+            'functions': self.functions,
+            'start_monotonic_ns': time.monotonic_ns(),
+            'start_unix_ns': time.time_ns(),
+        }).encode('utf-8')
+        self._file.write(AUDIT_MAGIC + struct.pack('<I', len(header)) + header)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._writer_loop, name='AuditLogWriter', daemon=True)
+        self._thread.start()
+        NimServoSDK.add_call_hook(self.record)
+
+    def stop(self):
+        """
+        停止记录，写完剩余记录并关闭文件
+        """
+        NimServoSDK.remove_call_hook(self.record)
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._write_batch(len(self._pending))
+        self._file.close()
+        self._file = None
+
+    def record(self, strFuncName, args, nRes, t0_ns, t1_ns):
+        """
+        调用钩子：只把原始数据放入队列，打包和写文件在后台线程完成
+        """
+        if len(self._pending) >= self.max_pending:
+            self.records_dropped += 1
+            return
+        node, values, outs = split_call_args(strFuncName, args)
+        self._pending.append((t0_ns, t1_ns - t0_ns, next(self._seq),
+                              self._func_ids.get(strFuncName, UNKNOWN_FUNC_ID),
+                              node, nRes, values, outs))
+
+    def _writer_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            while len(self._pending) >= self.batch_size:
+                self._write_batch(self.batch_size)
+            self._write_batch(len(self._pending))
+
+    def _write_batch(self, count):
+        if count <= 0:
+            return
+        buf = bytearray(RECORD_SIZE * count)
+        pack_into = _record.pack_into
+        popleft = self._pending.popleft
+        offset = 0
+        for _ in range(count):
+            t0, dur, seq, fid, node, res, values, outs = popleft()
+            # 第二个及以后的输出值放在空余的参数位置
+            values = (values + outs[1:])[:MAX_ARGS]
+            nargs = len(values)
+            args = values + [_nan] * (MAX_ARGS - nargs)
+            out = outs[0] if outs else _nan
+            pack_into(buf, offset, t0, min(dur, 0xFFFFFFFF), seq & 0xFFFFFFFF, fid,
+                      _clamp_node(node), res or 0, nargs, args[0], args[1], args[2], float(out))
+            offset += RECORD_SIZE
+        self._file.write(buf)
+        self._file.flush()
+        self.records_written += count
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+
+
+def _clamp_node(node):
+    try:
+        node = int(node)
+    except (TypeError, ValueError):
+        return -1
+    return node if -32768 <= node <= 32767 else -1
+
+
+def read_header(path):
+    """
+    读取日志文件头
+    返回: (文件头字典, 记录起始偏移)
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(AUDIT_MAGIC))
+        if magic != AUDIT_MAGIC:
+            raise ValueError(f"不是审计日志文件: {path}")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, len(AUDIT_MAGIC) + 4 + length
+
+
+def iter_records(path):
+    """
+    逐条解码日志记录
+    返回: 生成器，每条为字典，包含 RECORD_FIELDS 各字段以及 func（函数名）
+    """
+    header, offset = read_header(path)
+    functions = header['functions']
+    rec = struct.Struct(header['record_format'])
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            chunk = f.read(rec.size * 4096)
+            if not chunk:
+                break
+            # 忽略未写完整的尾部记录
+            usable = len(chunk) - len(chunk) % rec.size
+            for values in rec.iter_unpack(chunk[:usable]):
+                item = dict(zip(RECORD_FIELDS, values))
+                fid = item['func_id']
+                item['func'] = functions[fid] if fid < len(functions) else 'unknown'
+                yield item
+
+
+def to_csv(path, csv_path):
+    """
+    把日志转换为CSV文件
+    返回: 转换的记录数
+    """
+    count = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('t_ns', 'dur_ns', 'seq', 'func', 'node', 'result', 'arg0', 'arg1', 'arg2', 'out'))
+        for item in iter_records(path):
+            args = [item['arg%d' % i] if i < item['nargs'] else '' for i in range(MAX_ARGS)]
+            out = '' if math.isnan(item['out']) else item['out']
+            writer.writerow([item['t_ns'], item['dur_ns'], item['seq'], item['func'],
+                             item['node'], item['result']] + args + [out])
+            count += 1
+    return count
+
+
+def to_numpy(path):
+    """
+    把日志读取为NumPy结构化数组（需要安装numpy）
+    返回: (结构化数组, 函数名列表)，数组的 func_id 字段为函数名列表下标
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("to_numpy 需要安装 numpy: pip install numpy")
+    header, offset = read_header(path)
+    dtype = np.dtype({
+        'names': list(RECORD_FIELDS),
+        'formats': ['<u8', '<u4', '<u4', '<u2', '<i2', '<i4', 'u1', '<f8', '<f8', '<f8', '<f8'],
+        'offsets': [0, 8, 12, 16, 18, 20, 24, 32, 40, 48, 56],
+        'itemsize': RECORD_SIZE,
+    })
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    data = data[:len(data) - len(data) % RECORD_SIZE]
+    return np.frombuffer(data, dtype=dtype), header['functions']
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="解码SDK调用审计日志")
+    parser.add_argument('input', help="审计日志文件")
+    parser.add_argument('-o', '--csv', help="输出CSV文件")
+    parser.add_argument('--npy', help="输出NumPy .npy文件")
+    args = parser.parse_args(argv)
+
+    if not args.csv and not args.npy:
+        header, _ = read_header(args.input)
+        size = os.path.getsize(args.input)
+        print(f"版本: {header['version']}, 函数数: {len(header['functions'])}, 记录大小: {header['record_size']}字节")
+        print(f"文件大小: {size}字节")
+        return 0
+    if args.csv:
+        count = to_csv(args.input, args.csv)
+        print(f"已写入 {count} 条记录到 {args.csv}")
+    if args.npy:
+        import numpy as np
+        records, _ = to_numpy(args.input)
+        np.save(args.npy, records)
+        print(f"已写入 {len(records)} 条记录到 {args.npy}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
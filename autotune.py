@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轮廓位置模式加减速参数自动整定
+
+set_motion_parameters 的速度、加速度、减速度一直是手工挑选的，既不知道是否还有
+节拍可挖，也不知道驱动器是否已接近极限。ProfileAutoTuner 在限定行程内反复执行
+同一个往返测试运动，每次测量:
+
+- 运动时间：从发出指令到状态字目标到达位置位（实际位置进入到达窗口）；
+- 超调：越过目标位置的最大距离；
+- 跟随误差：实际位置与按轮廓参数计算的理想梯形轨迹之差的最大值
+  （轨迹起点取检测到开始运动的时刻），以及驱动器是否置位跟随误差位(bit13)；
+- 峰值转矩：Nim_get_currentTorque 的最大绝对值。
+
+在 Nim_get_maxVelocity / Nim_get_maxTorque 限定的范围内搜索:
+先以允许的最大速度按倍数增大加减速度（加速度=减速度），越过约束后二分逼近；
+再分别单独整定减速度和加速度；任何加速度都不满足约束时降低速度重试。
+搜索结束后按运动时间从短到长复测满足约束的参数（confirm_runs 次），每次复测都满足
+约束的第一组参数为结果，复测不通过时退回下一组。驱动器故障时立即中止整定。
+
+用法（轴需已设置为轮廓位置模式并使能，行程内无障碍）:
+    tuner = ProfileAutoTuner(motor.h_master, 1, distance=10.0, max_overshoot=0.01)
+    best = tuner.tune()
+    print(tuner.format_report())
+    if best is not None:
+        motor.set_motion_parameters(best.velocity, best.accel, best.decel)
+
+命令行（--sim 使用本地模拟器，--servo-bandwidth 设置模拟位置环带宽）:
+    python autotune.py --sim --servo-bandwidth 10 --distance 10
+"""
+
+import math, sys, time
+from NimServoSDK import *
+from typed_api import TypedSDK
+
+
+class TuneTrial(object):
+    __slots__ = ('velocity', 'accel', 'decel', 'move_time', 'overshoot', 'following_error',
+                 'peak_torque', 'ok', 'reason', 'check_of')
+
+    def __init__(self, velocity, accel, decel):
+        self.velocity = velocity
+        self.accel = accel
+        self.decel = decel
+        self.move_time = None           # 秒，往返两次中较长的一次
+        self.overshoot = 0.0            # 用户单位
+        self.following_error = 0.0      # 用户单位
+        self.peak_torque = 0            # 0.001倍额定转矩
+        self.ok = False                 # 是否满足全部约束
+        self.reason = None              # 不满足约束的原因
+        self.check_of = None            # 复测时为被复测的 TuneTrial
+
+
+def profile_position(t, distance, velocity, accel, decel):
+    """
+    理想梯形（或三角形）轨迹在 t 时刻走过的距离
+    """
+    if t <= 0:
+        return 0.0
+    # 距离不足以加速到 velocity 时为三角形轨迹
+    vpeak = min(velocity, math.sqrt(2.0 * distance * accel * decel / (accel + decel)))
+    t1 = vpeak / accel
+    d1 = 0.5 * accel * t1 * t1
+    d3 = vpeak * vpeak / (2.0 * decel)
+    t2 = (distance - d1 - d3) / vpeak
+    if t < t1:
+        return 0.5 * accel * t * t
+    if t < t1 + t2:
+        return d1 + vpeak * (t - t1)
+    t3 = min(t - t1 - t2, vpeak / decel)
+    return d1 + vpeak * t2 + vpeak * t3 - 0.5 * decel * t3 * t3
+
+
+class ProfileAutoTuner(object):
+    def __init__(self, h_master, node_id, distance, start=None, max_overshoot=None, max_following_error=None,
+                 torque_limit=0.8, velocity_limit=1.0, min_accel=1.0, growth=2.0, refine_steps=4,
+                 max_trials=40, confirm_runs=3, move_timeout=10.0, sample_interval=0.001, feedback_sdo=0,
+                 on_trial=None):
+        """
+        初始化自动整定
+        参数:
+        h_master - 主站句柄
+        node_id - 从站地址
+        distance - 测试运动距离(用户单位)，在 start 与 start+distance 之间往返
+        start - 测试起点，默认为当前位置
+        max_overshoot - 允许的最大超调(用户单位)，默认 distance 的 0.5%
+        max_following_error - 允许的最大跟随误差(用户单位)，默认 distance 的 5%
+        torque_limit - 允许的峰值转矩占 Nim_get_maxTorque 的比例
+        velocity_limit - 允许的速度占 Nim_get_maxVelocity 的比例
+        min_accel - 搜索的最小加减速度(用户单位/s^2)
+        growth - 扩大搜索时每次的倍数
+        refine_steps - 越过约束后的二分次数
+        max_trials - 试验次数上限（不含复测）
+        confirm_runs - 结果的复测次数，每次都满足约束才采用
+        move_timeout - 单次运动超时(秒)，超时后停止整定
+        sample_interval - 反馈采样间隔(秒)
+        feedback_sdo - 读取反馈使用 1 SDO / 0 PDO（默认）
+        on_trial - 每次试验结束的回调 on_trial(TuneTrial)
+        """
+        self.h_master = h_master
+        self.node_id = node_id
+        self.distance = abs(distance)
+        self.start = start
+        self.max_overshoot = max_overshoot if max_overshoot is not None else self.distance * 0.005
+        self.max_following_error = max_following_error if max_following_error is not None else self.distance * 0.05
+        self.torque_limit = torque_limit
+        self.velocity_limit = velocity_limit
+        self.min_accel = min_accel
+        self.growth = growth
+        self.refine_steps = refine_steps
+        self.max_trials = max_trials
+        self.confirm_runs = confirm_runs
+        self.move_timeout = move_timeout
+        self.sample_interval = sample_interval
+        self.feedback_sdo = feedback_sdo
+        self.on_trial = on_trial
+        self.trials = []
+        self.baseline = None            # 整定前参数的试验结果
+        self.best = None
+        self.max_velocity = None        # 允许的最大速度
+        self.max_torque = None          # 允许的峰值转矩
+        self.aborted = None             # 中止整定的原因
+        self._sdk = TypedSDK(h_master, raise_errors=False)
+
+    def read_limits(self):
+        """
+        读取驱动器速度和转矩上限
+        返回: True 成功
+        """
+        [r1, vmax] = Nim_get_maxVelocity(self.h_master, self.node_id)
+        [r2, tmax] = Nim_get_maxTorque(self.h_master, self.node_id)
+        if r1 != 0 or r2 != 0 or vmax <= 0 or tmax <= 0:
+            self.aborted = "读取最大速度/最大转矩失败"
+            return False
+        self.max_velocity = vmax * self.velocity_limit
+        self.max_torque = tmax * self.torque_limit
+        return True
+
+    def read_profile(self):
+        """
+        返回当前轮廓参数 (速度, 加速度, 减速度)，失败返回 None
+        """
+        [r1, v] = Nim_get_profileVelocity(self.h_master, self.node_id)
+        [r2, a] = Nim_get_profileAccel(self.h_master, self.node_id)
+        [r3, d] = Nim_get_profileDecel(self.h_master, self.node_id)
+        if r1 or r2 or r3:
+            return None
+        return v, a, d
+
+    def _apply(self, velocity, accel, decel):
+        h, node = self.h_master, self.node_id
+        return (Nim_set_profileVelocity(h, node, velocity) == 0 and Nim_set_profileAccel(h, node, accel) == 0
+                and Nim_set_profileDecel(h, node, decel) == 0)
+
+    def _move(self, trial, origin, target):
+        """
+        执行一次测试运动并更新 trial 的测量值
+        返回: 运动时间(秒)；失败返回 None 并设置 trial.reason
+        """
+        sdk, node, sdo = self._sdk, self.node_id, self.feedback_sdo
+        direction = 1.0 if target >= origin else -1.0
+        t0 = time.monotonic()
+        if not sdk.move_absolute(node, target, True, 1):
+            trial.reason = f"发送目标位置失败，错误码: {sdk.last_error}"
+            # 两次运动之间驱动器进入故障时目标位置会被拒绝，同样中止整定
+            sw = sdk.status_word(node, sdo)
+            if sw is not None and sw & ServoStatusWord.FAULT:
+                self.aborted = "驱动器故障"
+                trial.reason = "驱动器故障"
+            return None
+        onset = None
+        last_t = t0
+        while True:
+            now = time.monotonic()
+            sw = sdk.status_word(node, sdo)
+            pos = sdk.position(node, sdo)
+            torque = sdk.torque(node, sdo)
+            if sw is None or pos is None or torque is None:
+                trial.reason = f"读取反馈失败，错误码: {sdk.last_error}"
+                return None
+            if sw & ServoStatusWord.FAULT:
+                self.aborted = "驱动器故障"
+                trial.reason = "驱动器故障"
+                return None
+            travelled = (pos - origin) * direction
+            if onset is None and travelled > 1e-9:
+                # 运动开始于上一次采样和本次采样之间，取中点
+                onset = (last_t + now) / 2.0
+            trial.peak_torque = max(trial.peak_torque, abs(torque))
+            trial.overshoot = max(trial.overshoot, travelled - self.distance)
+            if onset is not None:
+                ideal = profile_position(now - onset, self.distance, trial.velocity, trial.accel, trial.decel)
+                trial.following_error = max(trial.following_error, abs(ideal - travelled))
+            if sw & ServoStatusWord.FOLLOWING_ERROR:
+                trial.reason = "驱动器跟随误差超限"
+            if onset is not None and sw & ServoStatusWord.TARGET_REACHED:
+                return now - t0
+            if now - t0 > self.move_timeout:
+                Nim_fastStop(self.h_master, node, 1)
+                self.aborted = "测试运动超时，已快速停止"
+                trial.reason = "运动超时"
+                return None
+            last_t = now
+            time.sleep(self.sample_interval)
+
+    def measure(self, velocity, accel, decel, check_of=None):
+        """
+        以给定参数执行一次往返测试
+        参数:
+        check_of - 复测时为被复测的 TuneTrial
+        返回: TuneTrial
+        """
+        trial = TuneTrial(velocity, accel, decel)
+        trial.check_of = check_of
+        if not self._apply(velocity, accel, decel):
+            trial.reason = "写入轮廓参数失败"
+        else:
+            times = []
+            for origin, target in ((self.start, self.start + self.distance), (self.start + self.distance, self.start)):
+                t = self._move(trial, origin, target)
+                if t is None:
+                    break
+                times.append(t)
+            if len(times) == 2:
+                trial.move_time = max(times)
+        if trial.reason is None:
+            if trial.peak_torque > self.max_torque:
+                trial.reason = f"峰值转矩 {trial.peak_torque} 超过 {self.max_torque:.0f}"
+            elif trial.overshoot > self.max_overshoot:
+                trial.reason = f"超调 {trial.overshoot:.4g} 超过 {self.max_overshoot:.4g}"
+            elif trial.following_error > self.max_following_error:
+                trial.reason = f"跟随误差 {trial.following_error:.4g} 超过 {self.max_following_error:.4g}"
+        trial.ok = trial.reason is None
+        self.trials.append(trial)
+        if self.on_trial is not None:
+            self.on_trial(trial)
+        return trial
+
+    def _trial(self, velocity, accel, decel):
+        # 相同参数已试验过时不再重复运动（上一阶段的结果是下一阶段的起点）
+        for t in self.trials:
+            if t is not self.baseline and t.check_of is None and (t.velocity, t.accel, t.decel) == (velocity, accel, decel):
+                return t
+        return self.measure(velocity, accel, decel)
+
+    def _budget(self):
+        return self.aborted is None and len(self.trials) < self.max_trials
+
+    def _confirm(self):
+        """
+        按运动时间从短到长复测满足约束的参数，单次测量可能恰好落在约束以内，
+        复测不通过时标记为不满足并退回下一组
+        返回: 每次复测都满足约束的 TuneTrial，没有时返回 None
+        """
+        candidates = sorted((t for t in self.trials if t.ok and t.check_of is None), key=lambda t: t.move_time)
+        for candidate in candidates:
+            for _ in range(self.confirm_runs):
+                if self.aborted is not None:
+                    return None
+                check = self.measure(candidate.velocity, candidate.accel, candidate.decel, check_of=candidate)
+                if not check.ok:
+                    candidate.ok = False
+                    candidate.reason = f"复测未通过: {check.reason}"
+                    break
+                # 结果按复测中最差的一次记录
+                candidate.move_time = max(candidate.move_time, check.move_time)
+                candidate.overshoot = max(candidate.overshoot, check.overshoot)
+                candidate.following_error = max(candidate.following_error, check.following_error)
+                candidate.peak_torque = max(candidate.peak_torque, check.peak_torque)
+            else:
+                return candidate
+        return None
+
+    def _search(self, make, x0, x_max):
+        """
+        在 [min_accel, x_max] 内寻找满足约束的最大 x：先按 growth 倍数扩大，越过约束后按几何中点二分
+        参数:
+        make - x -> (速度, 加速度, 减速度)
+        返回: 满足约束的最大 x，没有时返回 None
+        """
+        good, bad = None, None
+        x = max(self.min_accel, min(x0, x_max))
+        while self._budget():
+            if self._trial(*make(x)).ok:
+                good = x
+                if x >= x_max:
+                    return good
+                x = min(x * self.growth, x_max)
+            else:
+                bad = x
+                if good is not None:
+                    break
+                if x <= self.min_accel:
+                    return None
+                x = max(x / self.growth, self.min_accel)
+        for _ in range(self.refine_steps):
+            if good is None or bad is None or not self._budget():
+                break
+            x = math.sqrt(good * bad)
+            if self._trial(*make(x)).ok:
+                good = x
+            else:
+                bad = x
+        return good
+
+    def tune(self):
+        """
+        执行整定，结束后恢复原轮廓参数（调用方决定是否采用结果）
+        返回: 运动时间最短的满足约束的 TuneTrial，没有时返回 None
+        """
+        self.trials = []
+        self.best = None
+        self.aborted = None
+        original = self.read_profile()
+        if original is None:
+            self.aborted = "读取轮廓参数失败"
+            return None
+        if not self.read_limits():
+            return None
+        if self.start is None:
+            self.start = self._sdk.position(self.node_id, self.feedback_sdo)
+            if self.start is None:
+                self.aborted = "读取当前位置失败"
+                return None
+        v0, a0, d0 = original
+        self.baseline = self.measure(min(v0, self.max_velocity), a0, d0)
+
+        # 1. 最大速度下整定加速度=减速度；都不满足时降低速度
+        velocity = self.max_velocity
+        common = None
+        while self._budget():
+            common = self._search(lambda x: (velocity, x, x), min(a0, d0), float('inf'))
+            if common is not None or velocity <= v0 / 8.0:
+                break
+            velocity /= 2.0
+        # 2. 单独整定减速度，再单独整定加速度
+        if common is not None:
+            decel = self._search(lambda x: (velocity, common, x), common, float('inf')) or common
+            self._search(lambda x: (velocity, x, decel), common, float('inf'))
+        if self.aborted is None:
+            self.best = self._confirm()
+
+        self._apply(v0, a0, d0)
+        # 回到测试起点
+        if self.aborted is None:
+            self._sdk.move_absolute(self.node_id, self.start, True, 1)
+        return self.best
+
+    def format_report(self):
+        lines = [f"{'#':>3}{'速度':>10}{'加速度':>12}{'减速度':>12}{'时间(s)':>10}{'超调':>10}"
+                 f"{'跟随误差':>10}{'峰值转矩':>10}  结果"]
+        for i, t in enumerate(self.trials):
+            mark = "*" if t is self.best else ("基准" if t is self.baseline else
+                                               (f"复测#{self.trials.index(t.check_of)}" if t.check_of else ""))
+            result = "满足" if t.ok else t.reason
+            move_time = f"{t.move_time:10.3f}" if t.move_time is not None else f"{'-':>10}"
+            lines.append(f"{i:>3}{t.velocity:>10.3f}{t.accel:>12.3f}{t.decel:>12.3f}{move_time}"
+                         f"{t.overshoot:>10.4f}{t.following_error:>10.4f}{t.peak_torque:>10}  {result} {mark}")
+        if self.max_velocity is not None:
+            lines.append(f"约束: 速度 <= {self.max_velocity:g}，峰值转矩 <= {self.max_torque:.0f}，"
+                         f"超调 <= {self.max_overshoot:g}，跟随误差 <= {self.max_following_error:g}")
+        if self.best is not None:
+            b = self.best
+            lines.append(f"结果: 速度 {b.velocity:.3f}，加速度 {b.accel:.3f}，减速度 {b.decel:.3f}，"
+                         f"运动时间 {b.move_time:.3f} s")
+            if self.baseline is not None and self.baseline.ok:
+                lines.append(f"原参数运动时间 {self.baseline.move_time:.3f} s，"
+                             f"缩短 {(1 - b.move_time / self.baseline.move_time) * 100:.1f}%")
+        else:
+            lines.append("没有满足约束的参数")
+        if self.aborted:
+            lines.append(f"整定中止: {self.aborted}")
+        return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+    from motor_control import MotorController
+    parser = argparse.ArgumentParser(description="轮廓位置模式加减速参数自动整定")
+    parser.add_argument('--node', type=int, default=1, help="从站地址")
+    parser.add_argument('--distance', type=float, default=10.0, help="测试运动距离(用户单位)")
+    parser.add_argument('--max-overshoot', type=float, default=None, help="允许的最大超调(用户单位)")
+    parser.add_argument('--max-following-error', type=float, default=None, help="允许的最大跟随误差(用户单位)")
+    parser.add_argument('--torque-limit', type=float, default=0.8, help="峰值转矩占最大转矩的比例")
+    parser.add_argument('--max-trials', type=int, default=40, help="试验次数上限")
+    parser.add_argument('--apply', action='store_true', help="采用整定结果")
+    parser.add_argument('--sim', action='store_true', help="使用本地模拟器代替驱动器")
+    parser.add_argument('--servo-bandwidth', type=float, default=10.0, help="模拟器: 位置环带宽(Hz)")
+    args = parser.parse_args(argv)
+
+    if args.sim:
+        from sdk_simulator import install_simulator
+        install_simulator(nodes=[args.node], servo_bandwidth=args.servo_bandwidth)
+    motor = MotorController(comm_type=0, node_id=args.node)
+    if not (motor.connect_canopen() and motor.initialize_motor() and motor.set_profile_position_mode()
+            and motor.enable_motor()):
+        print(motor.status)
+        motor.close()
+        return 1
+    tuner = ProfileAutoTuner(motor.h_master, args.node, args.distance, max_overshoot=args.max_overshoot,
+                             max_following_error=args.max_following_error, torque_limit=args.torque_limit,
+                             max_trials=args.max_trials,
+                             on_trial=lambda t: print(f"速度 {t.velocity:.2f} 加速度 {t.accel:.2f} 减速度 {t.decel:.2f}: "
+                                                      f"{'满足' if t.ok else t.reason}"))
+    best = tuner.tune()
+    motor.wait_target_reached(timeout=10.0, interval=0.01)
+    print(tuner.format_report())
+    if best is not None and args.apply:
+        motor.set_motion_parameters(best.velocity, best.accel, best.decel)
+        print(motor.status)
+    motor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CAN总线负载估算与PDO/SYNC周期规划
+
+connect_canopen 的 pdo_interval、sync_interval 和波特率决定了总线上周期性报文的数量，
+但没有任何地方说明例如 20 台驱动器、1 ms PDO 在 500K 总线上是否可行。
+本模块按节点数、PDO映射、波特率和周期计算每秒帧数、按最坏位填充计算的总线利用率
+和每个SYNC周期的时延预算，给出满足利用率上限的最短周期，并可以在运行时通过
+SDK调用钩子统计实际的SDO请求速率，与估算值比较。
+
+用法:
+    est = estimate_bus_load(20, baudrate=CanBaudRate.CAN_BT_500K, pdo_interval=1, sync_interval=1)
+    print(est.format_report())
+    pdo_interval, sync_interval, est = recommend_intervals(20, baudrate=CanBaudRate.CAN_BT_500K)
+
+    monitor = CallRateMonitor()
+    monitor.start()
+    ...
+    print(monitor.compare(est).format_report())
+"""
+
+import threading, time
+from NimServoSDK import *
+from sdk_functions import MASTER_FUNCS, LOCAL_FUNCS, sdo_arg_functions
+
+# 波特率代码 -> 位速率(bit/s)
+BAUD_RATES = {
+    CanBaudRate.CAN_BT_10K: 10000,
+    CanBaudRate.CAN_BT_20K: 20000,
+    CanBaudRate.CAN_BT_50K: 50000,
+    CanBaudRate.CAN_BT_100K: 100000,
+    CanBaudRate.CAN_BT_125K: 125000,
+    CanBaudRate.CAN_BT_250K: 250000,
+    CanBaudRate.CAN_BT_500K: 500000,
+    CanBaudRate.CAN_BT_800K: 800000,
+    CanBaudRate.CAN_BT_1000K: 1000000,
+}
+
+# 默认PDO映射的数据长度(字节)：TPDO1 状态字+实际位置，TPDO2 模式显示+实际速度；
+# RPDO1 控制字+目标位置，RPDO2 模式+目标速度
+DEFAULT_TPDO_BYTES = [6, 5]
+DEFAULT_RPDO_BYTES = [6, 5]
+
+# 一次SDO访问为请求+应答两帧，每帧8字节数据
+SDO_FRAMES = 2
+SDO_FRAME_BYTES = 8
+
+# 推荐周期时允许的最大总线利用率
+DEFAULT_MAX_UTILIZATION = 0.7
+
+
+def frame_bits(data_bytes):
+    """
+    标准帧(11位标识符)在最坏位填充下的长度，包含3位帧间隔
+    参数:
+    data_bytes - 数据长度(0~8字节)
+    返回: 位数
+    """
+    if not 0 <= data_bytes <= 8:
+        raise ValueError(f"CAN帧数据长度 {data_bytes} 无效")
+    # 44位固定开销 + 数据 + 参与填充的 34+8n 位中最多每4位插入1位填充位 + 3位帧间隔
+    return 44 + 8 * data_bytes + (34 + 8 * data_bytes - 1) // 4 + 3
+
+
+def pdo_bytes(pdos):
+    """
+    把PDO映射转换为每个PDO的数据长度
+    参数:
+    pdos - PDO列表，每个元素为 [(索引, 子索引, 位长), ...]（read_pdo_mapping 的返回格式）或字节数
+    返回: 已启用PDO的字节数列表
+    """
+    sizes = []
+    for pdo in pdos:
+        size = pdo if isinstance(pdo, int) else (sum(e[2] for e in pdo) + 7) // 8
+        if size > 0:
+            sizes.append(size)
+    return sizes
+
+
+class BusLoadEstimate(object):
+    def __init__(self, baudrate, bitrate, pdo_interval, sync_interval):
+        self.baudrate = baudrate
+        self.bitrate = bitrate
+        self.pdo_interval = pdo_interval        # ms
+        self.sync_interval = sync_interval      # ms
+        self.frames_per_second = 0.0
+        self.bits_per_second = 0.0
+        self.cyclic_bits_per_second = 0.0       # SYNC+PDO 周期报文
+        self.sdo_bits_per_second = 0.0
+        self.sync_cycle_bits = 0                # 一个SYNC周期内的 SYNC + 全部TPDO
+        self.frames = {}                        # 报文类型 -> 每秒帧数
+
+    @property
+    def utilization(self):
+        """
+        总线利用率(0~1，超过1表示总线过载)
+        """
+        return self.bits_per_second / self.bitrate
+
+    @property
+    def sync_response_time(self):
+        """
+        SYNC发出后全部TPDO到达主站的最坏时间(ms)，即每个周期的时延预算
+        """
+        return self.sync_cycle_bits * 1000.0 / self.bitrate
+
+    @property
+    def feasible(self):
+        return self.utilization <= 1.0 and self.sync_response_time <= self.sync_interval
+
+    def format_report(self):
+        lines = [f"波特率: {self.bitrate // 1000}K，PDO周期 {self.pdo_interval} ms，SYNC周期 {self.sync_interval} ms"]
+        for name, rate in self.frames.items():
+            lines.append(f"  {name:<6}{rate:>10.0f} 帧/s")
+        lines.append(f"总计: {self.frames_per_second:.0f} 帧/s，{self.bits_per_second / 1000:.1f} kbit/s，"
+                     f"利用率 {self.utilization * 100:.1f}%")
+        lines.append(f"SYNC响应时间: {self.sync_response_time:.3f} ms / 周期 {self.sync_interval} ms")
+        lines.append("可行" if self.feasible else "不可行：总线过载或TPDO无法在一个SYNC周期内发送完")
+        return '\n'.join(lines)
+
+
+def estimate_bus_load(node_count, tpdos=None, rpdos=None, baudrate=CanBaudRate.CAN_BT_1000K,
+                      pdo_interval=10, sync_interval=10, sdo_rate=0.0):
+    """
+    估算CAN总线负载
+    参数:
+    node_count - 节点数，或 {从站地址: (tpdos, rpdos)} 为每个节点单独指定映射
+    tpdos/rpdos - 每个节点的PDO映射（格式见 pdo_bytes），None 表示默认映射
+    baudrate - CanBaudRate 波特率代码
+    pdo_interval - 主站发送RPDO的周期(ms)
+    sync_interval - SYNC周期(ms)，驱动器在每个SYNC后发送TPDO
+    sdo_rate - 预留的SDO访问速率(次/s)
+    返回: BusLoadEstimate
+    """
+    if baudrate not in BAUD_RATES:
+        raise ValueError(f"未知的波特率代码: {baudrate}")
+    if pdo_interval <= 0 or sync_interval <= 0:
+        raise ValueError("PDO周期和SYNC周期必须大于0")
+    if isinstance(node_count, dict):
+        nodes = [(pdo_bytes(t if t is not None else DEFAULT_TPDO_BYTES), pdo_bytes(r if r is not None else DEFAULT_RPDO_BYTES))
+                 for t, r in node_count.values()]
+    else:
+        node = (pdo_bytes(tpdos if tpdos is not None else DEFAULT_TPDO_BYTES),
+                pdo_bytes(rpdos if rpdos is not None else DEFAULT_RPDO_BYTES))
+        nodes = [node] * node_count
+
+    est = BusLoadEstimate(baudrate, BAUD_RATES[baudrate], pdo_interval, sync_interval)
+    sync_rate = 1000.0 / sync_interval
+    pdo_rate = 1000.0 / pdo_interval
+    tpdo_bits = sum(frame_bits(n) for t, _ in nodes for n in t)
+    rpdo_bits = sum(frame_bits(n) for _, r in nodes for n in r)
+    sync_bits = frame_bits(0)
+
+    est.frames = {
+        'SYNC': sync_rate,
+        'TPDO': sync_rate * sum(len(t) for t, _ in nodes),
+        'RPDO': pdo_rate * sum(len(r) for _, r in nodes),
+        'SDO': sdo_rate * SDO_FRAMES,
+    }
+    est.frames_per_second = sum(est.frames.values())
+    est.cyclic_bits_per_second = sync_rate * (sync_bits + tpdo_bits) + pdo_rate * rpdo_bits
+    est.sdo_bits_per_second = sdo_rate * SDO_FRAMES * frame_bits(SDO_FRAME_BYTES)
+    est.bits_per_second = est.cyclic_bits_per_second + est.sdo_bits_per_second
+    est.sync_cycle_bits = sync_bits + tpdo_bits
+    return est
+
+
+def recommend_intervals(node_count, tpdos=None, rpdos=None, baudrate=CanBaudRate.CAN_BT_1000K,
+                        sdo_rate=0.0, max_utilization=DEFAULT_MAX_UTILIZATION, max_interval=1000):
+    """
+    推荐满足利用率上限的最短PDO/SYNC周期（整数毫秒，PDO周期与SYNC周期相同）
+    参数:
+    max_utilization - 允许的最大总线利用率
+    max_interval - 搜索的最大周期(ms)
+    返回: (pdo_interval, sync_interval, BusLoadEstimate)，无法满足时返回 (None, None, 最大周期的估算)
+    """
+    est = None
+    for interval in range(1, max_interval + 1):
+        est = estimate_bus_load(node_count, tpdos, rpdos, baudrate, interval, interval, sdo_rate)
+        if est.utilization <= max_utilization and est.sync_response_time <= interval:
+            return interval, interval, est
+    return None, None, est
+
+
+class MeasuredBusLoad(object):
+    def __init__(self, estimate, duration, sdo_rate, pdo_rate):
+        self.estimate = estimate
+        self.duration = duration
+        self.sdo_rate = sdo_rate        # 实测SDO访问速率(次/s)
+        self.pdo_rate = pdo_rate        # 实测PDO读写调用速率(次/s)，只访问主站缓存，不产生报文
+
+    @property
+    def sdo_bits_per_second(self):
+        return self.sdo_rate * SDO_FRAMES * frame_bits(SDO_FRAME_BYTES)
+
+    @property
+    def utilization(self):
+        """
+        估算的周期报文负载 + 实测SDO负载
+        """
+        return (self.estimate.cyclic_bits_per_second + self.sdo_bits_per_second) / self.estimate.bitrate
+
+    def format_report(self):
+        lines = [f"统计时长: {self.duration:.1f} s",
+                 f"SDO访问: {self.sdo_rate:.1f} 次/s（估算预留 {self.estimate.frames['SDO'] / SDO_FRAMES:.1f} 次/s）",
+                 f"PDO调用: {self.pdo_rate:.1f} 次/s",
+                 f"估算利用率: {self.estimate.utilization * 100:.1f}%，按实测SDO: {self.utilization * 100:.1f}%"]
+        return '\n'.join(lines)
+
+
+class CallRateMonitor(object):
+    def __init__(self):
+        """
+        通过SDK调用钩子统计SDO/PDO访问速率
+        """
+        self.sdo_calls = 0
+        self.pdo_calls = 0
+        self.functions = {}
+        self._sdo_arg_funcs = sdo_arg_functions()
+        self._lock = threading.Lock()
+        self._t0 = None
+        self._t1 = None
+
+    def start(self):
+        self.reset()
+        add_call_hook(self._hook)
+
+    def stop(self):
+        remove_call_hook(self._hook)
+        self._t1 = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.sdo_calls = 0
+            self.pdo_calls = 0
+            self.functions = {}
+            self._t0 = time.monotonic()
+            self._t1 = None
+
+    def _hook(self, strFuncName, args, nRes, t0_ns, t1_ns):
+        if strFuncName in self._sdo_arg_funcs:
+            bSDO = call_arg_value(args[-1]) if args else 1
+        elif strFuncName in MASTER_FUNCS or strFuncName in LOCAL_FUNCS:
+            return
+        else:
+            # 没有 bSDO 参数的从站函数（原点参数、限位等）均为SDO访问
+            bSDO = 1
+        with self._lock:
+            if bSDO:
+                self.sdo_calls += 1
+            else:
+                self.pdo_calls += 1
+            self.functions[strFuncName] = self.functions.get(strFuncName, 0) + 1
+
+    def duration(self):
+        if self._t0 is None:
+            return 0.0
+        return (self._t1 if self._t1 is not None else time.monotonic()) - self._t0
+
+    def compare(self, estimate):
+        """
+        与估算结果比较
+        参数:
+        estimate - estimate_bus_load 的返回值
+        返回: MeasuredBusLoad
+        """
+        duration = max(self.duration(), 1e-9)
+        return MeasuredBusLoad(estimate, duration, self.sdo_calls / duration, self.pdo_calls / duration)
+
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CSV/CST 模式下的每周期用户控制回调
+
+在 Python 中围绕 Nim_set_targetVelocity / Nim_set_targetTorque 闭合自定义控制环
+（例如力控、张力控制）：每个周期通过PDO读取各轴最新反馈，调用用户回调得到目标值
+并写入。框架测量回调执行时间，超出预算时丢弃本周期的计算结果、保持上一个安全
+目标值，并统计预算利用率。周期调度使用 CyclicExecutor。
+
+用法:
+    def tension(cycle, t, fb):
+        err = 200 - fb[1].torque
+        return {1: fb[1].velocity + 0.01 * err}
+
+    loop = ControlLoop(motor.h_master, {1: ServoWorkMode.SERVO_CSV_MODE}, tension,
+                       period=0.001, budget=0.0004, limits={1: (-50.0, 50.0)})
+    loop.run(duration=10.0)         # 或 loop.start() / loop.stop()
+    print(loop.format_report())
+"""
+
+import time
+from NimServoSDK import *
+from cyclic_executor import CyclicExecutor
+from perf_stats import Histogram
+
+
+class AxisFeedback(object):
+    __slots__ = ('position', 'velocity', 'torque', 'status_word', 'timestamp_ns', 'bus_cycle', 'valid')
+
+    def __init__(self):
+        self.position = 0.0
+        self.velocity = 0.0
+        self.torque = 0
+        self.status_word = 0
+        self.timestamp_ns = 0
+        self.bus_cycle = None   # SyncTimebase 估计的SYNC周期序号
+        self.valid = False      # 本周期反馈是否全部读取成功
+
+    def __repr__(self):
+        return (f"AxisFeedback(位置={self.position}, 速度={self.velocity}, 转矩={self.torque}, "
+                f"状态字={self.status_word:#06x}, valid={self.valid})")
+
+
+class ControlLoop(object):
+    def __init__(self, h_master, axes, callback, period=0.001, budget=None, limits=None,
+                 cpu=None, priority=None, timebase=None):
+        """
+        初始化控制环
+        参数:
+        h_master - 主站句柄
+        axes - {从站地址: ServoWorkMode.SERVO_CSV_MODE 或 SERVO_CST_MODE}，轴需已设置为对应模式并使能
+        callback - 回调函数 callback(cycle, t, feedback)，feedback 为 {从站地址: AxisFeedback}，
+                   返回 {从站地址: 目标值}（CSV 为速度(用户单位/s)，CST 为转矩(0.001倍额定转矩)），
+                   未返回的轴保持上一个目标值
+        period - 控制周期(秒)
+        budget - 回调执行时间预算(秒)，默认为周期的一半
+        limits - {从站地址: (最小值, 最大值)}，目标值限幅
+        cpu, priority - 传给 CyclicExecutor 的CPU绑定和 SCHED_FIFO 优先级
+        timebase - SyncTimebase，设置后反馈带有SYNC周期序号，各轴反馈可按同一周期对齐
+        """
+        for node, mode in axes.items():
+            if mode not in (ServoWorkMode.SERVO_CSV_MODE, ServoWorkMode.SERVO_CST_MODE):
+                raise ValueError(f"节点{node}的模式必须为CSV或CST")
+        self.h_master = h_master
+        self.axes = dict(axes)
+        self.callback = callback
+        self.period = period
+        self.budget = budget if budget is not None else period * 0.5
+        self.limits = dict(limits or {})
+        self.timebase = timebase
+        self.feedback = dict((node, AxisFeedback()) for node in axes)
+        # 上一个安全目标值：初始为 0（速度为0 / 转矩为0）
+        self.setpoints = dict((node, 0.0 if mode == ServoWorkMode.SERVO_CSV_MODE else 0) for node, mode in axes.items())
+        self.exec_hist = Histogram(period / 100.0, 200)
+        self.budget_overruns = 0
+        self.callback_errors = 0
+        self.read_errors = 0
+        self.write_errors = 0
+        self.held_cycles = 0
+        self.last_error = None
+        self._exec_total = 0.0
+        self.executor = CyclicExecutor(period, self._cycle, cpu=cpu, priority=priority, name='ControlLoop')
+
+    def _read_feedback(self, now_ns):
+        h = self.h_master
+        timebase = self.timebase
+        for node, fb in self.feedback.items():
+            t0 = time.monotonic_ns()
+            [r1, fb.position] = Nim_get_currentPosition(h, node, 0)
+            [r2, fb.velocity] = Nim_get_currentVelocity(h, node, 0)
+            [r3, fb.torque] = Nim_get_currentTorque(h, node, 0)
+            [r4, fb.status_word] = Nim_get_statusWord(h, node, 0)
+            fb.valid = not (r1 or r2 or r3 or r4)
+            fb.timestamp_ns = now_ns
+            if not fb.valid:
+                self.read_errors += 1
+            elif timebase is not None:
+                t1 = time.monotonic_ns()
+                timebase.observe_value((node, 'position'), fb.position, t0, t1)
+                fb.bus_cycle = timebase.cycle_at(t1)
+
+    def _clamp(self, node, value):
+        limit = self.limits.get(node)
+        if limit is not None:
+            value = max(limit[0], min(limit[1], value))
+        if self.axes[node] == ServoWorkMode.SERVO_CST_MODE:
+            return int(value)
+        return float(value)
+
+    def _write_setpoints(self):
+        h = self.h_master
+        for node, value in self.setpoints.items():
+            if self.axes[node] == ServoWorkMode.SERVO_CSV_MODE:
+                res = Nim_set_targetVelocity(h, node, value, 0)
+            else:
+                res = Nim_set_targetTorque(h, node, value, 0)
+            if res != 0:
+                self.write_errors += 1
+
+    def _cycle(self, cycle, deadline_ns):
+        self._read_feedback(time.monotonic_ns())
+        t0 = time.perf_counter()
+        try:
+            # 超时跳过的周期不计入 cycle，t 按截止时刻计算，与实际时间保持一致
+            result = self.callback(cycle, (deadline_ns - self.executor.start_ns) / 1e9, self.feedback)
+        except Exception as e:
+            result = None
+            self.callback_errors += 1
+            self.last_error = e
+        elapsed = time.perf_counter() - t0
+        self.exec_hist.add(elapsed)
+        self._exec_total += elapsed
+        if elapsed > self.budget:
+            # Python 无法中断回调，超出预算的结果视为过期，保持上一个安全目标值
+            self.budget_overruns += 1
+            result = None
+        if result is None:
+            self.held_cycles += 1
+        else:
+            for node, value in result.items():
+                if node in self.setpoints:
+                    self.setpoints[node] = self._clamp(node, value)
+        self._write_setpoints()
+
+    def run(self, cycles=None, duration=None):
+        """
+        在当前线程运行控制环
+        """
+        return self.executor.run(cycles, duration)
+
+    def start(self, cycles=None, duration=None):
+        self.executor.start(cycles, duration)
+
+    def stop(self):
+        """
+        停止控制环，并把所有轴的目标值置0
+        """
+        self.executor.stop()
+        for node in self.setpoints:
+            self.setpoints[node] = self._clamp(node, 0)
+        self._write_setpoints()
+
+    def utilization(self):
+        """
+        返回预算利用率 {'mean', 'p99', 'max'}（回调执行时间 / 预算）
+        """
+        cycles = self.exec_hist.total
+        if not cycles:
+            return {'mean': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {'mean': self._exec_total / cycles / self.budget,
+                'p99': self.exec_hist.percentile(99) / self.budget,
+                'max': self.exec_hist.max_value / self.budget}
+
+    def format_report(self):
+        u = self.utilization()
+        lines = [f"周期: {self.period * 1e3:.3f} ms，预算: {self.budget * 1e3:.3f} ms，周期数: {self.exec_hist.total}",
+                 f"预算利用率: 平均 {u['mean'] * 100:.1f}%，p99 {u['p99'] * 100:.1f}%，最大 {u['max'] * 100:.1f}%",
+                 f"超出预算: {self.budget_overruns}，回调异常: {self.callback_errors}，保持目标值周期: {self.held_cycles}",
+                 f"反馈读取错误: {self.read_errors}，目标值写入错误: {self.write_errors}，调度超时: {self.executor.overruns}"]
+        return '\n'.join(lines)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于绝对截止时刻的实时周期执行器
+
+motor_control.py 和 motor_test.py 中的循环都使用相对的 time.sleep，周期会漂移，
+抖动也无从测量。CyclicExecutor 按 time.monotonic_ns() 的绝对截止时刻以固定周期
+调用回调函数，可选绑定CPU核心并在有权限时申请 SCHED_FIFO 实时调度（无权限时
+自动退回普通调度并记录原因），检测并统计超时周期，记录实际周期、唤醒抖动和
+回调执行时间直方图，作为 CSP/CSV/CST 周期控制的时间基准。
+
+用法:
+    def on_cycle(cycle, deadline_ns):
+        # 超时跳过的周期不计入 cycle，轨迹时间按截止时刻计算
+        motor.write_cyclic_setpoint(trajectory((deadline_ns - ex.start_ns) / 1e9))
+
+    ex = CyclicExecutor(0.001, on_cycle, cpu=3, priority=80)
+    ex.run(duration=5.0)            # 在当前线程运行；或 ex.start() / ex.stop() 在后台线程运行
+    print(ex.format_report())
+"""
+
+import os, threading, time
+from perf_stats import Histogram
+
+# 超时处理策略
+OVERRUN_SKIP = 'skip'           # 跳过已错过的周期，保持相位对齐（默认）
+OVERRUN_CATCH_UP = 'catch_up'   # 立即连续执行错过的周期
+
+
+def set_realtime(cpu=None, priority=None):
+    """
+    为当前线程设置CPU亲和性和 SCHED_FIFO 实时调度
+    参数:
+    cpu - CPU核心编号，None 表示不绑定
+    priority - SCHED_FIFO 优先级(1~99)，None 表示不申请实时调度
+    返回: {'affinity': True/False/None, 'sched_fifo': True/False/None, 'errors': [说明, ...],
+          'previous': 修改前的设置，传给 restore_realtime 恢复}
+    """
+    result = {'affinity': None, 'sched_fifo': None, 'errors': [], 'previous': {}}
+    if cpu is not None:
+        try:
+            result['previous']['affinity'] = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, {cpu})
+            result['affinity'] = True
+        except (AttributeError, OSError, ValueError) as e:
+            result['affinity'] = False
+            result['errors'].append(f"绑定CPU{cpu}失败: {e}")
+    if priority is not None:
+        try:
+            previous = (os.sched_getscheduler(0), os.sched_getparam(0))
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            result['previous']['scheduler'] = previous
+            result['sched_fifo'] = True
+        except (AttributeError, OSError, ValueError) as e:
+            result['sched_fifo'] = False
+            result['errors'].append(f"设置SCHED_FIFO失败，使用普通调度: {e}")
+    return result
+
+
+def restore_realtime(status):
+    """
+    恢复 set_realtime 修改前的CPU亲和性和调度策略
+    参数:
+    status - set_realtime 的返回值
+    """
+    previous = (status or {}).get('previous', {})
+    if 'scheduler' in previous:
+        policy, param = previous['scheduler']
+        try:
+            os.sched_setscheduler(0, policy, param)
+        except (AttributeError, OSError, ValueError):
+            pass
+    if 'affinity' in previous:
+        try:
+            os.sched_setaffinity(0, previous['affinity'])
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+class CyclicExecutor(object):
+    def __init__(self, period, callback=None, cpu=None, priority=None, overrun=OVERRUN_SKIP,
+                 spin=0.0, hist_bin=10e-6, hist_bins=1000, name='CyclicExecutor'):
+        """
+        初始化周期执行器
+        参数:
+        period - 周期(秒)，可小于1ms
+        callback - 回调函数 callback(cycle, deadline_ns)，可再用 add() 添加多个，按添加顺序调用
+        cpu - 绑定的CPU核心编号，None 表示不绑定
+        priority - SCHED_FIFO 优先级(1~99)，None 表示不申请实时调度
+        overrun - 超时处理策略 OVERRUN_SKIP / OVERRUN_CATCH_UP
+        spin - 截止时刻前忙等的时长(秒)，大于0时以CPU占用换取更小的唤醒抖动
+        hist_bin, hist_bins - 直方图桶宽度(秒)和桶数量
+        name - 后台线程名称
+        """
+        if period <= 0:
+            raise ValueError("周期必须大于0")
+        self.period = period
+        self.cpu = cpu
+        self.priority = priority
+        self.overrun = overrun
+        self.spin = spin
+        self.name = name
+        self.callbacks = [callback] if callback is not None else []
+        self.rt_status = None
+        self.period_hist = Histogram(hist_bin, hist_bins)   # 相邻两次周期开始的实际间隔
+        self.jitter_hist = Histogram(hist_bin, hist_bins)   # 周期开始时刻滞后截止时刻的时间
+        self.exec_hist = Histogram(hist_bin, hist_bins)     # 回调执行时间
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.callback_errors = 0
+        self.last_error = None
+        self.start_ns = None            # 本次 run() 第一个周期的截止时刻，(deadline_ns - start_ns) 为经过的时间
+        self._period_ns = int(period * 1e9)
+        self._spin_ns = int(spin * 1e9)
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def add(self, callback):
+        self.callbacks.append(callback)
+
+    def remove(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def reset_stats(self):
+        self.period_hist.reset()
+        self.jitter_hist.reset()
+        self.exec_hist.reset()
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.callback_errors = 0
+
+    def _wait_until(self, deadline_ns):
+        wait = deadline_ns - self._spin_ns - time.monotonic_ns()
+        if wait > 0:
+            self._stop_event.wait(wait / 1e9)
+        while time.monotonic_ns() < deadline_ns and not self._stop_event.is_set():
+            pass
+
+    def run(self, cycles=None, duration=None):
+        """
+        在当前线程运行，直到 stop()、达到周期数或运行时长
+        参数:
+        cycles - 运行的周期数，None 表示不限
+        duration - 运行时长(秒)，None 表示不限
+        返回: 本次运行的周期数
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+        # 实时设置作用于调用 run() 的线程，返回前恢复
+        self.rt_status = set_realtime(self.cpu, self.priority)
+        try:
+            return self._run(cycles, duration)
+        finally:
+            restore_realtime(self.rt_status)
+
+    def _run(self, cycles, duration):
+        period_ns = self._period_ns
+        start = time.monotonic_ns()
+        self.start_ns = start
+        end = start + int(duration * 1e9) if duration is not None else None
+        deadline = start
+        last_start = None
+        count = 0
+        while not self._stop_event.is_set():
+            if cycles is not None and count >= cycles:
+                break
+            if end is not None and deadline >= end:
+                break
+            self._wait_until(deadline)
+            if self._stop_event.is_set():
+                break
+            t0 = time.monotonic_ns()
+            self.jitter_hist.add((t0 - deadline) / 1e9)
+            if last_start is not None:
+                self.period_hist.add((t0 - last_start) / 1e9)
+            last_start = t0
+            for callback in self.callbacks:
+                try:
+                    callback(self.cycles, deadline)
+                except Exception as e:
+                    self.callback_errors += 1
+                    self.last_error = e
+            t1 = time.monotonic_ns()
+            self.exec_hist.add((t1 - t0) / 1e9)
+            self.cycles += 1
+            count += 1
+            deadline += period_ns
+            if t1 > deadline:
+                self.overruns += 1
+                if self.overrun == OVERRUN_SKIP:
+                    # 跳到下一个未来的截止时刻，保持与起始时刻的相位对齐
+                    missed = (t1 - deadline) // period_ns + 1
+                    self.skipped += missed
+                    deadline += missed * period_ns
+        return count
+
+    def start(self, cycles=None, duration=None):
+        """
+        启动后台线程运行
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, args=(cycles, duration), name=self.name, daemon=True)
+        self._thread.start()
+
+    def request_stop(self):
+        """
+        请求停止但不等待线程结束，可在回调中调用
+        """
+        self._stop_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def join(self, timeout=None):
+        """
+        等待后台线程结束（达到周期数或运行时长）
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def format_report(self):
+        """
+        生成周期、抖动和超时统计文本
+        """
+        us = lambda v: f"{v * 1e6:.1f}" if v is not None else "-"
+        lines = [f"周期: {self.period * 1e3:.3f} ms，周期数: {self.cycles}，超时: {self.overruns}，"
+                 f"跳过: {self.skipped}，回调异常: {self.callback_errors}"]
+        for title, hist in (("实际周期", self.period_hist), ("唤醒抖动", self.jitter_hist), ("执行时间", self.exec_hist)):
+            lines.append(f"{title}(us): p50 {us(hist.percentile(50))}  p99 {us(hist.percentile(99))}  max {us(hist.max_value)}")
+        if self.rt_status is not None:
+            lines.append(f"CPU绑定: {self.rt_status['affinity']}，SCHED_FIFO: {self.rt_status['sched_fifo']}")
+            lines.extend(self.rt_status['errors'])
+        return '\n'.join(lines)
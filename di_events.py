@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+DI 边沿事件订阅
+
+每个周期对所有被订阅的节点只读取一次 DI（默认走PDO），按位检测上升沿/下降沿，
+支持可选的消抖时间，通过回调函数或队列分发带周期时间戳的事件。
+传感器和限位开关的消费者不再各自轮询 Nim_get_DIs。
+
+用法:
+    di = DIService(motor.h_master, cycle=0.005)
+    di.subscribe(1, bit=0, edge=EDGE_RISING, callback=on_sensor, debounce=0.002)
+    di.start()
+    ...
+    di.stop()
+"""
+
+import threading, time
+from NimServoSDK import *
+
+EDGE_RISING = 1
+EDGE_FALLING = 2
+EDGE_BOTH = EDGE_RISING | EDGE_FALLING
+
+
+class DIEvent(object):
+    __slots__ = ('node_id', 'bit', 'edge', 'level', 'timestamp_ns', 'cycle')
+
+    def __init__(self, node_id, bit, edge, level, timestamp_ns, cycle):
+        self.node_id = node_id
+        self.bit = bit                      # DI编号从0开始，bit0 表示 DI1
+        self.edge = edge                    # EDGE_RISING 或 EDGE_FALLING
+        self.level = level                  # 边沿后的电平 0/1
+        self.timestamp_ns = timestamp_ns    # 读取该周期DI时的 time.monotonic_ns()
+        self.cycle = cycle                  # 周期计数
+
+    def __repr__(self):
+        edge = "上升沿" if self.edge == EDGE_RISING else "下降沿"
+        return f"DIEvent(节点{self.node_id}, DI{self.bit + 1}, {edge}, 周期{self.cycle})"
+
+
+class DISubscription(object):
+    def __init__(self, node_id, bit, edge, callback, queue, debounce_ns):
+        self.node_id = node_id
+        self.bit = bit
+        self.mask = 1 << bit
+        self.edge = edge
+        self.callback = callback
+        self.queue = queue
+        self.debounce_ns = debounce_ns
+        # 消抖状态：已确认的电平、候选电平及其开始时间
+        self.stable = None
+        self.candidate = None
+        self.candidate_since = 0
+
+    def update(self, level, now_ns):
+        """
+        输入本周期电平
+        返回: 确认的边沿 EDGE_RISING/EDGE_FALLING，无边沿返回 0
+        """
+        if self.stable is None:
+            self.stable = level
+            self.candidate = level
+            return 0
+        if level != self.candidate:
+            self.candidate = level
+            self.candidate_since = now_ns
+        if self.candidate == self.stable:
+            return 0
+        if now_ns - self.candidate_since < self.debounce_ns:
+            return 0
+        self.stable = self.candidate
+        return EDGE_RISING if self.stable else EDGE_FALLING
+
+
+class DIService(object):
+    def __init__(self, h_master, cycle=0.01, bSDO=0):
+        """
+        初始化DI服务
+        参数:
+        h_master - 主站句柄
+        cycle - 读取周期(秒)
+        bSDO - 1 使用SDO读取；0 使用PDO（默认）
+        """
+        self.h_master = h_master
+        self.cycle = cycle
+        self.bSDO = bSDO
+        self.cycle_count = 0
+        self.read_errors = {}
+        self.callback_errors = 0
+        self.last_values = {}
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def subscribe(self, node_id, bit, edge=EDGE_BOTH, callback=None, queue=None, debounce=0.0):
+        """
+        订阅某个DI位的边沿事件
+        参数:
+        node_id - 从站地址
+        bit - DI编号，从0开始（0 表示 DI1）
+        edge - EDGE_RISING / EDGE_FALLING / EDGE_BOTH
+        callback - 回调函数 callback(DIEvent)，在读取线程中调用
+        queue - 事件队列（queue.Queue 等，具有 put 方法），与 callback 可同时使用
+        debounce - 消抖时间(秒)，电平需持续该时间才确认边沿
+        返回: DISubscription 对象，用于取消订阅
+        """
+        if callback is None and queue is None:
+            raise ValueError("callback 和 queue 至少指定一个")
+        sub = DISubscription(node_id, bit, edge, callback, queue, int(debounce * 1e9))
+        with self._lock:
+            self._subscriptions.setdefault(node_id, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscriptions.get(sub.node_id, [])
+            if sub in subs:
+                subs.remove(sub)
+            if not subs:
+                self._subscriptions.pop(sub.node_id, None)
+
+    def poll(self):
+        """
+        执行一个周期：每个订阅节点读取一次DI并分发事件
+        返回: 本周期产生的事件列表
+        """
+        with self._lock:
+            nodes = [(node, list(subs)) for node, subs in self._subscriptions.items()]
+        self.cycle_count += 1
+        events = []
+        for node, subs in nodes:
+            [res, dis] = Nim_get_DIs(self.h_master, node, self.bSDO)
+            now_ns = time.monotonic_ns()
+            if res != 0:
+                self.read_errors[node] = self.read_errors.get(node, 0) + 1
+                continue
+            self.last_values[node] = dis
+            for sub in subs:
+                edge = sub.update(1 if dis & sub.mask else 0, now_ns)
+                if edge and (edge & sub.edge):
+                    event = DIEvent(node, sub.bit, edge, sub.stable, now_ns, self.cycle_count)
+                    events.append(event)
+                    self._dispatch(sub, event)
+        return events
+
+    def _dispatch(self, sub, event):
+        try:
+            if sub.callback is not None:
+                sub.callback(event)
+            if sub.queue is not None:
+                sub.queue.put(event)
+        except Exception:
+            self.callback_errors += 1
+
+    def start(self):
+        """
+        启动后台读取线程
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='DIService', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        period_ns = int(self.cycle * 1e9)
+        deadline = time.monotonic_ns()
+        while not self._stop_event.is_set():
+            self.poll()
+            # 按绝对时刻计算下一周期，避免累计漂移
+            deadline += period_ns
+            wait = deadline - time.monotonic_ns()
+            if wait > 0:
+                self._stop_event.wait(wait / 1e9)
+            else:
+                deadline = time.monotonic_ns()
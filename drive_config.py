@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+驱动器配置快照、差异比较与并行恢复
+
+调试更换的驱动器时，把原驱动器的配置（轮廓速度/加减速度、快速停止减速度、
+原点参数、位置限制、最大速度/转矩、用户单位系数等）导出为文件；恢复时只读取
+文件中包含的对象与在线驱动器比较，只写入不同的参数，再保存到驱动器，
+多台驱动器可并行恢复，并汇总每个节点的结果和超时。
+
+用法:
+    export_config(motor.h_master, 1, "axis1.json")
+    diffs = diff_config(motor.h_master, 1, load_config_file("axis1.json"))
+    fleet = restore_many(motor.h_master, {1: cfg1, 2: cfg2}, timeout=30.0)
+    print(fleet.format_report())
+"""
+
+import concurrent.futures, json, threading, time
+from NimServoSDK import *
+
+CONFIG_VERSION = 1
+
+# 配置项: 名称 -> (读取函数, 写入函数)
+# 读取函数返回 [nRes, 值] 或 [nRes, 值1, 值2]；写入函数参数为 (hMaster, nodeId, *值)
+# 用户单位系数放在最前面，其余参数都以用户单位表示
+CONFIG_ITEMS = [
+    ('unitsFactor', Nim_get_unitsFactor, Nim_set_unitsFactor),
+    ('profileVelocity', Nim_get_profileVelocity, Nim_set_profileVelocity),
+    ('profileAccel', Nim_get_profileAccel, Nim_set_profileAccel),
+    ('profileDecel', Nim_get_profileDecel, Nim_set_profileDecel),
+    ('quickStopDecel', Nim_get_quickStopDecel, Nim_set_quickStopDecel),
+    ('homeType', Nim_get_homeType, Nim_set_homeType),
+    ('homeOffset', Nim_get_homeOffset, Nim_set_homeOffset),
+    ('goHomeVelocity', Nim_get_goHome_velocity, Nim_set_goHome_velocity),
+    ('goHomeAccel', Nim_get_goHome_accel, Nim_set_goHome_accel),
+    ('posLimit', Nim_get_posLimit, Nim_set_posLimit),
+    ('maxVelocity', Nim_get_maxVelocity, Nim_set_maxVelocity),
+    ('maxMotorSpeed', Nim_get_maxMotorSpeed, Nim_set_maxMotorSpeed),
+    ('maxTorque', Nim_get_maxTorque, Nim_set_maxTorque),
+    ('vmSpeedLimit', Nim_get_vmSpeedLimit, Nim_set_vmSpeedLimit),
+    ('ptSpeedLimit', Nim_get_PT_SpeedLimit, Nim_set_PT_SpeedLimit),
+    ('ptTorqueRamp', Nim_get_PT_TorqueRamp, Nim_set_PT_TorqueRamp),
+    ('ipPeriod', Nim_get_ipPeriod, Nim_set_ipPeriod),
+]
+_ITEMS = dict((name, (getter, setter)) for name, getter, setter in CONFIG_ITEMS)
+_ORDER = dict((name, i) for i, (name, _, _) in enumerate(CONFIG_ITEMS))
+
+
+def _values_equal(a, b, rel_tol=1e-9, abs_tol=1e-6):
+    if isinstance(a, list) or isinstance(b, list):
+        if not isinstance(a, list) or not isinstance(b, list) or len(a) != len(b):
+            return False
+        return all(_values_equal(x, y, rel_tol, abs_tol) for x, y in zip(a, b))
+    return abs(a - b) <= max(rel_tol * max(abs(a), abs(b)), abs_tol)
+
+
+def _read_item(h_master, node_id, name):
+    if name.startswith('param:'):
+        [res, value] = Nim_get_param_value(h_master, node_id, name[6:].encode('utf-8'), 1)
+        return res, value
+    getter = _ITEMS[name][0]
+    result = getter(h_master, node_id)
+    value = result[1] if len(result) == 2 else list(result[1:])
+    return result[0], value
+
+
+def _write_item(h_master, node_id, name, value):
+    if name.startswith('param:'):
+        return Nim_set_param_value(h_master, node_id, name[6:].encode('utf-8'), int(value), 1)
+    setter = _ITEMS[name][1]
+    if isinstance(value, list):
+        return setter(h_master, node_id, *value)
+    return setter(h_master, node_id, value)
+
+
+def _sorted_names(names):
+    return sorted(names, key=lambda n: _ORDER.get(n, len(_ORDER)))
+
+
+def read_config(h_master, node_id, items=None, params=()):
+    """
+    读取驱动器配置
+    参数:
+    h_master - 主站句柄
+    node_id - 从站地址
+    items - 要读取的配置项名称列表，None 表示 CONFIG_ITEMS 全部
+    params - 额外读取的参数编号列表（Nim_get_param_value 的参数编号字符串）
+    返回: (配置字典, 错误字典 {名称: 错误码})
+    """
+    names = list(items) if items is not None else [name for name, _, _ in CONFIG_ITEMS]
+    names += ['param:' + p for p in params]
+    config = {}
+    errors = {}
+    for name in names:
+        res, value = _read_item(h_master, node_id, name)
+        if res == 0:
+            config[name] = value
+        else:
+            errors[name] = res
+    return config, errors
+
+
+def save_config_file(config, path, node_id=None):
+    """
+    保存配置到JSON文件
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CONFIG_VERSION, 'node_id': node_id, 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'config': config}, f, ensure_ascii=False, indent=2)
+
+
+def load_config_file(path):
+    """
+    从JSON文件读取配置
+    返回: 配置字典
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != CONFIG_VERSION:
+        raise ValueError(f"不支持的配置文件版本: {data.get('version')}")
+    return data['config']
+
+
+def export_config(h_master, node_id, path, params=()):
+    """
+    读取驱动器全部配置并保存到文件
+    返回: (配置字典, 错误字典)
+    """
+    config, errors = read_config(h_master, node_id, params=params)
+    save_config_file(config, path, node_id)
+    return config, errors
+
+
+class ConfigDiff(object):
+    __slots__ = ('name', 'expected', 'actual', 'error')
+
+    def __init__(self, name, expected, actual, error=0):
+        self.name = name
+        self.expected = expected
+        self.actual = actual
+        self.error = error
+
+    def __repr__(self):
+        if self.error:
+            return f"ConfigDiff({self.name}: 读取失败，错误码 {self.error})"
+        return f"ConfigDiff({self.name}: 期望 {self.expected}, 实际 {self.actual})"
+
+
+def diff_config(h_master, node_id, config):
+    """
+    比较配置与在线驱动器，只读取配置中包含的对象
+    返回: ConfigDiff 列表（读取失败的项也包含在内，error 为错误码）
+    """
+    diffs = []
+    for name in _sorted_names(config):
+        res, actual = _read_item(h_master, node_id, name)
+        if res != 0:
+            diffs.append(ConfigDiff(name, config[name], None, res))
+        elif not _values_equal(config[name], actual):
+            diffs.append(ConfigDiff(name, config[name], actual))
+    return diffs
+
+
+class ConfigApplyResult(object):
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.written = []
+        self.errors = {}
+        self.saved = False
+        self.timed_out = False
+        self.cancelled = False      # 被 cancel 中止，未写入的参数不再写入、不保存
+        self.duration = 0.0
+
+    @property
+    def success(self):
+        return not self.errors and not self.timed_out
+
+
+def apply_config(h_master, node_id, config, save=True, save_timeout_ms=5000, only_diff=True, cancel=None):
+    """
+    把配置写入驱动器
+    参数:
+    config - 配置字典
+    save - 写入后是否调用 Nim_save_AllParams 保存到驱动器
+    save_timeout_ms - 保存参数超时时间(ms)
+    only_diff - True 时先比较，只写入不同的参数
+    cancel - threading.Event，置位后在下一个参数之前停止（正在进行的SDO访问无法中断），不再保存
+    返回: ConfigApplyResult
+    """
+    result = ConfigApplyResult(node_id)
+    t0 = time.monotonic()
+    names = _sorted_names(config)
+    # 其余参数以用户单位表示，用户单位系数先单独比较和写入，之后按新系数比较其余参数
+    groups = [[n for n in names if n == 'unitsFactor'], [n for n in names if n != 'unitsFactor']]
+    for group in groups:
+        if not group:
+            continue
+        if only_diff:
+            pending = []
+            for diff in diff_config(h_master, node_id, dict((name, config[name]) for name in group)):
+                if diff.error:
+                    result.errors[diff.name] = diff.error
+                else:
+                    pending.append(diff.name)
+        else:
+            pending = group
+        for name in pending:
+            if cancel is not None and cancel.is_set():
+                result.cancelled = True
+                break
+            res = _write_item(h_master, node_id, name, config[name])
+            if res == 0:
+                result.written.append(name)
+            else:
+                result.errors[name] = res
+        if result.errors or result.cancelled:
+            # 用户单位系数未能确认时，其余参数的比较和写入都没有意义
+            break
+    if cancel is not None and cancel.is_set():
+        result.cancelled = True
+    if save and result.written and not result.errors and not result.cancelled:
+        res = Nim_save_AllParams(h_master, node_id, save_timeout_ms)
+        if res == 0:
+            result.saved = True
+        else:
+            result.errors['saveAllParams'] = res
+    result.duration = time.monotonic() - t0
+    return result
+
+
+class FleetRestoreResult(object):
+    def __init__(self):
+        self.results = {}
+        self.duration = 0.0
+
+    @property
+    def succeeded(self):
+        return sorted(n for n, r in self.results.items() if r.success)
+
+    @property
+    def failed(self):
+        return sorted(n for n, r in self.results.items() if r.errors and not r.timed_out)
+
+    @property
+    def timed_out(self):
+        return sorted(n for n, r in self.results.items() if r.timed_out)
+
+    def format_report(self):
+        lines = [f"{'节点':<6}{'结果':<8}{'写入数':>8}{'耗时(s)':>10}  说明"]
+        for node in sorted(self.results):
+            r = self.results[node]
+            state = "超时" if r.timed_out else ("成功" if r.success else "失败")
+            errors = ", ".join(f"{k}={v}" for k, v in r.errors.items())
+            lines.append(f"{node:<6}{state:<8}{len(r.written):>8}{r.duration:>10.3f}  {errors}")
+        lines.append(f"成功 {len(self.succeeded)}，失败 {len(self.failed)}，超时 {len(self.timed_out)}，总耗时 {self.duration:.3f} s")
+        return '\n'.join(lines)
+
+
+def restore_many(h_master, configs, save=True, timeout=30.0, max_workers=8, save_timeout_ms=5000):
+    """
+    并行恢复多台驱动器的配置
+    参数:
+    configs - {从站地址: 配置字典}
+    save - 是否保存到驱动器
+    timeout - 整体超时时间(秒)，到时仍未完成的节点标记为超时
+    max_workers - 最大并行数
+    返回: FleetRestoreResult
+    超时后未开始的节点不再执行；已开始的节点在下一个参数之前停止且不保存，函数等待它们正在进行的
+    SDO访问（或正在进行的保存，最长 save_timeout_ms）结束后才返回，返回后不会再有后台写入。
+    超时节点的 written 为实际已写入（未保存）的参数
+    """
+    fleet = FleetRestoreResult()
+    t0 = time.monotonic()
+    cancel = threading.Event()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = dict((pool.submit(apply_config, h_master, node, cfg, save, save_timeout_ms, True, cancel), node)
+                       for node, cfg in configs.items())
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        cancel.set()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    for future, node in futures.items():
+        if future.cancelled():
+            result = ConfigApplyResult(node)
+        else:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ConfigApplyResult(node)
+                result.errors['exception'] = str(e)
+        if future in not_done:
+            result.timed_out = True
+            result.duration = timeout
+        fleet.results[node] = result
+    fleet.duration = time.monotonic() - t0
+    return fleet
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多轴并行原点回归
+
+按轴配置回原点方式、原点偏置、回零速度和加速度，无依赖关系的轴同时回零，
+有依赖关系的轴（例如先Z后X/Y）在其依赖轴完成后立即启动。所有回零中的轴由
+同一个循环通过PDO读取状态字，原点回归完成/错误位变化时通知对应轴，
+最终报告每个轴的配置、等待和回零耗时。
+
+用法:
+    orch = HomingOrchestrator(motor.h_master, [
+        HomingAxis(3, home_type=17, offset=0.0),                   # Z
+        HomingAxis(1, home_type=17, depends_on=[3]),               # X
+        HomingAxis(2, home_type=17, depends_on=[3]),               # Y
+    ])
+    results = orch.run()
+    print(orch.format_report())
+"""
+
+import concurrent.futures, threading, time
+from NimServoSDK import *
+
+HOMING_PENDING = "等待"
+HOMING_RUNNING = "回零中"
+HOMING_DONE = "完成"
+HOMING_FAILED = "失败"
+HOMING_SKIPPED = "跳过"
+
+
+class HomingAxis(object):
+    def __init__(self, node_id, home_type, offset=None, velocity1=None, velocity2=None,
+                 accel=None, depends_on=(), timeout=60.0):
+        """
+        单轴回原点配置
+        参数:
+        node_id - 从站地址
+        home_type - 回原点方式(6098)
+        offset - 原点偏置(用户单位)，None 表示不修改
+        velocity1 - 搜索开关速度(用户单位/s)，None 表示不修改
+        velocity2 - 搜索零点速度(用户单位/s)，None 表示不修改
+                    （两个速度由同一个函数写入，只给出一个时另一个保持驱动器当前值）
+        accel - 回零加速度(用户单位/s^2)，None 表示不修改
+        depends_on - 必须先完成回零的从站地址列表
+        timeout - 回零超时时间(秒)
+        """
+        self.node_id = node_id
+        self.home_type = home_type
+        self.offset = offset
+        self.velocity1 = velocity1
+        self.velocity2 = velocity2
+        self.accel = accel
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+
+
+class HomingResult(object):
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.state = HOMING_PENDING
+        self.error = None
+        self.configure_time = 0.0   # 配置参数耗时(秒)
+        self.start_time = None      # 启动回零的时刻，相对 run() 开始(秒)
+        self.duration = None        # 启动回零到完成的时长(秒)
+        self.status_word = None
+
+    @property
+    def success(self):
+        return self.state == HOMING_DONE
+
+
+class HomingOrchestrator(object):
+    def __init__(self, h_master, axes, poll_interval=0.005, max_workers=None, settle_time=0.02):
+        """
+        初始化回零编排器
+        参数:
+        h_master - 主站句柄
+        axes - HomingAxis 列表
+        poll_interval - 状态字轮询周期(秒)
+        max_workers - 并行配置参数的最大线程数，None 表示每轴一个线程
+        settle_time - 启动回零后至少经过多长时间(秒)才接受完成状态，应不小于一个PDO周期：
+                      PDO读到的状态字可能仍是启动前的，已回零的轴的完成位尚未清除
+        """
+        self.h_master = h_master
+        self.axes = dict((axis.node_id, axis) for axis in axes)
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers or max(1, len(self.axes))
+        self.settle_time = settle_time
+        self.results = {}
+        self.total_time = None
+        self._events = {}
+        self._check_dependencies()
+
+    def _check_dependencies(self):
+        for axis in self.axes.values():
+            for dep in axis.depends_on:
+                if dep not in self.axes:
+                    raise ValueError(f"节点{axis.node_id}依赖的节点{dep}不在回零列表中")
+        # 拓扑排序检查循环依赖
+        visiting, done = set(), set()
+
+        def visit(node_id):
+            if node_id in done:
+                return
+            if node_id in visiting:
+                raise ValueError(f"回零依赖存在循环: 节点{node_id}")
+            visiting.add(node_id)
+            for dep in self.axes[node_id].depends_on:
+                visit(dep)
+            visiting.discard(node_id)
+            done.add(node_id)
+
+        for node_id in self.axes:
+            visit(node_id)
+
+    def event(self, node_id):
+        """
+        返回某轴回零结束（成功、失败或跳过）时置位的 threading.Event，可供其它线程等待
+        """
+        return self._events[node_id]
+
+    def _set_velocity(self, axis):
+        velocity1, velocity2 = axis.velocity1, axis.velocity2
+        if velocity1 is None or velocity2 is None:
+            # 未给出的速度保持驱动器当前值，避免零点搜索速度被提高到开关搜索速度
+            [res, current1, current2] = Nim_get_goHome_velocity(self.h_master, axis.node_id)
+            if res != 0:
+                return res
+            velocity1 = current1 if velocity1 is None else velocity1
+            velocity2 = current2 if velocity2 is None else velocity2
+        return Nim_set_goHome_velocity(self.h_master, axis.node_id, velocity1, velocity2)
+
+    def _configure(self, axis):
+        h, node = self.h_master, axis.node_id
+        t0 = time.monotonic()
+        # 回零模式只能在脱机状态下设置；(步骤, 之后的必要延时)，延时与 MotorController 切换模式时相同
+        steps = [
+            (lambda: Nim_power_off(h, node, 1), 0.05),
+            (lambda: Nim_set_workMode(h, node, ServoWorkMode.SERVO_HM_MODE, 1), 0.05),
+            (lambda: Nim_set_homeType(h, node, axis.home_type), 0),
+        ]
+        if axis.offset is not None:
+            steps.append((lambda: Nim_set_homeOffset(h, node, axis.offset), 0))
+        if axis.velocity1 is not None or axis.velocity2 is not None:
+            steps.append((lambda: self._set_velocity(axis), 0))
+        if axis.accel is not None:
+            steps.append((lambda: Nim_set_goHome_accel(h, node, axis.accel), 0))
+        steps.append((lambda: Nim_power_on(h, node, 1), 0.2))
+        for step, delay in steps:
+            res = step()
+            if res != 0:
+                return res, time.monotonic() - t0
+            if delay:
+                time.sleep(delay)  # 必要延时
+        return 0, time.monotonic() - t0
+
+    def run(self, timeout=None):
+        """
+        执行回零，阻塞直到所有轴结束
+        参数:
+        timeout - 整体超时时间(秒)，None 表示只使用各轴自己的超时
+        返回: {从站地址: HomingResult}
+        """
+        self.results = dict((node, HomingResult(node)) for node in self.axes)
+        self._events = dict((node, threading.Event()) for node in self.axes)
+        run_start = time.monotonic()
+
+        # 1. 并行配置所有轴（均为SDO访问，不同节点之间互不等待）
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = dict((pool.submit(self._configure, axis), axis.node_id) for axis in self.axes.values())
+            for future in concurrent.futures.as_completed(futures):
+                node = futures[future]
+                res, elapsed = future.result()
+                result = self.results[node]
+                result.configure_time = elapsed
+                if res != 0:
+                    self._finish(node, HOMING_FAILED, f"配置回零参数失败，错误码: {res}")
+
+        # 2. 依赖满足即启动，统一轮询状态字
+        deadline = run_start + timeout if timeout is not None else None
+        running = {}
+        cleared = set()     # 启动回零后已读到完成位(bit12)清除的轴
+        while True:
+            self._start_ready(running, run_start)
+            if not running:
+                break
+            now = time.monotonic()
+            for node in list(running):
+                [res, sw] = Nim_get_statusWord(self.h_master, node, 0)
+                result = self.results[node]
+                started = running[node]
+                if res == 0:
+                    result.status_word = sw
+                    if sw & ServoStatusWord.FAULT:
+                        self._finish(node, HOMING_FAILED, f"驱动器故障，状态字: {sw:#06x}")
+                    elif sw & ServoStatusWord.HOMING_ERROR:
+                        self._finish(node, HOMING_FAILED, f"原点回归错误，状态字: {sw:#06x}")
+                    elif not sw & ServoStatusWord.HOMING_ATTAINED:
+                        cleared.add(node)
+                    elif (sw & ServoStatusWord.TARGET_REACHED) and (node in cleared or
+                                                                    now - started >= self.settle_time):
+                        # 未见完成位清除时，至少等待 settle_time，避免接受启动前的旧状态字
+                        result.duration = now - started
+                        self._finish(node, HOMING_DONE)
+                if not self._events[node].is_set() and now - started > self.axes[node].timeout:
+                    self._finish(node, HOMING_FAILED, "回零超时")
+                if not self._events[node].is_set() and deadline is not None and now > deadline:
+                    self._finish(node, HOMING_FAILED, "整体回零超时")
+                if self._events[node].is_set():
+                    del running[node]
+            time.sleep(self.poll_interval)
+
+        self.total_time = time.monotonic() - run_start
+        return self.results
+
+    def _start_ready(self, running, run_start):
+        """
+        启动依赖已满足的轴；依赖失败的轴标记为跳过
+        """
+        changed = True
+        while changed:
+            changed = False
+            for node, axis in self.axes.items():
+                result = self.results[node]
+                if result.state != HOMING_PENDING:
+                    continue
+                deps = [self.results[d] for d in axis.depends_on]
+                if any(d.state in (HOMING_FAILED, HOMING_SKIPPED) for d in deps):
+                    self._finish(node, HOMING_SKIPPED, "依赖轴回零未成功")
+                    changed = True
+                elif all(d.state == HOMING_DONE for d in deps):
+                    res = Nim_goHome(self.h_master, node, 1)
+                    if res != 0:
+                        self._finish(node, HOMING_FAILED, f"启动回零失败，错误码: {res}")
+                        changed = True
+                        continue
+                    result.state = HOMING_RUNNING
+                    result.start_time = time.monotonic() - run_start
+                    running[node] = time.monotonic()
+
+    def _finish(self, node, state, error=None):
+        result = self.results[node]
+        result.state = state
+        result.error = error
+        self._events[node].set()
+
+    def format_report(self):
+        """
+        生成回零报告文本
+        """
+        lines = [f"{'节点':<6}{'结果':<8}{'配置(s)':>10}{'启动(s)':>10}{'回零(s)':>10}  说明"]
+        for node in sorted(self.results):
+            r = self.results[node]
+            start = f"{r.start_time:.3f}" if r.start_time is not None else "-"
+            duration = f"{r.duration:.3f}" if r.duration is not None else "-"
+            lines.append(f"{node:<6}{r.state:<8}{r.configure_time:>10.3f}{start:>10}{duration:>10}  {r.error or ''}")
+        serial = sum(r.configure_time + (r.duration or 0.0) for r in self.results.values())
+        if self.total_time is not None:
+            lines.append(f"总耗时: {self.total_time:.3f} s（逐轴顺序执行约 {serial:.3f} s）")
+        return '\n'.join(lines)
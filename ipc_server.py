@@ -0,0 +1,653 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地IPC控制服务：多个进程共享一条总线
+
+同一个CAN适配器只能由一个进程通过 Nim_master_run 打开，HMI、数据记录和测试脚本
+却都需要访问总线。ControlServer 在一个进程内持有已连接的 MotorController，
+通过 Unix 域套接字向本机其他进程提供:
+
+- MotorController 的方法调用（EXPOSED_METHODS），以及带从站地址的 Nim_* 调用
+  （主站句柄由服务端填入，主站级函数不开放）；
+- 遥测订阅：同一 (节点, 数据量, SDO/PDO) 由服务端的 PollScheduler 只读取一次，
+  每个样本只编码一次，再分发给所有订阅的客户端，各客户端按自己的频率抽取。
+
+协议为紧凑的二进制帧: uint32 长度 + uint8 类型 + uint32 编号 + 带类型标记的值
+（见 encode_value）。客户端可以连续发送多个请求而不等待应答（流水线），服务端
+按顺序执行同一客户端的请求，应答带有请求编号；不同客户端的方法调用由服务端串行
+执行。发送线程把排队的帧合并为一次系统调用写出。订阅事件在客户端接收过慢时丢弃并计数，应答不会丢弃。
+
+用法:
+    # 服务端（持有总线）
+    python ipc_server.py --socket /tmp/nimservo.sock --comm canopen --pdo-interval 10 --node 1
+
+    # 客户端
+    client = ControlClient("/tmp/nimservo.sock")
+    client.call('enable_motor')
+    client.call('move_to_position', 10.0)
+    [res, sw] = client.call('Nim_get_statusWord', 2, 0)          # 访问其他从站
+    futures = [client.call_async('Nim_get_currentPosition', n, 0) for n in (1, 2, 3)]
+    sub = client.subscribe(1, 'position', 100, callback=lambda node, q, value, t_ns, cycle: ...)
+    client.unsubscribe(sub)
+    client.close()
+"""
+
+import collections, os, socket, struct, sys, threading, time
+from concurrent.futures import Future
+import NimServoSDK
+from sdk_functions import MASTER_FUNCS, NO_HANDLE_FUNCS
+from poll_scheduler import PollScheduler, QUANTITIES
+
+DEFAULT_SOCKET = "/tmp/nimservo.sock"
+MAX_FRAME_BYTES = 16 * 1024 * 1024     # 单帧长度上限，超出视为协议错误并断开连接
+
+# 帧类型
+MSG_REQUEST = 1         # 值: [方法名, [参数...]]
+MSG_RESPONSE = 2        # 值: [是否成功, 返回值或错误信息]
+MSG_EVENT = 3           # 编号为订阅编号，值: [节点, 数据量, 数值, 时间戳ns, SYNC周期]
+
+# 开放给客户端的 MotorController 方法
+EXPOSED_METHODS = frozenset([
+    'enable_motor', 'disable_motor', 'set_profile_velocity_mode', 'set_profile_position_mode',
+    'set_cyclic_position_mode', 'set_cyclic_velocity_mode', 'set_cyclic_torque_mode',
+    'write_cyclic_setpoint', 'set_motion_parameters', 'run_velocity', 'move_to_position',
+    'move_by_distance', 'move_sequence', 'release_brake', 'engage_brake', 'quick_stop',
+    'get_motor_status', 'get_motor_sample', 'check_target_reached', 'wait_target_reached',
+])
+
+# 值的类型标记
+_T_NONE = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STR = 5
+_T_BYTES = 6
+_T_LIST = 7
+_T_DICT = 8
+
+_header = struct.Struct('<IBI')     # 长度（不含自身4字节）、类型、编号
+_u32 = struct.Struct('<I')
+_tag_q = struct.Struct('<Bq')
+_tag_d = struct.Struct('<Bd')
+_tag_u32 = struct.Struct('<BI')
+_q = struct.Struct('<q')
+_d = struct.Struct('<d')
+
+
+class IPCError(Exception):
+    """
+    服务端执行请求失败，或连接已断开
+    """
+
+
+def encode_value(buf, value):
+    """
+    把值追加编码到 bytearray：支持 None、bool、int、float、str、bytes、list/tuple、dict
+    """
+    if value is None:
+        buf.append(_T_NONE)
+    elif value is True:
+        buf.append(_T_TRUE)
+    elif value is False:
+        buf.append(_T_FALSE)
+    elif isinstance(value, int):
+        buf += _tag_q.pack(_T_INT, value)
+    elif isinstance(value, float):
+        buf += _tag_d.pack(_T_FLOAT, value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        buf += _tag_u32.pack(_T_STR, len(data))
+        buf += data
+    elif isinstance(value, (bytes, bytearray)):
+        buf += _tag_u32.pack(_T_BYTES, len(value))
+        buf += value
+    elif isinstance(value, (list, tuple)):
+        buf += _tag_u32.pack(_T_LIST, len(value))
+        for item in value:
+            encode_value(buf, item)
+    elif isinstance(value, dict):
+        buf += _tag_u32.pack(_T_DICT, len(value))
+        for key, item in value.items():
+            encode_value(buf, key)
+            encode_value(buf, item)
+    else:
+        raise TypeError(f"不支持编码的类型: {type(value).__name__}")
+
+
+def decode_value(buf, offset=0):
+    """
+    从 offset 处解码一个值
+    返回: (值, 下一个值的偏移)
+    """
+    tag = buf[offset]
+    offset += 1
+    if tag == _T_NONE:
+        return None, offset
+    if tag == _T_TRUE:
+        return True, offset
+    if tag == _T_FALSE:
+        return False, offset
+    if tag == _T_INT:
+        return _q.unpack_from(buf, offset)[0], offset + 8
+    if tag == _T_FLOAT:
+        return _d.unpack_from(buf, offset)[0], offset + 8
+    (length,) = _u32.unpack_from(buf, offset)
+    offset += 4
+    if tag == _T_STR:
+        return bytes(buf[offset:offset + length]).decode('utf-8'), offset + length
+    if tag == _T_BYTES:
+        return bytes(buf[offset:offset + length]), offset + length
+    if tag == _T_LIST:
+        items = []
+        for _ in range(length):
+            item, offset = decode_value(buf, offset)
+            items.append(item)
+        return items, offset
+    if tag == _T_DICT:
+        result = {}
+        for _ in range(length):
+            key, offset = decode_value(buf, offset)
+            result[key], offset = decode_value(buf, offset)
+        return result, offset
+    raise ValueError(f"未知的类型标记: {tag}")
+
+
+def encode_frame(kind, ident, value):
+    body = bytearray()
+    encode_value(body, value)
+    return _header.pack(len(body) + 5, kind, ident) + body
+
+
+def _read_frame(reader):
+    """
+    读取一帧
+    返回: (类型, 编号, 值)，连接关闭时返回 None；帧长度无效时抛出 ValueError
+    """
+    head = reader.read(_header.size)
+    if len(head) < _header.size:
+        return None
+    length, kind, ident = _header.unpack(head)
+    if length < 5 or length > MAX_FRAME_BYTES:
+        raise ValueError(f"帧长度无效: {length}")
+    body = reader.read(length - 5)
+    if len(body) < length - 5:
+        return None
+    value, _ = decode_value(body)
+    return kind, ident, value
+
+
+class _Connection(object):
+    """
+    一个套接字连接的发送端：帧放入队列，由发送线程合并写出
+    """
+    def __init__(self, sock, name, max_queued_events=1024):
+        self.sock = sock
+        self.max_queued_events = max_queued_events
+        self.events_sent = 0
+        self.events_dropped = 0
+        self.closed = False
+        self._frames = collections.deque()
+        self._queued_events = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._send_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def send(self, frame, event=False):
+        with self._cond:
+            if self.closed:
+                return False
+            if event:
+                if self._queued_events >= self.max_queued_events:
+                    self.events_dropped += 1
+                    return False
+                self._queued_events += 1
+            self._frames.append((frame, event))
+            self._cond.notify()
+        return True
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                while not self._frames and not self.closed:
+                    self._cond.wait()
+                if not self._frames:
+                    return
+                frames = list(self._frames)
+                self._frames.clear()
+                events = sum(1 for _, event in frames if event)
+                self._queued_events -= events
+            try:
+                self.sock.sendall(b''.join(frame for frame, _ in frames))
+                self.events_sent += events
+            except OSError:
+                self.close()
+                return
+
+    def close(self):
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def join(self):
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.sock.close()
+
+
+class _Channel(object):
+    """
+    一个 (节点, 数据量, SDO/PDO) 的订阅分发：样本只编码一次，发给所有订阅者
+    """
+    def __init__(self, key):
+        self.key = key
+        self.rate = 0.0
+        self.slack_ns = 0           # 半个读取周期，抽取时容许样本时间戳的抖动
+        self.subscription = None    # PollScheduler 的订阅
+        self.members = {}           # 订阅编号 -> [连接, 最小间隔ns, 上次发送时间戳ns]
+
+
+class ControlServer(object):
+    def __init__(self, motor, path=DEFAULT_SOCKET, cycle=0.001, max_queued_events=1024):
+        """
+        初始化控制服务
+        参数:
+        motor - 已连接并初始化的 MotorController
+        path - Unix 域套接字路径
+        cycle - 订阅轮询的基本调度周期(秒)
+        max_queued_events - 每个客户端排队等待发送的订阅事件上限，超出后丢弃
+        """
+        self.motor = motor
+        self.path = path
+        self.max_queued_events = max_queued_events
+        self.scheduler = PollScheduler(motor.h_master, cycle, timebase=motor.timebase)
+        self.requests = 0
+        self.errors = 0
+        self.clients = 0
+        self._sock = None
+        self._accept_thread = None
+        self._conns = {}            # _Connection -> 接收线程
+        self._channels = {}         # (节点, 数据量, bSDO) -> _Channel
+        self._sub_ids = {}          # 订阅编号 -> _Channel
+        self._next_sub = 1
+        self._lock = threading.Lock()
+        # 各客户端的接收线程并发执行请求，MotorController 与SDK调用不是线程安全的，统一串行执行
+        self._call_lock = threading.RLock()
+
+    def start(self):
+        """
+        开始监听（已存在的套接字文件会被替换）
+        """
+        if self._sock is not None:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(16)
+        self._accept_thread = threading.Thread(target=self._accept_loop, name='ControlServer', daemon=True)
+        self._accept_thread.start()
+        # BusSupervisor 重新创建主站后，订阅轮询随控制器切换到新句柄
+        self.motor.attach(self.scheduler)
+
+    def stop(self):
+        """
+        停止监听，断开所有客户端并停止订阅轮询
+        """
+        if self._sock is None:
+            return
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._accept_thread.join()
+        self._sock = None
+        with self._lock:
+            conns = list(self._conns.items())
+        for conn, thread in conns:
+            conn.close()
+            thread.join()
+        self.scheduler.stop()
+        self.motor.detach(self.scheduler)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def serve_forever(self):
+        """
+        在当前线程运行，直到 Ctrl+C
+        """
+        self.start()
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            conn = _Connection(sock, 'ControlServerSend', self.max_queued_events)
+            thread = threading.Thread(target=self._client_loop, args=(conn,), name='ControlServerClient', daemon=True)
+            with self._lock:
+                self._conns[conn] = thread
+                self.clients += 1
+            thread.start()
+
+    def _client_loop(self, conn):
+        reader = conn.sock.makefile('rb', buffering=65536)
+        try:
+            while True:
+                try:
+                    frame = _read_frame(reader)
+                except (OSError, ValueError, struct.error):
+                    frame = None
+                if frame is None:
+                    break
+                kind, ident, value = frame
+                if kind != MSG_REQUEST:
+                    continue
+                try:
+                    method, args = value
+                    result = [True, self._dispatch(conn, method, args)]
+                except Exception as e:
+                    self.errors += 1
+                    result = [False, f"{type(e).__name__}: {e}"]
+                self.requests += 1
+                try:
+                    conn.send(encode_frame(MSG_RESPONSE, ident, result))
+                except TypeError as e:
+                    conn.send(encode_frame(MSG_RESPONSE, ident, [False, str(e)]))
+        finally:
+            reader.close()
+            self._drop_client(conn)
+
+    def _drop_client(self, conn):
+        with self._lock:
+            self._conns.pop(conn, None)
+            subs = []
+            for sid, channel in self._sub_ids.items():
+                member = channel.members.get(sid)
+                if member is not None and member[0] is conn:
+                    subs.append(sid)
+        for sid in subs:
+            self._unsubscribe(sid)
+        conn.close()
+        conn.join()
+
+    def _dispatch(self, conn, method, args):
+        if method in EXPOSED_METHODS:
+            with self._call_lock:
+                return getattr(self.motor, method)(*args)
+        if method.startswith('Nim_'):
+            if method in MASTER_FUNCS or method in NO_HANDLE_FUNCS:
+                raise PermissionError(f"不开放主站级函数: {method}")
+            func = getattr(NimServoSDK, method, None)
+            if func is None:
+                raise AttributeError(f"未知的SDK函数: {method}")
+            with self._call_lock:
+                return func(self.motor.h_master, *args)
+        if method == 'subscribe':
+            return self._subscribe(conn, *args)
+        if method == 'unsubscribe':
+            return self._unsubscribe(*args)
+        if method == 'status':
+            return self.motor.status
+        if method == 'ping':
+            return None
+        raise AttributeError(f"未开放的方法: {method}")
+
+    def _subscribe(self, conn, node_id, quantity, rate, sdo=False):
+        # 先校验参数，无效的订阅不留下订阅编号和空的读取通道
+        if not isinstance(quantity, str) or not (quantity.startswith('param:') or quantity in QUANTITIES):
+            raise ValueError(f"未知的数据量: {quantity}")
+        if not rate > 0:
+            raise ValueError("订阅频率必须大于0")
+        key = (node_id, quantity, 1 if sdo else 0)
+        with self._lock:
+            channel = self._channels.get(key)
+            created = channel is None
+            if created:
+                channel = _Channel(key)
+            if rate > channel.rate:
+                # 按最高订阅频率重新登记，PollScheduler 保证同一数据只读一次；
+                # 登记失败时通道和订阅表都还没有修改
+                subscription = self.scheduler.subscribe(node_id, quantity, rate, sdo,
+                                                        self._fanout_callback(channel))
+                old = channel.subscription
+                channel.rate = rate
+                channel.slack_ns = int(0.5e9 / rate)
+                channel.subscription = subscription
+                if old is not None:
+                    self.scheduler.unsubscribe(old)
+            if created:
+                self._channels[key] = channel
+            sid = self._next_sub
+            self._next_sub += 1
+            self._sub_ids[sid] = channel
+            channel.members[sid] = [conn, int(1e9 / rate), 0]
+        self.scheduler.start()
+        return sid
+
+    def _unsubscribe(self, sid):
+        with self._lock:
+            channel = self._sub_ids.pop(sid, None)
+            if channel is None:
+                return False
+            channel.members.pop(sid, None)
+            if not channel.members:
+                self.scheduler.unsubscribe(channel.subscription)
+                del self._channels[channel.key]
+            return True
+
+    def _fanout_callback(self, channel):
+        node_id, quantity, _ = channel.key
+
+        def on_sample(node, q, sample):
+            t_ns = sample.timestamp_ns
+            body = None
+            for sid, member in list(channel.members.items()):
+                if t_ns - member[2] < member[1] - channel.slack_ns:
+                    continue
+                if body is None:
+                    body = bytearray()
+                    encode_value(body, [node_id, quantity, sample.value, t_ns, sample.bus_cycle])
+                member[2] = t_ns
+                member[0].send(_header.pack(len(body) + 5, MSG_EVENT, sid) + body, event=True)
+        return on_sample
+
+    def format_report(self):
+        with self._lock:
+            conns = list(self._conns)
+            channels = len(self._channels)
+            subs = len(self._sub_ids)
+        sent = sum(c.events_sent for c in conns)
+        dropped = sum(c.events_dropped for c in conns)
+        return (f"客户端: 当前 {len(conns)}，累计 {self.clients}；请求 {self.requests}，失败 {self.errors}；"
+                f"订阅 {subs}（读取 {channels} 路），当前客户端事件发送 {sent}，丢弃 {dropped}")
+
+
+class ClientSubscription(object):
+    __slots__ = ('sid', 'node_id', 'quantity', 'callback')
+
+    def __init__(self, sid, node_id, quantity, callback):
+        self.sid = sid
+        self.node_id = node_id
+        self.quantity = quantity
+        self.callback = callback    # callback(node_id, quantity, value, timestamp_ns, bus_cycle)
+
+
+class ControlClient(object):
+    def __init__(self, path=DEFAULT_SOCKET, timeout=10.0):
+        """
+        连接控制服务
+        参数:
+        path - 服务端套接字路径
+        timeout - call() 等待应答的默认超时(秒)
+        """
+        self.timeout = timeout
+        self.callback_errors = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._pending = {}          # 请求编号 -> Future
+        self._subs = {}             # 订阅编号 -> ClientSubscription
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._recv_loop, name='ControlClient', daemon=True)
+        self._thread.start()
+
+    def call_async(self, method, *args):
+        """
+        发送请求，不等待应答
+        返回: concurrent.futures.Future，结果为返回值，服务端出错时为 IPCError
+        """
+        return self.call_many([(method, args)])[0]
+
+    def call_many(self, calls):
+        """
+        一次写出多个请求（流水线）
+        参数:
+        calls - [(方法名, 参数元组), ...]
+        返回: Future 列表，与 calls 一一对应
+        """
+        futures = []
+        frames = []
+        with self._lock:
+            if self._closed:
+                raise IPCError("连接已关闭")
+            for method, args in calls:
+                ident = self._next_id
+                self._next_id = (self._next_id + 1) & 0xFFFFFFFF or 1
+                future = Future()
+                self._pending[ident] = future
+                futures.append(future)
+                frames.append(encode_frame(MSG_REQUEST, ident, [method, list(args)]))
+            self._sock.sendall(b''.join(frames))
+        return futures
+
+    def call(self, method, *args, timeout=None):
+        """
+        调用服务端方法并等待返回值
+        """
+        return self.call_async(method, *args).result(self.timeout if timeout is None else timeout)
+
+    def subscribe(self, node_id, quantity, rate, callback, sdo=False):
+        """
+        订阅遥测数据
+        参数:
+        quantity - 数据量名称，见 poll_scheduler.QUANTITIES
+        rate - 期望频率(Hz)
+        callback - callback(node_id, quantity, value, timestamp_ns, bus_cycle)，在接收线程中调用
+        返回: ClientSubscription
+        """
+        sid = self.call('subscribe', node_id, quantity, rate, sdo)
+        sub = ClientSubscription(sid, node_id, quantity, callback)
+        self._subs[sid] = sub
+        return sub
+
+    def unsubscribe(self, sub):
+        self._subs.pop(sub.sid, None)
+        return self.call('unsubscribe', sub.sid)
+
+    def _recv_loop(self):
+        reader = self._sock.makefile('rb', buffering=65536)
+        try:
+            while True:
+                try:
+                    frame = _read_frame(reader)
+                except (OSError, ValueError, struct.error):
+                    frame = None
+                if frame is None:
+                    break
+                kind, ident, value = frame
+                if kind == MSG_RESPONSE:
+                    with self._lock:
+                        future = self._pending.pop(ident, None)
+                    if future is None:
+                        continue
+                    ok, result = value
+                    if ok:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(IPCError(result))
+                elif kind == MSG_EVENT:
+                    sub = self._subs.get(ident)
+                    if sub is not None:
+                        try:
+                            sub.callback(*value)
+                        except Exception:
+                            self.callback_errors += 1
+        finally:
+            reader.close()
+            with self._lock:
+                self._closed = True
+                pending = list(self._pending.values())
+                self._pending.clear()
+            for future in pending:
+                future.set_exception(IPCError("连接已断开"))
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._thread.join()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def main(argv=None):
+    import argparse
+    from motor_control import MotorController
+    parser = argparse.ArgumentParser(description="持有总线并通过Unix域套接字提供控制和遥测订阅")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="套接字路径")
+    parser.add_argument('--node', type=int, default=1, help="MotorController 的从站地址")
+    parser.add_argument('--comm', choices=['canopen', 'ethercat'], default='canopen', help="通信方式")
+    parser.add_argument('--pdo-interval', type=int, default=10, help="PDO周期(ms)")
+    parser.add_argument('--sync-interval', type=int, default=None, help="CANopen SYNC周期(ms)，默认与PDO周期相同")
+    parser.add_argument('--cycle', type=float, default=0.001, help="订阅轮询的基本调度周期(秒)")
+    parser.add_argument('--sim', action='store_true', help="使用本地模拟器代替驱动器")
+    parser.add_argument('--sim-nodes', default='1', help="模拟器: 从站地址，逗号分隔")
+    args = parser.parse_args(argv)
+
+    if args.sim:
+        from sdk_simulator import install_simulator
+        install_simulator(nodes=[int(n) for n in args.sim_nodes.split(',')])
+    motor = MotorController(comm_type=1 if args.comm == 'ethercat' else 0, node_id=args.node)
+    if args.comm == 'ethercat':
+        ok = motor.connect_ethercat(pdo_interval=args.pdo_interval) and motor.initialize_ethercat()
+    else:
+        sync = args.sync_interval if args.sync_interval is not None else args.pdo_interval
+        ok = motor.connect_canopen(pdo_interval=args.pdo_interval, sync_interval=sync) and motor.initialize_motor()
+    if not ok:
+        print(motor.status)
+        motor.close()
+        return 1
+    server = ControlServer(motor, args.socket, cycle=args.cycle)
+    print(f"监听 {args.socket}，Ctrl+C 退出")
+    server.serve_forever()
+    print(server.format_report())
+    motor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指令到运动的响应延时测量
+
+调用 Nim_moveAbsolute 或 Nim_set_targetVelocity 之后，驱动器要经过多久才真正开始
+动作，与走SDO还是PDO、PDO/SYNC周期都有关系。LatencyProbe 发出指令前记录时刻，
+随后以短间隔轮询状态字和位置/速度反馈，以第一次发生变化的时刻作为驱动器响应时刻，
+分别记录SDK调用耗时和响应延时，按 (配置, 指令, 路径) 汇总延时分布。
+
+每次试验前随机等待一小段时间，使发出指令的时刻在PDO周期内均匀分布，测到的
+分布包含PDO/SYNC周期对齐带来的等待。检测分辨率为轮询间隔加一次反馈读取的耗时。
+
+用法:
+    probe = LatencyProbe(motor.h_master, 1, config="CAN 10ms")
+    probe.measure_move(distance=0.5, trials=50, bSDO=0)       # 轴需为轮廓位置模式并使能
+    probe.measure_velocity(velocity=5.0, trials=50, bSDO=1)   # 轴需为轮廓速度或周期同步速度模式并使能
+    print(probe.format_report())
+
+命令行（--sim 使用本地模拟器，可设置指令生效延时）:
+    python latency_probe.py --sim --reaction-delay 0.002 --cycle-aligned --pdo-interval 1,5,10 --trials 30
+"""
+
+import random, sys, time
+from NimServoSDK import *
+from perf_stats import summarize
+
+CMD_MOVE = 'move'
+CMD_VELOCITY = 'velocity'
+
+# 响应判据
+BY_STATUS = 'statusWord'
+BY_POSITION = 'position'
+BY_VELOCITY = 'velocity'
+
+
+class LatencySample(object):
+    __slots__ = ('config', 'command', 'path', 'call_ns', 'latency_ns', 'detected_by')
+
+    def __init__(self, config, command, path, call_ns, latency_ns, detected_by):
+        self.config = config
+        self.command = command
+        self.path = path                # 'SDO' / 'PDO'
+        self.call_ns = call_ns          # SDK调用耗时
+        self.latency_ns = latency_ns    # 调用开始到检测到响应，None 表示超时
+        self.detected_by = detected_by  # 检测到变化的反馈量
+
+
+class LatencyProbe(object):
+    def __init__(self, h_master, node_id, config="", feedback_sdo=0, poll_interval=0.0002, timeout=1.0,
+                 phase_jitter=0.02, position_eps=1e-4, velocity_eps=1e-3):
+        """
+        初始化延时测量
+        参数:
+        h_master - 主站句柄
+        node_id - 从站地址
+        config - 配置名称，用于区分不同的PDO/SYNC周期等
+        feedback_sdo - 读取反馈使用 1 SDO / 0 PDO（默认，开销小、分辨率高）
+        poll_interval - 反馈轮询间隔(秒)
+        timeout - 单次试验等待响应的超时时间(秒)
+        phase_jitter - 每次试验前随机等待的最长时间(秒)，应不小于PDO周期
+        position_eps, velocity_eps - 判定位置/速度发生变化的阈值(用户单位, 用户单位/s)
+        """
+        self.h_master = h_master
+        self.node_id = node_id
+        self.config = config
+        self.feedback_sdo = feedback_sdo
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.phase_jitter = phase_jitter
+        self.position_eps = position_eps
+        self.velocity_eps = velocity_eps
+        self.samples = []
+        self.errors = 0
+
+    def _read(self):
+        h, node, sdo = self.h_master, self.node_id, self.feedback_sdo
+        [r1, sw] = Nim_get_statusWord(h, node, sdo)
+        [r2, pos] = Nim_get_currentPosition(h, node, sdo)
+        [r3, vel] = Nim_get_currentVelocity(h, node, sdo)
+        if r1 or r2 or r3:
+            return None
+        return sw, pos, vel
+
+    def _detect(self, base, t0, watch_status):
+        """
+        轮询反馈直到与基准值不同
+        返回: (检测时刻ns, 判据)，超时返回 (None, None)
+        """
+        deadline = t0 + int(self.timeout * 1e9)
+        sw0, pos0, vel0 = base
+        while True:
+            now = time.monotonic_ns()
+            value = self._read()
+            if value is not None:
+                sw, pos, vel = value
+                if watch_status and sw != sw0:
+                    return now, BY_STATUS
+                if abs(pos - pos0) > self.position_eps:
+                    return now, BY_POSITION
+                if abs(vel - vel0) > self.velocity_eps:
+                    return now, BY_VELOCITY
+            if now > deadline:
+                return None, None
+            time.sleep(self.poll_interval)
+
+    def _wait(self, predicate, timeout):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            value = self._read()
+            if value is not None and predicate(*value):
+                return True
+            time.sleep(0.001)
+        return False
+
+    def _trial(self, command, bSDO, issue, watch_status):
+        time.sleep(random.uniform(0, self.phase_jitter))
+        base = self._read()
+        if base is None:
+            self.errors += 1
+            return None
+        t0 = time.monotonic_ns()
+        res = issue(base)
+        t1 = time.monotonic_ns()
+        if res != 0:
+            self.errors += 1
+            return None
+        t_detect, by = self._detect(base, t0, watch_status)
+        sample = LatencySample(self.config, command, 'SDO' if bSDO else 'PDO', t1 - t0,
+                               t_detect - t0 if t_detect is not None else None, by)
+        self.samples.append(sample)
+        return sample
+
+    def measure_move(self, distance=0.5, trials=20, bSDO=0):
+        """
+        测量 Nim_moveAbsolute 的响应延时（轮廓位置模式），每次往返移动 distance
+        判据: 状态字变化（目标到达位清除）或位置变化
+        返回: 本次测量的 LatencySample 列表
+        """
+        result = []
+        reached = lambda sw, pos, vel: (sw & ServoStatusWord.TARGET_REACHED) != 0
+        for i in range(trials):
+            if not self._wait(reached, self.timeout + 10.0):
+                self.errors += 1
+                break
+            step = distance if i % 2 == 0 else -distance
+            sample = self._trial(CMD_MOVE, bSDO, lambda base: Nim_moveAbsolute(
+                self.h_master, self.node_id, base[1] + step, 1, bSDO), True)
+            if sample is not None:
+                result.append(sample)
+        self._wait(reached, self.timeout + 10.0)
+        return result
+
+    def measure_velocity(self, velocity=5.0, trials=20, bSDO=0):
+        """
+        测量 Nim_set_targetVelocity 的响应延时（轮廓速度或周期同步速度模式），每次从0速给定 velocity
+        判据: 速度或位置变化（不使用状态字，速度模式下目标到达位随速度波动）
+        返回: 本次测量的 LatencySample 列表
+        """
+        result = []
+        h, node = self.h_master, self.node_id
+        stopped = lambda sw, pos, vel: abs(vel) <= self.velocity_eps
+        for i in range(trials):
+            Nim_set_targetVelocity(h, node, 0.0, bSDO)
+            if not self._wait(stopped, self.timeout + 10.0):
+                self.errors += 1
+                break
+            v = velocity if i % 2 == 0 else -velocity
+            sample = self._trial(CMD_VELOCITY, bSDO, lambda base: Nim_set_targetVelocity(h, node, v, bSDO), False)
+            if sample is not None:
+                result.append(sample)
+        Nim_set_targetVelocity(h, node, 0.0, bSDO)
+        self._wait(stopped, self.timeout + 10.0)
+        return result
+
+    def summary(self):
+        """
+        按 (配置, 指令, 路径) 汇总
+        返回: {(config, command, path): {'latency': summarize(秒), 'call': summarize(秒), 'timeouts': n}}
+        """
+        groups = {}
+        for s in self.samples:
+            groups.setdefault((s.config, s.command, s.path), []).append(s)
+        result = {}
+        for key, samples in groups.items():
+            result[key] = {'latency': summarize([s.latency_ns / 1e9 for s in samples if s.latency_ns is not None]),
+                           'call': summarize([s.call_ns / 1e9 for s in samples]),
+                           'timeouts': len([s for s in samples if s.latency_ns is None])}
+        return result
+
+    def format_report(self):
+        ms = lambda v: f"{v * 1e3:8.2f}" if v == v else "       -"
+        lines = [f"{'配置':<16}{'指令':<10}{'路径':<6}{'次数':>6}{'调用p50':>10}"
+                 f"{'响应p50':>10}{'响应p95':>10}{'响应max':>10}{'超时':>6}  (ms)"]
+        for (config, command, path), s in sorted(self.summary().items()):
+            lat = s['latency']
+            lines.append(f"{config:<16}{command:<10}{path:<6}{lat['count']:>6}{ms(s['call']['p50']):>10}"
+                         f"{ms(lat['p50']):>10}{ms(lat['p95']):>10}{ms(lat['max']):>10}{s['timeouts']:>6}")
+        if self.errors:
+            lines.append(f"指令或反馈读取失败: {self.errors}")
+        return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+    from motor_control import MotorController
+    parser = argparse.ArgumentParser(description="测量指令到运动的响应延时")
+    parser.add_argument('--node', type=int, default=1, help="从站地址")
+    parser.add_argument('--comm', choices=['canopen', 'ethercat'], default='canopen', help="通信方式")
+    parser.add_argument('--pdo-interval', default='10', help="PDO周期(ms)，逗号分隔的多个值依次测量")
+    parser.add_argument('--sync-interval', type=int, default=None, help="CANopen SYNC周期(ms)，默认与PDO周期相同")
+    parser.add_argument('--trials', type=int, default=20, help="每种指令和路径的试验次数")
+    parser.add_argument('--commands', default='move,velocity', help="测量的指令: move,velocity")
+    parser.add_argument('--paths', default='sdo,pdo', help="指令路径: sdo,pdo")
+    parser.add_argument('--distance', type=float, default=0.5, help="位置指令移动距离(用户单位)")
+    parser.add_argument('--velocity', type=float, default=5.0, help="速度指令目标速度(用户单位/s)")
+    parser.add_argument('--sim', action='store_true', help="使用本地模拟器代替驱动器")
+    parser.add_argument('--reaction-delay', type=float, default=0.001, help="模拟器: 指令生效延时(秒)")
+    parser.add_argument('--cycle-aligned', action='store_true', help="模拟器: PDO指令在下一个PDO周期边界发出")
+    parser.add_argument('--sdo-latency', type=float, default=0.0005, help="模拟器: SDO访问延时(秒)")
+    args = parser.parse_args(argv)
+
+    sim = None
+    if args.sim:
+        from sdk_simulator import SimulatedServoSDK
+        sim = SimulatedServoSDK(nodes=[args.node], sdo_latency=args.sdo_latency,
+                                reaction_delay=args.reaction_delay, cycle_aligned=args.cycle_aligned)
+    commands = [c.strip() for c in args.commands.split(',') if c.strip()]
+    paths = [1 if p.strip().lower() == 'sdo' else 0 for p in args.paths.split(',') if p.strip()]
+    report = LatencyProbe(None, args.node)
+    for interval in [float(v) for v in args.pdo_interval.split(',')]:
+        if sim is not None:
+            # MotorController.close() 调用 Nim_clean 会卸载库，每个配置重新安装模拟器
+            from sdk_simulator import install_simulator
+            install_simulator(sim)
+        if args.comm == 'ethercat':
+            motor = MotorController(comm_type=1, node_id=args.node)
+            ok = motor.connect_ethercat(pdo_interval=interval) and motor.initialize_ethercat()
+            config = f"EtherCAT {interval:g}ms"
+        else:
+            sync = args.sync_interval if args.sync_interval is not None else int(interval)
+            motor = MotorController(comm_type=0, node_id=args.node)
+            ok = motor.connect_canopen(pdo_interval=int(interval), sync_interval=sync) and motor.initialize_motor()
+            config = f"CAN {interval:g}/{sync}ms"
+        if not ok:
+            print(f"{config}: {motor.status}")
+            motor.close()
+            return 1
+        probe = LatencyProbe(motor.h_master, args.node, config=config, phase_jitter=max(interval / 1000.0, 0.002))
+        if CMD_MOVE in commands:
+            motor.set_profile_position_mode()
+            motor.enable_motor()
+            for bSDO in paths:
+                probe.measure_move(args.distance, args.trials, bSDO)
+        if CMD_VELOCITY in commands:
+            motor.set_profile_velocity_mode()
+            motor.enable_motor()
+            for bSDO in paths:
+                probe.measure_velocity(args.velocity, args.trials, bSDO)
+        motor.close()
+        report.samples.extend(probe.samples)
+        report.errors += probe.errors
+    print(report.format_report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
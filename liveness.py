@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+从站在线状态跟踪与心跳间隔统计
+
+initialize_motor 只在初始化时调用一次 Nim_is_online，运行中从站掉线要等到下一条
+命令失败才会发现。LivenessTracker 通过SDK调用钩子把每次成功的SDO读取（从站的SDO
+应答）记为该从站的一次"心跳"，只对一个检查周期内没有心跳的从站调用开销很小的
+Nim_is_online（只查询主站本地状态），因此已有SDO访问时几乎不增加开销。
+bSDO=0 的PDO读取只读主站本地缓存，从站掉线后仍返回成功，不作为心跳；只有PDO
+轮询的从站每个检查周期都调用 Nim_is_online。
+钩子看到 SlaveNotOnline 错误码时立即唤醒检查线程。
+从站掉线在 check_interval 内被发现（钩子看到错误码时立即发现），并触发
+lost / recovered 事件。每个从站记录最后一次心跳时刻，以及相邻两次在线确认
+（SDO心跳、成功的 Nim_is_online 检查、在线期间的PDO读取）的间隔直方图，
+只用PDO轮询的从站也有间隔统计。
+
+用法:
+    tracker = LivenessTracker(motor.h_master, [1, 2], check_interval=0.05,
+                              on_event=lambda node, event, rec: print(node, event))
+    tracker.start()
+    ...
+    tracker.stop()
+    print(tracker.format_report())
+"""
+
+import threading, time
+from NimServoSDK import *
+from sdk_functions import MASTER_FUNCS, LOCAL_FUNCS, sdo_arg_functions
+from perf_stats import Histogram
+
+EVENT_LOST = 'lost'
+EVENT_RECOVERED = 'recovered'
+
+
+class NodeLiveness(object):
+    def __init__(self, node_id, hist_bin, hist_bins):
+        self.node_id = node_id
+        self.online = True
+        self.last_heartbeat_ns = None   # 最后一次SDO心跳的 time.monotonic_ns()
+        self.last_seen_ns = None        # 最后一次在线确认的 time.monotonic_ns()
+        self.gap_hist = Histogram(hist_bin, hist_bins)     # 相邻两次在线确认的间隔(秒)
+        self.heartbeats = 0
+        self.checks = 0                 # 调用 Nim_is_online 的次数
+        self.losses = 0
+        self.lost_at_ns = None
+        self.downtime = 0.0             # 累计离线时间(秒)
+
+    def observe(self, t_ns):
+        """
+        记录一次在线确认：SDO心跳、成功的 Nim_is_online 检查或在线期间的PDO读取
+        """
+        if self.last_seen_ns is not None:
+            if t_ns <= self.last_seen_ns:
+                return
+            self.gap_hist.add((t_ns - self.last_seen_ns) / 1e9)
+        self.last_seen_ns = t_ns
+
+    def heartbeat(self, t_ns):
+        self.last_heartbeat_ns = t_ns
+        self.heartbeats += 1
+        self.observe(t_ns)
+
+    def __repr__(self):
+        return f"NodeLiveness({self.node_id}, {'在线' if self.online else '离线'}, 心跳{self.heartbeats}次, 掉线{self.losses}次)"
+
+
+class LivenessTracker(object):
+    def __init__(self, h_master, nodes, check_interval=0.05, on_event=None, hist_bin=1e-3, hist_bins=1000):
+        """
+        初始化在线状态跟踪器
+        参数:
+        h_master - 主站句柄
+        nodes - 从站地址列表
+        check_interval - 检查周期(秒)，即最长掉线发现时间
+        on_event - 事件回调 on_event(从站地址, EVENT_LOST / EVENT_RECOVERED, NodeLiveness)，在检查线程中调用
+        hist_bin, hist_bins - 在线确认间隔直方图桶宽度(秒)和桶数量
+        """
+        self.h_master = h_master
+        self.check_interval = check_interval
+        self.on_event = on_event
+        self.nodes = dict((node, NodeLiveness(node, hist_bin, hist_bins)) for node in nodes)
+        self._lock = threading.Lock()
+        self._errors = set()            # 钩子看到 SlaveNotOnline 的从站
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sdo_arg_funcs = sdo_arg_functions()
+
+    def _hook(self, strFuncName, args, nRes, t0_ns, t1_ns):
+        if strFuncName in MASTER_FUNCS or len(args) < 2:
+            return
+        node = call_arg_value(args[1])
+        state = self.nodes.get(node)
+        if state is None:
+            return
+        if nRes == 0 and strFuncName.startswith('Nim_get_') and strFuncName not in LOCAL_FUNCS:
+            # SDO读取成功说明收到了从站的应答，记为心跳；PDO读取只读主站缓存，从站掉线后仍然成功，
+            # 不作为心跳，只在从站在线时计入间隔统计；写入只更新主站缓冲区，不记录
+            pdo = strFuncName in self._sdo_arg_funcs and not call_arg_value(args[-1])
+            with self._lock:
+                if not pdo:
+                    state.heartbeat(t1_ns)
+                elif state.online:
+                    state.observe(t1_ns)
+        elif nRes == ServoSDK_Error.ServoSDK_SlaveNotOnline:
+            with self._lock:
+                self._errors.add(node)
+            self._wake.set()
+
+    def _emit(self, node, event, state):
+        if self.on_event is not None:
+            try:
+                self.on_event(node, event, state)
+            except Exception:
+                pass
+
+    def check(self):
+        """
+        检查一次所有从站，一个检查周期内有SDO心跳的从站不调用 Nim_is_online
+        返回: 本次产生的事件列表 [(从站地址, 事件)]
+        """
+        now = time.monotonic_ns()
+        fresh = now - int(self.check_interval * 1e9)
+        with self._lock:
+            errors = self._errors
+            self._errors = set()
+        events = []
+        for node, state in self.nodes.items():
+            hb = state.last_heartbeat_ns
+            if node not in errors and hb is not None and hb >= fresh:
+                online = True
+            else:
+                online = 1 == Nim_is_online(self.h_master, node)
+                t = time.monotonic_ns()
+                with self._lock:
+                    state.checks += 1
+                    if online:
+                        state.observe(t)
+            if online != state.online:
+                state.online = online
+                if online:
+                    state.downtime += (now - state.lost_at_ns) / 1e9
+                    state.lost_at_ns = None
+                    events.append((node, EVENT_RECOVERED))
+                else:
+                    state.losses += 1
+                    state.lost_at_ns = now
+                    events.append((node, EVENT_LOST))
+        for node, event in events:
+            self._emit(node, event, self.nodes[node])
+        return events
+
+    def offline_nodes(self):
+        return [node for node, state in self.nodes.items() if not state.online]
+
+    def start(self):
+        """
+        启动检查线程
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        add_call_hook(self._hook)
+        self._thread = threading.Thread(target=self._run, name='LivenessTracker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        remove_call_hook(self._hook)
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            self.check()
+            # 被钩子提前唤醒时不推迟下一次定时检查
+            now = time.monotonic()
+            while deadline <= now:
+                deadline += self.check_interval
+            self._wake.wait(deadline - now)
+            self._wake.clear()
+
+    def format_report(self):
+        """
+        生成各从站的心跳和掉线统计文本
+        """
+        ms = lambda v: f"{v * 1e3:.1f}" if v is not None else "-"
+        now = time.monotonic_ns()
+        lines = []
+        for node, state in self.nodes.items():
+            age = (now - state.last_seen_ns) / 1e9 if state.last_seen_ns is not None else None
+            lines.append(f"从站{node}: {'在线' if state.online else '离线'}，心跳 {state.heartbeats} 次，"
+                         f"在线检查 {state.checks} 次，距最后确认在线 {ms(age)} ms，"
+                         f"掉线 {state.losses} 次，累计离线 {state.downtime:.3f} s")
+            if state.gap_hist.total:
+                lines.append(f"  在线确认间隔(ms): p50 {ms(state.gap_hist.percentile(50))}  "
+                             f"p99 {ms(state.gap_hist.percentile(99))}  max {ms(state.gap_hist.max_value)}")
+        return '\n'.join(lines)
@@ -0,0 +1,570 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运动程序解析、拐角过渡规划与执行
+
+每个工件几百段运动，原来用 Python 循环调用 move_to_position + wait_target_reached，
+每段之间都要停下并等待轮询。本模块把运动程序（G代码子集或JSON）一次解析成
+程序段，预先规划整条路径：按各轴最大速度/加速度限制每段的速度和加速度，
+按拐角偏差(junction deviation)计算段与段之间不必停下的过渡速度，前后两遍
+传播保证每段都能按加速度限制加减速，得到每段的梯形速度曲线。执行时:
+
+- CSP: CyclicExecutor 每个周期按规划结果采样各轴位置，通过PDO写目标位置，
+  拐角处不停顿，节拍只取决于机械动力学限制；
+- PP:  （仅单轴）把各段终点交给 MoveQueue 的缓冲设定点依次执行，速度和加速度
+  使用驱动器当前的轮廓参数，没有拐角过渡。
+
+支持的G代码: G0 快速移动、G1 直线插补(F 进给，用户单位/min)、G4 暂停(P 秒)、
+G90 绝对坐标、G91 增量坐标；';' 和 '( )' 为注释。JSON 格式为程序段列表，
+每段的键与G代码字相同，例如 [{"G": 1, "X": 10, "F": 600}, {"G": 4, "P": 0.5}]。
+
+用法:
+    runner = ProgramRunner(motor.h_master, {'X': 1, 'Y': 2},
+                           max_velocity={'X': 50.0, 'Y': 50.0}, max_accel={'X': 500.0, 'Y': 500.0},
+                           period=0.001, on_event=lambda kind, index, block: print(kind, index))
+    runner.load(open("part.nc").read(), feed_override=1.2)
+    print(runner.plan.total_time)
+    runner.run()                    # 或 runner.start() / runner.wait() / runner.stop()
+"""
+
+import json, math, re, threading, time
+from NimServoSDK import *
+from cyclic_executor import CyclicExecutor
+from move_queue import MoveQueue, QUEUE_RUNNING
+
+MOVE_RAPID = 'G0'
+MOVE_LINEAR = 'G1'
+DWELL = 'G4'
+
+MODE_CSP = 'csp'
+MODE_PP = 'pp'
+
+# 执行事件
+EVENT_START = 'start'       # 开始执行
+EVENT_BLOCK = 'block'       # 开始执行某一程序段
+EVENT_DONE = 'done'         # 全部完成
+EVENT_STOPPED = 'stopped'   # 被 stop() 停止
+EVENT_ERROR = 'error'       # 写入目标值失败
+
+AXIS_LETTERS = 'XYZABCUVW'
+
+_WORD = re.compile(r'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+_COMMENT = re.compile(r'\(.*?\)|;.*$')
+
+
+class Block(object):
+    __slots__ = ('kind', 'coords', 'incremental', 'feed', 'dwell', 'line')
+
+    def __init__(self, kind, coords=None, incremental=False, feed=None, dwell=0.0, line=0):
+        self.kind = kind
+        self.coords = coords or {}      # 轴名 -> 坐标(增量模式下为增量)
+        self.incremental = incremental
+        self.feed = feed                # 进给速度(用户单位/s)，G0 为 None
+        self.dwell = dwell              # 暂停时间(秒)
+        self.line = line                # 源程序行号（JSON 为段序号）
+
+    def __repr__(self):
+        words = ' '.join(f"{axis}{value:g}" for axis, value in self.coords.items())
+        if self.kind == DWELL:
+            words = f"P{self.dwell:g}"
+        return f"Block({self.line}: {self.kind} {words})"
+
+
+class _Modal(object):
+    """
+    G代码模态状态：运动方式、坐标方式和进给速度在后续程序段中保持有效
+    """
+    def __init__(self):
+        self.motion = MOVE_RAPID
+        self.incremental = False
+        self.feed = None
+
+    def block(self, words, line):
+        coords = {}
+        dwell = None
+        for letter, value in words:
+            if letter == 'G':
+                code = int(value)
+                if code != value:
+                    raise ValueError(f"第{line}行: 不支持的G代码 G{value:g}")
+                if code in (0, 1):
+                    self.motion = MOVE_RAPID if code == 0 else MOVE_LINEAR
+                elif code == 4:
+                    dwell = 0.0
+                elif code in (90, 91):
+                    self.incremental = code == 91
+                else:
+                    raise ValueError(f"第{line}行: 不支持的G代码 G{code}")
+            elif letter == 'F':
+                if value <= 0:
+                    raise ValueError(f"第{line}行: 进给速度必须大于0")
+                self.feed = value / 60.0
+            elif letter == 'P':
+                if dwell is None:
+                    raise ValueError(f"第{line}行: P 只能用于 G4")
+                dwell = value
+            elif letter in AXIS_LETTERS:
+                coords[letter] = value
+            elif letter == 'N':
+                continue
+            else:
+                raise ValueError(f"第{line}行: 不支持的字 {letter}")
+        if dwell is not None:
+            if coords:
+                raise ValueError(f"第{line}行: G4 不能带坐标")
+            return Block(DWELL, dwell=dwell, line=line)
+        if not coords:
+            return None
+        if self.motion == MOVE_LINEAR and self.feed is None:
+            raise ValueError(f"第{line}行: G1 未指定进给速度 F")
+        return Block(self.motion, coords, self.incremental, self.feed if self.motion == MOVE_LINEAR else None, line=line)
+
+
+def parse_gcode(text):
+    """
+    解析G代码子集
+    返回: Block 列表
+    """
+    modal = _Modal()
+    blocks = []
+    for line, raw in enumerate(text.splitlines(), 1):
+        src = _COMMENT.sub('', raw).strip().upper()
+        if not src:
+            continue
+        words = [(letter, float(value)) for letter, value in _WORD.findall(src)]
+        if len(_WORD.sub('', src).strip()) > 0:
+            raise ValueError(f"第{line}行: 无法解析 '{raw.strip()}'")
+        block = modal.block(words, line)
+        if block is not None:
+            blocks.append(block)
+    return blocks
+
+
+def parse_json(text):
+    """
+    解析JSON运动程序，每段的键与G代码字相同
+    返回: Block 列表
+    """
+    data = json.loads(text) if isinstance(text, str) else text
+    if isinstance(data, dict):
+        data = data.get('blocks', [])
+    modal = _Modal()
+    blocks = []
+    for index, item in enumerate(data, 1):
+        # G 先处理，使同一段内的 P/坐标按新的模态解释
+        words = sorted(((str(k).upper(), float(v)) for k, v in item.items()), key=lambda w: w[0] != 'G')
+        block = modal.block(words, index)
+        if block is not None:
+            blocks.append(block)
+    return blocks
+
+
+def parse_program(text):
+    """
+    解析运动程序，'[' 或 '{' 开头按JSON解析，否则按G代码解析
+    """
+    if isinstance(text, (list, dict)) or text.lstrip()[:1] in ('[', '{'):
+        return parse_json(text)
+    return parse_gcode(text)
+
+
+class Segment(object):
+    __slots__ = ('block_index', 't0', 'duration', 'p0', 'unit', 'length',
+                 'v0', 'vp', 'v1', 'accel', 't_acc', 't_cruise', 'd_acc', 'd_cruise')
+
+    def distance(self, tau):
+        """
+        段内时刻 tau 时沿路径走过的距离
+        """
+        if tau <= 0:
+            return 0.0
+        if tau < self.t_acc:
+            return self.v0 * tau + 0.5 * self.accel * tau * tau
+        tau -= self.t_acc
+        if tau < self.t_cruise:
+            return self.d_acc + self.vp * tau
+        tau -= self.t_cruise
+        d = self.d_acc + self.d_cruise + self.vp * tau - 0.5 * self.accel * tau * tau
+        return min(d, self.length)
+
+    def speed(self, tau):
+        if tau < self.t_acc:
+            return self.v0 + self.accel * tau
+        if tau < self.t_acc + self.t_cruise:
+            return self.vp
+        return max(self.vp - self.accel * (tau - self.t_acc - self.t_cruise), self.v1)
+
+
+def _profile(seg, v0, v1, vmax, accel):
+    """
+    计算梯形（或三角形）速度曲线，v0/v1 已保证可达
+    """
+    length = seg.length
+    seg.v0, seg.v1, seg.accel = v0, v1, accel
+    if length <= 0:
+        seg.vp = seg.t_acc = seg.t_cruise = seg.d_acc = seg.d_cruise = 0.0
+        seg.duration = 0.0
+        return
+    d_acc = (vmax * vmax - v0 * v0) / (2.0 * accel)
+    d_dec = (vmax * vmax - v1 * v1) / (2.0 * accel)
+    if d_acc + d_dec > length:
+        vp = math.sqrt(max((2.0 * accel * length + v0 * v0 + v1 * v1) / 2.0, max(v0, v1) ** 2))
+        d_acc = (vp * vp - v0 * v0) / (2.0 * accel)
+        d_dec = (vp * vp - v1 * v1) / (2.0 * accel)
+    else:
+        vp = vmax
+    seg.vp = vp
+    seg.t_acc = (vp - v0) / accel
+    seg.d_acc = d_acc
+    seg.d_cruise = max(length - d_acc - d_dec, 0.0)
+    seg.t_cruise = seg.d_cruise / vp if vp > 0 else 0.0
+    seg.duration = seg.t_acc + seg.t_cruise + (vp - v1) / accel
+
+
+def _limits(value, axes, name):
+    if isinstance(value, dict):
+        missing = [axis for axis in axes if axis not in value]
+        if missing:
+            raise ValueError(f"未指定轴 {','.join(missing)} 的{name}")
+        return [float(value[axis]) for axis in axes]
+    return [float(value)] * len(axes)
+
+
+class MotionPlan(object):
+    def __init__(self, axes, blocks, segments, start, end):
+        self.axes = axes
+        self.blocks = blocks
+        self.segments = segments
+        self.start = start
+        self.end = end
+        self.total_time = segments[-1].t0 + segments[-1].duration if segments else 0.0
+        self._cursor = 0
+
+    def locate(self, t):
+        """
+        返回时刻 t 所在的段序号（按时间单调增加调用时为 O(1)）
+        """
+        segments = self.segments
+        i = self._cursor if self._cursor < len(segments) and segments[self._cursor].t0 <= t else 0
+        while i + 1 < len(segments) and segments[i + 1].t0 <= t:
+            i += 1
+        self._cursor = i
+        return i
+
+    def sample(self, t):
+        """
+        返回时刻 t 各轴的位置元组（顺序同 axes）
+        """
+        if not self.segments or t >= self.total_time:
+            return self.end
+        seg = self.segments[self.locate(t)]
+        d = seg.distance(t - seg.t0)
+        return tuple(p + u * d for p, u in zip(seg.p0, seg.unit))
+
+    def block_at(self, t):
+        """
+        返回时刻 t 正在执行的程序段序号
+        """
+        if not self.segments:
+            return None
+        return self.segments[self.locate(min(t, self.total_time))].block_index
+
+    def max_speed(self):
+        return max([seg.vp for seg in self.segments] or [0.0])
+
+
+def plan_program(blocks, axes, start, max_velocity, max_accel, junction_deviation=0.01,
+                 feed_override=1.0, rapid_override=1.0):
+    """
+    规划运动程序
+    参数:
+    blocks - parse_program 的返回值
+    axes - 轴名列表，例如 ['X', 'Y']
+    start - 起点 {轴名: 位置}
+    max_velocity - 各轴最大速度(用户单位/s)，{轴名: 值} 或所有轴相同的数值；G0 按此速度运行
+    max_accel - 各轴最大加速度(用户单位/s^2)，{轴名: 值} 或数值
+    junction_deviation - 拐角偏差(用户单位)，越大拐角处保持的速度越高，0 表示每个拐角都停下
+    feed_override - G1 进给倍率
+    rapid_override - G0 速度倍率(0~1)
+    返回: MotionPlan
+    """
+    axes = list(axes)
+    vmax = _limits(max_velocity, axes, "最大速度")
+    amax = _limits(max_accel, axes, "最大加速度")
+    if min(vmax) <= 0 or min(amax) <= 0:
+        raise ValueError("最大速度和最大加速度必须大于0")
+    if feed_override <= 0 or not 0 < rapid_override <= 1:
+        raise ValueError("进给倍率必须大于0，快速移动倍率必须在 (0, 1] 范围内")
+    position = [float(start.get(axis, 0.0)) for axis in axes]
+    start = tuple(position)
+    segments = []
+    for index, block in enumerate(blocks):
+        seg = Segment()
+        seg.block_index = index
+        seg.p0 = tuple(position)
+        if block.kind == DWELL:
+            seg.unit = (0.0,) * len(axes)
+            seg.length = 0.0
+            _profile(seg, 0.0, 0.0, 0.0, 1.0)
+            seg.duration = max(block.dwell, 0.0)
+            segments.append(seg)
+            continue
+        for axis in block.coords:
+            if axis not in axes:
+                raise ValueError(f"第{block.line}行: 未配置的轴 {axis}")
+        target = list(position)
+        for i, axis in enumerate(axes):
+            if axis in block.coords:
+                target[i] = position[i] + block.coords[axis] if block.incremental else block.coords[axis]
+        delta = [b - a for a, b in zip(position, target)]
+        length = math.sqrt(sum(d * d for d in delta))
+        if length < 1e-12:
+            continue
+        seg.unit = tuple(d / length for d in delta)
+        seg.length = length
+        # 路径速度/加速度受各轴限制：|u_i| * v <= vmax_i
+        v_limit = min(v / abs(u) for v, u in zip(vmax, seg.unit) if abs(u) > 1e-12)
+        seg.accel = min(a / abs(u) for a, u in zip(amax, seg.unit) if abs(u) > 1e-12)
+        if block.kind == MOVE_RAPID:
+            seg.vp = v_limit * rapid_override
+        else:
+            seg.vp = min(block.feed * feed_override, v_limit)
+        segments.append(seg)
+        position = target
+
+    # 段与段之间的最大过渡速度（拐角偏差模型），暂停前后和程序首尾为 0
+    n = len(segments)
+    junction = [0.0] * (n + 1)
+    for i in range(1, n):
+        a, b = segments[i - 1], segments[i]
+        if a.length == 0 or b.length == 0:
+            continue
+        cos_theta = -sum(x * y for x, y in zip(a.unit, b.unit))
+        v = min(a.vp, b.vp)
+        if cos_theta > 0.999999 or junction_deviation <= 0:
+            v = 0.0         # 反向或不允许过渡
+        elif cos_theta > -0.999999:
+            sin_half = math.sqrt((1.0 - cos_theta) / 2.0)
+            accel = min(a.accel, b.accel)
+            v = min(v, math.sqrt(accel * junction_deviation * sin_half / (1.0 - sin_half)))
+        junction[i] = v
+    # 反向传播：保证每段都能减速到下一段的入口速度
+    for i in range(n - 1, -1, -1):
+        seg = segments[i]
+        if seg.length > 0:
+            junction[i] = min(junction[i], math.sqrt(junction[i + 1] ** 2 + 2.0 * seg.accel * seg.length))
+    # 正向传播：保证每段都能从入口速度加速到出口速度
+    t = 0.0
+    for i, seg in enumerate(segments):
+        if seg.length > 0:
+            junction[i + 1] = min(junction[i + 1], math.sqrt(junction[i] ** 2 + 2.0 * seg.accel * seg.length))
+            _profile(seg, junction[i], junction[i + 1], seg.vp, seg.accel)
+        seg.t0 = t
+        t += seg.duration
+    return MotionPlan(axes, blocks, segments, start, tuple(position))
+
+
+class ProgramRunner(object):
+    def __init__(self, h_master, axes, max_velocity, max_accel, period=0.001, mode=MODE_CSP,
+                 junction_deviation=0.01, on_event=None, cpu=None, priority=None):
+        """
+        初始化运动程序执行器
+        参数:
+        h_master - 主站句柄
+        axes - {轴名: 从站地址}，CSP 模式下各轴需已设置为周期同步位置模式并使能，PP 模式需为轮廓位置模式
+        max_velocity, max_accel - 各轴最大速度(用户单位/s)和最大加速度(用户单位/s^2)
+        period - CSP 控制周期(秒)，应与连接时的 pdo_interval 一致；PP 模式为状态字检查周期
+        mode - MODE_CSP 或 MODE_PP（仅单轴）
+        junction_deviation - 拐角偏差(用户单位)
+        on_event - 事件回调 on_event(事件, 程序段序号, Block)，在执行线程中调用
+        cpu, priority - 传给 CyclicExecutor 的CPU绑定和 SCHED_FIFO 优先级
+        """
+        if mode not in (MODE_CSP, MODE_PP):
+            raise ValueError(f"未知的执行方式: {mode}")
+        if mode == MODE_PP and len(axes) != 1:
+            raise ValueError("PP 方式只支持单轴程序")
+        self.h_master = h_master
+        self.axes = dict(axes)
+        self.max_velocity = max_velocity
+        self.max_accel = max_accel
+        self.period = period
+        self.mode = mode
+        self.junction_deviation = junction_deviation
+        self.on_event = on_event
+        self.plan = None
+        self.write_errors = 0
+        self.current_block = None
+        self.finished_at = None
+        self._names = list(self.axes)
+        self._nodes = [self.axes[name] for name in self._names]
+        self._t = 0.0
+        self._rate = 1.0
+        self._rate_step = 0.0
+        self._last_ns = None
+        self._finished = threading.Event()
+        self._queue = None
+        self.executor = CyclicExecutor(period, self._on_cycle, cpu=cpu, priority=priority, name='ProgramRunner')
+
+    def load(self, program, start=None, feed_override=1.0, rapid_override=1.0):
+        """
+        解析并规划运动程序
+        参数:
+        program - G代码/JSON 文本，或 parse_program 的返回值
+        start - 起点 {轴名: 位置}，None 表示读取各轴当前位置
+        feed_override, rapid_override - 进给倍率和快速移动倍率
+        返回: MotionPlan
+        """
+        blocks = program if isinstance(program, list) and all(isinstance(b, Block) for b in program) \
+            else parse_program(program)
+        if start is None:
+            start = {}
+            for name, node in self.axes.items():
+                [res, position] = Nim_get_currentPosition(self.h_master, node, 1)
+                if res != 0:
+                    raise RuntimeError(f"读取轴{name}(从站{node})位置失败，错误码: {res}")
+                start[name] = position
+        if self.mode == MODE_PP and any(b.kind == DWELL for b in blocks):
+            raise ValueError("PP 方式不支持 G4 暂停")
+        self.plan = plan_program(blocks, self._names, start, self.max_velocity, self.max_accel,
+                                 self.junction_deviation, feed_override, rapid_override)
+        return self.plan
+
+    def _emit(self, kind, index):
+        if self.on_event is not None:
+            block = self.plan.blocks[index] if index is not None else None
+            self.on_event(kind, index, block)
+
+    def _finish(self, kind):
+        self.finished_at = time.monotonic()
+        self.executor.request_stop()
+        self._finished.set()
+        self._emit(kind, self.current_block)
+
+    def _on_cycle(self, cycle, deadline_ns):
+        plan = self.plan
+        if self._last_ns is not None:
+            # 按截止时刻推进路径时间，跳过的周期不会使路径时间落后
+            dt = (deadline_ns - self._last_ns) / 1e9
+            if self._rate_step:
+                self._rate = max(self._rate - self._rate_step * dt, 0.0)
+            self._t += dt * self._rate
+        self._last_ns = deadline_ns
+        block = plan.block_at(self._t)
+        if block != self.current_block:
+            self.current_block = block
+            self._emit(EVENT_BLOCK, block)
+        h = self.h_master
+        for node, position in zip(self._nodes, plan.sample(self._t)):
+            if Nim_set_targetPosition(h, node, position, 0) != 0:
+                self.write_errors += 1
+        if self.write_errors:
+            self._finish(EVENT_ERROR)
+        elif self._t >= plan.total_time:
+            self._finish(EVENT_DONE)
+        elif self._rate == 0.0:
+            self._finish(EVENT_STOPPED)
+
+    def _prepare(self):
+        if self.plan is None:
+            raise RuntimeError("未加载运动程序")
+        self._t = 0.0
+        self._rate = 1.0
+        self._rate_step = 0.0
+        self._last_ns = None
+        self.current_block = None
+        self.write_errors = 0
+        self.finished_at = None
+        self._finished.clear()
+        self._emit(EVENT_START, None)
+
+    def _pp_queue(self):
+        """
+        PP 方式：创建按程序段终点发送缓冲设定点的 MoveQueue
+        """
+        indices = sorted(set(seg.block_index for seg in self.plan.segments))
+
+        def on_progress(done, total):
+            if done < total:
+                self.current_block = indices[done]
+                self._emit(EVENT_BLOCK, self.current_block)
+
+        node = self._nodes[0]
+        self._queue = MoveQueue(self.h_master, node, self.period, on_progress=on_progress)
+        self._queue.extend([seg.p0[0] + seg.unit[0] * seg.length for seg in self.plan.segments])
+        self.current_block = indices[0] if indices else None
+        self._emit(EVENT_BLOCK, self.current_block)
+        return self._queue
+
+    def _pp_finished(self, ok):
+        if self._queue.state != QUEUE_RUNNING and not self._finished.is_set():
+            self.finished_at = time.monotonic()
+            self._finished.set()
+            self._emit(EVENT_DONE if ok else EVENT_ERROR, self.current_block)
+        return ok
+
+    def _succeeded(self):
+        return self._finished.is_set() and self._t >= self.plan.total_time and not self.write_errors
+
+    def run(self):
+        """
+        在当前线程执行已加载的运动程序，直到完成、出错或被其他线程 stop()
+        返回: True 全部完成；False 失败或被停止
+        """
+        self._prepare()
+        if self.mode == MODE_PP:
+            return self._pp_finished(self._pp_queue().run())
+        self.executor.run()
+        return self._succeeded()
+
+    def start(self):
+        """
+        在后台线程执行已加载的运动程序
+        """
+        self._prepare()
+        if self.mode == MODE_PP:
+            self._pp_queue().start()
+        else:
+            self.executor.start()
+
+    def wait(self, timeout=None):
+        """
+        等待 start() 启动的执行结束
+        返回: True 全部完成；False 失败、超时或被停止
+        """
+        if self.mode == MODE_PP:
+            return self._pp_finished(self._queue.wait(timeout))
+        if self._finished.wait(timeout):
+            self.executor.join()
+        return self._succeeded()
+
+    def stop(self, ramp=True):
+        """
+        停止执行
+        参数:
+        ramp - True 沿路径按最小加速度减速后停止（进给保持）；False 立即停止在当前指令位置
+        """
+        if self.mode == MODE_PP:
+            if self._queue is not None:
+                self._queue.stop()
+            return
+        if ramp and self.plan.segments and not self._finished.is_set():
+            accel = min(seg.accel for seg in self.plan.segments if seg.length > 0) if any(
+                seg.length > 0 for seg in self.plan.segments) else 1.0
+            # 倍率从1线性降到0所需时间，使倍率下降引起的减速度不超过最小加速度
+            ramp_time = max(self.plan.max_speed() / accel, self.period)
+            self._rate_step = 1.0 / ramp_time
+            self._finished.wait(ramp_time * 2 + 1.0)
+        self.executor.stop()
+        if not self._finished.is_set():
+            self._finish(EVENT_STOPPED)
+
+    def progress(self):
+        """
+        返回执行进度 0~1（按规划时间）
+        """
+        if self.plan is None or self.plan.total_time <= 0:
+            return 1.0 if self._finished.is_set() else 0.0
+        if self.mode == MODE_PP and self._queue is not None:
+            return self._queue.done / max(self._queue.total, 1)
+        return min(self._t / self.plan.total_time, 1.0)
@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import ctypes, os, types, sys, time
+import ctypes, json, os, types, sys, time
 from NimServoSDK import *
+from pdo_router import PdoRouter
+from cyclic_executor import CyclicExecutor
+from pdo_mapping import apply_pdo_mapping
+from setpoint_coalescer import SetpointCoalescer
+from move_queue import MoveQueue
+from timebase import SyncTimebase
+from telemetry_parquet import TelemetrySink, TelemetryRecorder
+from typed_api import TypedSDK, ServoSDKError
+from autotune import ProfileAutoTuner
+from move_planner import MovePlanner
 
 class MotorController:
     def __init__(self, sdk_path=None, comm_type=0, node_id=1):
@@ -16,6 +26,25 @@ class MotorController:
         self.h_master = None
         self.node_id = node_id
         self.status = "未初始化"
+        self.pdo_router = None
+        self.coalescer = None
+        self.timebase = None
+        self.telemetry = None
+        self._typed = None
+        self.move_planner = None
+        self._move_planner_kwargs = {}
+        self.slaves = []
+        self.cyclic_mode = None
+        self._attached = []             # attach() 登记的持有主站句柄的外部组件
+        
+        # 缓存连接和配置，用于主站重启后恢复状态（见 restore_state）
+        self.comm_type = comm_type
+        self.conn_str = None
+        self.init_args = None
+        self.pdo_mapping = None
+        self.work_mode = None
+        self.motion_params = None
+        self.enabled = False
         
         # 将SDK路径添加到系统搜索路径中
         if sdk_path is not None:
@@ -55,12 +84,68 @@ class MotorController:
         conn_str = f'{{"DevType": "{dev_type}", "DevIndex": {dev_index}, "Baudrate": {baudrate}, "PDOIntervalMS": {pdo_interval}, "SyncIntervalMS": {sync_interval}}}'
         res = Nim_master_run(self.h_master, conn_str)
         if res == 0:
+            self.conn_str = conn_str
+            self.timebase = SyncTimebase.from_conn_str(conn_str)
             self.status = "CANopen连接成功"
             return True
         else:
             self.status = f"CANopen连接失败，错误码: {res}"
             return False
             
+    def connect_ethercat(self, adapter="eth0", pdo_interval=1, overlapping_pdo=True):
+        """
+        连接EtherCAT网络
+        参数:
+        adapter - 网络适配器名称，默认"eth0"
+        pdo_interval - PDO通信周期(ms)，即周期同步模式的控制周期，默认1ms
+        overlapping_pdo - 是否使用重叠PDO，默认True
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法连接"
+            return False
+            
+        overlapping = "true" if overlapping_pdo else "false"
+        conn_str = f'{{"NetworkAdapter": "{adapter}", "OverlappingPDO": {overlapping}, "PDOIntervalMS": {pdo_interval:g}}}'
+        res = Nim_master_run(self.h_master, conn_str)
+        if res == 0:
+            self.conn_str = conn_str
+            self.timebase = SyncTimebase.from_conn_str(conn_str)
+            self.status = "EtherCAT连接成功"
+            return True
+        else:
+            self.status = f"EtherCAT连接失败，错误码: {res}"
+            return False
+            
+    def connect_modbus(self, serial_port="COM1", baudrate=115200, parity="N", data_bits=8, stop_bits=1,
+                       pdo_interval=10, sync_interval=0):
+        """
+        连接Modbus设备(串口)，连接后使用 initialize_motor(param_db="Modbus.db") 初始化
+        参数:
+        serial_port - 串口名称，默认"COM1"（Linux下如"/dev/ttyUSB0"）
+        baudrate - 串口波特率，默认115200
+        parity - 校验方式：N无校验；O奇校验；E偶校验
+        data_bits - 数据位，默认8
+        stop_bits - 停止位，默认1
+        pdo_interval - PDO通信周期，默认10ms
+        sync_interval - 同步周期，默认0(不启动同步)，启动时必须为 pdo_interval 的整倍数
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法连接"
+            return False
+            
+        conn_str = (f'{{"SerialPort": "{serial_port}", "Baudrate": {baudrate}, "Parity": "{parity}", '
+                    f'"DataBits": {data_bits}, "StopBits": {stop_bits}, '
+                    f'"PDOIntervalMS": {pdo_interval}, "SyncIntervalMS": {sync_interval}}}')
+        res = Nim_master_run(self.h_master, conn_str)
+        if res == 0:
+            self.conn_str = conn_str
+            self.timebase = SyncTimebase.from_conn_str(conn_str)
+            self.status = "Modbus连接成功"
+            return True
+        else:
+            self.status = f"Modbus连接失败，错误码: {res}"
+            return False
+            
     def initialize_motor(self, param_db="CANopen.db", unit_factor=10000.0):
         """
         初始化电机，包括扫描节点、加载参数、读取PDO配置等
@@ -94,9 +179,231 @@ class MotorController:
         Nim_master_changeToOP(self.h_master)
         time.sleep(0.05)
         
+        self.init_args = ('initialize_motor', {'param_db': param_db, 'unit_factor': unit_factor})
         self.status = "电机初始化成功"
         return True
+
+    def initialize_ethercat(self, param_db="EtherCAT.db", unit_factor=10000.0, max_nodes=10):
+        """
+        初始化EtherCAT网络上的全部从站，并切换到运行(OP)状态
+        参数:
+        param_db - 参数数据库文件名
+        unit_factor - 用户单位换算系数
+        max_nodes - 扫描的最大从站地址
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法初始化电机"
+            return False
+            
+        # 进入预操作模式
+        Nim_master_changeToPreOP(self.h_master)
+        time.sleep(0.05)
+        
+        # 扫描节点
+        Nim_scan_nodes(self.h_master, 1, max_nodes)
+        slaves = [node for node in range(1, max_nodes + 1) if 1 == Nim_is_online(self.h_master, node)]
+        if self.node_id not in slaves:
+            self.status = f"电机节点{self.node_id}不在线"
+            return False
+            
+        # 所有从站都在预操作状态下完成配置，再一起进入运行状态
+        for node in slaves:
+            Nim_load_params(self.h_master, node, param_db)
+            res = Nim_read_PDOConfig(self.h_master, node)
+            if res != 0:
+                self.status = f"从站{node}读取PDO配置失败，错误码: {res}"
+                return False
+            Nim_set_unitsFactor(self.h_master, node, unit_factor)
+            Nim_clearError(self.h_master, node, 1)
+            
+        # 切换到操作模式
+        res = Nim_master_changeToOP(self.h_master)
+        if res != 0:
+            self.status = f"切换到OP状态失败，错误码: {res}"
+            return False
+        time.sleep(0.05)
+        
+        self.slaves = slaves
+        self.init_args = ('initialize_ethercat', {'param_db': param_db, 'unit_factor': unit_factor, 'max_nodes': max_nodes})
+        self.status = f"EtherCAT初始化成功，从站: {slaves}"
+        return True
+        
+    def enable_pdo_routing(self):
+        """
+        启用按PDO映射自动选择SDO/PDO（在initialize_motor之后调用）
+        已映射到PDO的对象改走PDO，未映射的仍走SDO
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法启用PDO路由"
+            return False
+            
+        router = PdoRouter(self.h_master)
+        res = router.load_mapping(self.node_id)
+        if res != 0:
+            self.status = f"读取PDO映射失败，错误码: {res}"
+            return False
+            
+        self.pdo_router = router
+        self.status = "PDO路由已启用"
+        return True
+        
+    def enable_setpoint_coalescing(self, period=None):
+        """
+        启用目标值合并写入：run_velocity 只保存最新的速度，每个PDO周期写一次
+        参数:
+        period - 写入周期(秒)，默认使用连接时的 pdo_interval
+        """
+        if self.h_master is None or self.conn_str is None:
+            self.status = "主站未连接，无法启用目标值合并"
+            return False
+            
+        if period is None:
+            period = self._pdo_period()
+        if self.coalescer is not None:
+            self.coalescer.stop()
+        self.coalescer = SetpointCoalescer(self.h_master, period, bSDO=self._bsdo(Nim_forward, 0))
+        self.coalescer.start()
+        self.status = f"目标值合并已启用，周期: {period * 1000:g}ms"
+        return True
+        
+    def start_telemetry(self, directory, nodes=None, period=None, **sink_args):
+        """
+        开始把各轴状态、位置、速度、转矩、DI和报警写入轮换的Parquet文件（需要安装pyarrow）
+        参数:
+        directory - 输出目录
+        nodes - 从站地址列表，默认为当前轴
+        period - 采样周期(秒)，默认使用连接时的 pdo_interval
+        sink_args - 传给 TelemetrySink 的其他参数，如 rotate_interval、compression
+        """
+        if self.h_master is None or self.conn_str is None:
+            self.status = "主站未连接，无法记录遥测数据"
+            return False
+            
+        if period is None:
+            period = self._pdo_period()
+        self.stop_telemetry()
+        try:
+            sink = TelemetrySink(directory, **sink_args)
+            self.telemetry = TelemetryRecorder(self.h_master, nodes or [self.node_id], sink, period,
+                                               bSDO=self._bsdo(Nim_get_currentPosition, 0), timebase=self.timebase)
+            self.telemetry.start()
+        except (ImportError, OSError) as e:
+            self.telemetry = None
+            self.status = f"启动遥测记录失败: {e}"
+            return False
+        self.status = f"遥测记录已启动，周期: {period * 1000:g}ms，目录: {directory}"
+        return True
+        
+    def stop_telemetry(self):
+        """
+        停止遥测记录，写完剩余数据并关闭文件
+        """
+        if self.telemetry is not None:
+            self.telemetry.stop()
+            self.status = self.telemetry.sink.format_report()
+            self.telemetry = None
+            
+    def _pdo_period(self):
+        """
+        返回连接时设置的PDO周期(秒)
+        """
+        return json.loads(self.conn_str).get("PDOIntervalMS", 10) / 1000.0
+        
+    def _bsdo(self, func, default):
+        """
+        选择SDO/PDO：未启用PDO路由时使用默认值
+        """
+        if self.pdo_router is None:
+            return default
+        return self.pdo_router.route(func.__name__, self.node_id, default)
+        
+    def remap_pdos(self, tpdos=None, rpdos=None):
+        """
+        重新映射本节点的PDO（见 pdo_mapping.apply_pdo_mapping），映射会被缓存，恢复状态时重新写入
+        参数:
+        tpdos/rpdos - PDO列表，每个PDO为对象名称或 (索引, 子索引, 位长) 列表；None 表示不修改
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法映射PDO"
+            return False
+            
+        res = apply_pdo_mapping(self.h_master, self.node_id, tpdos, rpdos, router=self.pdo_router)
+        if res != 0:
+            self.status = f"PDO映射失败，错误码: {res}"
+            return False
+            
+        self.pdo_mapping = (tpdos, rpdos)
+        self.status = "PDO映射成功"
+        return True
+        
+    def attach(self, component):
+        """
+        登记持有主站句柄的外部组件（LivenessTracker、PollScheduler、DIService 等），
+        主站重新创建后 set_master 同时更新它们的 h_master
+        """
+        if component not in self._attached:
+            self._attached.append(component)
+            
+    def detach(self, component):
+        if component in self._attached:
+            self._attached.remove(component)
+            
+    def set_master(self, h_master):
+        """
+        切换到重新创建的主站句柄：PDO路由、目标值合并器、遥测记录器和 attach() 登记的组件改用新句柄；
+        运动规划器和类型化接口在下次使用时发现句柄变化后重新创建
+        """
+        self.h_master = h_master
+        for component in [self.pdo_router, self.coalescer, self.telemetry] + self._attached:
+            if component is not None:
+                component.h_master = h_master
+                
+    def restore_state(self):
+        """
+        主站重新启动后恢复缓存的状态：初始化、PDO映射、PDO路由、工作模式、运动参数和使能状态
+        返回: True 成功；False 失败，self.status 为失败的步骤
+        """
+        if self.init_args is None:
+            self.status = "电机未初始化，没有可恢复的状态"
+            return False
+            
+        work_mode, motion_params, enabled = self.work_mode, self.motion_params, self.enabled
+        method, kwargs = self.init_args
+        if not getattr(self, method)(**kwargs):
+            return False
+        if self.pdo_mapping is not None and not self.remap_pdos(*self.pdo_mapping):
+            return False
+        if self.pdo_router is not None and not self.enable_pdo_routing():
+            return False
+            
+        setters = {
+            ServoWorkMode.SERVO_PP_MODE: self.set_profile_position_mode,
+            ServoWorkMode.SERVO_PV_MODE: self.set_profile_velocity_mode,
+            ServoWorkMode.SERVO_CSP_MODE: self.set_cyclic_position_mode,
+            ServoWorkMode.SERVO_CSV_MODE: self.set_cyclic_velocity_mode,
+            ServoWorkMode.SERVO_CST_MODE: self.set_cyclic_torque_mode,
+        }
+        if work_mode in setters and not setters[work_mode]():
+            return False
+        if motion_params is not None and not self.set_motion_parameters(*motion_params):
+            return False
+        if enabled and not self.enable_motor():
+            return False
+        self._invalidate_setpoints()
+            
+        self.status = "状态恢复成功"
+        return True
         
+    def _invalidate_setpoints(self):
+        """
+        驱动器状态被快速停止、使能/脱机或模式切换改变后，目标值合并器重新写入下一次提交的值，
+        运动规划以实际位置为下次运动的起点
+        """
+        if self.coalescer is not None:
+            self.coalescer.invalidate(self.node_id)
+        if self.move_planner is not None:
+            self.move_planner.forget_target()
+            
     def enable_motor(self):
         """
         使能电机（抱机）
@@ -105,12 +412,14 @@ class MotorController:
             self.status = "主站未创建，无法使能电机"
             return False
             
-        Nim_power_on(self.h_master, self.node_id, 1)
+        Nim_power_on(self.h_master, self.node_id, self._bsdo(Nim_power_on, 1))
+        self._invalidate_setpoints()
         time.sleep(0.2)  # 必要延时
         
         # 检查电机状态
-        [res, sw] = Nim_get_statusWord(self.h_master, self.node_id, 0)
+        [res, sw] = Nim_get_statusWord(self.h_master, self.node_id, self._bsdo(Nim_get_statusWord, 0))
         if res == 0 and (sw & 0x6F) == 0x27:  # 检查电机是否处于使能状态
+            self.enabled = True
             self.status = "电机使能成功"
             return True
         else:
@@ -125,9 +434,11 @@ class MotorController:
             self.status = "主站未创建，无法脱机电机"
             return False
             
-        Nim_power_off(self.h_master, self.node_id, 1)
+        Nim_power_off(self.h_master, self.node_id, self._bsdo(Nim_power_off, 1))
+        self._invalidate_setpoints()
         time.sleep(0.05)  # 必要延时
         
+        self.enabled = False
         self.status = "电机脱机成功"
         return True
         
@@ -140,16 +451,19 @@ class MotorController:
             return False
             
         # 先脱机电机
-        Nim_power_off(self.h_master, self.node_id, 1)
+        Nim_power_off(self.h_master, self.node_id, self._bsdo(Nim_power_off, 1))
         time.sleep(0.05)
         
         # 设置轮廓速度模式
-        Nim_set_workMode(self.h_master, self.node_id, ServoWorkMode.SERVO_PV_MODE, 1)
+        Nim_set_workMode(self.h_master, self.node_id, ServoWorkMode.SERVO_PV_MODE, self._bsdo(Nim_set_workMode, 1))
+        self._invalidate_setpoints()
         time.sleep(0.05)
         
         # 获取工作模式确认
-        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, 1)
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 1))
         if res == 0 and mode == ServoWorkMode.SERVO_PV_MODE:
+            self.work_mode = mode
+            self.enabled = False
             self.status = "设置轮廓速度模式成功"
             return True
         else:
@@ -165,22 +479,125 @@ class MotorController:
             return False
             
         # 先脱机电机
-        Nim_power_off(self.h_master, self.node_id, 1)
+        Nim_power_off(self.h_master, self.node_id, self._bsdo(Nim_power_off, 1))
         time.sleep(0.05)
         
         # 设置轮廓位置模式
-        Nim_set_workMode(self.h_master, self.node_id, ServoWorkMode.SERVO_PP_MODE, 1)
+        Nim_set_workMode(self.h_master, self.node_id, ServoWorkMode.SERVO_PP_MODE, self._bsdo(Nim_set_workMode, 1))
+        self._invalidate_setpoints()
         time.sleep(0.05)
         
         # 获取工作模式确认
-        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, 1)
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 1))
         if res == 0 and mode == ServoWorkMode.SERVO_PP_MODE:
+            self.work_mode = mode
+            self.enabled = False
             self.status = "设置轮廓位置模式成功"
             return True
         else:
             self.status = f"设置轮廓位置模式失败，当前模式: {mode}"
             return False
             
+    def _set_cyclic_mode(self, mode, name):
+        """
+        设置周期同步模式(CSP/CSV/CST)，目标值先与当前状态对齐，避免使能时跳变
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法设置模式"
+            return False
+            
+        # 先脱机电机
+        Nim_power_off(self.h_master, self.node_id, self._bsdo(Nim_power_off, 1))
+        time.sleep(0.05)
+        
+        Nim_set_workMode(self.h_master, self.node_id, mode, self._bsdo(Nim_set_workMode, 1))
+        self._invalidate_setpoints()
+        time.sleep(0.05)
+        
+        if mode == ServoWorkMode.SERVO_CSP_MODE:
+            [res, position] = Nim_get_currentPosition(self.h_master, self.node_id, self._bsdo(Nim_get_currentPosition, 0))
+            if res == 0:
+                Nim_set_targetPosition(self.h_master, self.node_id, position, self._bsdo(Nim_set_targetPosition, 0))
+        elif mode == ServoWorkMode.SERVO_CSV_MODE:
+            Nim_set_targetVelocity(self.h_master, self.node_id, 0.0, self._bsdo(Nim_set_targetVelocity, 0))
+        else:
+            Nim_set_targetTorque(self.h_master, self.node_id, 0, self._bsdo(Nim_set_targetTorque, 0))
+            
+        # 获取工作模式确认
+        [res, current] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 1))
+        if res == 0 and current == mode:
+            self.cyclic_mode = mode
+            self.work_mode = mode
+            self.enabled = False
+            self.status = f"设置{name}模式成功"
+            return True
+        else:
+            self.status = f"设置{name}模式失败，当前模式: {current}"
+            return False
+            
+    def set_cyclic_position_mode(self):
+        """
+        设置为周期同步位置模式(CSP)
+        """
+        return self._set_cyclic_mode(ServoWorkMode.SERVO_CSP_MODE, "周期同步位置")
+        
+    def set_cyclic_velocity_mode(self):
+        """
+        设置为周期同步速度模式(CSV)
+        """
+        return self._set_cyclic_mode(ServoWorkMode.SERVO_CSV_MODE, "周期同步速度")
+        
+    def set_cyclic_torque_mode(self):
+        """
+        设置为周期同步转矩模式(CST)
+        """
+        return self._set_cyclic_mode(ServoWorkMode.SERVO_CST_MODE, "周期同步转矩")
+        
+    def write_cyclic_setpoint(self, value):
+        """
+        写入本周期的目标值(通过PDO)，按当前周期同步模式解释
+        参数:
+        value - CSP: 目标位置(用户单位)；CSV: 目标速度(用户单位/s)；CST: 目标转矩(0.001倍额定转矩)
+        返回: 0 成功；其它 失败
+        """
+        if self.cyclic_mode == ServoWorkMode.SERVO_CSP_MODE:
+            return Nim_set_targetPosition(self.h_master, self.node_id, value, 0)
+        elif self.cyclic_mode == ServoWorkMode.SERVO_CSV_MODE:
+            return Nim_set_targetVelocity(self.h_master, self.node_id, value, 0)
+        elif self.cyclic_mode == ServoWorkMode.SERVO_CST_MODE:
+            return Nim_set_targetTorque(self.h_master, self.node_id, int(value), 0)
+        return ServoSDK_Error.ServoSDK_Cia402ModeError
+        
+    def run_cyclic(self, setpoint, cycle=0.001, duration=1.0, cpu=None, priority=None):
+        """
+        按固定周期写入目标值，由 CyclicExecutor 按绝对截止时刻调度，避免周期漂移
+        参数:
+        setpoint - 函数 setpoint(t)，t 为开始后的时间(秒)，返回本周期的目标值
+        cycle - 控制周期(秒)，可小于1ms，应与 connect_ethercat 的 pdo_interval 一致
+        duration - 运行时长(秒)
+        cpu - 绑定的CPU核心编号，None 表示不绑定
+        priority - SCHED_FIFO 优先级，None 表示不申请实时调度
+        返回: 统计字典 {'cycles', 'errors', 'overruns', 'max_late', 'executor'}，max_late 为最大唤醒滞后(秒)
+        """
+        if self.h_master is None or self.cyclic_mode is None:
+            self.status = "未设置周期同步模式，无法执行周期运动"
+            return None
+            
+        errors = [0]
+        
+        def on_cycle(n, deadline_ns):
+            # 超时跳过的周期不计入 n，按截止时刻计算时间，轨迹不落后于实际时间
+            if self.write_cyclic_setpoint(setpoint((deadline_ns - executor.start_ns) / 1e9)) != 0:
+                errors[0] += 1
+                
+        executor = CyclicExecutor(cycle, on_cycle, cpu=cpu, priority=priority, name='MotorCyclic')
+        executor.run(duration=duration)
+        stats = {'cycles': executor.cycles, 'errors': errors[0], 'overruns': executor.overruns,
+                 'max_late': executor.jitter_hist.max_value or 0.0, 'executor': executor}
+                 
+        self.status = f"周期运动完成，周期数: {stats['cycles']}，超时: {stats['overruns']}，错误: {stats['errors']}"
+        return stats
+        
     def set_motion_parameters(self, velocity=10.0, accel=12.5, decel=12.5):
         """
         设置运动参数 (速度、加速度、减速度)
@@ -196,10 +613,97 @@ class MotorController:
         Nim_set_profileVelocity(self.h_master, self.node_id, velocity)
         Nim_set_profileAccel(self.h_master, self.node_id, accel)
         Nim_set_profileDecel(self.h_master, self.node_id, decel)
+        if self.move_planner is not None:
+            # 规划器下次运动时重新写入它的参数
+            self.move_planner.invalidate()
         
+        self.motion_params = (velocity, accel, decel)
         self.status = "运动参数设置成功"
         return True
         
+    def tune_motion_parameters(self, distance, apply=True, **kwargs):
+        """
+        在当前位置与当前位置+distance之间反复往返，自动整定最短运动时间的速度、加速度、减速度
+        （需已设置为轮廓位置模式并使能，行程内不能有障碍）
+        参数:
+        distance - 测试运动距离(用户单位)
+        apply - 是否用 set_motion_parameters 采用整定结果
+        其余参数传给 ProfileAutoTuner，例如 max_overshoot、max_following_error、torque_limit
+        返回: ProfileAutoTuner（best 为结果，format_report() 为报告）；主站未创建时返回 None
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法整定参数"
+            return None
+            
+        kwargs.setdefault('feedback_sdo', self._bsdo(Nim_get_currentPosition, 0))
+        tuner = ProfileAutoTuner(self.h_master, self.node_id, distance, **kwargs)
+        best = tuner.tune()
+        if tuner.aborted is None:
+            self.wait_target_reached(timeout=tuner.move_timeout, interval=0.01)
+        if best is None:
+            self.status = f"参数整定失败: {tuner.aborted or '没有满足约束的参数'}"
+        elif apply:
+            self.set_motion_parameters(best.velocity, best.accel, best.decel)
+            self.status = f"参数整定完成，运动时间 {best.move_time:.3f} s"
+        else:
+            self.status = f"参数整定完成（未采用），运动时间 {best.move_time:.3f} s"
+        return tuner
+        
+    def enable_move_planner(self, **kwargs):
+        """
+        启用时间最优运动规划：读取一次轴限制，此后 move_to_position / move_by_distance 按限制
+        设置轮廓参数（只写入变化的参数），短距离运动自动形成三角形轨迹
+        参数:
+        传给 MovePlanner，例如 max_accel、max_decel、counts_per_rev、torque_per_accel
+        返回: MovePlanner；失败返回 None
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法启用运动规划"
+            return None
+            
+        try:
+            self.move_planner = MovePlanner(self.h_master, self.node_id, **kwargs)
+        except (ServoSDKError, ValueError) as e:
+            self.move_planner = None
+            self.status = f"启用运动规划失败: {e}"
+            return None
+        self._move_planner_kwargs = kwargs
+        self.status = (f"运动规划已启用，速度 {self.move_planner.velocity:g}，加速度 {self.move_planner.accel:g}，"
+                       f"减速度 {self.move_planner.decel:g}")
+        return self.move_planner
+        
+    def disable_move_planner(self):
+        """
+        停用运动规划，恢复 set_motion_parameters 设置的参数
+        """
+        self.move_planner = None
+        self._move_planner_kwargs = {}
+        if self.motion_params is not None and self.h_master is not None:
+            self.set_motion_parameters(*self.motion_params)
+        
+    def _plan_move(self, target, relative, immediate):
+        # 规划失败时返回 False；未启用规划时返回 True
+        planner = self.move_planner
+        if planner is None:
+            return True
+        if planner.h_master != self.h_master:
+            # 主站已重建，按原参数重新创建，轴限制和已写入的参数都需要重新读取
+            try:
+                planner = self.move_planner = MovePlanner(self.h_master, self.node_id, **self._move_planner_kwargs)
+            except (ServoSDKError, ValueError) as e:
+                self.move_planner = None
+                self.status = f"主站重建后重新启用运动规划失败: {e}"
+                return False
+        [res, current] = Nim_get_currentPosition(self.h_master, self.node_id, self._bsdo(Nim_get_currentPosition, 0))
+        if res != 0:
+            self.status = "获取当前位置失败，无法规划运动"
+            return False
+        plan = planner.prepare(target, current, relative, immediate)
+        if plan is None:
+            self.status = planner.error
+            return False
+        return True
+        
     def run_velocity(self, velocity):
         """
         执行速度运动 (轮廓速度模式下)
@@ -211,19 +715,25 @@ class MotorController:
             return False
             
         # 获取当前模式
-        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, 0)
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 0))
         if res != 0 or mode != ServoWorkMode.SERVO_PV_MODE:
             self.status = f"非轮廓速度模式，当前模式: {mode}"
             return False
             
+        # 启用目标值合并时只提交最新速度，不等待总线写入
+        if self.coalescer is not None:
+            self.coalescer.submit(self.node_id, 'jog', velocity)
+            self.status = f"速度运动指令已提交，目标速度: {velocity}"
+            return True
+            
         # 根据正负值决定正转或反转
         if velocity > 0:
-            Nim_forward(self.h_master, self.node_id, velocity, 0)
+            Nim_forward(self.h_master, self.node_id, velocity, self._bsdo(Nim_forward, 0))
         elif velocity < 0:
-            Nim_backward(self.h_master, self.node_id, abs(velocity), 0)
+            Nim_backward(self.h_master, self.node_id, abs(velocity), self._bsdo(Nim_backward, 0))
         else:
             # 速度为0时停止
-            Nim_forward(self.h_master, self.node_id, 0.0, 0)
+            Nim_forward(self.h_master, self.node_id, 0.0, self._bsdo(Nim_forward, 0))
             
         self.status = f"速度运动指令已发送，目标速度: {velocity}"
         return True
@@ -240,12 +750,19 @@ class MotorController:
             return False
             
         # 获取当前模式
-        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, 0)
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 0))
         if res != 0 or mode != ServoWorkMode.SERVO_PP_MODE:
             self.status = f"非轮廓位置模式，当前模式: {mode}"
             return False
+        if not self._plan_move(position, False, immediate):
+            return False
             
-        Nim_moveAbsolute(self.h_master, self.node_id, position, 1 if immediate else 0, 0)
+        nRes = Nim_moveAbsolute(self.h_master, self.node_id, position, 1 if immediate else 0, self._bsdo(Nim_moveAbsolute, 0))
+        if nRes != 0:
+            if self.move_planner is not None:
+                self.move_planner.forget_target()
+            self.status = f"位置运动指令发送失败，错误码: {nRes}"
+            return False
         self.status = f"位置运动指令已发送，目标位置: {position}"
         return True
         
@@ -261,14 +778,54 @@ class MotorController:
             return False
             
         # 获取当前模式
-        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, 0)
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 0))
         if res != 0 or mode != ServoWorkMode.SERVO_PP_MODE:
             self.status = f"非轮廓位置模式，当前模式: {mode}"
             return False
+        if not self._plan_move(distance, True, immediate):
+            return False
             
-        Nim_moveRelative(self.h_master, self.node_id, distance, 1 if immediate else 0, 0)
+        nRes = Nim_moveRelative(self.h_master, self.node_id, distance, 1 if immediate else 0, self._bsdo(Nim_moveRelative, 0))
+        if nRes != 0:
+            if self.move_planner is not None:
+                self.move_planner.forget_target()
+            self.status = f"相对位置运动指令发送失败，错误码: {nRes}"
+            return False
         self.status = f"相对位置运动指令已发送，移动距离: {distance}"
         return True
+        
+    def move_sequence(self, positions, relative=False, timeout=None, on_progress=None):
+        """
+        连续执行一组位置点 (轮廓位置模式下使用缓冲设定点，点与点之间不等待Python轮询)
+        参数:
+        positions - 目标位置列表 (用户单位)
+        relative - True 为相对移动距离，False 为绝对位置
+        timeout - 超时时间(秒)，None 表示不限
+        on_progress - 进度回调 on_progress(已完成点数, 总点数)
+        返回: True - 全部完成; False - 失败或超时
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法执行运动"
+            return False
+            
+        # 获取当前模式
+        [res, mode] = Nim_get_workModeDisplay(self.h_master, self.node_id, self._bsdo(Nim_get_workModeDisplay, 0))
+        if res != 0 or mode != ServoWorkMode.SERVO_PP_MODE:
+            self.status = f"非轮廓位置模式，当前模式: {mode}"
+            return False
+            
+        if self.move_planner is not None:
+            # 位置点由 MoveQueue 直接发送，不经过规划
+            self.move_planner.forget_target()
+        queue = MoveQueue(self.h_master, self.node_id, self._pdo_period(), relative=relative,
+                          bSDO=self._bsdo(Nim_moveAbsolute, 0), on_progress=on_progress)
+        queue.extend(list(positions))
+        if queue.run(timeout):
+            self.status = f"位置序列完成，共 {queue.total} 点"
+            return True
+            
+        self.status = f"位置序列{queue.state}，完成 {queue.done}/{queue.total} 点: {queue.error}"
+        return False
     
     def release_brake(self):
         """
@@ -281,7 +838,7 @@ class MotorController:
             
         # 设置数字输出，假设DO1控制刹车，1为释放刹车
         # 根据实际刹车连接的DO端口和电平逻辑调整
-        Nim_set_DOs(self.h_master, self.node_id, 0x01, 1)  # 设置DO1为高电平
+        Nim_set_DOs(self.h_master, self.node_id, 0x01, self._bsdo(Nim_set_DOs, 1))  # 设置DO1为高电平
         time.sleep(0.1)  # 等待刹车释放
         
         self.status = "刹车已释放"
@@ -298,7 +855,7 @@ class MotorController:
             
         # 设置数字输出，假设DO1控制刹车，0为吸合刹车
         # 根据实际刹车连接的DO端口和电平逻辑调整
-        Nim_set_DOs(self.h_master, self.node_id, 0x00, 1)  # 设置DO1为低电平
+        Nim_set_DOs(self.h_master, self.node_id, 0x00, self._bsdo(Nim_set_DOs, 1))  # 设置DO1为低电平
         time.sleep(0.1)  # 等待刹车吸合
         
         self.status = "刹车已吸合"
@@ -312,7 +869,8 @@ class MotorController:
             self.status = "主站未创建，无法停止电机"
             return False
             
-        Nim_fastStop(self.h_master, self.node_id, 1)
+        Nim_fastStop(self.h_master, self.node_id, self._bsdo(Nim_fastStop, 1))
+        self._invalidate_setpoints()
         self.status = "电机快速停止指令已发送"
         return True
         
@@ -321,16 +879,53 @@ class MotorController:
         获取电机状态信息
         返回: [状态字, 当前位置, 当前速度]
         """
+        sample = self.get_motor_sample()
+        if sample is None:
+            return None
+        return [sample['statusWord'], sample['position'], sample['velocity']]
+        
+    def get_motor_state(self, out=None):
+        """
+        获取电机状态，适合高频轮询：函数原型只设置一次，传入同一个 out 时不创建新的结果对象
+        参数:
+        out - 用于填充的 MotorState，None 时新建
+        返回: MotorState（statusWord, position, velocity）；失败返回 None
+        """
         if self.h_master is None:
             self.status = "主站未创建，无法获取状态"
             return None
             
-        [res_sw, sw] = Nim_get_statusWord(self.h_master, self.node_id, 0)
-        [res_pos, pos] = Nim_get_currentPosition(self.h_master, self.node_id, 0)
-        [res_vel, vel] = Nim_get_currentVelocity(self.h_master, self.node_id, 0)
+        if self._typed is None or self._typed.h_master != self.h_master:
+            self._typed = TypedSDK(self.h_master, raise_errors=False)
+        state = self._typed.read_state(self.node_id, out, self._bsdo(Nim_get_currentPosition, 0))
+        if state is None:
+            self.status = "获取电机状态失败"
+        return state
+        
+    def get_motor_sample(self):
+        """
+        获取带时间戳的电机状态
+        返回: {'statusWord', 'position', 'velocity', 'timestamp_ns', 'cycle'}，timestamp_ns 为读取完成时的
+              time.monotonic_ns()，cycle 为 self.timebase 估计的SYNC周期序号（未连接时为 None）
+        """
+        if self.h_master is None:
+            self.status = "主站未创建，无法获取状态"
+            return None
+            
+        pdo = self._bsdo(Nim_get_currentPosition, 0) == 0
+        t0 = time.monotonic_ns()
+        [res_sw, sw] = Nim_get_statusWord(self.h_master, self.node_id, self._bsdo(Nim_get_statusWord, 0))
+        [res_pos, pos] = Nim_get_currentPosition(self.h_master, self.node_id, self._bsdo(Nim_get_currentPosition, 0))
+        [res_vel, vel] = Nim_get_currentVelocity(self.h_master, self.node_id, self._bsdo(Nim_get_currentVelocity, 0))
+        t1 = time.monotonic_ns()
         
         if res_sw == 0 and res_pos == 0 and res_vel == 0:
-            return [sw, pos, vel]
+            cycle = None
+            if self.timebase is not None:
+                if pdo:
+                    self.timebase.observe_value((self.node_id, 'position'), pos, t0, t1)
+                cycle = self.timebase.cycle_at(t1)
+            return {'statusWord': sw, 'position': pos, 'velocity': vel, 'timestamp_ns': t1, 'cycle': cycle}
         else:
             self.status = "获取电机状态失败"
             return None
@@ -340,7 +935,7 @@ class MotorController:
         检查是否到达目标位置
         返回: True - 已到达目标位置; False - 未到达目标位置
         """
-        [res, sw] = Nim_get_statusWord(self.h_master, self.node_id, 0)
+        [res, sw] = Nim_get_statusWord(self.h_master, self.node_id, self._bsdo(Nim_get_statusWord, 0))
         if res == 0 and (sw & 0x400) != 0:  # 检查目标到达位
             return True
         return False
@@ -366,9 +961,15 @@ class MotorController:
         """
         关闭连接并释放资源
         """
+        if self.coalescer is not None:
+            self.coalescer.stop()
+            self.coalescer = None
+            
+        self.stop_telemetry()
+        
         if self.h_master is not None:
             # 先脱机电机
-            Nim_power_off(self.h_master, self.node_id, 1)
+            Nim_power_off(self.h_master, self.node_id, self._bsdo(Nim_power_off, 1))
             time.sleep(0.05)
             
             # 进入预操作模式
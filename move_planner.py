@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轮廓位置模式(PP)时间最优运动规划
+
+set_motion_parameters 设置的速度、加速度、减速度对所有运动都一样，通常是保守的
+手工值：长距离运动达不到轴允许的速度，短距离运动的加减速度也没有用足。
+MovePlanner 在创建时读取一次轴的限制:
+
+- 最大速度 Nim_get_maxVelocity(607F，用户单位/s)；
+- 最大电机速度 Nim_get_maxMotorSpeed(6080，rpm)，给出编码器分辨率时按
+  Nim_get_unitsFactor 换算为用户单位/s；
+- 最大转矩 Nim_get_maxTorque(6072)，给出每单位加速度所需转矩时换算为加减速度上限；
+- 位置限制 Nim_get_posLimit(607D)，超出范围的目标直接拒绝。
+
+对每个运动按限制计算梯形轨迹（距离不足以加速到最大速度时为三角形轨迹）的
+峰值速度和预计运动时间。驱动器的轮廓速度始终设为速度上限，短距离运动由驱动器
+自动形成三角形轨迹，因此轮廓参数与距离无关：参数只在与上次写入的值不同时才写入
+（每个参数一次SDO），连续运动只需发送目标位置。规划结果按距离缓存，重复距离的
+运动不再计算。相对运动和缓冲（非立即）运动以最近发送的目标位置为起点，与驱动器
+计算相对目标、执行缓冲设定点的方式一致。
+
+用法:
+    planner = MovePlanner(motor.h_master, 1, counts_per_rev=10000, max_accel=500.0, max_decel=500.0)
+    plan = planner.move_absolute(25.0)      # 写入需要更新的参数并发送目标位置
+    print(plan.duration, plan.peak_velocity)
+    print(planner.format_report())
+"""
+
+import collections, math
+from NimServoSDK import *
+from typed_api import ServoSDKError, check
+
+
+class AxisLimits(object):
+    __slots__ = ('max_velocity', 'max_motor_speed', 'max_torque', 'min_position', 'max_position', 'units_factor')
+
+    def __init__(self, max_velocity, max_motor_speed, max_torque, min_position, max_position, units_factor):
+        self.max_velocity = max_velocity        # 用户单位/s
+        self.max_motor_speed = max_motor_speed  # rpm
+        self.max_torque = max_torque            # 0.001倍额定转矩
+        self.min_position = min_position        # 用户单位，min_position >= max_position 表示不限制
+        self.max_position = max_position
+        self.units_factor = units_factor        # 电机编码器单位/用户单位
+
+    @classmethod
+    def read(cls, h_master, node_id):
+        """
+        从驱动器读取轴限制，读取失败时抛出 ServoSDKError
+        """
+        max_velocity = check(Nim_get_maxVelocity(h_master, node_id), 'Nim_get_maxVelocity', node_id)
+        max_motor_speed = check(Nim_get_maxMotorSpeed(h_master, node_id), 'Nim_get_maxMotorSpeed', node_id)
+        max_torque = check(Nim_get_maxTorque(h_master, node_id), 'Nim_get_maxTorque', node_id)
+        [nRes, min_position, max_position] = Nim_get_posLimit(h_master, node_id)
+        if nRes != 0:
+            raise ServoSDKError(nRes, 'Nim_get_posLimit', node_id)
+        units_factor = check(Nim_get_unitsFactor(h_master, node_id), 'Nim_get_unitsFactor', node_id)
+        return cls(max_velocity, max_motor_speed, max_torque, min_position, max_position, units_factor)
+
+    def position_allowed(self, position):
+        if self.min_position >= self.max_position:
+            return True
+        return self.min_position <= position <= self.max_position
+
+
+class MovePlan(object):
+    __slots__ = ('distance', 'velocity', 'accel', 'decel', 'peak_velocity', 'duration', 'triangular')
+
+    def __init__(self, distance, velocity, accel, decel):
+        self.distance = distance        # 运动距离(绝对值)
+        self.velocity = velocity        # 写入驱动器的轮廓速度
+        self.accel = accel
+        self.decel = decel
+        # 距离不足以加速到轮廓速度时为三角形轨迹
+        reachable = math.sqrt(2.0 * distance * accel * decel / (accel + decel))
+        self.triangular = reachable < velocity
+        self.peak_velocity = min(velocity, reachable)
+        vp = self.peak_velocity
+        if vp <= 0:
+            self.duration = 0.0
+        else:
+            cruise = distance - vp * vp / (2.0 * accel) - vp * vp / (2.0 * decel)
+            self.duration = vp / accel + vp / decel + max(cruise, 0.0) / vp
+
+
+class MovePlanner(object):
+    def __init__(self, h_master, node_id, max_accel=None, max_decel=None, counts_per_rev=None,
+                 torque_per_accel=None, friction_torque=0.0, torque_limit=0.8, velocity_limit=1.0,
+                 resolution=1e-6, cache_size=1024, limits=None):
+        """
+        初始化运动规划（轴需已设置为轮廓位置模式并使能）
+        参数:
+        h_master - 主站句柄
+        node_id - 从站地址
+        max_accel - 加速度上限(用户单位/s^2)，None 时按转矩换算，都没有时使用驱动器当前的轮廓加速度
+        max_decel - 减速度上限(用户单位/s^2)，规则同上
+        counts_per_rev - 电机编码器每转计数，给出时用最大电机速度限制速度
+        torque_per_accel - 每 1 用户单位/s^2 加速度所需转矩(0.001倍额定转矩)，例如自动整定结果的
+                           峰值转矩/加速度
+        friction_torque - 摩擦转矩(0.001倍额定转矩)，从可用于加速的转矩中扣除
+        torque_limit - 用于加减速的转矩占最大转矩的比例
+        velocity_limit - 速度占速度上限的比例
+        resolution - 缓存键的距离分辨率(用户单位)
+        cache_size - 缓存的规划数
+        limits - 已读取的 AxisLimits，None 时从驱动器读取
+        读取轴限制或轮廓参数失败时抛出 ServoSDKError
+        """
+        self.h_master = h_master
+        self.node_id = node_id
+        self.resolution = resolution
+        self.cache_size = cache_size
+        self.error = None
+        self.last_target = None         # 最近发送的目标位置(用户单位)，None 表示未知
+        self.limits = limits if limits is not None else AxisLimits.read(h_master, node_id)
+
+        lim = self.limits
+        velocity = lim.max_velocity
+        if counts_per_rev and lim.units_factor > 0:
+            velocity = min(velocity, lim.max_motor_speed * counts_per_rev / 60.0 / lim.units_factor)
+        self.velocity = velocity * velocity_limit
+        torque_accel = None
+        if torque_per_accel:
+            torque_accel = (lim.max_torque * torque_limit - friction_torque) / torque_per_accel
+        if max_accel is None or max_decel is None:
+            profile_accel = check(Nim_get_profileAccel(h_master, node_id), 'Nim_get_profileAccel', node_id)
+            profile_decel = check(Nim_get_profileDecel(h_master, node_id), 'Nim_get_profileDecel', node_id)
+            if max_accel is None:
+                max_accel = torque_accel if torque_accel is not None else profile_accel
+            if max_decel is None:
+                max_decel = torque_accel if torque_accel is not None else profile_decel
+        if torque_accel is not None:
+            max_accel = min(max_accel, torque_accel)
+            max_decel = min(max_decel, torque_accel)
+        if self.velocity <= 0 or max_accel <= 0 or max_decel <= 0:
+            raise ValueError(f"速度/加减速度上限必须大于0: {self.velocity}, {max_accel}, {max_decel}")
+        self.accel = max_accel
+        self.decel = max_decel
+
+        self._cache = collections.OrderedDict()
+        self._sent = [None, None, None]     # 最近写入驱动器的 速度, 加速度, 减速度
+        self.moves = 0
+        self.cache_hits = 0
+        self.writes = 0
+        self.writes_skipped = 0
+
+    def plan(self, distance):
+        """
+        计算运动规划，结果按距离缓存
+        参数:
+        distance - 运动距离(用户单位)，符号不影响结果
+        返回: MovePlan
+        """
+        key = int(round(abs(distance) / self.resolution))
+        plan = self._cache.get(key)
+        if plan is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return plan
+        plan = MovePlan(key * self.resolution, self.velocity, self.accel, self.decel)
+        self._cache[key] = plan
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return plan
+
+    def invalidate(self):
+        """
+        轮廓参数被其它代码修改后调用，下次运动重新写入全部参数
+        """
+        self._sent = [None, None, None]
+
+    def forget_target(self):
+        """
+        目标位置被其它代码修改（快速停止、模式切换、未经规划的运动）后调用，
+        下次运动以实际位置为起点
+        """
+        self.last_target = None
+
+    def apply(self, plan):
+        """
+        写入与上次不同的轮廓参数
+        返回: True 成功
+        """
+        h, node = self.h_master, self.node_id
+        for i, (value, setter) in enumerate(((plan.velocity, Nim_set_profileVelocity),
+                                             (plan.accel, Nim_set_profileAccel),
+                                             (plan.decel, Nim_set_profileDecel))):
+            if self._sent[i] == value:
+                self.writes_skipped += 1
+                continue
+            nRes = setter(h, node, value)
+            if nRes != 0:
+                self._sent[i] = None
+                self.error = f"写入轮廓参数失败，错误码: {nRes}"
+                return False
+            self._sent[i] = value
+            self.writes += 1
+        return True
+
+    def prepare(self, target, current, relative=False, immediate=True):
+        """
+        检查目标位置、计算规划并写入需要更新的轮廓参数（不发送目标位置）
+        成功时把终点记为 last_target，发送目标位置失败时调用方应调用 forget_target
+        参数:
+        target - 目标位置，relative=True 时为移动距离
+        current - 当前位置(用户单位)
+        relative - 相对运动，以最近发送的目标位置为起点
+        immediate - False 为缓冲运动，在上一个目标之后执行，以最近发送的目标位置为起点
+        返回: MovePlan；目标超出位置限制或写入失败时返回 None（原因见 error）
+        """
+        start = current
+        if (relative or not immediate) and self.last_target is not None:
+            start = self.last_target
+        distance = target if relative else target - start
+        end = start + distance
+        if not self.limits.position_allowed(end):
+            self.error = f"目标位置 {end} 超出位置限制 [{self.limits.min_position}, {self.limits.max_position}]"
+            return None
+        plan = self.plan(distance)
+        if not self.apply(plan):
+            return None
+        self.last_target = end
+        self.moves += 1
+        return plan
+
+    def _current(self, bSDO):
+        [nRes, position] = Nim_get_currentPosition(self.h_master, self.node_id, bSDO)
+        if nRes != 0:
+            self.error = f"读取当前位置失败，错误码: {nRes}"
+            return None
+        return position
+
+    def move_absolute(self, position, immediate=True, bSDO=0):
+        """
+        按规划移动到绝对位置
+        返回: MovePlan；失败返回 None（原因见 error）
+        """
+        current = self._current(bSDO)
+        if current is None:
+            return None
+        plan = self.prepare(position, current, immediate=immediate)
+        if plan is None:
+            return None
+        nRes = Nim_moveAbsolute(self.h_master, self.node_id, position, 1 if immediate else 0, bSDO)
+        if nRes != 0:
+            self.forget_target()
+            self.error = f"发送目标位置失败，错误码: {nRes}"
+            return None
+        return plan
+
+    def move_relative(self, distance, immediate=True, bSDO=0):
+        """
+        按规划移动指定距离
+        返回: MovePlan；失败返回 None（原因见 error）
+        """
+        current = self._current(bSDO)
+        if current is None:
+            return None
+        plan = self.prepare(distance, current, relative=True, immediate=immediate)
+        if plan is None:
+            return None
+        nRes = Nim_moveRelative(self.h_master, self.node_id, distance, 1 if immediate else 0, bSDO)
+        if nRes != 0:
+            self.forget_target()
+            self.error = f"发送目标位置失败，错误码: {nRes}"
+            return None
+        return plan
+
+    def format_report(self):
+        lim = self.limits
+        lines = [f"轴限制: 最大速度 {lim.max_velocity:g}，最大电机速度 {lim.max_motor_speed} rpm，"
+                 f"最大转矩 {lim.max_torque}，位置限制 [{lim.min_position:g}, {lim.max_position:g}]",
+                 f"规划参数: 速度 {self.velocity:.3f}，加速度 {self.accel:.3f}，减速度 {self.decel:.3f}",
+                 f"运动: {self.moves}，缓存命中: {self.cache_hits}，参数写入: {self.writes}，"
+                 f"跳过的重复写入: {self.writes_skipped}"]
+        return '\n'.join(lines)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轮廓位置模式(PP)缓冲设定点运动队列
+
+move_to_position / move_by_distance 总是以 bChangeImmediatly=1 发送，调用方必须等到
+目标到达后才能发送下一个点，点与点之间还要加上 Python 轮询的往返时间。MoveQueue
+以 bChangeImmediatly=0 发送设定点：当前目标执行期间，驱动器接收下一个设定点并
+置位状态字的设定点确认位(bit12)，表示缓冲区已占用；当前目标到达后驱动器立即
+执行缓冲的设定点并清除 bit12。队列每个PDO周期读取一次状态字，bit12 为 0 时立即
+补充下一个点，使驱动器缓冲区始终有待执行的点，数百个点可以连续执行。
+
+用法:
+    q = MoveQueue(motor.h_master, 1, period=0.01, on_progress=lambda done, total: print(done, total))
+    q.extend([10.0, 20.0, 15.0, 30.0])
+    q.run(timeout=60.0)             # 或 q.start() / q.wait() / q.stop()
+    print(q.format_report())
+"""
+
+import collections, threading, time
+from NimServoSDK import *
+from cyclic_executor import CyclicExecutor
+
+QUEUE_IDLE = "空闲"
+QUEUE_RUNNING = "运行中"
+QUEUE_DONE = "完成"
+QUEUE_FAILED = "失败"
+QUEUE_STOPPED = "已停止"
+
+
+class MoveQueue(object):
+    def __init__(self, h_master, node_id, period=0.01, relative=False, settle_cycles=1, bSDO=0,
+                 on_progress=None):
+        """
+        初始化运动队列（轴需已设置为轮廓位置模式并使能）
+        参数:
+        h_master - 主站句柄
+        node_id - 从站地址
+        period - 状态字检查周期(秒)，应与连接时的 pdo_interval 一致
+        relative - True 为相对位置(Nim_moveRelative)，False 为绝对位置(Nim_moveAbsolute)
+        settle_cycles - 发送设定点后等待的周期数，保证读到的状态字已反映新的设定点
+        bSDO - 1 使用SDO；0 使用PDO（默认）
+        on_progress - 进度回调 on_progress(已完成点数, 总点数)，在队列线程中调用
+        """
+        self.h_master = h_master
+        self.node_id = node_id
+        self.period = period
+        self.relative = relative
+        self.settle_cycles = settle_cycles
+        self.bSDO = bSDO
+        self.on_progress = on_progress
+        self.state = QUEUE_IDLE
+        self.error = None
+        self.total = 0              # 已加入队列的点数
+        self.sent = 0               # 已发送给驱动器的点数
+        self.done = 0               # 已完成的点数
+        self.starved_cycles = 0     # 驱动器缓冲区为空且当前目标已到达、而队列中仍有点的周期数
+        self.start_time = None
+        self.end_time = None
+        self._points = collections.deque()
+        self._lock = threading.Lock()
+        self._settle = 0
+        self._finished = threading.Event()
+        self.executor = CyclicExecutor(period, self._on_cycle, name='MoveQueue')
+
+    def append(self, position):
+        with self._lock:
+            self._points.append(position)
+            self.total += 1
+
+    def extend(self, positions):
+        with self._lock:
+            self._points.extend(positions)
+            self.total += len(positions)
+
+    def pending(self):
+        """
+        返回尚未发送的点数
+        """
+        with self._lock:
+            return len(self._points)
+
+    def _send(self, position):
+        if self.relative:
+            return Nim_moveRelative(self.h_master, self.node_id, position, 0, self.bSDO)
+        return Nim_moveAbsolute(self.h_master, self.node_id, position, 0, self.bSDO)
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.end_time = time.monotonic()
+        self.executor.request_stop()
+        self._finished.set()
+
+    def _on_cycle(self, cycle, deadline_ns):
+        if self._settle > 0:
+            self._settle -= 1
+            return
+        [res, sw] = Nim_get_statusWord(self.h_master, self.node_id, self.bSDO)
+        if res != 0:
+            self._finish(QUEUE_FAILED, f"读取状态字失败，错误码: {res}")
+            return
+        if sw & ServoStatusWord.FAULT:
+            self._finish(QUEUE_FAILED, "驱动器故障")
+            return
+        buffered = (sw & ServoStatusWord.SETPOINT_ACK) != 0
+        reached = (sw & ServoStatusWord.TARGET_REACHED) != 0
+        # 驱动器中尚未完成的点：缓冲的设定点 + 正在执行的目标
+        in_flight = (1 if buffered else 0) + (0 if reached else 1)
+        done = max(self.sent - in_flight, self.done)
+        if done != self.done:
+            self.done = done
+            if self.on_progress is not None:
+                self.on_progress(done, self.total)
+        if buffered:
+            return
+        with self._lock:
+            position = self._points.popleft() if self._points else None
+        if position is None:
+            if reached and self.done >= self.sent:
+                self._finish(QUEUE_DONE)
+            return
+        if reached and self.sent > 0:
+            self.starved_cycles += 1
+        res = self._send(position)
+        if res != 0:
+            self._finish(QUEUE_FAILED, f"发送设定点失败，错误码: {res}")
+            return
+        self.sent += 1
+        self._settle = self.settle_cycles
+
+    def _prepare(self):
+        self.state = QUEUE_RUNNING
+        self.error = None
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self._finished.clear()
+
+    def run(self, timeout=None):
+        """
+        在当前线程执行队列中的所有点
+        参数:
+        timeout - 超时时间(秒)，None 表示不限
+        返回: True 全部完成；False 失败、超时或被停止
+        """
+        self._prepare()
+        self.executor.run(duration=timeout)
+        if not self._finished.is_set():
+            self._finish(QUEUE_FAILED if timeout is not None else QUEUE_STOPPED,
+                         "执行超时" if timeout is not None else None)
+        return self.state == QUEUE_DONE
+
+    def start(self):
+        """
+        在后台线程执行，全部完成之前仍可 append/extend
+        """
+        self._prepare()
+        self.executor.start()
+
+    def wait(self, timeout=None):
+        """
+        等待后台执行结束
+        返回: True 全部完成；False 失败、超时或被停止
+        """
+        if self._finished.wait(timeout):
+            self.executor.join()
+        return self.state == QUEUE_DONE
+
+    def stop(self):
+        """
+        停止补充设定点（已发送给驱动器的点仍会执行完）
+        """
+        self.executor.stop()
+        if not self._finished.is_set():
+            self._finish(QUEUE_STOPPED)
+
+    def format_report(self):
+        elapsed = ((self.end_time or time.monotonic()) - self.start_time) if self.start_time is not None else 0.0
+        lines = [f"状态: {self.state}，完成 {self.done}/{self.total} 点，耗时 {elapsed:.3f} s",
+                 f"缓冲区断供周期: {self.starved_cycles}，检查周期: {self.period * 1e3:g} ms"]
+        if self.error:
+            lines.append(f"错误: {self.error}")
+        return '\n'.join(lines)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+声明式PDO重映射
+
+读取一个轴的位置、速度、转矩和状态字需要多个对象，其中一些默认没有映射到TPDO，
+只能走SDO。本模块按对象列表生成 RPDO/TPDO 映射：校验每个PDO不超过8个条目、
+64位（一个CAN帧），在预运行(PreOP)状态下通过 Nim_set_param_value 写入
+1400h~1403h/1600h~1603h、1800h~1803h/1A00h~1A03h，再用 Nim_read_PDOConfig
+让SDK重新加载映射，之后被监控的数据全部通过PDO周期性到达。
+
+用法:
+    tpdos = pack_pdos(AXIS_SNAPSHOT)            # 自动装箱到TPDO
+    res = apply_pdo_mapping(motor.h_master, 1, tpdos=tpdos, router=motor.pdo_router)
+
+    # 或逐个PDO指定
+    apply_pdo_mapping(motor.h_master, 1,
+                      tpdos=[['statusWord', 'positionActual'], ['velocityActual', 'torqueActual']],
+                      rpdos=[['controlWord', 'targetPosition'], ['modesOfOperation', 'targetVelocity']])
+"""
+
+from NimServoSDK import *
+from pdo_router import (CIA402_OBJECTS, PDO_COUNT, RPDO_COMM_BASE, RPDO_MAP_BASE, TPDO_COMM_BASE,
+                        TPDO_MAP_BASE, encode_mapping_entry, read_pdo_mapping)
+
+# 每个PDO的限制：一个CAN帧8字节，映射参数最多8个条目
+MAX_PDO_BITS = 64
+MAX_PDO_ENTRIES = 8
+
+# COB-ID bit31: 1 表示PDO未启用
+COB_ID_INVALID = 0x80000000
+
+# 一个轴的完整快照：状态字、实际位置、实际速度、实际转矩（共96位，两个TPDO）
+AXIS_SNAPSHOT = ['statusWord', 'positionActual', 'velocityActual', 'torqueActual']
+
+
+def resolve_object(obj):
+    """
+    把对象名称或 (索引, 子索引, 位长) 转换为映射条目
+    参数:
+    obj - CIA402_OBJECTS 中的名称，或 (索引, 子索引, 位长)
+    返回: (索引, 子索引, 位长)
+    """
+    if isinstance(obj, str):
+        if obj not in CIA402_OBJECTS:
+            raise ValueError(f"未知的对象: {obj}")
+        return CIA402_OBJECTS[obj]
+    index, subIndex, bits = obj
+    if bits not in (8, 16, 32):
+        raise ValueError(f"对象 {index:04X}h.{subIndex} 的位长 {bits} 无效")
+    return index, subIndex, bits
+
+
+def validate_pdo(entries):
+    """
+    校验一个PDO的映射条目
+    参数:
+    entries - [(索引, 子索引, 位长), ...]
+    """
+    if len(entries) > MAX_PDO_ENTRIES:
+        raise ValueError(f"PDO映射条目数 {len(entries)} 超过 {MAX_PDO_ENTRIES}")
+    bits = sum(e[2] for e in entries)
+    if bits > MAX_PDO_BITS:
+        raise ValueError(f"PDO映射长度 {bits} 位超过 {MAX_PDO_BITS} 位")
+    if len(set((e[0], e[1]) for e in entries)) != len(entries):
+        raise ValueError("PDO映射中有重复的对象")
+
+
+def pack_pdos(objects, pdo_count=PDO_COUNT):
+    """
+    按首次适应把对象装入尽量少的PDO，保持对象在PDO内的声明顺序
+    参数:
+    objects - 对象名称或 (索引, 子索引, 位长) 列表
+    pdo_count - 可用的PDO数量
+    返回: PDO列表，每个PDO为 [(索引, 子索引, 位长), ...]
+    """
+    entries = [resolve_object(obj) for obj in objects]
+    if len(set((e[0], e[1]) for e in entries)) != len(entries):
+        raise ValueError("对象列表中有重复的对象")
+    pdos = []
+    for entry in entries:
+        for pdo in pdos:
+            if len(pdo) < MAX_PDO_ENTRIES and sum(e[2] for e in pdo) + entry[2] <= MAX_PDO_BITS:
+                pdo.append(entry)
+                break
+        else:
+            pdos.append([entry])
+    if len(pdos) > pdo_count:
+        raise ValueError(f"对象需要 {len(pdos)} 个PDO，超过可用的 {pdo_count} 个")
+    return pdos
+
+
+def _normalize(pdos):
+    """
+    解析并校验PDO列表，不足 PDO_COUNT 个时以空PDO补齐（未使用的PDO将被禁用）
+    """
+    if len(pdos) > PDO_COUNT:
+        raise ValueError(f"PDO数量 {len(pdos)} 超过 {PDO_COUNT}")
+    result = []
+    for pdo in pdos:
+        entries = [resolve_object(obj) for obj in pdo]
+        validate_pdo(entries)
+        result.append(entries)
+    return result + [[] for _ in range(PDO_COUNT - len(result))]
+
+
+def write_pdo(h_master, node_id, comm_index, map_index, entries):
+    """
+    写入一个PDO的映射：禁用PDO、条目数清零、写入条目、写入条目数、重新启用
+    参数:
+    comm_index - 通信参数索引，如 0x1800
+    map_index - 映射参数索引，如 0x1A00
+    entries - [(索引, 子索引, 位长), ...]，空列表表示禁用该PDO
+    返回: 0 成功；其它 失败
+    """
+    [res, cob_id] = Nim_get_param_value(h_master, node_id, param_no(comm_index, 1), 1)
+    if res != 0:
+        return res
+    steps = [
+        (param_no(comm_index, 1), cob_id | COB_ID_INVALID),
+        (param_no(map_index, 0), 0),
+    ]
+    for sub, (index, subIndex, bits) in enumerate(entries, 1):
+        steps.append((param_no(map_index, sub), encode_mapping_entry(index, subIndex, bits)))
+    if entries:
+        steps.append((param_no(map_index, 0), len(entries)))
+        steps.append((param_no(comm_index, 1), cob_id & ~COB_ID_INVALID))
+    for strParamNO, value in steps:
+        res = Nim_set_param_value(h_master, node_id, strParamNO, value, 1)
+        if res != 0:
+            return res
+    return 0
+
+
+def read_pdo_raw(h_master, node_id, comm_index, map_index):
+    """
+    读取一个PDO的原始配置，用于映射失败时恢复
+    返回: (nRes, COB-ID, [映射条目原始值, ...])
+    """
+    [res, cob_id] = Nim_get_param_value(h_master, node_id, param_no(comm_index, 1), 1)
+    if res != 0:
+        return res, None, None
+    [res, count] = Nim_get_param_value(h_master, node_id, param_no(map_index, 0), 1)
+    if res != 0:
+        return res, None, None
+    raw = []
+    for sub in range(1, count + 1):
+        [res, value] = Nim_get_param_value(h_master, node_id, param_no(map_index, sub), 1)
+        if res != 0:
+            return res, None, None
+        raw.append(value)
+    return 0, cob_id, raw
+
+
+def restore_pdo_raw(h_master, node_id, comm_index, map_index, cob_id, raw):
+    """
+    按 read_pdo_raw 的结果恢复一个PDO：禁用、写入原条目、恢复原COB-ID
+    返回: 0 成功；其它 失败（继续写入其余步骤，返回第一个错误）
+    """
+    steps = [(param_no(comm_index, 1), cob_id | COB_ID_INVALID), (param_no(map_index, 0), 0)]
+    for sub, value in enumerate(raw, 1):
+        steps.append((param_no(map_index, sub), value))
+    steps.append((param_no(map_index, 0), len(raw)))
+    steps.append((param_no(comm_index, 1), cob_id))
+    first = 0
+    for strParamNO, value in steps:
+        res = Nim_set_param_value(h_master, node_id, strParamNO, value, 1)
+        if res != 0 and first == 0:
+            first = res
+    return first
+
+
+def apply_pdo_mapping(h_master, node_id, tpdos=None, rpdos=None, router=None, back_to_op=True):
+    """
+    重新映射节点的PDO
+    参数:
+    h_master - 主站句柄
+    node_id - 从站地址
+    tpdos - TPDO列表，每个TPDO为对象名称或 (索引, 子索引, 位长) 列表；None 表示不修改TPDO
+    rpdos - RPDO列表，格式同上；None 表示不修改RPDO
+    router - PdoRouter，不为 None 时更新其映射，使对应的读写自动改走PDO
+    back_to_op - 完成后是否切换回运行(OP)状态；写入失败时同样切换回OP
+    返回: 0 成功；其它 失败（第一个错误码）。写入失败时恢复原映射和COB-ID，
+          切换到PreOP会停止总线上所有轴的PDO，因此无论成功与否都会切换回OP
+    """
+    # 先完成全部校验，避免写入一半后才发现映射无效
+    plan = []
+    if tpdos is not None:
+        plan.append((TPDO_COMM_BASE, TPDO_MAP_BASE, _normalize(tpdos)))
+    if rpdos is not None:
+        plan.append((RPDO_COMM_BASE, RPDO_MAP_BASE, _normalize(rpdos)))
+
+    # 记录原配置，写入失败时恢复
+    saved = []
+    for comm_base, map_base, pdos in plan:
+        for n in range(len(pdos)):
+            res, cob_id, raw = read_pdo_raw(h_master, node_id, comm_base + n, map_base + n)
+            if res != 0:
+                return res
+            saved.append((comm_base + n, map_base + n, cob_id, raw))
+
+    # PDO映射只能在预运行状态下修改
+    res = Nim_master_changeToPreOP(h_master)
+    if res != 0:
+        return res
+    written = []
+    try:
+        for comm_base, map_base, pdos in plan:
+            for n, entries in enumerate(pdos):
+                written.append(comm_base + n)
+                res = write_pdo(h_master, node_id, comm_base + n, map_base + n, entries)
+                if res != 0:
+                    break
+            if res != 0:
+                break
+        if res == 0:
+            res = Nim_read_PDOConfig(h_master, node_id)
+        if res != 0:
+            # 恢复已改动（包括写入一半）的PDO，重新加载原映射
+            for comm_index, map_index, cob_id, raw in saved:
+                if comm_index in written:
+                    restore_pdo_raw(h_master, node_id, comm_index, map_index, cob_id, raw)
+            Nim_read_PDOConfig(h_master, node_id)
+    finally:
+        if back_to_op:
+            op = Nim_master_changeToOP(h_master)
+            if res == 0:
+                res = op
+    if res != 0:
+        return res
+
+    if router is not None:
+        if tpdos is None:
+            res, current = read_pdo_mapping(h_master, node_id, 'tx')
+            if res != 0:
+                return res
+            plan.insert(0, (TPDO_COMM_BASE, TPDO_MAP_BASE, current))
+        if rpdos is None:
+            res, current = read_pdo_mapping(h_master, node_id, 'rx')
+            if res != 0:
+                return res
+            plan.append((RPDO_COMM_BASE, RPDO_MAP_BASE, current))
+        router.set_mapping(node_id, plan[0][2], plan[1][2])
+    return 0
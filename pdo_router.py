@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按PDO映射自动选择SDO/PDO
+
+每个封装函数都有 bSDO 参数，MotorController 以前是人工选择（使能、模式读取走SDO，
+状态走PDO），经常对已经映射到PDO的对象走了慢速的SDO。PdoRouter 读取每个节点的
+PDO映射（Nim_read_PDOConfig 之后通过SDO读取 1600h~1603h / 1A00h~1A03h），
+函数涉及的对象全部已映射时走PDO，否则退回SDO，并统计避免了多少次SDO。
+
+用法:
+    router = PdoRouter(motor.h_master)
+    router.load_mapping(1)
+    [res, sw] = router.call(Nim_get_statusWord, 1)
+    bSDO = router.route('Nim_get_workModeDisplay', 1, default=1)
+    print(router.format_stats())
+"""
+
+import threading
+from NimServoSDK import *
+
+# CiA402 常用对象: 名称 -> (索引, 子索引, 位长)
+CIA402_OBJECTS = {
+    'controlWord': (0x6040, 0, 16),
+    'statusWord': (0x6041, 0, 16),
+    'vmTargetSpeed': (0x6042, 0, 16),
+    'vmCurrentSpeed': (0x6044, 0, 16),
+    'errorCode': (0x603F, 0, 16),
+    'modesOfOperation': (0x6060, 0, 8),
+    'modesOfOperationDisplay': (0x6061, 0, 8),
+    'positionActual': (0x6064, 0, 32),
+    'velocitySensorActual': (0x6069, 0, 32),
+    'velocityActual': (0x606C, 0, 32),
+    'targetTorque': (0x6071, 0, 16),
+    'torqueActual': (0x6077, 0, 16),
+    'targetPosition': (0x607A, 0, 32),
+    'profileVelocity': (0x6081, 0, 32),
+    'ipPosition': (0x60C1, 1, 32),
+    'followingError': (0x60F4, 0, 32),
+    'digitalInputs': (0x60FD, 0, 32),
+    'digitalOutputs': (0x60FE, 1, 32),
+    'targetVelocity': (0x60FF, 0, 32),
+}
+
+# 封装函数访问的对象: 函数名 -> (方向, 对象名列表)
+# 'tx' 为驱动器发送的TPDO（读），'rx' 为驱动器接收的RPDO（写）
+FUNCTION_OBJECTS = {
+    'Nim_get_statusWord': ('tx', ['statusWord']),
+    'Nim_get_workModeDisplay': ('tx', ['modesOfOperationDisplay']),
+    'Nim_get_currentPosition': ('tx', ['positionActual']),
+    'Nim_get_currentVelocity': ('tx', ['velocitySensorActual']),
+    'Nim_get_currentVelocity2': ('tx', ['velocityActual']),
+    'Nim_get_currentMotorSpeed': ('tx', ['velocityActual']),
+    'Nim_get_currentTorque': ('tx', ['torqueActual']),
+    'Nim_get_DIs': ('tx', ['digitalInputs']),
+    'Nim_get_newestAlarm': ('tx', ['errorCode']),
+    'Nim_get_vmCurrentSpeed': ('tx', ['vmCurrentSpeed']),
+    'Nim_set_controlWord': ('rx', ['controlWord']),
+    'Nim_power_on': ('rx', ['controlWord']),
+    'Nim_power_off': ('rx', ['controlWord']),
+    'Nim_fastStop': ('rx', ['controlWord']),
+    'Nim_clearError': ('rx', ['controlWord']),
+    'Nim_goHome': ('rx', ['controlWord']),
+    'Nim_set_workMode': ('rx', ['modesOfOperation']),
+    'Nim_forward': ('rx', ['targetVelocity']),
+    'Nim_backward': ('rx', ['targetVelocity']),
+    'Nim_set_targetVelocity': ('rx', ['targetVelocity']),
+    'Nim_set_vmTargetSpeed': ('rx', ['vmTargetSpeed']),
+    'Nim_moveAbsolute': ('rx', ['targetPosition', 'controlWord']),
+    'Nim_moveRelative': ('rx', ['targetPosition', 'controlWord']),
+    'Nim_set_targetPosition': ('rx', ['targetPosition']),
+    'Nim_set_ipPosition': ('rx', ['ipPosition']),
+    'Nim_set_targetTorque': ('rx', ['targetTorque']),
+    'Nim_set_DOs': ('rx', ['digitalOutputs']),
+}
+
+# PDO 通信参数/映射参数对象基址
+RPDO_COMM_BASE = 0x1400
+RPDO_MAP_BASE = 0x1600
+TPDO_COMM_BASE = 0x1800
+TPDO_MAP_BASE = 0x1A00
+PDO_COUNT = 4
+
+
+def decode_mapping_entry(entry):
+    """
+    解码PDO映射条目
+    返回: (索引, 子索引, 位长)
+    """
+    return (entry >> 16) & 0xFFFF, (entry >> 8) & 0xFF, entry & 0xFF
+
+
+def encode_mapping_entry(index, subIndex, bits):
+    """
+    编码PDO映射条目
+    """
+    return ((index & 0xFFFF) << 16) | ((subIndex & 0xFF) << 8) | (bits & 0xFF)
+
+
+def read_pdo_mapping(h_master, node_id, direction):
+    """
+    通过SDO读取节点的PDO映射
+    参数:
+    direction - 'tx' 读取TPDO映射，'rx' 读取RPDO映射
+    返回: (nRes, [[(索引, 子索引, 位长), ...], ...])，每个元素对应一个PDO，未启用的PDO为空列表
+    """
+    comm_base, map_base = (TPDO_COMM_BASE, TPDO_MAP_BASE) if direction == 'tx' else (RPDO_COMM_BASE, RPDO_MAP_BASE)
+    pdos = []
+    for n in range(PDO_COUNT):
+        # COB-ID bit31 为1表示该PDO未启用
+        [res, cob_id] = Nim_get_param_value(h_master, node_id, param_no(comm_base + n, 1), 1)
+        if res == 0 and cob_id & 0x80000000:
+            pdos.append([])
+            continue
+        [res, count] = Nim_get_param_value(h_master, node_id, param_no(map_base + n, 0), 1)
+        if res != 0:
+            return res, pdos
+        entries = []
+        for sub in range(1, count + 1):
+            [res, entry] = Nim_get_param_value(h_master, node_id, param_no(map_base + n, sub), 1)
+            if res != 0:
+                return res, pdos
+            entries.append(decode_mapping_entry(entry))
+        pdos.append(entries)
+    return 0, pdos
+
+
+class PdoRouter(object):
+    def __init__(self, h_master):
+        """
+        初始化SDO/PDO路由
+        参数:
+        h_master - 主站句柄
+        """
+        self.h_master = h_master
+        self.mappings = {}      # node_id -> {'tx': set((索引, 子索引)), 'rx': set(...)}
+        self.pdo_calls = {}
+        self.sdo_calls = {}
+        self.sdo_avoided = 0
+        self._routes = {}       # (函数名, node_id) -> bSDO
+        self._lock = threading.Lock()
+
+    def load_mapping(self, node_id, read_config=True):
+        """
+        读取节点的PDO映射
+        参数:
+        read_config - 是否先调用 Nim_read_PDOConfig 让SDK重新加载PDO配置
+        返回: 0 成功；其它 失败（失败时该节点全部走SDO）
+        """
+        if read_config:
+            res = Nim_read_PDOConfig(self.h_master, node_id)
+            if res != 0:
+                self.clear_mapping(node_id)
+                return res
+        mapping = {}
+        for direction in ('tx', 'rx'):
+            res, pdos = read_pdo_mapping(self.h_master, node_id, direction)
+            if res != 0:
+                self.clear_mapping(node_id)
+                return res
+            mapping[direction] = pdos
+        self.set_mapping(node_id, mapping['tx'], mapping['rx'])
+        return 0
+
+    def set_mapping(self, node_id, tpdos, rpdos):
+        """
+        直接设置节点的PDO映射（例如重新映射之后，无需再次读取）
+        参数:
+        tpdos/rpdos - PDO列表，每个PDO为 [(索引, 子索引, 位长), ...]
+        """
+        with self._lock:
+            self.mappings[node_id] = {
+                'tx': set((i, s) for pdo in tpdos for (i, s, _) in pdo),
+                'rx': set((i, s) for pdo in rpdos for (i, s, _) in pdo),
+            }
+            self._routes = dict((k, v) for k, v in self._routes.items() if k[1] != node_id)
+
+    def clear_mapping(self, node_id):
+        with self._lock:
+            self.mappings.pop(node_id, None)
+            self._routes = dict((k, v) for k, v in self._routes.items() if k[1] != node_id)
+
+    def is_mapped(self, node_id, index, subIndex=0, direction='tx'):
+        mapping = self.mappings.get(node_id)
+        return mapping is not None and (index, subIndex) in mapping[direction]
+
+    def route(self, strFuncName, node_id, default=1):
+        """
+        选择 bSDO
+        参数:
+        strFuncName - 封装函数名，如 'Nim_get_statusWord'
+        default - 调用方原本使用的 bSDO，用于统计避免的SDO次数
+        返回: 0 使用PDO；1 使用SDO
+        """
+        key = (strFuncName, node_id)
+        bSDO = self._routes.get(key)
+        if bSDO is None:
+            bSDO = 1
+            spec = FUNCTION_OBJECTS.get(strFuncName)
+            if spec is not None and node_id in self.mappings:
+                direction, names = spec
+                if all(self.is_mapped(node_id, CIA402_OBJECTS[n][0], CIA402_OBJECTS[n][1], direction) for n in names):
+                    bSDO = 0
+            self._routes[key] = bSDO
+        counter = self.sdo_calls if bSDO else self.pdo_calls
+        counter[strFuncName] = counter.get(strFuncName, 0) + 1
+        if default and not bSDO:
+            self.sdo_avoided += 1
+        return bSDO
+
+    def call(self, func, node_id, *args, **kwargs):
+        """
+        以自动选择的 bSDO 调用封装函数，bSDO 作为最后一个参数传入
+        参数:
+        func - 封装函数，如 Nim_get_statusWord
+        node_id - 从站地址
+        args - hMaster、nodeId 与 bSDO 之间的其它参数
+        default - 关键字参数，调用方原本使用的 bSDO（默认1）
+        """
+        bSDO = self.route(func.__name__, node_id, kwargs.get('default', 1))
+        return func(self.h_master, node_id, *(args + (bSDO,)))
+
+    def reset_stats(self):
+        self.pdo_calls = {}
+        self.sdo_calls = {}
+        self.sdo_avoided = 0
+
+    def format_stats(self):
+        """
+        生成路由统计文本
+        """
+        lines = [f"{'函数':<28}{'PDO':>8}{'SDO':>8}"]
+        for name in sorted(set(self.pdo_calls) | set(self.sdo_calls)):
+            lines.append(f"{name:<28}{self.pdo_calls.get(name, 0):>8}{self.sdo_calls.get(name, 0):>8}")
+        lines.append(f"避免的SDO次数: {self.sdo_avoided}")
+        return '\n'.join(lines)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能统计辅助函数（百分位数、汇总、直方图）
+"""
+
+import math
+
+
+def percentile(sorted_values, q):
+    """
+    计算百分位数（线性插值）
+    参数:
+    sorted_values - 已排序的数值列表
+    q - 百分位 0~100
+    返回: 百分位数，列表为空时返回 nan
+    """
+    if not sorted_values:
+        return float('nan')
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(sorted_values) - 1)
+    frac = pos - lo
+    return sorted_values[lo] * (1.0 - frac) + sorted_values[hi] * frac
+
+
+def summarize(values):
+    """
+    汇总统计
+    返回: 字典 {count, mean, min, p50, p95, p99, max}
+    """
+    data = sorted(values)
+    if not data:
+        return {'count': 0, 'mean': float('nan'), 'min': float('nan'), 'p50': float('nan'),
+                'p95': float('nan'), 'p99': float('nan'), 'max': float('nan')}
+    return {
+        'count': len(data),
+        'mean': sum(data) / len(data),
+        'min': data[0],
+        'p50': percentile(data, 50),
+        'p95': percentile(data, 95),
+        'p99': percentile(data, 99),
+        'max': data[-1],
+    }
+
+
+class Histogram(object):
+    def __init__(self, bin_width, bin_count):
+        """
+        固定宽度直方图，超出范围的值计入最后一个桶
+        参数:
+        bin_width - 桶宽度
+        bin_count - 桶数量
+        """
+        self.bin_width = bin_width
+        self.counts = [0] * bin_count
+        self.total = 0
+        self.max_value = None
+
+    def add(self, value):
+        index = int(value / self.bin_width)
+        if index < 0:
+            index = 0
+        elif index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.total += 1
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+        self.max_value = None
+
+    def bins(self):
+        """
+        返回非空桶列表 [(桶下界, 计数)]
+        """
+        return [(i * self.bin_width, c) for i, c in enumerate(self.counts) if c]
+
+    def percentile(self, q):
+        """
+        按桶估算百分位数（返回所在桶的上界，最后一个桶返回最大值）
+        参数:
+        q - 百分位 0~100
+        """
+        if not self.total:
+            return float('nan')
+        target = self.total * q / 100.0
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target and c:
+                if i == len(self.counts) - 1:
+                    return self.max_value
+                return min((i + 1) * self.bin_width, self.max_value)
+        return self.max_value
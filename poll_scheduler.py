@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多速率轮询调度器
+
+不同数据需要不同的刷新率：状态字每周期、位置 100~1000 Hz、DI 100 Hz、
+报警和温度每秒一次。消费者向调度器登记 (节点, 数据量, 频率, SDO/PDO) 订阅，
+调度器合并重复订阅（同一数据只读一次，按最高频率），把低频读取错开到不同周期
+以平滑总线负载，并通过回调或带时间戳的共享缓存提供数据。
+
+用法:
+    sched = PollScheduler(motor.h_master, cycle=0.001)
+    sched.subscribe(1, 'statusWord', rate=1000)
+    sched.subscribe(1, 'position', rate=200, callback=on_position)
+    sched.subscribe(1, 'alarm', rate=1, sdo=True)
+    sched.start()
+    sample = sched.get(1, 'position', max_age=0.01)
+"""
+
+import threading, time
+from NimServoSDK import *
+
+# 数据量: 名称 -> 读取函数，读取函数参数均为 (hMaster, nodeId, bSDO)
+QUANTITIES = {
+    'statusWord': Nim_get_statusWord,
+    'position': Nim_get_currentPosition,
+    'velocity': Nim_get_currentVelocity,
+    'velocity2': Nim_get_currentVelocity2,
+    'motorSpeed': Nim_get_currentMotorSpeed,
+    'torque': Nim_get_currentTorque,
+    'DIs': Nim_get_DIs,
+    'workMode': Nim_get_workModeDisplay,
+    'alarm': Nim_get_newestAlarm,
+    'vmSpeed': Nim_get_vmCurrentSpeed,
+}
+
+# 负载权重：SDO 是一次完整的请求/应答，PDO 只读取主站缓存
+SDO_WEIGHT = 1.0
+PDO_WEIGHT = 0.1
+
+# 错开相位时考察的最大周期窗口
+_STAGGER_WINDOW = 1000
+
+
+def read_quantity(h_master, node_id, quantity, bSDO):
+    """
+    读取一个数据量
+    参数:
+    quantity - QUANTITIES 中的名称，或 'param:<参数编号>' 表示用 Nim_get_param_value 读取任意参数（如温度）
+    返回: [nRes, value]
+    """
+    if quantity.startswith('param:'):
+        return Nim_get_param_value(h_master, node_id, quantity[6:].encode('utf-8'), bSDO)
+    return QUANTITIES[quantity](h_master, node_id, bSDO)
+
+
+class Sample(object):
+    __slots__ = ('value', 'timestamp_ns', 'cycle', 'bus_cycle')
+
+    def __init__(self, value, timestamp_ns, cycle, bus_cycle=None):
+        self.value = value
+        self.timestamp_ns = timestamp_ns    # 读取完成时的 time.monotonic_ns()
+        self.cycle = cycle                  # 调度周期计数
+        self.bus_cycle = bus_cycle          # SyncTimebase 估计的SYNC周期序号，未设置时间基准时为 None
+
+    def age(self, now_ns=None):
+        """
+        返回数据的新鲜度(秒)
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        return (now_ns - self.timestamp_ns) / 1e9
+
+    def __repr__(self):
+        return f"Sample({self.value}, t={self.timestamp_ns}, cycle={self.cycle}, bus_cycle={self.bus_cycle})"
+
+
+class Subscription(object):
+    def __init__(self, node_id, quantity, rate, sdo, callback):
+        self.node_id = node_id
+        self.quantity = quantity
+        self.rate = rate
+        self.sdo = sdo
+        self.callback = callback
+
+
+class _PollTask(object):
+    """
+    合并后的读取任务：同一 (节点, 数据量, SDO/PDO) 只读取一次
+    """
+    def __init__(self, node_id, quantity, bSDO):
+        self.node_id = node_id
+        self.quantity = quantity
+        self.bSDO = bSDO
+        self.subscriptions = []
+        self.period = 1     # 以调度周期为单位
+        self.phase = 0
+        self.reads = 0
+        self.errors = 0
+
+    @property
+    def weight(self):
+        return SDO_WEIGHT if self.bSDO else PDO_WEIGHT
+
+
+class PollScheduler(object):
+    def __init__(self, h_master, cycle=0.001, timebase=None):
+        """
+        初始化轮询调度器
+        参数:
+        h_master - 主站句柄
+        cycle - 基本调度周期(秒)，所有订阅频率都折算为该周期的整数倍
+        timebase - SyncTimebase，设置后每个 Sample 带有SYNC周期序号，PDO读取结果同时用于估计SYNC相位
+        """
+        self.h_master = h_master
+        self.cycle = cycle
+        self.timebase = timebase
+        self.cycle_count = 0
+        self.callback_errors = 0
+        self.cache = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def subscribe(self, node_id, quantity, rate, sdo=False, callback=None):
+        """
+        登记订阅
+        参数:
+        node_id - 从站地址
+        quantity - 数据量名称（见 QUANTITIES），或 'param:<参数编号>'
+        rate - 期望频率(Hz)，高于调度频率时按每周期读取
+        sdo - True 使用SDO读取；False 使用PDO
+        callback - 回调函数 callback(node_id, quantity, Sample)，在调度线程中调用
+        返回: Subscription 对象，用于取消订阅
+        """
+        if not quantity.startswith('param:') and quantity not in QUANTITIES:
+            raise ValueError(f"未知的数据量: {quantity}")
+        if rate <= 0:
+            raise ValueError("订阅频率必须大于0")
+        sub = Subscription(node_id, quantity, rate, bool(sdo), callback)
+        key = (node_id, quantity, 1 if sdo else 0)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = _PollTask(node_id, quantity, key[2])
+                self._tasks[key] = task
+            task.subscriptions.append(sub)
+            self._reschedule(task)
+        return sub
+
+    def unsubscribe(self, sub):
+        key = (sub.node_id, sub.quantity, 1 if sub.sdo else 0)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None or sub not in task.subscriptions:
+                return
+            task.subscriptions.remove(sub)
+            if task.subscriptions:
+                self._reschedule(task)
+            else:
+                del self._tasks[key]
+
+    def _reschedule(self, task):
+        """
+        按最高订阅频率确定任务周期，并选择负载最低的相位
+        """
+        rate = max(s.rate for s in task.subscriptions)
+        period = max(1, int(round(1.0 / (rate * self.cycle))))
+        if period == task.period and task.reads:
+            return
+        task.period = period
+        if period == 1:
+            task.phase = 0
+            return
+        others = [t for t in self._tasks.values() if t is not task]
+        window = min(_STAGGER_WINDOW, max([period] + [t.period for t in others]))
+        best_phase, best_load = 0, None
+        for phase in range(period):
+            load = 0.0
+            for cycle in range(phase, max(window, period), period):
+                load = max(load, sum(t.weight for t in others if cycle % t.period == t.phase))
+            if best_load is None or load < best_load:
+                best_phase, best_load = phase, load
+        task.phase = best_phase
+
+    def tasks(self):
+        """
+        返回合并后的读取任务列表 [(节点, 数据量, bSDO, 周期, 相位, 订阅数)]
+        """
+        with self._lock:
+            return [(t.node_id, t.quantity, t.bSDO, t.period, t.phase, len(t.subscriptions))
+                    for t in self._tasks.values()]
+
+    def cycle_load(self, cycle):
+        """
+        返回某个周期的加权读取负载
+        """
+        with self._lock:
+            return sum(t.weight for t in self._tasks.values() if cycle % t.period == t.phase)
+
+    def get(self, node_id, quantity, max_age=None):
+        """
+        从共享缓存读取最新数据
+        参数:
+        max_age - 最大允许的数据年龄(秒)，超过时返回 None
+        返回: Sample 或 None
+        """
+        sample = self.cache.get((node_id, quantity))
+        if sample is None:
+            return None
+        if max_age is not None and sample.age() > max_age:
+            return None
+        return sample
+
+    def poll(self):
+        """
+        执行一个调度周期，读取本周期到期的任务
+        返回: 本周期读取的任务数
+        """
+        cycle = self.cycle_count
+        self.cycle_count += 1
+        with self._lock:
+            due = [t for t in self._tasks.values() if cycle % t.period == t.phase]
+        timebase = self.timebase
+        for task in due:
+            t0 = time.monotonic_ns()
+            [res, value] = read_quantity(self.h_master, task.node_id, task.quantity, task.bSDO)[:2]
+            t1 = time.monotonic_ns()
+            task.reads += 1
+            if res != 0:
+                task.errors += 1
+                continue
+            bus_cycle = None
+            if timebase is not None:
+                if not task.bSDO:
+                    timebase.observe_value((task.node_id, task.quantity), value, t0, t1)
+                bus_cycle = timebase.cycle_at(t1)
+            sample = Sample(value, t1, cycle, bus_cycle)
+            self.cache[(task.node_id, task.quantity)] = sample
+            for sub in task.subscriptions:
+                if sub.callback is not None:
+                    try:
+                        sub.callback(task.node_id, task.quantity, sample)
+                    except Exception:
+                        self.callback_errors += 1
+        return len(due)
+
+    def start(self):
+        """
+        启动调度线程
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='PollScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        period_ns = int(self.cycle * 1e9)
+        deadline = time.monotonic_ns()
+        while not self._stop_event.is_set():
+            self.poll()
+            deadline += period_ns
+            wait = deadline - time.monotonic_ns()
+            if wait > 0:
+                self._stop_event.wait(wait / 1e9)
+            else:
+                deadline = time.monotonic_ns()
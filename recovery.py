@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+主站/从站掉线自动恢复
+
+CAN适配器断开或主站停止后，MotorController 没有恢复手段，只能重启整个进程并
+重新执行 initialize_motor，耗时数十秒。BusSupervisor 周期性调用 Nim_is_online，
+并通过SDK调用钩子监视 MasterNotRunning / SlaveNotOnline 错误码，发现掉线后
+重新启动主站（必要时重新创建主站），由 MotorController.restore_state 重新写入
+缓存的初始化参数、PDO映射、工作模式和运动参数并恢复使能，记录每次恢复的耗时。
+重新创建主站后，控制器持有的组件和用 motor.attach() 登记的组件由
+MotorController.set_master 切换到新句柄。
+
+用法:
+    sup = BusSupervisor(motor, check_interval=0.1, on_event=print)
+    sup.start()
+    ...
+    sup.stop()
+    print(sup.format_report())
+"""
+
+import threading, time
+from NimServoSDK import *
+from perf_stats import summarize
+
+# 触发恢复检查的错误码
+LOSS_ERRORS = frozenset([ServoSDK_Error.ServoSDK_MasterNotRunning, ServoSDK_Error.ServoSDK_SlaveNotOnline])
+
+CAUSE_MASTER = "主站停止"
+CAUSE_SLAVE = "从站掉线"
+
+
+class RecoveryRecord(object):
+    def __init__(self, cause, detected_at):
+        self.cause = cause
+        self.detected_at = detected_at      # 发现掉线的 time.monotonic()
+        self.attempts = 0
+        self.success = False
+        self.error = None
+        self.master_restart_time = None     # 主站重新启动耗时(秒)
+        self.restore_time = None            # 恢复状态耗时(秒)
+        self.recovery_time = None           # 发现掉线到恢复完成(秒)
+
+    def __repr__(self):
+        state = f"{self.recovery_time:.3f} s" if self.success else f"失败: {self.error}"
+        return f"RecoveryRecord({self.cause}, 尝试{self.attempts}次, {state})"
+
+
+class BusSupervisor(object):
+    def __init__(self, motor, check_interval=0.1, retry_interval=0.5, max_attempts=None, on_event=None):
+        """
+        初始化掉线恢复监督器
+        参数:
+        motor - MotorController，需已完成连接和初始化（缓存了连接字符串和初始化参数）
+        check_interval - Nim_is_online 检查周期(秒)
+        retry_interval - 恢复失败后的重试间隔(秒)
+        max_attempts - 单次掉线的最大恢复尝试次数，None 表示一直重试直到 stop()
+        on_event - 事件回调 on_event(事件文本, RecoveryRecord)，在监督线程中调用
+        """
+        self.motor = motor
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.on_event = on_event
+        self.records = []
+        self.recovering = False
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _nodes(self):
+        return self.motor.slaves or [self.motor.node_id]
+
+    def _hook(self, strFuncName, args, nRes, t0_ns, t1_ns):
+        # 恢复过程中自身的调用不触发检查
+        if nRes in LOSS_ERRORS and threading.current_thread() is not self._thread:
+            self._wake.set()
+
+    def _emit(self, text, record):
+        if self.on_event is not None:
+            try:
+                self.on_event(text, record)
+            except Exception:
+                pass
+
+    def check(self):
+        """
+        检查主站和从站
+        返回: None 正常；CAUSE_MASTER 或 CAUSE_SLAVE 掉线原因
+        """
+        h = self.motor.h_master
+        if h is None:
+            return CAUSE_MASTER
+        offline = [node for node in self._nodes() if 1 != Nim_is_online(h, node)]
+        if not offline:
+            return None
+        # 主站停止时所有从站都不在线，用一次只读主站的SDO访问区分
+        [res, _] = Nim_get_statusWord(h, offline[0], 1)
+        if res in (ServoSDK_Error.ServoSDK_MasterNotRunning, ServoSDK_Error.ServoSDK_MasterNotExist):
+            return CAUSE_MASTER
+        return CAUSE_SLAVE
+
+    def _restart_master(self):
+        """
+        重新启动主站，主站句柄失效时重新创建
+        返回: 0 成功；其它 失败
+        """
+        motor = self.motor
+        if motor.h_master is not None:
+            Nim_master_stop(motor.h_master)
+            res = Nim_master_run(motor.h_master, motor.conn_str)
+            if res != ServoSDK_Error.ServoSDK_MasterNotExist:
+                return self._restarted(res)
+            Nim_destroy_master(motor.h_master)
+        [res, h_master] = Nim_create_master(motor.comm_type)
+        if res != 0:
+            motor.h_master = None
+            return res
+        # 控制器持有的组件（PDO路由、目标值合并器、遥测记录器、登记的外部组件）一并切换到新句柄
+        motor.set_master(h_master)
+        return self._restarted(Nim_master_run(h_master, motor.conn_str))
+
+    def _restarted(self, res):
+        if res == 0 and self.motor.timebase is not None:
+            # 主站重新启动后SYNC从新的相位开始
+            self.motor.timebase.restart()
+        return res
+
+    def recover(self, cause):
+        """
+        执行一次恢复（阻塞直到成功、达到最大尝试次数或 stop()）
+        返回: RecoveryRecord
+        """
+        record = RecoveryRecord(cause, time.monotonic())
+        self.records.append(record)
+        self.recovering = True
+        self._emit(f"检测到{cause}，开始恢复", record)
+        try:
+            while not self._stop_event.is_set():
+                record.attempts += 1
+                t0 = time.monotonic()
+                if cause == CAUSE_MASTER or record.attempts > 1:
+                    res = self._restart_master()
+                    record.master_restart_time = time.monotonic() - t0
+                    if res != 0:
+                        record.error = f"主站启动失败，错误码: {res}"
+                        if not self._retry(record):
+                            break
+                        continue
+                t1 = time.monotonic()
+                if self.motor.restore_state():
+                    record.restore_time = time.monotonic() - t1
+                    record.recovery_time = time.monotonic() - record.detected_at
+                    record.success = True
+                    record.error = None
+                    self._emit(f"恢复成功，耗时 {record.recovery_time:.3f} s", record)
+                    break
+                record.error = self.motor.status
+                if not self._retry(record):
+                    break
+        finally:
+            self.recovering = False
+        return record
+
+    def _retry(self, record):
+        if self.max_attempts is not None and record.attempts >= self.max_attempts:
+            self._emit(f"恢复失败: {record.error}", record)
+            return False
+        self._stop_event.wait(self.retry_interval)
+        return not self._stop_event.is_set()
+
+    def start(self):
+        """
+        启动监督线程
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._wake.clear()
+        add_call_hook(self._hook)
+        self._thread = threading.Thread(target=self._run, name='BusSupervisor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        remove_call_hook(self._hook)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            cause = self.check()
+            if cause is not None:
+                self.recover(cause)
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    def metrics(self):
+        """
+        返回恢复统计 {'losses', 'recovered', 'failed', 'recovery_time': summarize(...)}
+        """
+        done = [r.recovery_time for r in self.records if r.success]
+        return {'losses': len(self.records), 'recovered': len(done),
+                'failed': len([r for r in self.records if not r.success and not self.recovering]),
+                'recovery_time': summarize(done)}
+
+    def format_report(self):
+        m = self.metrics()
+        t = m['recovery_time']
+        lines = [f"掉线 {m['losses']} 次，恢复 {m['recovered']} 次，失败 {m['failed']} 次"]
+        if t['count']:
+            lines.append(f"恢复耗时(s): 平均 {t['mean']:.3f}，p95 {t['p95']:.3f}，最大 {t['max']:.3f}")
+        for r in self.records:
+            lines.append(f"  {r!r}")
+        return '\n'.join(lines)
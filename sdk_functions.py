@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+NimServoSDK 函数分类
+
+审计日志、会话回放、总线负载统计、在线状态跟踪和控制服务都需要按函数名判断
+一次SDK调用的性质：是否为主站级函数、第一个参数是否为主站句柄、是否只访问
+主站本地状态、是否带 bSDO 参数。分类表统一在这里维护。
+
+用法:
+    from sdk_functions import MASTER_FUNCS, LOCAL_FUNCS, sdo_arg_functions
+
+    if name not in MASTER_FUNCS and name in sdo_arg_functions():
+        bSDO = call_arg_value(args[-1])
+"""
+
+import inspect
+import NimServoSDK
+
+# 不带节点参数的主站级函数
+MASTER_FUNCS = frozenset([
+    'Nim_init', 'Nim_clean', 'Nim_setLogFlags', 'Nim_getLogFlags',
+    'Nim_create_master', 'Nim_destroy_master', 'Nim_master_run', 'Nim_master_stop',
+    'Nim_master_changeToPreOP', 'Nim_master_changeToOP', 'Nim_scan_nodes',
+])
+
+# 第一个参数不是主站句柄的函数
+NO_HANDLE_FUNCS = frozenset(['Nim_init', 'Nim_clean', 'Nim_setLogFlags', 'Nim_getLogFlags', 'Nim_create_master'])
+
+# 只访问主站本地状态、不产生SDO报文的从站函数
+LOCAL_FUNCS = frozenset(['Nim_is_online', 'Nim_read_PDOConfig', 'Nim_load_params'])
+
+
+def sdk_function_names():
+    """
+    返回 NimServoSDK 中全部 Nim_* 函数名（按源码顺序）
+    """
+    funcs = [(getattr(NimServoSDK, name).__code__.co_firstlineno, name)
+             for name in dir(NimServoSDK)
+             if name.startswith('Nim_') and callable(getattr(NimServoSDK, name))]
+    return [name for _, name in sorted(funcs)]
+
+
+def sdo_arg_functions():
+    """
+    返回带 bSDO 参数的封装函数名集合（底层调用的最后一个参数为 bSDO）
+    """
+    names = set()
+    for name in dir(NimServoSDK):
+        func = getattr(NimServoSDK, name)
+        if name.startswith('Nim_') and callable(func):
+            try:
+                params = list(inspect.signature(func).parameters)
+            except (TypeError, ValueError):
+                continue
+            if params and params[-1] == 'bSDO':
+                names.add(name)
+    return names
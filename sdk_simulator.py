@@ -0,0 +1,994 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+NimServoSDK 本地模拟器
+
+在没有驱动器和CAN适配器的情况下代替 libNimServoSDK.so / NimServoSDK.dll，
+实现全部 Nim_* 底层函数，按调用时刻推进一个简化的 CiA402 伺服轴模型
+（PP/PV/HM/CSP/CSV/CST 等模式、状态字、报警、DI/DO、参数），
+并可配置SDO/PDO调用延时、运动指令生效延时和故障注入，用于回放、测试和性能测量。
+
+用法:
+    from sdk_simulator import install_simulator
+    sim = install_simulator(nodes=[1, 2])
+    motor = MotorController(comm_type=0, node_id=1)   # Nim_init 直接使用模拟器
+"""
+
+import collections, json, math, threading, time
+import NimServoSDK
+from NimServoSDK import ServoSDK_Error, ServoStatusWord, ServoWorkMode
+
+# 状态字位
+SW_READY_TO_SWITCH_ON = ServoStatusWord.READY_TO_SWITCH_ON
+SW_SWITCHED_ON = ServoStatusWord.SWITCHED_ON
+SW_OPERATION_ENABLED = ServoStatusWord.OPERATION_ENABLED
+SW_FAULT = ServoStatusWord.FAULT
+SW_VOLTAGE_ENABLED = ServoStatusWord.VOLTAGE_ENABLED
+SW_QUICK_STOP = ServoStatusWord.QUICK_STOP
+SW_SWITCH_ON_DISABLED = ServoStatusWord.SWITCH_ON_DISABLED
+SW_REMOTE = ServoStatusWord.REMOTE
+SW_TARGET_REACHED = ServoStatusWord.TARGET_REACHED
+SW_BIT12 = 0x1000           # PP: 设定点确认；HM: 原点回归完成
+SW_BIT13 = 0x2000           # PP/CSP: 跟随误差；HM: 原点回归错误
+
+MASTER_INIT = 0
+MASTER_PREOP = 1
+MASTER_OP = 2
+
+# 各通信方式连接字符串的必需字段（见使用说明书 5.2）
+CONN_STR_KEYS = {
+    0: ('DevType', 'Baudrate', 'PDOIntervalMS'),             # CANopen
+    1: ('NetworkAdapter', 'PDOIntervalMS'),                  # EtherCAT
+    2: ('SerialPort', 'Baudrate', 'PDOIntervalMS'),          # Modbus
+}
+
+# 模拟积分步长(秒)
+SIM_STEP = 0.0005
+
+# 默认PDO映射: [(通信参数索引, 映射参数索引, [(索引, 子索引, 位长), ...]), ...]
+# TPDO1: 状态字+实际位置，TPDO2: 模式显示+实际速度；RPDO1: 控制字+目标位置，RPDO2: 模式+目标速度
+DEFAULT_PDO_MAPPING = [
+    (0x1800, 0x1A00, [(0x6041, 0, 16), (0x6064, 0, 32)]),
+    (0x1801, 0x1A01, [(0x6061, 0, 8), (0x606C, 0, 32)]),
+    (0x1802, 0x1A02, []),
+    (0x1803, 0x1A03, []),
+    (0x1400, 0x1600, [(0x6040, 0, 16), (0x607A, 0, 32)]),
+    (0x1401, 0x1601, [(0x6060, 0, 8), (0x60FF, 0, 32)]),
+    (0x1402, 0x1602, []),
+    (0x1403, 0x1603, []),
+]
+
+
+def _default_pdo_params(node_id):
+    """
+    生成默认PDO映射对应的参数，未使用的PDO COB-ID 置 bit31（未启用）
+    """
+    params = {}
+    for comm, mapping, entries in DEFAULT_PDO_MAPPING:
+        # 预定义连接集: TPDOn 0x180+(n-1)*0x100+节点，RPDOn 0x200+(n-1)*0x100+节点
+        base = 0x180 if comm >= 0x1800 else 0x200
+        cob_id = base + (comm & 0xFF) * 0x100 + node_id
+        if not entries:
+            cob_id |= 0x80000000
+        params[NimServoSDK.param_no(comm, 1)] = cob_id
+        params[NimServoSDK.param_no(mapping, 0)] = len(entries)
+        for sub, (index, subIndex, bits) in enumerate(entries, 1):
+            params[NimServoSDK.param_no(mapping, sub)] = (index << 16) | (subIndex << 8) | bits
+    return params
+
+
+class _SimFunction(object):
+    """
+    可设置 restype/argtypes 的可调用对象，与 ctypes 函数指针的用法一致
+    """
+    __slots__ = ('_impl', 'restype', 'argtypes')
+
+    def __init__(self, impl):
+        self._impl = impl
+        self.restype = None
+        self.argtypes = None
+
+    def __call__(self, *args):
+        return self._impl(*args)
+
+
+def _out(ref, value):
+    """
+    写输出参数(ctypes.byref)
+    """
+    ref._obj.value = value
+
+
+class SimulatedAxis(object):
+    def __init__(self, node_id):
+        """
+        模拟伺服轴
+        参数:
+        node_id - 从站地址
+        """
+        self.node_id = node_id
+        self.online = True
+        self.enabled = False
+        self.fault = False
+        self.quick_stopped = False
+        self.mode = 0
+        # 运动状态（用户单位）
+        self.position = 0.0
+        self.velocity = 0.0
+        self.torque = 0
+        self.target_position = 0.0
+        self.target_velocity = 0.0
+        self.target_torque = 0
+        self.moving = False
+        self.buffered_position = None
+        self.target_reached = True
+        self.pending = collections.deque()      # 尚未生效的运动指令 (生效时刻, 函数)
+        self.latched = {}                       # PDO周期锁存的反馈值 读取函数 -> (周期序号, 数值)
+        # 原点回归
+        self.home_type = 1
+        self.home_offset = 0.0
+        self.home_velocity1 = 10.0
+        self.home_velocity2 = 1.0
+        self.home_accel = 100.0
+        self.homing_remaining = None
+        self.homing_attained = False
+        self.homing_time = None
+        # 轮廓参数
+        self.profile_velocity = 10.0
+        self.profile_accel = 12.5
+        self.profile_decel = 12.5
+        self.quick_stop_decel = 100.0
+        self.units_factor = 10000.0
+        self.counts_per_rev = 10000
+        self.min_position = -1.0e9
+        self.max_position = 1.0e9
+        self.max_velocity = 100.0
+        self.max_motor_speed = 3000
+        self.max_torque = 3000
+        # VM / PT / IP 参数
+        self.vm_target_speed = 0
+        self.vm_accel = (1000, 1)
+        self.vm_decel = (1000, 1)
+        self.vm_speed_limit = (0, 3000)
+        self.pt_speed_limit = (3000, 3000)
+        self.pt_torque_ramp = 1000
+        self.ip_period = 1
+        # 负载模型：转矩(0.001倍额定) = inertia * 加速度 + friction * sign(速度)
+        self.inertia = 10.0
+        self.friction = 20.0
+        # 位置环：servo_bandwidth(Hz) 为 None 时实际位置与指令位置完全一致；
+        # 设置后 PP/CSP/IP 模式下实际位置以二阶系统跟随指令，加速度受 max_torque 限制
+        self.servo_bandwidth = None
+        self.servo_damping = 0.7
+        self.position_window = 1e-3             # 目标到达窗口(用户单位)
+        self.following_error_window = 1.0       # 超出时置位状态字 bit13(用户单位)
+        self.following_error = 0.0
+        self.demand = None                      # 轨迹发生器的 (指令位置, 指令速度)
+        # IO、报警、参数
+        self.DIs = 0
+        self.DOs = 0
+        self.VDIs = 0
+        self.alarms = []
+        self.params = _default_pdo_params(node_id)
+        self.saved_params = None
+
+    def status_word(self):
+        if self.fault:
+            sw = SW_FAULT | SW_VOLTAGE_ENABLED | SW_REMOTE
+        elif self.enabled:
+            sw = SW_READY_TO_SWITCH_ON | SW_SWITCHED_ON | SW_OPERATION_ENABLED | SW_VOLTAGE_ENABLED | SW_REMOTE
+            if not self.quick_stopped:
+                sw |= SW_QUICK_STOP
+        else:
+            sw = SW_SWITCH_ON_DISABLED | SW_VOLTAGE_ENABLED | SW_QUICK_STOP | SW_REMOTE
+        if self.target_reached:
+            sw |= SW_TARGET_REACHED
+        if self.mode == ServoWorkMode.SERVO_PP_MODE and self.buffered_position is not None:
+            sw |= SW_BIT12
+        if self.mode == ServoWorkMode.SERVO_HM_MODE and self.homing_attained:
+            sw |= SW_BIT12
+        if self.demand is not None and abs(self.following_error) > self.following_error_window:
+            sw |= SW_BIT13
+        return sw
+
+    def start_move(self, position, immediate):
+        if self.moving and not immediate:
+            self.buffered_position = position
+            return
+        self.target_position = position
+        self.moving = True
+        self.target_reached = False
+
+    def start_homing(self):
+        self.homing_attained = False
+        self.target_reached = False
+        if self.homing_time is not None:
+            self.homing_remaining = self.homing_time
+        else:
+            # 以回零高速走回当前位置到零点的距离，再以低速找零点
+            v1 = max(abs(self.home_velocity1), 1e-6)
+            self.homing_remaining = abs(self.position) / v1 + 0.1
+
+    def advance(self, dt):
+        """
+        推进模型 dt 秒
+        """
+        if not self.enabled or self.fault:
+            self.velocity = 0.0
+            self.torque = 0
+            self.demand = None
+            return
+        tracking = self.servo_bandwidth is not None and not self.quick_stopped and self.mode in (
+            ServoWorkMode.SERVO_PP_MODE, ServoWorkMode.SERVO_CSP_MODE, ServoWorkMode.SERVO_IP_MODE)
+        if tracking:
+            # 轨迹发生器推进指令位置，实际位置随后由 _track 计算
+            actual = (self.position, self.velocity)
+            if self.demand is not None:
+                self.position, self.velocity = self.demand
+        else:
+            self.demand = None
+        v0 = self.velocity
+        if self.quick_stopped:
+            self._ramp_velocity(0.0, self.quick_stop_decel, self.quick_stop_decel, dt)
+        elif self.mode == ServoWorkMode.SERVO_PP_MODE:
+            self._advance_pp(dt)
+        elif self.mode == ServoWorkMode.SERVO_PV_MODE:
+            self._ramp_velocity(self.target_velocity, self.profile_accel, self.profile_decel, dt)
+            self.target_reached = abs(self.velocity - self.target_velocity) < 1e-9
+        elif self.mode == ServoWorkMode.SERVO_HM_MODE:
+            self._advance_homing(dt)
+        elif self.mode in (ServoWorkMode.SERVO_CSP_MODE, ServoWorkMode.SERVO_IP_MODE):
+            self.velocity = (self.target_position - self.position) / dt
+            self.position = self.target_position
+        elif self.mode == ServoWorkMode.SERVO_CSV_MODE:
+            self.velocity = self.target_velocity
+        elif self.mode in (ServoWorkMode.SERVO_CST_MODE, ServoWorkMode.SERVO_PT_MODE):
+            friction = math.copysign(self.friction, self.velocity) if self.velocity else 0.0
+            self.velocity += (self.target_torque - friction) / self.inertia * dt
+        elif self.mode == ServoWorkMode.SERVO_VM_MODE:
+            rpm_to_unit = self.counts_per_rev / 60.0 / self.units_factor
+            self._ramp_velocity(self.vm_target_speed * rpm_to_unit, 1e9, 1e9, dt)
+        if tracking:
+            self._track(actual, dt)
+            return
+        if self.quick_stopped or self.mode not in (ServoWorkMode.SERVO_PP_MODE, ServoWorkMode.SERVO_CSP_MODE,
+                                                   ServoWorkMode.SERVO_IP_MODE, ServoWorkMode.SERVO_HM_MODE):
+            self.position += (v0 + self.velocity) * 0.5 * dt
+        if self.mode not in (ServoWorkMode.SERVO_CST_MODE, ServoWorkMode.SERVO_PT_MODE):
+            accel = (self.velocity - v0) / dt
+            torque = self.inertia * accel + (math.copysign(self.friction, self.velocity) if self.velocity else 0.0)
+            self.torque = int(max(-self.max_torque, min(self.max_torque, torque)))
+        else:
+            self.torque = int(max(-self.max_torque, min(self.max_torque, self.target_torque)))
+
+    def _track(self, actual, dt):
+        """
+        位置环：实际位置跟随指令位置，转矩饱和时加速度受限
+        """
+        pd, vd = self.position, self.velocity
+        self.demand = (pd, vd)
+        pa, va = actual
+        wn = 2.0 * math.pi * self.servo_bandwidth
+        accel = wn * wn * (pd - pa) + 2.0 * self.servo_damping * wn * (vd - va)
+        friction = math.copysign(self.friction, va) if va else 0.0
+        torque = max(-self.max_torque, min(self.max_torque, self.inertia * accel + friction))
+        va += (torque - friction) / self.inertia * dt
+        pa += va * dt
+        self.position, self.velocity = pa, va
+        self.torque = int(torque)
+        self.following_error = pd - pa
+        if self.mode == ServoWorkMode.SERVO_PP_MODE and not self.moving:
+            # 指令到达后还要等实际位置进入到达窗口
+            self.target_reached = abs(self.target_position - pa) <= self.position_window
+
+    def _ramp_velocity(self, target, accel, decel, dt):
+        dv = target - self.velocity
+        # 远离零速为加速，接近零速为减速
+        rate = accel if abs(target) > abs(self.velocity) else decel
+        step = rate * dt
+        if abs(dv) <= step:
+            self.velocity = target
+        else:
+            self.velocity += math.copysign(step, dv)
+
+    def _advance_pp(self, dt):
+        if not self.moving:
+            self.velocity = 0.0
+            return
+        remaining = self.target_position - self.position
+        direction = 1.0 if remaining >= 0 else -1.0
+        # v 为朝向目标方向的速度分量
+        v = self.velocity * direction
+        decel = max(self.profile_decel, 1e-9)
+        accel = max(self.profile_accel, 1e-9)
+        vmax = min(abs(self.profile_velocity), self.max_velocity)
+        if v < 0:
+            v = min(v + decel * dt, 0.0)
+        elif abs(remaining) <= v * v / (2.0 * decel):
+            v = max(v - decel * dt, 0.0)
+        else:
+            v = min(v + accel * dt, vmax)
+        if v >= 0 and abs(remaining) <= v * dt + 1e-12:
+            self.position = self.target_position
+            self.velocity = 0.0
+            if self.buffered_position is not None:
+                # 缓冲的设定点在当前目标到达后立即开始
+                self.target_position, self.buffered_position = self.buffered_position, None
+                return
+            self.moving = False
+            self.target_reached = True
+            return
+        self.velocity = v * direction
+        self.position += self.velocity * dt
+
+    def _advance_homing(self, dt):
+        if self.homing_remaining is None:
+            self.velocity = 0.0
+            return
+        self.homing_remaining -= dt
+        if self.homing_remaining <= 0:
+            self.homing_remaining = None
+            self.position = self.home_offset
+            self.velocity = 0.0
+            self.homing_attained = True
+            self.target_reached = True
+        else:
+            self.velocity = -math.copysign(abs(self.home_velocity1), self.position - self.home_offset)
+
+
+class SimulatedMaster(object):
+    def __init__(self, handle, comm_type):
+        self.handle = handle
+        self.comm_type = comm_type
+        self.running = False
+        self.state = MASTER_INIT
+        self.conn_str = None
+        self.conn = {}
+        self.scanned = set()
+        self.started = None
+
+
+class SimulatedServoSDK(object):
+    def __init__(self, nodes=(1,), sdo_latency=0.0, pdo_latency=0.0, reaction_delay=0.0, cycle_aligned=False,
+                 bus_drift_ppm=0.0, servo_bandwidth=None):
+        """
+        初始化模拟SDK
+        参数:
+        nodes - 在线的从站地址列表
+        sdo_latency - 每次SDO访问的模拟延时(秒)
+        pdo_latency - 每次PDO访问的模拟延时(秒)
+        reaction_delay - 运动指令（目标位置/速度/转矩、正反转、位置运动）从调用返回到驱动器开始执行的延时(秒)
+        cycle_aligned - True 时按PDO周期(PDOIntervalMS)模拟PDO通信：PDO写入的运动指令在下一个周期边界才发出，
+                        再加上 reaction_delay；PDO读取返回本周期开始时锁存的反馈值
+        bus_drift_ppm - 总线时钟相对主机时钟的偏差(ppm)，实际PDO周期为 PDOIntervalMS * (1 + bus_drift_ppm / 1e6)
+        servo_bandwidth - 各轴位置环带宽(Hz)，None 表示实际位置与指令位置一致（见 SimulatedAxis.servo_bandwidth）
+        """
+        self.sdo_latency = sdo_latency
+        self.pdo_latency = pdo_latency
+        self.reaction_delay = reaction_delay
+        self.cycle_aligned = cycle_aligned
+        self.bus_drift_ppm = bus_drift_ppm
+        self.axes = dict((node, SimulatedAxis(node)) for node in nodes)
+        self.servo_bandwidth = servo_bandwidth
+        for axis in self.axes.values():
+            axis.servo_bandwidth = servo_bandwidth
+        self.masters = {}
+        self.log_flags = 0
+        self.initialized = False
+        self.call_count = 0
+        self._next_handle = 1
+        self._lock = threading.RLock()
+        self._last_time = time.monotonic()
+        # 把 Nim_* 方法包装为可设置 restype/argtypes 的对象
+        for name in dir(type(self)):
+            if name.startswith('Nim_'):
+                setattr(self, name, _SimFunction(getattr(self, name)))
+
+    # ---------------- 模拟控制 ----------------
+
+    def axis(self, node_id):
+        """
+        获取模拟轴对象，便于测试中直接设置DI、报警等
+        """
+        return self.axes[node_id]
+
+    def add_node(self, node_id):
+        with self._lock:
+            if node_id not in self.axes:
+                self.axes[node_id] = SimulatedAxis(node_id)
+                self.axes[node_id].servo_bandwidth = self.servo_bandwidth
+            return self.axes[node_id]
+
+    def set_online(self, node_id, online):
+        """
+        故障注入：设置从站在线/离线
+        """
+        with self._lock:
+            self._update()
+            self.axes[node_id].online = online
+
+    def kill_master(self, hMaster):
+        """
+        故障注入：模拟主站停止（例如CAN适配器断开）
+        """
+        with self._lock:
+            master = self.masters.get(hMaster)
+            if master is not None:
+                master.running = False
+                master.state = MASTER_INIT
+
+    def raise_alarm(self, node_id, code):
+        """
+        故障注入：使从站进入故障状态并记录报警码
+        """
+        with self._lock:
+            self._update()
+            axis = self.axes[node_id]
+            axis.alarms.append(code)
+            axis.fault = True
+            axis.enabled = False
+
+    def _update(self):
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            return
+        self._last_time = now
+        steps = max(1, int(math.ceil(elapsed / SIM_STEP)))
+        # 长时间没有调用时限制积分步数，最后一步吸收剩余时间
+        if steps > 20000:
+            steps = 20000
+        dt = elapsed / steps
+        start = now - elapsed
+        for axis in self.axes.values():
+            if axis.online:
+                if axis.pending:
+                    t = start
+                    for _ in range(steps):
+                        # 到期的运动指令在所在积分步开始时生效
+                        while axis.pending and axis.pending[0][0] <= t:
+                            axis.pending.popleft()[1](axis)
+                        axis.advance(dt)
+                        t += dt
+                    while axis.pending and axis.pending[0][0] <= now:
+                        axis.pending.popleft()[1](axis)
+                else:
+                    for _ in range(steps):
+                        axis.advance(dt)
+
+    def _delay(self, bSDO):
+        latency = self.sdo_latency if bSDO else self.pdo_latency
+        if latency > 0:
+            time.sleep(latency)
+
+    def _enter(self, hMaster, nodeId, bSDO=1):
+        """
+        公共前置处理：推进模型、检查主站和从站
+        模拟延时在加锁之前由调用方完成，不同节点的访问可以并行
+        返回: (错误码, 轴对象)
+        """
+        self.call_count += 1
+        self._update()
+        master = self.masters.get(hMaster)
+        if master is None:
+            return ServoSDK_Error.ServoSDK_MasterNotExist, None
+        if not master.running:
+            return ServoSDK_Error.ServoSDK_MasterNotRunning, None
+        axis = self.axes.get(nodeId)
+        if axis is None or not axis.online:
+            return ServoSDK_Error.ServoSDK_SlaveNotOnline, None
+        if not bSDO and master.state != MASTER_OP:
+            return ServoSDK_Error.ServoSDK_OperationNotAllowed, None
+        return ServoSDK_Error.ServoSDK_NoError, axis
+
+    def _bus_period(self, hMaster):
+        """
+        返回按 cycle_aligned 模拟的PDO周期(秒)，未启用时返回 0
+        """
+        master = self.masters[hMaster]
+        interval = master.conn.get('PDOIntervalMS', 0) / 1000.0
+        if not self.cycle_aligned or interval <= 0 or master.started is None:
+            return 0.0
+        return interval * (1.0 + self.bus_drift_ppm / 1e6)
+
+    def _get(self, hMaster, nodeId, ref, getter, bSDO=1):
+        self._delay(bSDO)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId, bSDO)
+            if nRes == 0:
+                period = 0.0 if bSDO else self._bus_period(hMaster)
+                if period > 0:
+                    # 同一周期内的PDO读取返回周期内第一次读取时锁存的值
+                    cycle = int((time.monotonic() - self.masters[hMaster].started) // period)
+                    key = getattr(getter, '__code__', getter)
+                    latched = axis.latched.get(key)
+                    if latched is None or latched[0] != cycle:
+                        latched = axis.latched[key] = (cycle, getter(axis))
+                    _out(ref, latched[1])
+                else:
+                    _out(ref, getter(axis))
+            return nRes
+
+    def _set(self, hMaster, nodeId, setter, bSDO=1):
+        self._delay(bSDO)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId, bSDO)
+            if nRes == 0:
+                return setter(axis) or 0
+            return nRes
+
+    def _command(self, hMaster, nodeId, apply, bSDO=1, check=None):
+        """
+        运动指令：check 立即检查并返回错误码，apply 按 reaction_delay / cycle_aligned 延时生效
+        """
+        self._delay(bSDO)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId, bSDO)
+            if nRes != 0:
+                return nRes
+            if check is not None:
+                nRes = check(axis)
+                if nRes:
+                    return nRes
+            now = time.monotonic()
+            due = now + self.reaction_delay
+            period = 0.0 if bSDO else self._bus_period(hMaster)
+            if period > 0:
+                due += period - (now - self.masters[hMaster].started) % period
+            if due <= now and not axis.pending:
+                apply(axis)
+            else:
+                axis.pending.append((due, apply))
+            return 0
+
+    # ---------------- SDK/主站 ----------------
+
+    def Nim_init(self, strSdkPath):
+        self.initialized = True
+        return 0
+
+    def Nim_clean(self):
+        self.initialized = False
+        return None
+
+    def Nim_setLogFlags(self, nFlags):
+        self.log_flags = nFlags
+        return 0
+
+    def Nim_getLogFlags(self):
+        return self.log_flags
+
+    def Nim_create_master(self, nCommType, pHandle):
+        if nCommType not in (0, 1, 2):
+            return ServoSDK_Error.ServoSDK_UnsupportedCommType
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self.masters[handle] = SimulatedMaster(handle, nCommType)
+        _out(pHandle, handle)
+        return 0
+
+    def Nim_destroy_master(self, hMaster):
+        with self._lock:
+            if self.masters.pop(hMaster, None) is None:
+                return ServoSDK_Error.ServoSDK_MasterNotExist
+        return 0
+
+    def Nim_master_run(self, hMaster, conn_str):
+        with self._lock:
+            master = self.masters.get(hMaster)
+            if master is None:
+                return ServoSDK_Error.ServoSDK_MasterNotExist
+            try:
+                conn = json.loads(conn_str)
+            except ValueError:
+                return ServoSDK_Error.ServoSDK_ParamError
+            if not isinstance(conn, dict) or any(k not in conn for k in CONN_STR_KEYS[master.comm_type]):
+                return ServoSDK_Error.ServoSDK_ParamError
+            master.conn_str = conn_str
+            master.conn = conn
+            master.running = True
+            master.state = MASTER_PREOP
+            master.started = time.monotonic()
+            self._last_time = time.monotonic()
+        return 0
+
+    def Nim_master_stop(self, hMaster):
+        with self._lock:
+            master = self.masters.get(hMaster)
+            if master is None:
+                return ServoSDK_Error.ServoSDK_MasterNotExist
+            master.running = False
+            master.state = MASTER_INIT
+        return 0
+
+    def _change_state(self, hMaster, state):
+        with self._lock:
+            self._update()
+            master = self.masters.get(hMaster)
+            if master is None:
+                return ServoSDK_Error.ServoSDK_MasterNotExist
+            if not master.running:
+                return ServoSDK_Error.ServoSDK_MasterNotRunning
+            master.state = state
+        return 0
+
+    def Nim_master_changeToPreOP(self, hMaster):
+        return self._change_state(hMaster, MASTER_PREOP)
+
+    def Nim_master_changeToOP(self, hMaster):
+        return self._change_state(hMaster, MASTER_OP)
+
+    def Nim_scan_nodes(self, hMaster, fromAddr, toAddr):
+        with self._lock:
+            master = self.masters.get(hMaster)
+            if master is None:
+                return ServoSDK_Error.ServoSDK_MasterNotExist
+            if not master.running:
+                return ServoSDK_Error.ServoSDK_MasterNotRunning
+            self._delay(1)
+            master.scanned = set(n for n, a in self.axes.items() if fromAddr <= n <= toAddr and a.online)
+        return 0
+
+    def Nim_is_online(self, hMaster, nodeId):
+        with self._lock:
+            master = self.masters.get(hMaster)
+            if master is None or not master.running:
+                return 0
+            axis = self.axes.get(nodeId)
+            return 1 if axis is not None and axis.online else 0
+
+    def Nim_read_PDOConfig(self, hMaster, nodeId):
+        return self._set(hMaster, nodeId, lambda a: 0)
+
+    def Nim_load_params(self, hMaster, nodeId, db_name):
+        return self._set(hMaster, nodeId, lambda a: 0)
+
+    def Nim_get_param_value(self, hMaster, nodeId, strParamNO, pValue, bSDO):
+        def getter(axis):
+            return axis.params.get(strParamNO, 0)
+        self._delay(bSDO)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId, bSDO)
+            if nRes != 0:
+                return nRes
+            if strParamNO not in axis.params:
+                return ServoSDK_Error.ServoSDK_ParamNotExist
+            _out(pValue, getter(axis))
+        return 0
+
+    def Nim_set_param_value(self, hMaster, nodeId, strParamNO, nValue, bSDO):
+        def setter(axis):
+            axis.params[strParamNO] = nValue & 0xFFFFFFFF
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_save_AllParams(self, hMaster, nodeId, timeoutMS):
+        def setter(axis):
+            axis.saved_params = dict(axis.params)
+        return self._set(hMaster, nodeId, setter)
+
+    # ---------------- 状态机 ----------------
+
+    def Nim_power_on(self, hMaster, nodeId, bSDO):
+        def setter(axis):
+            if axis.fault:
+                return ServoSDK_Error.ServoSDK_SlaveInternalError
+            axis.enabled = True
+            axis.quick_stopped = False
+            axis.target_position = axis.position
+            axis.target_velocity = 0.0
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_power_off(self, hMaster, nodeId, bSDO):
+        def setter(axis):
+            axis.enabled = False
+            axis.moving = False
+            axis.buffered_position = None
+            axis.pending.clear()
+            axis.velocity = 0.0
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_set_controlWord(self, hMaster, nodeId, cw, bSDO):
+        def setter(axis):
+            if cw & 0x80:
+                axis.fault = False
+            elif (cw & 0x0F) == 0x0F:
+                axis.enabled = not axis.fault
+                axis.quick_stopped = False
+            elif (cw & 0x07) == 0x02:
+                axis.quick_stopped = True
+            else:
+                axis.enabled = False
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_get_statusWord(self, hMaster, nodeId, pStatusWord, bSDO):
+        return self._get(hMaster, nodeId, pStatusWord, SimulatedAxis.status_word, bSDO)
+
+    def Nim_set_workMode(self, hMaster, nodeId, mode, bSDO):
+        def setter(axis):
+            if axis.enabled and axis.mode != mode:
+                return ServoSDK_Error.ServoSDK_OperationNotAllowed
+            axis.mode = mode
+            axis.target_reached = True
+            axis.moving = False
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_get_workModeDisplay(self, hMaster, nodeId, pMode, bSDO):
+        return self._get(hMaster, nodeId, pMode, lambda a: a.mode, bSDO)
+
+    def Nim_fastStop(self, hMaster, nodeId, bSDO):
+        def setter(axis):
+            axis.quick_stopped = True
+            axis.moving = False
+            axis.buffered_position = None
+            axis.pending.clear()
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_clearError(self, hMaster, nodeId, bSDO):
+        def setter(axis):
+            axis.fault = False
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    # ---------------- 原点回归 ----------------
+
+    def Nim_set_homeType(self, hMaster, nodeId, type):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'home_type', type))
+
+    def Nim_get_homeType(self, hMaster, nodeId, pType):
+        return self._get(hMaster, nodeId, pType, lambda a: a.home_type)
+
+    def Nim_goHome(self, hMaster, nodeId, bSDO):
+        def setter(axis):
+            if not axis.enabled or axis.mode != ServoWorkMode.SERVO_HM_MODE:
+                return ServoSDK_Error.ServoSDK_OperationNotAllowed
+            axis.start_homing()
+        return self._set(hMaster, nodeId, setter, bSDO)
+
+    def Nim_get_homeOffset(self, hMaster, nodeId, pOffset):
+        return self._get(hMaster, nodeId, pOffset, lambda a: a.home_offset)
+
+    def Nim_set_homeOffset(self, hMaster, nodeId, offset):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'home_offset', offset))
+
+    def Nim_get_goHome_velocity(self, hMaster, nodeId, pVelocity1, pVelocity2):
+        self._delay(1)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId)
+            if nRes == 0:
+                _out(pVelocity1, axis.home_velocity1)
+                _out(pVelocity2, axis.home_velocity2)
+            return nRes
+
+    def Nim_set_goHome_velocity(self, hMaster, nodeId, velocity1, velocity2):
+        def setter(axis):
+            axis.home_velocity1 = velocity1
+            axis.home_velocity2 = velocity2
+        return self._set(hMaster, nodeId, setter)
+
+    def Nim_get_goHome_accel(self, hMaster, nodeId, pAccel):
+        return self._get(hMaster, nodeId, pAccel, lambda a: a.home_accel)
+
+    def Nim_set_goHome_accel(self, hMaster, nodeId, accel):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'home_accel', accel))
+
+    # ---------------- 速度/位置/转矩 ----------------
+
+    def Nim_forward(self, hMaster, nodeId, fVelocity, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_velocity', abs(fVelocity)), bSDO)
+
+    def Nim_backward(self, hMaster, nodeId, fVelocity, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_velocity', -abs(fVelocity)), bSDO)
+
+    def Nim_set_targetVelocity(self, hMaster, nodeId, fVelocity, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_velocity', fVelocity), bSDO)
+
+    def Nim_set_vmTargetSpeed(self, hMaster, nodeId, nSpeed, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'vm_target_speed', nSpeed), bSDO)
+
+    def Nim_get_vmCurrentSpeed(self, hMaster, nodeId, pSpeed, bSDO):
+        return self._get(hMaster, nodeId, pSpeed, self._motor_speed, bSDO)
+
+    def _move(self, hMaster, nodeId, position, relative, bChangeImmediatly, bSDO):
+        def check(axis):
+            if not axis.enabled or axis.mode != ServoWorkMode.SERVO_PP_MODE:
+                return ServoSDK_Error.ServoSDK_OperationNotAllowed
+            return 0
+
+        def apply(axis):
+            target = position
+            if relative:
+                base = axis.buffered_position if axis.buffered_position is not None else axis.target_position
+                target = base + position
+            target = max(axis.min_position, min(axis.max_position, target))
+            axis.start_move(target, bool(bChangeImmediatly))
+        return self._command(hMaster, nodeId, apply, bSDO, check)
+
+    def Nim_moveAbsolute(self, hMaster, nodeId, position, bChangeImmediatly, bSDO):
+        return self._move(hMaster, nodeId, position, False, bChangeImmediatly, bSDO)
+
+    def Nim_moveRelative(self, hMaster, nodeId, distance, bChangeImmediatly, bSDO):
+        return self._move(hMaster, nodeId, distance, True, bChangeImmediatly, bSDO)
+
+    def Nim_set_targetPosition(self, hMaster, nodeId, position, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_position', position), bSDO)
+
+    def Nim_set_ipPosition(self, hMaster, nodeId, position, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_position', position), bSDO)
+
+    def Nim_set_ipPeriod(self, hMaster, nodeId, nPeriodMS):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'ip_period', nPeriodMS))
+
+    def Nim_get_ipPeriod(self, hMaster, nodeId, pPeriod):
+        return self._get(hMaster, nodeId, pPeriod, lambda a: a.ip_period)
+
+    def Nim_set_targetTorque(self, hMaster, nodeId, torque, bSDO):
+        return self._command(hMaster, nodeId, lambda a: setattr(a, 'target_torque', torque), bSDO)
+
+    def Nim_get_currentTorque(self, hMaster, nodeId, pTorque, bSDO):
+        return self._get(hMaster, nodeId, pTorque, lambda a: a.torque, bSDO)
+
+    def Nim_set_PT_SpeedLimit(self, hMaster, nodeId, FwrSpeedLimit, BwrSpeedLimit):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'pt_speed_limit', (FwrSpeedLimit, BwrSpeedLimit)))
+
+    def Nim_get_PT_SpeedLimit(self, hMaster, nodeId, pFwr, pBwr):
+        self._delay(1)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId)
+            if nRes == 0:
+                _out(pFwr, axis.pt_speed_limit[0])
+                _out(pBwr, axis.pt_speed_limit[1])
+            return nRes
+
+    def Nim_set_PT_TorqueRamp(self, hMaster, nodeId, torqueRamp):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'pt_torque_ramp', torqueRamp))
+
+    def Nim_get_PT_TorqueRamp(self, hMaster, nodeId, pRamp):
+        return self._get(hMaster, nodeId, pRamp, lambda a: a.pt_torque_ramp)
+
+    def _motor_speed(self, axis):
+        return int(round(axis.velocity * axis.units_factor * 60.0 / axis.counts_per_rev))
+
+    def Nim_get_currentVelocity(self, hMaster, nodeId, pVelocity, bSDO):
+        return self._get(hMaster, nodeId, pVelocity, lambda a: a.velocity, bSDO)
+
+    def Nim_get_currentVelocity2(self, hMaster, nodeId, pVelocity, bSDO):
+        return self._get(hMaster, nodeId, pVelocity, lambda a: a.velocity, bSDO)
+
+    def Nim_get_currentMotorSpeed(self, hMaster, nodeId, pSpeed, bSDO):
+        return self._get(hMaster, nodeId, pSpeed, self._motor_speed, bSDO)
+
+    def Nim_get_currentPosition(self, hMaster, nodeId, pPosition, bSDO):
+        return self._get(hMaster, nodeId, pPosition, lambda a: a.position, bSDO)
+
+    # ---------------- 报警 ----------------
+
+    def Nim_get_newestAlarm(self, hMaster, nodeId, pAlarm, bSDO):
+        return self._get(hMaster, nodeId, pAlarm, lambda a: a.alarms[-1] if a.alarms else 0, bSDO)
+
+    def Nim_get_alarmCount(self, hMaster, nodeId, pCount):
+        return self._get(hMaster, nodeId, pCount, lambda a: len(a.alarms))
+
+    def Nim_get_alarm(self, hMaster, nodeId, index, pAlarm):
+        self._delay(1)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId)
+            if nRes != 0:
+                return nRes
+            if not 0 <= index < len(axis.alarms):
+                return ServoSDK_Error.ServoSDK_ParamError
+            _out(pAlarm, axis.alarms[index])
+        return 0
+
+    # ---------------- 轮廓参数与限制 ----------------
+
+    def Nim_get_profileVelocity(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.profile_velocity)
+
+    def Nim_get_profileAccel(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.profile_accel)
+
+    def Nim_get_profileDecel(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.profile_decel)
+
+    def Nim_get_quickStopDecel(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.quick_stop_decel)
+
+    def Nim_set_profileVelocity(self, hMaster, nodeId, velocity):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'profile_velocity', velocity))
+
+    def Nim_set_profileAccel(self, hMaster, nodeId, accel):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'profile_accel', accel))
+
+    def Nim_set_profileDecel(self, hMaster, nodeId, decel):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'profile_decel', decel))
+
+    def Nim_set_quickStopDecel(self, hMaster, nodeId, decel):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'quick_stop_decel', decel))
+
+    def Nim_set_vmAccel(self, hMaster, nodeId, deltaV, deltaT):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'vm_accel', (deltaV, deltaT)))
+
+    def Nim_set_vmDecel(self, hMaster, nodeId, deltaV, deltaT):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'vm_decel', (deltaV, deltaT)))
+
+    def Nim_get_vmAccel(self, hMaster, nodeId, pAccel):
+        return self._get(hMaster, nodeId, pAccel, lambda a: float(a.vm_accel[0]) / max(a.vm_accel[1], 1))
+
+    def Nim_get_vmDecel(self, hMaster, nodeId, pDecel):
+        return self._get(hMaster, nodeId, pDecel, lambda a: float(a.vm_decel[0]) / max(a.vm_decel[1], 1))
+
+    def Nim_get_posLimit(self, hMaster, nodeId, pMin, pMax):
+        self._delay(1)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId)
+            if nRes == 0:
+                _out(pMin, axis.min_position)
+                _out(pMax, axis.max_position)
+            return nRes
+
+    def Nim_set_posLimit(self, hMaster, nodeId, minPos, maxPos):
+        def setter(axis):
+            axis.min_position = minPos
+            axis.max_position = maxPos
+        return self._set(hMaster, nodeId, setter)
+
+    def Nim_get_maxVelocity(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.max_velocity)
+
+    def Nim_set_maxVelocity(self, hMaster, nodeId, velocity):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'max_velocity', velocity))
+
+    def Nim_get_maxMotorSpeed(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.max_motor_speed)
+
+    def Nim_set_maxMotorSpeed(self, hMaster, nodeId, speed):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'max_motor_speed', speed))
+
+    def Nim_get_maxTorque(self, hMaster, nodeId, pValue):
+        return self._get(hMaster, nodeId, pValue, lambda a: a.max_torque)
+
+    def Nim_set_maxTorque(self, hMaster, nodeId, torque):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'max_torque', torque))
+
+    def Nim_get_vmSpeedLimit(self, hMaster, nodeId, pMin, pMax):
+        self._delay(1)
+        with self._lock:
+            nRes, axis = self._enter(hMaster, nodeId)
+            if nRes == 0:
+                _out(pMin, axis.vm_speed_limit[0])
+                _out(pMax, axis.vm_speed_limit[1])
+            return nRes
+
+    def Nim_set_vmSpeedLimit(self, hMaster, nodeId, minSpeed, maxSpeed):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'vm_speed_limit', (minSpeed, maxSpeed)))
+
+    def Nim_set_unitsFactor(self, hMaster, nodeId, factor):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'units_factor', factor))
+
+    def Nim_get_unitsFactor(self, hMaster, nodeId, pFactor):
+        return self._get(hMaster, nodeId, pFactor, lambda a: a.units_factor)
+
+    # ---------------- IO ----------------
+
+    def Nim_set_DOs(self, hMaster, nodeId, nDOs, bSDO):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'DOs', nDOs), bSDO)
+
+    def Nim_set_VDIs(self, hMaster, nodeId, nVDIs):
+        return self._set(hMaster, nodeId, lambda a: setattr(a, 'VDIs', nVDIs))
+
+    def Nim_get_DIs(self, hMaster, nodeId, pDIs, bSDO):
+        return self._get(hMaster, nodeId, pDIs, lambda a: a.DIs | a.VDIs, bSDO)
+
+
+def install_simulator(sim=None, **kwargs):
+    """
+    安装模拟器代替SDK动态库，必须在 Nim_init（或创建 MotorController）之前调用
+    参数:
+    sim - 已创建的 SimulatedServoSDK 对象，None 时用 kwargs 创建
+    返回: 模拟器对象
+    """
+    if sim is None:
+        sim = SimulatedServoSDK(**kwargs)
+    NimServoSDK.attach_library(sim)
+    return sim
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SDK调用会话的录制与回放
+
+录制: 通过SDK调用钩子捕获一次运行中全部 Nim_* 调用的顺序、参数、返回码和耗时，
+      保存为JSON行文件。
+回放: 把录制的调用序列按原速（或指定倍速、或尽快）重新发给本地模拟器
+      （或其它已加载的SDK库），对比录制与回放的单次调用耗时和端到端时长，
+      用于在离线环境下度量 MotorController 改动对真实工作负载的影响。
+
+用法:
+    rec = SessionRecorder("session.jsonl")
+    rec.start()
+    ...                      # 正常运行 MotorController
+    rec.stop()
+
+    python session_replay.py session.jsonl            # 原速回放到模拟器
+    python session_replay.py session.jsonl --fast     # 尽快回放
+"""
+
+import ctypes, json, sys, threading, time
+import NimServoSDK
+from sdk_functions import MASTER_FUNCS, NO_HANDLE_FUNCS
+from perf_stats import summarize
+
+SESSION_VERSION = 1
+
+
+def _encode_arg(arg):
+    obj = getattr(arg, '_obj', None)
+    if obj is not None:
+        return {'o': type(obj).__name__, 'v': obj.value}
+    if isinstance(arg, bytes):
+        return {'b': arg.decode('latin-1')}
+    if isinstance(arg, ctypes._SimpleCData):
+        return arg.value
+    return arg
+
+
+def _decode_arg(arg):
+    if isinstance(arg, dict):
+        if 'o' in arg:
+            return ctypes.byref(getattr(ctypes, arg['o'])())
+        if 'b' in arg:
+            return arg['b'].encode('latin-1')
+    return arg
+
+
+class SessionRecorder(object):
+    def __init__(self, path):
+        """
+        初始化会话录制器
+        参数:
+        path - 会话文件路径（JSON行格式，覆盖写入）
+        """
+        self.path = path
+        self.calls = []
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._t0 = None
+
+    def start(self):
+        """
+        开始录制
+        """
+        self.calls = []
+        self._threads = {}
+        self._t0 = time.monotonic_ns()
+        NimServoSDK.add_call_hook(self.record)
+
+    def stop(self):
+        """
+        停止录制并写入文件
+        返回: 录制的调用数
+        """
+        NimServoSDK.remove_call_hook(self.record)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': SESSION_VERSION, 'calls': len(self.calls),
+                                'start_unix_ns': time.time_ns()}) + '\n')
+            for call in self.calls:
+                f.write(json.dumps(call, separators=(',', ':')) + '\n')
+        return len(self.calls)
+
+    def record(self, strFuncName, args, nRes, t0_ns, t1_ns):
+        """
+        调用钩子
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            thread = self._threads.setdefault(ident, len(self._threads))
+            self.calls.append({
+                't': t0_ns - self._t0,
+                'd': t1_ns - t0_ns,
+                'f': strFuncName,
+                'a': [_encode_arg(a) for a in args],
+                'r': nRes,
+                'th': thread,
+            })
+
+
+def load_session(path):
+    """
+    读取会话文件
+    返回: 调用列表（按开始时间排序）
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != SESSION_VERSION:
+            raise ValueError(f"不支持的会话文件版本: {header.get('version')}")
+        calls = [json.loads(line) for line in f if line.strip()]
+    calls.sort(key=lambda c: c['t'])
+    return calls
+
+
+def session_nodes(calls):
+    """
+    返回会话中访问过的从站地址集合
+    """
+    nodes = set()
+    for call in calls:
+        if call['f'] not in MASTER_FUNCS and len(call['a']) > 1 and isinstance(call['a'][1], int):
+            nodes.add(call['a'][1])
+    return nodes
+
+
+class ReplayReport(object):
+    def __init__(self):
+        self.captured_ns = {}
+        self.replayed_ns = {}
+        self.result_mismatches = {}
+        self.captured_total_ns = 0      # 录制的第一个调用开始到最后一个调用结束
+        self.replayed_total_ns = 0
+        self.speed = 1.0                # 回放倍速，None 表示尽快回放
+        self.calls = 0
+
+    def add(self, name, captured_ns, replayed_ns, mismatch):
+        self.captured_ns.setdefault(name, []).append(captured_ns)
+        self.replayed_ns.setdefault(name, []).append(replayed_ns)
+        if mismatch:
+            self.result_mismatches[name] = self.result_mismatches.get(name, 0) + 1
+        self.calls += 1
+
+    @property
+    def expected_total_ns(self):
+        """
+        按回放倍速换算的录制时长，回放时长与它比较
+        """
+        return self.captured_total_ns / self.speed if self.speed else self.captured_total_ns
+
+    def functions(self):
+        """
+        返回每个函数的统计
+        返回: {函数名: {'count', 'captured': summarize(), 'replayed': summarize(), 'mismatches'}}，耗时单位微秒
+        """
+        stats = {}
+        for name in self.captured_ns:
+            stats[name] = {
+                'count': len(self.captured_ns[name]),
+                'captured': summarize([v / 1000.0 for v in self.captured_ns[name]]),
+                'replayed': summarize([v / 1000.0 for v in self.replayed_ns[name]]),
+                'mismatches': self.result_mismatches.get(name, 0),
+            }
+        return stats
+
+    def format(self):
+        """
+        生成文本报告
+        """
+        lines = []
+        lines.append(f"调用数: {self.calls}")
+        captured = f"录制 {self.captured_total_ns / 1e6:.3f} ms"
+        if self.speed and self.speed != 1.0:
+            captured += f"（{self.speed:g} 倍速 {self.expected_total_ns / 1e6:.3f} ms）"
+        lines.append(f"端到端时长: {captured}, 回放 {self.replayed_total_ns / 1e6:.3f} ms, "
+                     f"差值 {(self.replayed_total_ns - self.expected_total_ns) / 1e6:+.3f} ms")
+        lines.append(f"{'函数':<28}{'次数':>8}{'录制p50(us)':>14}{'回放p50(us)':>14}{'录制p95(us)':>14}{'回放p95(us)':>14}{'返回码不同':>10}")
+        stats = self.functions()
+        for name in sorted(stats, key=lambda n: -stats[n]['count']):
+            s = stats[name]
+            lines.append(f"{name:<28}{s['count']:>8}{s['captured']['p50']:>14.1f}{s['replayed']['p50']:>14.1f}"
+                         f"{s['captured']['p95']:>14.1f}{s['replayed']['p95']:>14.1f}{s['mismatches']:>10}")
+        return '\n'.join(lines)
+
+
+def replay_session(calls, lib=None, speed=1.0):
+    """
+    回放会话
+    参数:
+    calls - load_session 返回的调用列表
+    lib - 回放目标库对象，默认为当前已加载的SDK库（例如已安装的模拟器）
+    speed - 回放倍速，1.0 为原速，None 表示尽快回放
+    返回: ReplayReport
+    """
+    if lib is None:
+        lib = NimServoSDK.SDKHandle
+    if lib is None:
+        raise RuntimeError("SDK库未加载，请先安装模拟器或调用 Nim_init")
+    report = ReplayReport()
+    report.speed = speed
+    handles = {}
+    # 录制时间从 SessionRecorder.start() 算起，回放从第一个调用开始，不重放之前的空闲时间
+    first = calls[0]['t'] if calls else 0
+    start = time.monotonic_ns()
+    for call in calls:
+        if speed:
+            deadline = start + int((call['t'] - first) / speed)
+            wait = deadline - time.monotonic_ns()
+            if wait > 0:
+                time.sleep(wait / 1e9)
+        name = call['f']
+        args = [_decode_arg(a) for a in call['a']]
+        if name not in NO_HANDLE_FUNCS and args:
+            # 回放时主站句柄与录制时不同，按创建顺序映射
+            args[0] = handles.get(args[0], args[0])
+        func = getattr(lib, name)
+        t0 = time.monotonic_ns()
+        nRes = func(*args)
+        t1 = time.monotonic_ns()
+        if name == 'Nim_create_master' and nRes == 0:
+            handles[call['a'][1]['v']] = NimServoSDK.call_arg_value(args[1])
+        report.add(name, call['d'], t1 - t0, nRes != call['r'])
+    end = time.monotonic_ns()
+    if calls:
+        report.captured_total_ns = calls[-1]['t'] + calls[-1]['d'] - calls[0]['t']
+        report.replayed_total_ns = end - start
+    return report
+
+
+def main(argv=None):
+    import argparse
+    from sdk_simulator import SimulatedServoSDK
+    parser = argparse.ArgumentParser(description="回放SDK调用会话到本地模拟器")
+    parser.add_argument('session', help="会话文件")
+    parser.add_argument('--fast', action='store_true', help="尽快回放，不保持原始时序")
+    parser.add_argument('--speed', type=float, default=1.0, help="回放倍速")
+    parser.add_argument('--sdo-latency', type=float, default=0.0, help="模拟SDO延时(秒)")
+    parser.add_argument('--pdo-latency', type=float, default=0.0, help="模拟PDO延时(秒)")
+    args = parser.parse_args(argv)
+
+    calls = load_session(args.session)
+    sim = SimulatedServoSDK(nodes=sorted(session_nodes(calls)) or [1],
+                            sdo_latency=args.sdo_latency, pdo_latency=args.pdo_latency)
+    report = replay_session(calls, lib=sim, speed=None if args.fast else args.speed)
+    print(report.format())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+目标值合并写入（后写覆盖）
+
+点动界面和摇杆线程调用 run_velocity / Nim_set_targetVelocity 的频率远高于PDO周期，
+每次调用都会访问总线，但一个周期内只有最后一个值有意义。SetpointCoalescer 按
+(轴, 目标值类型) 只保留最新的值，submit() 不调用SDK、立即返回；后台
+CyclicExecutor 每个PDO周期写一次，与上次写入值相同时不再写入。被覆盖的中间值
+计入 dropped。驱动器状态被其它命令改变（快速停止、使能/脱机、切换模式、主站恢复）
+后，上次写入的值不再有效，需调用 invalidate()，下一次提交的值无论是否相同都会写入。
+
+用法:
+    co = SetpointCoalescer(motor.h_master, period=0.01)
+    co.start()
+    co.submit(1, 'velocity', 12.5)      # 任意线程、任意频率
+    co.submit(1, 'jog', -3.0)           # 轮廓速度模式点动：正值正转，负值反转
+    ...
+    co.stop()                           # 写入剩余的值后停止
+    print(co.format_report())
+"""
+
+import threading
+from NimServoSDK import *
+from cyclic_executor import CyclicExecutor
+
+
+def _jog(hMaster, nodeId, velocity, bSDO):
+    if velocity < 0:
+        return Nim_backward(hMaster, nodeId, -velocity, bSDO)
+    return Nim_forward(hMaster, nodeId, velocity, bSDO)
+
+
+def _torque(hMaster, nodeId, torque, bSDO):
+    return Nim_set_targetTorque(hMaster, nodeId, int(torque), bSDO)
+
+
+# 目标值类型: 名称 -> 写入函数，参数均为 (hMaster, nodeId, value, bSDO)
+SETPOINTS = {
+    'velocity': Nim_set_targetVelocity,     # 目标速度(60FF)，用户单位/s
+    'torque': _torque,                      # 目标转矩(6071)，0.001倍额定转矩
+    'jog': _jog,                            # 轮廓速度模式正转/反转，用户单位/s
+}
+
+
+class SetpointStats(object):
+    __slots__ = ('submitted', 'dropped', 'written', 'unchanged', 'errors')
+
+    def __init__(self):
+        self.submitted = 0      # submit() 次数
+        self.dropped = 0        # 写入前被新值覆盖的次数
+        self.written = 0        # 实际调用SDK写入的次数
+        self.unchanged = 0      # 与上次写入值相同而省略的次数
+        self.errors = 0         # 写入失败次数
+
+
+class SetpointCoalescer(object):
+    def __init__(self, h_master, period=0.01, bSDO=0, skip_unchanged=True, cpu=None, priority=None):
+        """
+        初始化目标值合并器
+        参数:
+        h_master - 主站句柄
+        period - 写入周期(秒)，应与连接时的 pdo_interval 一致
+        bSDO - 1 使用SDO写；0 使用PDO（默认）
+        skip_unchanged - 与上次写入值相同时不再写入
+        cpu, priority - 传给 CyclicExecutor 的CPU绑定和 SCHED_FIFO 优先级
+        """
+        self.h_master = h_master
+        self.period = period
+        self.bSDO = bSDO
+        self.skip_unchanged = skip_unchanged
+        self.stats = {}             # (轴, 类型) -> SetpointStats
+        self.last_error = None
+        self._pending = {}          # (轴, 类型) -> 最新的值
+        self._written = {}          # (轴, 类型) -> 上次写入的值
+        self._generation = 0        # invalidate() 的次数，写入期间发生时不记录写入值
+        self._lock = threading.Lock()
+        self.executor = CyclicExecutor(period, self._on_cycle, cpu=cpu, priority=priority, name='SetpointCoalescer')
+
+    def submit(self, node, kind, value):
+        """
+        提交目标值，只保留每个 (轴, 类型) 的最新值，下一个周期写入
+        参数:
+        node - 从站地址
+        kind - 目标值类型，见 SETPOINTS
+        value - 目标值
+        """
+        if kind not in SETPOINTS:
+            raise ValueError(f"未知的目标值类型: {kind}")
+        key = (node, kind)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = SetpointStats()
+            stats.submitted += 1
+            if key in self._pending:
+                stats.dropped += 1
+            self._pending[key] = value
+
+    def flush(self):
+        """
+        立即写入所有待写的值
+        返回: 本次实际写入的数量
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            generation = self._generation
+        count = 0
+        for key, value in pending.items():
+            stats = self.stats[key]
+            if self.skip_unchanged and self._written.get(key) == value:
+                stats.unchanged += 1
+                continue
+            node, kind = key
+            res = SETPOINTS[kind](self.h_master, node, value, self.bSDO)
+            stats.written += 1
+            count += 1
+            with self._lock:
+                if res == 0 and generation == self._generation:
+                    self._written[key] = value
+                else:
+                    # 写入失败或写入期间已失效时，下一次同值提交仍会写入
+                    self._written.pop(key, None)
+            if res != 0:
+                stats.errors += 1
+                self.last_error = res
+        return count
+
+    def invalidate(self, node=None):
+        """
+        清除上次写入值的记录，下一次提交的值即使与上次相同也会写入；
+        失效前提交、尚未写入的值一并丢弃（例如快速停止前的点动速度不应在停止后写入）
+        参数:
+        node - 从站地址，None 表示所有从站
+        """
+        with self._lock:
+            self._generation += 1
+            if node is None:
+                self._written.clear()
+                self._pending.clear()
+            else:
+                for table in (self._written, self._pending):
+                    for key in [key for key in table if key[0] == node]:
+                        del table[key]
+
+    def _on_cycle(self, cycle, deadline_ns):
+        self.flush()
+
+    def start(self):
+        """
+        启动后台写入线程
+        """
+        self.executor.start()
+
+    def stop(self):
+        """
+        停止后台写入线程，并写入剩余的值
+        """
+        self.executor.stop()
+        self.flush()
+
+    def totals(self):
+        """
+        返回所有 (轴, 类型) 的合计 {'submitted', 'dropped', 'written', 'unchanged', 'errors'}
+        """
+        total = dict((name, 0) for name in SetpointStats.__slots__)
+        with self._lock:
+            for stats in self.stats.values():
+                for name in SetpointStats.__slots__:
+                    total[name] += getattr(stats, name)
+        return total
+
+    def format_report(self):
+        lines = []
+        with self._lock:
+            items = sorted(self.stats.items())
+        for (node, kind), s in items:
+            lines.append(f"轴{node} {kind}: 提交 {s.submitted}，覆盖 {s.dropped}，写入 {s.written}，"
+                         f"相同省略 {s.unchanged}，失败 {s.errors}")
+        t = self.totals()
+        if t['submitted']:
+            lines.append(f"合计: 提交 {t['submitted']} 次，写入 {t['written']} 次，"
+                         f"总线写入减少 {(1 - t['written'] / t['submitted']) * 100:.1f}%")
+        return '\n'.join(lines)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+遥测数据流式导出为 Arrow/Parquet
+
+MotorController 只能逐次打印或写CSV，数小时的多轴数据写入慢、文件大、查询慢。
+TelemetrySink 把每个样本（时间戳、SYNC周期、节点、状态字、位置、速度、转矩、
+DI、报警）作为一行放入内存批次，采样线程只做一次列表追加；后台线程把批次
+按列转换为 Arrow 记录批次，攒够一个行组后写入 Parquet 文件，按行数或时长
+轮换文件。待写批次数有上限，写入跟不上时丢弃整批并计数，内存占用有界。
+
+写入中的文件名为 *.parquet.part，关闭后重命名为 *.parquet，分析工具读取目录时
+只会看到完整的文件。需要安装 pyarrow: pip install pyarrow
+
+用法:
+    sink = TelemetrySink("telemetry", rotate_interval=600)
+    rec = TelemetryRecorder(motor.h_master, [1, 2, 3], sink, period=0.01, timebase=motor.timebase)
+    rec.start()                     # 同时启动 sink
+    ...
+    rec.stop()                      # 写完剩余数据并关闭文件
+    print(sink.format_report())
+
+    # 分析端
+    import pyarrow.dataset as ds
+    table = ds.dataset("telemetry", format="parquet").to_table(filter=ds.field("node") == 1)
+
+查看目录:
+    python telemetry_parquet.py telemetry
+"""
+
+import collections, os, sys, threading, time
+from NimServoSDK import *
+from cyclic_executor import CyclicExecutor
+
+TELEMETRY_VERSION = 1
+
+# 列名和 Arrow 类型，每行的元组按此顺序排列；除 t_ns 和 node 外均可为空(None)
+TELEMETRY_FIELDS = (
+    ('t_ns', 'int64'),          # 读取完成时的 time.monotonic_ns()
+    ('bus_cycle', 'int64'),     # SyncTimebase 估计的SYNC周期序号
+    ('node', 'int16'),
+    ('statusWord', 'uint16'),
+    ('position', 'float64'),    # 用户单位
+    ('velocity', 'float64'),    # 用户单位/s
+    ('torque', 'int32'),        # 0.001倍额定转矩
+    ('DIs', 'uint32'),
+    ('alarm', 'uint32'),        # 最新报警代码
+)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet 导出需要安装 pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def telemetry_schema(metadata=None):
+    """
+    返回遥测数据的 Arrow schema（需要安装pyarrow）
+    """
+    pa, _ = _require_pyarrow()
+    fields = [pa.field(name, getattr(pa, kind)(), nullable=name not in ('t_ns', 'node'))
+              for name, kind in TELEMETRY_FIELDS]
+    return pa.schema(fields, metadata=metadata)
+
+
+class TelemetrySink(object):
+    def __init__(self, directory, prefix='telemetry', batch_rows=4096, row_group_rows=65536,
+                 rotate_rows=5000000, rotate_interval=3600.0, max_pending_batches=16,
+                 flush_interval=0.2, compression='zstd'):
+        """
+        初始化遥测数据写入器
+        参数:
+        directory - 输出目录，不存在时自动创建
+        prefix - 文件名前缀，文件名为 <prefix>-<开始时间>-<序号>.parquet
+        batch_rows - 每个内存批次的行数，攒满后交给后台线程
+        row_group_rows - Parquet 行组的行数（行组越大压缩和查询越好，占用内存越多）
+        rotate_rows - 单个文件的行数达到该值后轮换（按行组写入，实际行数可能略多）
+        rotate_interval - 单个文件的最长时间(秒)，None 表示不按时间轮换
+        max_pending_batches - 等待后台线程处理的批次上限，超出后丢弃并计数
+        flush_interval - 后台线程检查间隔(秒)，未攒满的批次也在此时交给后台线程
+        compression - Parquet 压缩算法: 'zstd' / 'snappy' / 'gzip' / None
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.batch_rows = batch_rows
+        self.row_group_rows = row_group_rows
+        self.rotate_rows = rotate_rows
+        self.rotate_interval = rotate_interval
+        self.max_pending_batches = max_pending_batches
+        self.flush_interval = flush_interval
+        self.compression = compression
+        self.rows_recorded = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.files = []             # 已关闭的文件路径
+        self.last_error = None
+        self._rows = []
+        self._batches = collections.deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._schema = None
+        self._writer = None
+        self._part_path = None
+        self._file_rows = 0
+        self._file_opened = 0.0
+        self._file_index = 0
+        self._group = []            # 尚未写入的 Arrow 记录批次
+        self._group_rows = 0
+
+    def start(self):
+        """
+        启动后台写入线程
+        """
+        if self._thread is not None:
+            return
+        _require_pyarrow()
+        os.makedirs(self.directory, exist_ok=True)
+        self._schema = telemetry_schema({
+            'version': str(TELEMETRY_VERSION),
+            'start_monotonic_ns': str(time.monotonic_ns()),
+            'start_unix_ns': str(time.time_ns()),
+        })
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._writer_loop, name='TelemetryWriter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台线程，写完剩余数据并关闭当前文件
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._seal()
+        self._drain()
+        self._write_group()
+        self._close_file()
+
+    def record(self, node, t_ns, statusWord=None, position=None, velocity=None, torque=None,
+               DIs=None, alarm=None, bus_cycle=None):
+        """
+        记录一行，只追加到内存批次，可在采样线程中以PDO周期调用
+        """
+        row = (t_ns, bus_cycle, node, statusWord, position, velocity, torque, DIs, alarm)
+        with self._lock:
+            self._rows.append(row)
+            self.rows_recorded += 1
+            if len(self._rows) < self.batch_rows:
+                return
+            self._seal_locked()
+        self._wake.set()
+
+    def record_sample(self, node, sample):
+        """
+        记录 MotorController.get_motor_sample() 返回的字典
+        """
+        self.record(node, sample['timestamp_ns'], sample.get('statusWord'), sample.get('position'),
+                    sample.get('velocity'), sample.get('torque'), sample.get('DIs'), sample.get('alarm'),
+                    sample.get('cycle'))
+
+    def _seal_locked(self):
+        rows = self._rows
+        self._rows = []
+        if not rows:
+            return
+        if len(self._batches) >= self.max_pending_batches:
+            self.rows_dropped += len(rows)
+            return
+        self._batches.append(rows)
+
+    def _seal(self):
+        with self._lock:
+            self._seal_locked()
+
+    def _writer_loop(self):
+        while not self._stop_event.is_set():
+            if not self._wake.wait(self.flush_interval):
+                self._seal()
+            self._wake.clear()
+            self._drain()
+            if self._writer is not None and self.rotate_interval is not None \
+                    and time.monotonic() - self._file_opened >= self.rotate_interval:
+                try:
+                    self._write_group()
+                    self._close_file()
+                except Exception as e:
+                    # 写入失败不终止写入线程，记录错误，下一个周期重试
+                    self.last_error = e
+
+    def _drain(self):
+        while self._batches:
+            rows = self._batches.popleft()
+            try:
+                self._add_rows(rows)
+            except Exception as e:
+                self.last_error = e
+                with self._lock:
+                    self.rows_dropped += len(rows)
+
+    def _add_rows(self, rows):
+        pa, _ = _require_pyarrow()
+        # 行转列后按列构造 Arrow 数组，None 转换为空值
+        columns = list(zip(*rows))
+        arrays = [pa.array(columns[i], type=field.type) for i, field in enumerate(self._schema)]
+        self._group.append(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        self._group_rows += len(rows)
+        if self._group_rows >= self.row_group_rows or self._file_rows + self._group_rows >= self.rotate_rows:
+            self._write_group()
+
+    def _write_group(self):
+        if not self._group:
+            return
+        pa, pq = _require_pyarrow()
+        table = pa.Table.from_batches(self._group, schema=self._schema)
+        self._group = []
+        self._group_rows = 0
+        if self._writer is None:
+            self._open_file()
+        self._writer.write_table(table, row_group_size=table.num_rows)
+        self._file_rows += table.num_rows
+        self.rows_written += table.num_rows
+        if self._file_rows >= self.rotate_rows:
+            self._close_file()
+
+    def _open_file(self):
+        _, pq = _require_pyarrow()
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self._file_index:04d}.parquet"
+        self._file_index += 1
+        self._part_path = os.path.join(self.directory, name + '.part')
+        self._writer = pq.ParquetWriter(self._part_path, self._schema, compression=self.compression)
+        self._file_rows = 0
+        self._file_opened = time.monotonic()
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        path = self._part_path[:-len('.part')]
+        os.replace(self._part_path, path)
+        self._part_path = None
+        self.files.append(path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+
+    def format_report(self):
+        lines = [f"记录 {self.rows_recorded} 行，写入 {self.rows_written} 行，丢弃 {self.rows_dropped} 行，"
+                 f"文件 {len(self.files)} 个"]
+        if self.last_error is not None:
+            lines.append(f"最近错误: {self.last_error}")
+        return '\n'.join(lines)
+
+
+class TelemetryRecorder(object):
+    def __init__(self, h_master, nodes, sink, period=0.01, bSDO=0, alarm_every=100, timebase=None,
+                 cpu=None, priority=None):
+        """
+        初始化周期采样：每个周期读取各轴状态字、位置、速度、转矩和DI写入 sink
+        参数:
+        h_master - 主站句柄
+        nodes - 从站地址列表
+        sink - TelemetrySink
+        period - 采样周期(秒)，应不小于连接时的 pdo_interval
+        bSDO - 周期数据使用 1 SDO / 0 PDO（默认）
+        alarm_every - 每隔多少个周期用SDO读取一次最新报警，其余行的 alarm 为空；0 表示不读取
+        timebase - SyncTimebase，设置后每行带有估计的SYNC周期序号
+        cpu, priority - 传给 CyclicExecutor 的CPU绑定和 SCHED_FIFO 优先级
+        """
+        self.h_master = h_master
+        self.nodes = list(nodes)
+        self.sink = sink
+        self.bSDO = bSDO
+        self.alarm_every = alarm_every
+        self.timebase = timebase
+        self.read_errors = 0
+        self.executor = CyclicExecutor(period, self._on_cycle, cpu=cpu, priority=priority, name='TelemetryRecorder')
+
+    def _read(self, func, node, bSDO):
+        [res, value] = func(self.h_master, node, bSDO)
+        if res != 0:
+            self.read_errors += 1
+            return None
+        return value
+
+    def _on_cycle(self, cycle, deadline_ns):
+        read_alarm = self.alarm_every and cycle % self.alarm_every == 0
+        for node in self.nodes:
+            t0 = time.monotonic_ns()
+            sw = self._read(Nim_get_statusWord, node, self.bSDO)
+            pos = self._read(Nim_get_currentPosition, node, self.bSDO)
+            vel = self._read(Nim_get_currentVelocity, node, self.bSDO)
+            torque = self._read(Nim_get_currentTorque, node, self.bSDO)
+            dis = self._read(Nim_get_DIs, node, self.bSDO)
+            t1 = time.monotonic_ns()
+            alarm = self._read(Nim_get_newestAlarm, node, 1) if read_alarm else None
+            bus_cycle = None
+            if self.timebase is not None:
+                if not self.bSDO and pos is not None:
+                    self.timebase.observe_value((node, 'position'), pos, t0, t1)
+                bus_cycle = self.timebase.cycle_at(t1)
+            self.sink.record(node, t1, sw, pos, vel, torque, dis, alarm, bus_cycle)
+
+    def start(self):
+        """
+        启动 sink 和后台采样线程
+        """
+        self.sink.start()
+        self.executor.start()
+
+    def stop(self):
+        """
+        停止采样，写完剩余数据并关闭文件
+        """
+        self.executor.stop()
+        self.sink.stop()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="查看遥测Parquet目录")
+    parser.add_argument('directory', help="TelemetrySink 输出目录")
+    args = parser.parse_args(argv)
+
+    _, pq = _require_pyarrow()
+    names = sorted(n for n in os.listdir(args.directory) if n.endswith('.parquet'))
+    total_rows = 0
+    total_bytes = 0
+    for name in names:
+        path = os.path.join(args.directory, name)
+        meta = pq.read_metadata(path)
+        size = os.path.getsize(path)
+        total_rows += meta.num_rows
+        total_bytes += size
+        print(f"{name}: {meta.num_rows} 行, {meta.num_row_groups} 个行组, {size} 字节")
+    if names:
+        print(f"合计: {len(names)} 个文件, {total_rows} 行, {total_bytes} 字节"
+              f" ({total_bytes / max(total_rows, 1):.1f} 字节/行)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
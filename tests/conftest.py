@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+"""
+测试使用本地模拟器（sdk_simulator）代替SDK动态库，不需要驱动器和适配器
+"""
+
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import NimServoSDK
+from sdk_simulator import install_simulator
+
+
+@pytest.fixture
+def sim():
+    simulator = install_simulator(nodes=[1, 2])
+    yield simulator
+    NimServoSDK.attach_library(None)
+
+
+@pytest.fixture
+def motor(sim):
+    from motor_control import MotorController
+    m = MotorController(comm_type=0, node_id=1)
+    assert m.connect_canopen() and m.initialize_motor(), m.status
+    yield m
+    m.close()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import csv
+from NimServoSDK import *
+from audit_log import AuditLog, read_header, iter_records, to_csv
+
+
+def test_records_sdk_calls(motor, tmp_path):
+    path = str(tmp_path / 'audit.bin')
+    log = AuditLog(path, flush_interval=0.01)
+    log.start()
+    assert Nim_set_profileVelocity(motor.h_master, 1, 12.5) == 0
+    [nRes, position] = Nim_get_currentPosition(motor.h_master, 2, 1)
+    Nim_get_currentPosition(motor.h_master, 9, 1)
+    log.stop()
+
+    header, _ = read_header(path)
+    assert 'Nim_get_currentPosition' in header['functions']
+    records = list(iter_records(path))
+    assert log.records_written == len(records) and log.records_dropped == 0
+    assert [r['seq'] for r in records] == list(range(len(records)))
+    velocity, read, missing = records[-3:]
+    assert velocity['func'] == 'Nim_set_profileVelocity'
+    assert (velocity['node'], velocity['result'], velocity['arg0']) == (1, 0, 12.5)
+    assert read['func'] == 'Nim_get_currentPosition'
+    assert (read['node'], read['result'], read['out']) == (2, 0, position)
+    assert missing['result'] != 0
+    assert all(r['t_ns'] > 0 for r in records)
+
+
+def test_to_csv(motor, tmp_path):
+    path = str(tmp_path / 'audit.bin')
+    with AuditLog(path):
+        Nim_get_statusWord(motor.h_master, 1, 1)
+    count = to_csv(path, str(tmp_path / 'audit.csv'))
+    with open(str(tmp_path / 'audit.csv'), encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert count == len(rows) - 1 == 1
+    assert rows[1][3] == 'Nim_get_statusWord'
+
+
+def test_stopped_log_does_not_record(motor, tmp_path):
+    path = str(tmp_path / 'audit.bin')
+    log = AuditLog(path)
+    log.start()
+    log.stop()
+    Nim_get_statusWord(motor.h_master, 1, 1)
+    assert list(iter_records(path)) == []
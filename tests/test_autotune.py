@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import pytest
+from NimServoSDK import *
+from autotune import ProfileAutoTuner, profile_position
+
+
+@pytest.fixture
+def pp(sim, motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    return motor
+
+
+def test_profile_position():
+    # 梯形: 加速1s走0.5，匀速1s走1，减速1s走0.5
+    assert profile_position(0.5, 2.0, 1.0, 1.0, 1.0) == pytest.approx(0.125)
+    assert profile_position(1.5, 2.0, 1.0, 1.0, 1.0) == pytest.approx(1.0)
+    assert profile_position(5.0, 2.0, 1.0, 1.0, 1.0) == pytest.approx(2.0)
+    # 三角形: 达不到设定速度
+    assert profile_position(10.0, 0.5, 10.0, 1.0, 1.0) == pytest.approx(0.5)
+
+
+def test_tune_confirms_and_restores_profile(sim, pp):
+    original = (Nim_get_profileVelocity(pp.h_master, 1)[1], Nim_get_profileAccel(pp.h_master, 1)[1],
+                Nim_get_profileDecel(pp.h_master, 1)[1])
+    tuner = ProfileAutoTuner(pp.h_master, 1, 0.2, max_trials=3, confirm_runs=2)
+    best = tuner.tune()
+    assert best is not None and best.ok and tuner.aborted is None
+    checks = [t for t in tuner.trials if t.check_of is best]
+    assert len(checks) == 2 and all(t.ok for t in checks)
+    assert best.move_time == max([best.move_time] + [t.move_time for t in checks])
+    assert len([t for t in tuner.trials if t.check_of is None]) <= 3
+    assert (Nim_get_profileVelocity(pp.h_master, 1)[1], Nim_get_profileAccel(pp.h_master, 1)[1],
+            Nim_get_profileDecel(pp.h_master, 1)[1]) == original
+    assert "结果:" in tuner.format_report()
+
+
+def test_failed_confirmation_falls_back(sim, pp):
+    rejected = []
+
+    def on_trial(trial):
+        # 让运动时间最短的候选第一次复测不通过
+        if trial.check_of is not None and not rejected:
+            rejected.append(trial.check_of)
+            trial.ok = False
+            trial.reason = "测试注入"
+
+    tuner = ProfileAutoTuner(pp.h_master, 1, 0.2, max_trials=3, confirm_runs=1, on_trial=on_trial)
+    best = tuner.tune()
+    assert rejected and not rejected[0].ok
+    assert "复测未通过" in rejected[0].reason
+    assert best is not rejected[0]
+    if best is not None:
+        assert best.move_time >= rejected[0].move_time
+
+
+def test_drive_fault_aborts(sim, pp):
+    def on_trial(trial):
+        sim.raise_alarm(1, 0x2310)
+
+    tuner = ProfileAutoTuner(pp.h_master, 1, 0.2, max_trials=10, on_trial=on_trial)
+    assert tuner.tune() is None
+    assert tuner.aborted == "驱动器故障"
+    assert len(tuner.trials) == 2
+    assert tuner.trials[-1].reason == "驱动器故障"
+    assert "整定中止: 驱动器故障" in tuner.format_report()
+
+
+def test_drive_fault_during_move_aborts(sim, pp):
+    timer = threading.Timer(0.05, sim.raise_alarm, (1, 0x2310))
+    timer.start()
+    tuner = ProfileAutoTuner(pp.h_master, 1, 0.2, max_trials=10)
+    try:
+        assert tuner.tune() is None
+    finally:
+        timer.cancel()
+    assert tuner.aborted == "驱动器故障"
+    assert len(tuner.trials) == 1
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from NimServoSDK import *
+from bus_planner import frame_bits, pdo_bytes, estimate_bus_load, recommend_intervals, CallRateMonitor
+
+
+def test_frame_bits_worst_case_stuffing():
+    assert frame_bits(0) == 55
+    assert frame_bits(8) == 135
+    with pytest.raises(ValueError):
+        frame_bits(9)
+
+
+def test_pdo_bytes_from_mapping():
+    tpdos = [[(0x6041, 0, 16), (0x6064, 0, 32)], [], [(0x6061, 0, 8)]]
+    assert pdo_bytes(tpdos) == [6, 1]
+    assert pdo_bytes([6, 0, 5]) == [6, 5]
+
+
+def test_estimate_counts_cyclic_frames():
+    est = estimate_bus_load(2, baudrate=CanBaudRate.CAN_BT_1000K, pdo_interval=10, sync_interval=5)
+    assert est.frames['SYNC'] == 200
+    assert est.frames['TPDO'] == 200 * 4
+    assert est.frames['RPDO'] == 100 * 4
+    expected = 200 * (55 + 2 * (frame_bits(6) + frame_bits(5))) + 100 * 2 * (frame_bits(6) + frame_bits(5))
+    assert est.bits_per_second == pytest.approx(expected)
+    assert est.feasible
+
+
+def test_overloaded_bus_is_infeasible():
+    est = estimate_bus_load(20, baudrate=CanBaudRate.CAN_BT_500K, pdo_interval=1, sync_interval=1)
+    assert est.utilization > 1.0
+    assert not est.feasible
+    assert "不可行" in est.format_report()
+
+
+def test_recommend_returns_shortest_feasible_interval():
+    pdo, sync, est = recommend_intervals(20, baudrate=CanBaudRate.CAN_BT_500K, max_utilization=0.7)
+    assert pdo == sync and pdo > 1
+    assert est.utilization <= 0.7
+    shorter = estimate_bus_load(20, baudrate=CanBaudRate.CAN_BT_500K, pdo_interval=pdo - 1, sync_interval=pdo - 1)
+    assert shorter.utilization > 0.7 or shorter.sync_response_time > pdo - 1
+
+
+def test_recommend_gives_up_within_max_interval():
+    assert recommend_intervals(100, baudrate=CanBaudRate.CAN_BT_10K, max_interval=5)[:2] == (None, None)
+
+
+def test_call_rate_monitor_separates_sdo_and_pdo(sim, motor):
+    monitor = CallRateMonitor()
+    monitor.start()
+    try:
+        for _ in range(3):
+            Nim_get_statusWord(motor.h_master, 1, 1)
+        for _ in range(5):
+            Nim_get_statusWord(motor.h_master, 1, 0)
+        Nim_is_online(motor.h_master, 1)
+    finally:
+        monitor.stop()
+    assert monitor.sdo_calls == 3
+    assert monitor.pdo_calls == 5
+    assert 'Nim_is_online' not in monitor.functions
+    measured = monitor.compare(estimate_bus_load(2))
+    assert measured.sdo_rate > 0
+    assert measured.utilization > estimate_bus_load(2).utilization
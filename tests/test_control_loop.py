@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from NimServoSDK import *
+from control_loop import ControlLoop
+
+AXES = {1: ServoWorkMode.SERVO_CSV_MODE, 2: ServoWorkMode.SERVO_CST_MODE}
+
+
+def test_rejects_non_cyclic_modes(sim, motor):
+    with pytest.raises(ValueError):
+        ControlLoop(motor.h_master, {1: ServoWorkMode.SERVO_PP_MODE}, lambda c, t, fb: None)
+
+
+def test_setpoints_clamped_and_written(sim, motor):
+    seen = []
+
+    def callback(cycle, t, fb):
+        seen.append((t, fb[1].valid, fb[2].valid))
+        return {1: 100.0, 2: 500.7, 3: 1.0}
+
+    loop = ControlLoop(motor.h_master, AXES, callback, period=0.002, limits={1: (-50.0, 50.0)})
+    assert loop.run(cycles=5) == 5
+    assert sim.axes[1].target_velocity == 50.0
+    assert sim.axes[2].target_torque == 500
+    assert all(v1 and v2 for _, v1, v2 in seen)
+    assert seen[0][0] == 0.0 and seen[1][0] == pytest.approx(0.002)
+    assert loop.write_errors == 0 and loop.read_errors == 0
+
+    loop.stop()
+    assert sim.axes[1].target_velocity == 0.0
+    assert sim.axes[2].target_torque == 0
+
+
+def test_budget_overrun_holds_last_setpoint(sim, motor):
+    def callback(cycle, t, fb):
+        if cycle >= 2:
+            time.sleep(0.005)
+            return {1: 99.0}
+        return {1: 10.0}
+
+    loop = ControlLoop(motor.h_master, {1: ServoWorkMode.SERVO_CSV_MODE}, callback, period=0.01, budget=0.002)
+    loop.run(cycles=4)
+    assert loop.budget_overruns == 2 and loop.held_cycles == 2
+    assert sim.axes[1].target_velocity == 10.0
+    assert loop.utilization()['max'] > 1.0
+
+
+def test_callback_error_holds_last_setpoint(sim, motor):
+    def callback(cycle, t, fb):
+        if cycle == 0:
+            return {1: 5.0}
+        raise RuntimeError("控制律异常")
+
+    loop = ControlLoop(motor.h_master, {1: ServoWorkMode.SERVO_CSV_MODE}, callback, period=0.002)
+    loop.run(cycles=3)
+    assert loop.callback_errors == 2 and isinstance(loop.last_error, RuntimeError)
+    assert sim.axes[1].target_velocity == 5.0
+    assert "回调异常: 2" in loop.format_report()
+
+
+def test_offline_axis_reports_invalid_feedback(sim, motor):
+    sim.set_online(2, False)
+    invalid = []
+    loop = ControlLoop(motor.h_master, AXES, lambda c, t, fb: invalid.append(not fb[2].valid), period=0.002)
+    loop.run(cycles=3)
+    assert invalid == [True] * 3
+    assert loop.read_errors == 3 and loop.write_errors == 3
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os, threading, time
+import pytest
+from cyclic_executor import CyclicExecutor, OVERRUN_CATCH_UP, set_realtime, restore_realtime
+
+
+def test_deadlines_are_absolute():
+    deadlines = []
+    ex = CyclicExecutor(0.002, lambda n, d: deadlines.append(d))
+    assert ex.run(cycles=20) == 20
+    assert deadlines[0] == ex.start_ns
+    # 截止时刻按起始时刻加整数个周期计算，负载下跳过的周期也不会引入漂移
+    steps = [(b - a) // 2000000 for a, b in zip(deadlines, deadlines[1:])]
+    assert all((d - ex.start_ns) % 2000000 == 0 for d in deadlines)
+    assert sum(steps) == len(steps) + ex.skipped
+    assert ex.period_hist.total == 19
+
+
+def test_overrun_skips_missed_cycles():
+    deadlines = []
+
+    def slow(n, deadline_ns):
+        deadlines.append(deadline_ns)
+        if n == 2:
+            time.sleep(0.0105)
+
+    ex = CyclicExecutor(0.002, slow)
+    ex.run(cycles=6)
+    assert ex.overruns >= 1 and ex.skipped >= 5
+    # 跳过后的截止时刻仍与起始时刻相位对齐
+    assert all((d - ex.start_ns) % 2000000 == 0 for d in deadlines)
+    assert deadlines[3] - deadlines[2] >= 12000000
+
+
+def test_overrun_catch_up_runs_every_cycle():
+    deadlines = []
+
+    def slow(n, deadline_ns):
+        deadlines.append(deadline_ns)
+        if n == 2:
+            time.sleep(0.0105)
+
+    ex = CyclicExecutor(0.002, slow, overrun=OVERRUN_CATCH_UP)
+    ex.run(cycles=6)
+    assert ex.skipped == 0
+    assert deadlines == [ex.start_ns + i * 2000000 for i in range(6)]
+
+
+def test_callback_errors_counted():
+    def fail(n, deadline_ns):
+        raise RuntimeError("boom")
+
+    ex = CyclicExecutor(0.001, fail)
+    assert ex.run(cycles=3) == 3
+    assert ex.callback_errors == 3 and isinstance(ex.last_error, RuntimeError)
+
+
+def test_background_start_and_request_stop():
+    ex = CyclicExecutor(0.001, name='TestCyclic')
+    ex.add(lambda n, d: ex.request_stop() if n == 9 else None)
+    ex.start()
+    ex.join(timeout=2.0)
+    assert ex._thread is None
+    assert ex.cycles == 10
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_getaffinity'), reason="需要 sched_getaffinity")
+def test_realtime_settings_restored():
+    affinity = os.sched_getaffinity(0)
+    cpu = min(affinity)
+    seen = []
+    ex = CyclicExecutor(0.001, lambda n, d: seen.append(os.sched_getaffinity(0)), cpu=cpu, priority=99)
+    ex.run(cycles=2)
+    assert seen[0] == {cpu}
+    assert os.sched_getaffinity(0) == affinity
+    # 无权限时退回普通调度并记录原因
+    assert ex.rt_status['sched_fifo'] is True or ex.rt_status['errors']
+    assert os.sched_getscheduler(0) == os.SCHED_OTHER
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import queue, time
+import pytest
+from di_events import DIService, DISubscription, EDGE_RISING, EDGE_FALLING, EDGE_BOTH
+
+
+def test_edges_dispatched_once_per_node(sim, motor):
+    di = DIService(motor.h_master, bSDO=1)
+    rising, both = [], queue.Queue()
+    di.subscribe(1, 0, EDGE_RISING, callback=rising.append)
+    di.subscribe(1, 1, EDGE_BOTH, queue=both)
+    assert di.poll() == []              # 第一个周期只记录初始电平
+
+    sim.axes[1].DIs = 0b11
+    events = di.poll()
+    assert [(e.bit, e.edge, e.level) for e in events] == [(0, EDGE_RISING, 1), (1, EDGE_RISING, 1)]
+    sim.axes[1].DIs = 0
+    events = di.poll()
+    assert [(e.bit, e.edge) for e in events] == [(1, EDGE_FALLING)]
+    assert [e.bit for e in rising] == [0]
+    assert both.qsize() == 2
+    assert events[0].cycle == di.cycle_count == 3
+
+
+def test_debounce_filters_glitches():
+    sub = DISubscription(1, 0, EDGE_BOTH, None, None, debounce_ns=1000)
+    assert sub.update(0, 0) == 0
+    assert sub.update(1, 100) == 0
+    assert sub.update(0, 500) == 0      # 持续时间不足，毛刺被忽略
+    assert sub.update(1, 600) == 0
+    assert sub.update(1, 1600) == EDGE_RISING
+    assert sub.update(1, 2000) == 0
+
+
+def test_read_errors_and_unsubscribe(sim, motor):
+    di = DIService(motor.h_master, bSDO=1)
+    sub = di.subscribe(2, 0, callback=lambda e: None)
+    sim.set_online(2, False)
+    di.poll()
+    assert di.read_errors[2] == 1
+    di.unsubscribe(sub)
+    di.poll()
+    assert di.read_errors[2] == 1
+    with pytest.raises(ValueError):
+        di.subscribe(1, 0)
+
+
+def test_background_thread(sim, motor):
+    di = DIService(motor.h_master, cycle=0.005, bSDO=1)
+    events = queue.Queue()
+    di.subscribe(1, 2, EDGE_RISING, queue=events)
+    di.start()
+    try:
+        time.sleep(0.05)
+        sim.axes[1].DIs = 0b100
+        event = events.get(timeout=1.0)
+    finally:
+        di.stop()
+    assert (event.node_id, event.bit, event.edge) == (1, 2, EDGE_RISING)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import time
+from drive_config import read_config, apply_config, restore_many, export_config, load_config_file, diff_config
+
+CONFIG = {'unitsFactor': 20000.0, 'profileVelocity': 11.0, 'profileAccel': 50.0, 'profileDecel': 40.0}
+
+
+def test_apply_config_roundtrip(motor):
+    result = apply_config(motor.h_master, 1, CONFIG, save=False)
+    assert result.success
+    assert result.written[0] == 'unitsFactor'
+    config, errors = read_config(motor.h_master, 1, items=list(CONFIG))
+    assert not errors
+    for name, value in CONFIG.items():
+        assert config[name] == value
+    # 再次写入相同配置时没有需要写入的参数
+    assert apply_config(motor.h_master, 1, CONFIG, save=False).written == []
+
+
+def test_restore_many_cancels_timed_out_node(sim, motor):
+    orig = sim.Nim_set_profileAccel
+    decel = sim.axes[2].profile_decel
+
+    def slow(h, node, accel):
+        if node == 2:
+            time.sleep(0.3)
+        return orig(h, node, accel)
+
+    sim.Nim_set_profileAccel = slow
+    fleet = restore_many(motor.h_master, {1: CONFIG, 2: CONFIG}, save=False, timeout=0.1)
+    assert fleet.results[1].success
+    result = fleet.results[2]
+    assert result.timed_out and result.cancelled and not result.saved
+    # 超时的工作线程已结束，之后不再写入参数
+    time.sleep(0.3)
+    assert sim.axes[2].profile_decel == decel
+
+
+def test_export_diff_and_restore_file(motor, tmp_path):
+    path = str(tmp_path / 'node1.json')
+    config, errors = export_config(motor.h_master, 1, path)
+    assert not errors and 'unitsFactor' in config
+    assert load_config_file(path) == config
+    assert diff_config(motor.h_master, 1, config) == []
+
+    assert apply_config(motor.h_master, 1, CONFIG, save=False).success
+    diffs = diff_config(motor.h_master, 1, load_config_file(path))
+    assert sorted(d.name for d in diffs) == sorted(CONFIG)
+    assert apply_config(motor.h_master, 1, load_config_file(path), save=False).success
+    assert diff_config(motor.h_master, 1, config) == []
+
+
+def test_restore_many_offline_node(sim, motor):
+    sim.set_online(2, False)
+    fleet = restore_many(motor.h_master, {1: CONFIG, 2: CONFIG}, save=False, timeout=5.0)
+    assert fleet.results[1].success
+    assert not fleet.results[2].success and fleet.results[2].errors
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import time
+from NimServoSDK import *
+from homing import HomingOrchestrator, HomingAxis, HOMING_DONE, HOMING_FAILED
+
+
+def _stale_status(sim, hold):
+    """
+    启动回零后的 hold 秒内，状态字读取返回启动前的值（模拟尚未更新的PDO）
+    """
+    orig_status, orig_home = sim.Nim_get_statusWord, sim.Nim_goHome
+    stale = {}
+
+    def status_word(h, node, ref, bSDO):
+        if node in stale and time.monotonic() < stale[node][0]:
+            ref._obj.value = stale[node][1]
+            return 0
+        return orig_status(h, node, ref, bSDO)
+
+    def go_home(h, node, bSDO):
+        [nRes, sw] = Nim_get_statusWord(h, node, 1)
+        stale[node] = (time.monotonic() + hold, sw)
+        return orig_home(h, node, bSDO)
+
+    sim.Nim_get_statusWord = status_word
+    sim.Nim_goHome = go_home
+
+
+def test_parallel_homing(sim, motor):
+    sim.axes[1].homing_time = 0.1
+    sim.axes[2].homing_time = 0.1
+    orch = HomingOrchestrator(motor.h_master, [HomingAxis(1, 35), HomingAxis(2, 35, depends_on=[1])])
+    results = orch.run(timeout=5.0)
+    assert results[1].state == HOMING_DONE
+    assert results[2].state == HOMING_DONE
+    assert results[2].start_time >= results[1].start_time + results[1].duration
+
+
+def test_rehome_ignores_stale_attained(sim, motor):
+    sim.axes[1].homing_time = 0.3
+    axes = [HomingAxis(1, 35)]
+    assert HomingOrchestrator(motor.h_master, axes).run(timeout=5.0)[1].state == HOMING_DONE
+
+    # 已回零的轴再次回零，启动后读到的状态字仍带着上一次的原点回归完成位
+    _stale_status(sim, 0.05)
+    result = HomingOrchestrator(motor.h_master, axes, settle_time=0.1).run(timeout=5.0)[1]
+    assert result.state == HOMING_DONE
+    assert result.duration >= 0.25
+
+
+def test_velocity2_kept_when_only_velocity1_given(sim, motor):
+    sim.axes[1].homing_time = 0.05
+    [nRes, velocity1, velocity2] = Nim_get_goHome_velocity(motor.h_master, 1)
+    assert nRes == 0 and velocity2 < velocity1
+    orch = HomingOrchestrator(motor.h_master, [HomingAxis(1, 35, velocity1=20.0)])
+    assert orch.run(timeout=5.0)[1].state == HOMING_DONE
+    assert Nim_get_goHome_velocity(motor.h_master, 1) == [0, 20.0, velocity2]
+
+
+def test_configure_failure_reported(sim, motor):
+    sim.set_online(2, False)
+    orch = HomingOrchestrator(motor.h_master, [HomingAxis(1, 35), HomingAxis(2, 35)])
+    results = orch.run(timeout=5.0)
+    assert results[1].state == HOMING_DONE
+    assert results[2].state == HOMING_FAILED
+    assert results[2].error is not None
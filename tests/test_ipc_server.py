@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import socket, struct, threading, time
+import pytest
+from ipc_server import ControlServer, ControlClient, IPCError, MAX_FRAME_BYTES
+
+
+@pytest.fixture
+def server(motor, tmp_path):
+    srv = ControlServer(motor, str(tmp_path / 'control.sock'))
+    srv.start()
+    yield srv
+    srv.stop()
+
+
+def test_call_and_pipeline(server):
+    client = ControlClient(server.path)
+    try:
+        assert client.call('ping') is None
+        assert client.call('set_profile_position_mode')
+        futures = [client.call_async('Nim_get_currentPosition', n, 1) for n in (1, 2)]
+        assert [f.result(timeout=5)[0] for f in futures] == [0, 0]
+        with pytest.raises(IPCError, match="PermissionError"):
+            client.call('Nim_master_stop')
+    finally:
+        client.close()
+
+
+def test_calls_from_clients_are_serialized(server, motor):
+    active, peak = [0], [0]
+    get_motor_status = motor.get_motor_status
+
+    def tracked():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.005)
+        active[0] -= 1
+        return get_motor_status()
+
+    motor.get_motor_status = tracked
+    clients = [ControlClient(server.path) for _ in range(4)]
+    threads = [threading.Thread(target=lambda c=c: [c.call('get_motor_status') for _ in range(5)]) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for c in clients:
+        c.close()
+    assert peak[0] == 1
+
+
+@pytest.mark.parametrize('length', [2, MAX_FRAME_BYTES + 1])
+def test_invalid_frame_length_drops_connection(server, length):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(2.0)
+    try:
+        sock.connect(server.path)
+        sock.sendall(struct.pack('<IBI', length, 1, 1))
+        assert sock.recv(16) == b''
+    finally:
+        sock.close()
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_subscription_fanout(server):
+    a, b = ControlClient(server.path), ControlClient(server.path)
+    got = {'a': [], 'b': []}
+    try:
+        a.subscribe(1, 'position', 200, lambda *ev: got['a'].append(ev))
+        b.subscribe(1, 'position', 50, lambda *ev: got['b'].append(ev))
+        assert _wait_for(lambda: len(got['a']) >= 5 and len(got['b']) >= 2)
+        assert got['a'][0][:2] == (1, 'position')
+        # 同一数据只读取一路
+        assert "订阅 2（读取 1 路）" in server.format_report()
+    finally:
+        a.close()
+        b.close()
+
+
+def test_rejected_subscribe_then_disconnect(server, monkeypatch):
+    client = ControlClient(server.path)
+    with pytest.raises(IPCError, match="ValueError"):
+        client.call('subscribe', 1, 'bogus', 100, False)
+    with pytest.raises(IPCError, match="ValueError"):
+        client.call('subscribe', 1, 'position', 0, False)
+
+    def failing(*args, **kwargs):
+        raise RuntimeError("scheduler full")
+
+    monkeypatch.setattr(server.scheduler, 'subscribe', failing)
+    with pytest.raises(IPCError, match="RuntimeError"):
+        client.call('subscribe', 1, 'position', 100, False)
+    assert "订阅 0（读取 0 路）" in server.format_report()
+    client.close()
+    assert _wait_for(lambda: "客户端: 当前 0" in server.format_report())
+    monkeypatch.undo()
+
+    # 断开时的清理没有出错，服务仍可接受新的连接和订阅
+    got = []
+    with ControlClient(server.path) as client:
+        assert client.call('ping') is None
+        client.subscribe(1, 'position', 100, lambda *ev: got.append(ev))
+        assert _wait_for(lambda: len(got) >= 2)
+    assert _wait_for(lambda: "订阅 0（读取 0 路）" in server.format_report())
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+import NimServoSDK
+from NimServoSDK import *
+from latency_probe import LatencyProbe, main, CMD_MOVE, CMD_VELOCITY, BY_STATUS
+
+
+def test_move_latency_includes_reaction_delay(sim, motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    sim.reaction_delay = 0.01
+    probe = LatencyProbe(motor.h_master, 1, config="sim", phase_jitter=0.002)
+    samples = probe.measure_move(distance=0.2, trials=4)
+    assert len(samples) == 4 and probe.errors == 0
+    assert all(0.01 <= s.latency_ns / 1e9 < 0.05 for s in samples)
+    assert all(s.detected_by == BY_STATUS for s in samples)
+    stats = probe.summary()[("sim", CMD_MOVE, 'PDO')]
+    assert stats['latency']['count'] == 4 and stats['timeouts'] == 0
+
+
+def test_velocity_latency_over_sdo(sim, motor):
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    sim.reaction_delay = 0.005
+    probe = LatencyProbe(motor.h_master, 1, config="sim", phase_jitter=0.002)
+    samples = probe.measure_velocity(velocity=5.0, trials=3, bSDO=1)
+    assert len(samples) == 3
+    assert all(s.path == 'SDO' and s.latency_ns >= 5000000 for s in samples)
+    assert ("sim", CMD_VELOCITY, 'SDO') in probe.summary()
+
+
+def test_timeout_reported(sim, motor):
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    sim.reaction_delay = 0.2
+    probe = LatencyProbe(motor.h_master, 1, config="slow", timeout=0.05, phase_jitter=0.0)
+    samples = probe.measure_velocity(velocity=5.0, trials=1)
+    assert samples[0].latency_ns is None
+    assert probe.summary()[("slow", CMD_VELOCITY, 'PDO')]['timeouts'] == 1
+
+
+def test_command_line_on_simulator(capsys):
+    try:
+        assert main(['--sim', '--trials', '2', '--commands', 'move', '--paths', 'pdo',
+                     '--pdo-interval', '1,5', '--reaction-delay', '0.002']) == 0
+    finally:
+        NimServoSDK.attach_library(None)
+    out = capsys.readouterr().out
+    assert "CAN 1/1ms" in out and "CAN 5/5ms" in out
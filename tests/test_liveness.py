@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import time
+from NimServoSDK import *
+from liveness import LivenessTracker, EVENT_LOST, EVENT_RECOVERED
+
+
+def _poll(motor, node, bSDO, seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        Nim_get_currentPosition(motor.h_master, node, bSDO)
+        time.sleep(0.005)
+
+
+def test_lost_while_polling_pdo(sim, motor):
+    # PDO读取只读主站本地缓存，掉线后仍然成功，不能当作心跳
+    events = []
+    tracker = LivenessTracker(motor.h_master, [1, 2], check_interval=0.05,
+                              on_event=lambda node, event, state: events.append((node, event)))
+    tracker.start()
+    try:
+        _poll(motor, 1, 0, 0.1)
+        sim.set_online(1, False)
+        _poll(motor, 1, 0, 0.2)
+        assert (1, EVENT_LOST) in events
+        sim.set_online(1, True)
+        _poll(motor, 1, 0, 0.2)
+        assert (1, EVENT_RECOVERED) in events
+    finally:
+        tracker.stop()
+    assert 1 not in tracker.offline_nodes()
+
+
+def test_sdo_reads_are_heartbeats(sim, motor):
+    tracker = LivenessTracker(motor.h_master, [1], check_interval=0.05)
+    tracker.start()
+    try:
+        _poll(motor, 1, 1, 0.3)
+    finally:
+        tracker.stop()
+    state = tracker.nodes[1]
+    assert state.heartbeats > 0
+    assert state.online
+    assert state.last_heartbeat_ns is not None
+    assert state.gap_hist.total > 0
+
+
+def test_pdo_reads_and_checks_fill_gap_statistics(sim, motor):
+    tracker = LivenessTracker(motor.h_master, [1, 2], check_interval=0.05)
+    tracker.start()
+    try:
+        _poll(motor, 1, 0, 0.3)
+    finally:
+        tracker.stop()
+    pdo_polled, idle = tracker.nodes[1], tracker.nodes[2]
+    assert pdo_polled.heartbeats == 0 and pdo_polled.last_heartbeat_ns is None
+    # PDO读取的间隔远小于检查周期
+    assert pdo_polled.gap_hist.total > idle.gap_hist.total > 0
+    assert pdo_polled.gap_hist.percentile(50) < 0.05
+    assert idle.checks > 0 and idle.gap_hist.percentile(50) >= 0.04
+    assert "在线确认间隔" in tracker.format_report()
+
+
+def test_pdo_reads_while_offline_not_counted(sim, motor):
+    tracker = LivenessTracker(motor.h_master, [1], check_interval=0.05)
+    sim.set_online(1, False)
+    assert tracker.check() == [(1, EVENT_LOST)]
+    tracker.start()
+    try:
+        _poll(motor, 1, 0, 0.1)
+    finally:
+        tracker.stop()
+    assert tracker.nodes[1].gap_hist.total == 0
+    assert tracker.nodes[1].last_seen_ns is None
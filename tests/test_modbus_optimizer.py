@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import pytest
+from modbus_optimizer import *
+
+
+@pytest.fixture(params=[FRAMING_TCP, FRAMING_RTU])
+def server(request):
+    srv = ModbusStandInServer(framing=request.param)
+    srv.start()
+    srv.set_registers(1, 0, [11, 12, 13])
+    srv.set_registers(2, 0, [21, 22])
+    srv.set_registers(3, 0, [31])
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def client(server):
+    c = ModbusClient(*server.address, timeout=0.5, framing=server.framing)
+    yield c
+    c.close()
+
+
+def test_coalesce_reads():
+    reads = [ReadRequest(1, 0x100, 1), ReadRequest(1, 0x101, 1), ReadRequest(1, 0x104, 2), ReadRequest(2, 0x100, 1)]
+    blocks = coalesce_reads(reads, max_gap=2)
+    assert [(b.unit, b.start, b.count) for b in blocks] == [(1, 0x100, 6), (2, 0x100, 1)]
+
+
+def test_rtu_frame_crc():
+    assert rtu_frame(1, bytes([0x03, 0x00, 0x00, 0x00, 0x01])) == bytes.fromhex('010300000001840a')
+
+
+def test_coalesce_respects_gap_and_size_limits():
+    reads = [ReadRequest(1, 0, 2), ReadRequest(1, 5, 1), ReadRequest(1, 6, 4)]
+    assert [(b.start, b.count) for b in coalesce_reads(reads)] == [(0, 2), (5, 5)]
+    assert [(b.start, b.count) for b in coalesce_reads(reads, max_gap=3, max_registers=8)] == [(0, 6), (6, 4)]
+    with pytest.raises(ValueError):
+        coalesce_reads([ReadRequest(1, 0, MAX_READ_REGISTERS + 1)])
+
+
+def test_poll_cycle(client):
+    cycle = ModbusPollCycle(client)
+    cycle.add(1, 0, 2)
+    cycle.add(1, 2)
+    cycle.add(3, 0)
+    values = cycle.execute()
+    assert values[(1, 0)] == [11, 12]
+    assert values[(1, 2)] == [13]
+    assert values[(3, 0)] == [31]
+
+
+def test_exception_response_keeps_connection_in_sync(client):
+    blocks = [ReadBlock(1, 0, 2, []), ReadBlock(2, 0, 200, []), ReadBlock(3, 0, 1, []), ReadBlock(1, 5, 1, [])]
+    with pytest.raises(ModbusError):
+        client.read_blocks(blocks)
+    # 之后的请求读到的是自己的应答，而不是上一次遗留的
+    assert client.read_registers(1, 0, 3) == [11, 12, 13]
+    assert client.read_registers(3, 0, 1) == [31]
+    client.write_register(2, 1, 99)
+    assert client.read_registers(2, 0, 2) == [21, 99]
+
+
+def test_mismatched_response_reconnects(server, client):
+    process = server.process
+    calls = [0]
+
+    def wrong_function(unit, pdu):
+        calls[0] += 1
+        if calls[0] == 1:
+            return struct.pack('>BHH', FC_WRITE_SINGLE, 0, 0)
+        return process(unit, pdu)
+
+    server.process = wrong_function
+    with pytest.raises(ConnectionError):
+        client.read_registers(1, 0, 3)
+    assert client.read_registers(1, 0, 3) == [11, 12, 13]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import threading, time
+import pytest
+from NimServoSDK import *
+from motor_control import MotorController
+from motion_program import *
+
+
+@pytest.fixture
+def csp(sim):
+    m = MotorController(comm_type=1, node_id=1)
+    assert m.connect_ethercat(pdo_interval=1) and m.initialize_ethercat(), m.status
+    assert m.set_cyclic_position_mode() and m.enable_motor()
+    yield m
+    m.close()
+
+
+def _position(h, node):
+    [nRes, position] = Nim_get_currentPosition(h, node, 1)
+    assert nRes == 0
+    return position
+
+
+def test_parse_gcode_modal_words():
+    blocks = parse_gcode("G90 G0 X1 Y2 ; 快速移动\n(注释)\nG1 X3 F600\nG91 Y-1\nG4 P0.5\n")
+    assert [b.kind for b in blocks] == [MOVE_RAPID, MOVE_LINEAR, MOVE_LINEAR, DWELL]
+    assert blocks[1].feed == 10.0 and blocks[2].feed == 10.0
+    assert blocks[2].incremental and blocks[2].coords == {'Y': -1.0}
+    assert blocks[3].dwell == 0.5
+    json_blocks = parse_program('[{"G": 0, "X": 1, "Y": 2}, {"G": 1, "X": 3, "F": 600}]')
+    assert [(b.kind, b.coords, b.feed) for b in json_blocks] == [(b.kind, b.coords, b.feed) for b in blocks[:2]]
+    with pytest.raises(ValueError):
+        parse_gcode("G1 X1")
+    with pytest.raises(ValueError):
+        parse_gcode("G0 X1 ?")
+
+
+def test_corner_blending():
+    program = parse_gcode("G1 X10 F600\nG1 X20\nG1 Y10")
+    plan = plan_program(program, ['X', 'Y'], {}, 50.0, 100.0, junction_deviation=0.05)
+    straight, corner = plan.segments[0].v1, plan.segments[1].v1
+    # 同向的段之间不减速，90°拐角按拐角偏差减速但不停下
+    assert straight == pytest.approx(10.0)
+    assert 0.0 < corner < 10.0
+    assert plan.sample(plan.total_time) == (20.0, 10.0)
+    stop = plan_program(program, ['X', 'Y'], {}, 50.0, 100.0, junction_deviation=0.0)
+    assert stop.segments[1].v1 == 0.0
+    assert stop.total_time > plan.total_time
+
+
+def test_csp_run_on_calling_thread(csp):
+    threads = []
+    events = []
+
+    def on_event(kind, index, block):
+        threads.append(threading.current_thread())
+        events.append(kind)
+
+    runner = ProgramRunner(csp.h_master, {'X': 1}, 50.0, 500.0, period=0.001, on_event=on_event)
+    runner.load("G1 X1 F1200\nG1 X2", start={'X': 0.0})
+    assert runner.run()
+    assert set(threads) == {threading.current_thread()}
+    assert events[0] == EVENT_START and events[-1] == EVENT_DONE
+    assert runner.progress() == 1.0
+    assert _position(csp.h_master, 1) == pytest.approx(2.0)
+
+
+def test_stop_from_another_thread(csp):
+    events = []
+    runner = ProgramRunner(csp.h_master, {'X': 1}, 50.0, 500.0, period=0.001,
+                           on_event=lambda kind, index, block: events.append(kind))
+    runner.load("G1 X100 F1200", start={'X': 0.0})
+    stopper = threading.Timer(0.1, runner.stop)
+    stopper.start()
+    assert not runner.run()
+    stopper.join()
+    assert events[-1] == EVENT_STOPPED
+    assert 0.0 < runner.progress() < 1.0
+
+
+def test_pp_run_and_background_start(motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    assert motor.set_motion_parameters(100.0, 1000.0, 1000.0)
+    runner = ProgramRunner(motor.h_master, {'X': 1}, 50.0, 500.0, period=0.002, mode=MODE_PP)
+    runner.load("G0 X1\nG0 X2")
+    assert runner.run()
+    assert _position(motor.h_master, 1) == pytest.approx(2.0)
+    runner.load("G0 X0.5")
+    runner.start()
+    assert runner.wait(5.0)
+    assert _position(motor.h_master, 1) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        runner.load("G4 P1")
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import os, time
+import pytest
+from NimServoSDK import *
+from motor_control import MotorController
+
+
+@pytest.fixture
+def ethercat(sim):
+    m = MotorController(comm_type=1, node_id=1)
+    assert m.connect_ethercat(pdo_interval=1), m.status
+    assert m.initialize_ethercat(), m.status
+    yield m
+    m.close()
+
+
+def test_connect_and_initialize_ethercat(ethercat):
+    assert ethercat.slaves == [1, 2]
+    assert ethercat.set_cyclic_position_mode() and ethercat.enable_motor()
+    [nRes, mode] = Nim_get_workModeDisplay(ethercat.h_master, 1, 1)
+    assert nRes == 0 and mode == ServoWorkMode.SERVO_CSP_MODE
+
+
+def test_run_cyclic(ethercat):
+    assert ethercat.set_cyclic_position_mode() and ethercat.enable_motor()
+    times = []
+
+    def setpoint(t):
+        times.append(t)
+        return t * 10.0
+
+    stats = ethercat.run_cyclic(setpoint, cycle=0.002, duration=0.2)
+    assert stats['errors'] == 0
+    assert stats['cycles'] == len(times)
+    # 轨迹时间为周期的整数倍；负载下跳过的周期不会让时间落后
+    assert times[0] == 0.0
+    assert all(round(t / 0.002) == pytest.approx(t / 0.002) for t in times)
+    assert all(b > a for a, b in zip(times, times[1:]))
+    [sw, position, velocity] = ethercat.get_motor_status()
+    assert position == pytest.approx(times[-1] * 10.0)
+
+
+def test_run_cyclic_time_follows_deadlines(ethercat):
+    assert ethercat.set_cyclic_velocity_mode() and ethercat.enable_motor()
+    samples = []
+
+    def setpoint(t):
+        samples.append((t, time.monotonic()))
+        if len(samples) % 50 == 0:
+            # 超时跳过的周期不能让轨迹时间落后于实际时间
+            time.sleep(0.02)
+        return 0.0
+
+    cpu = min(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else None
+    affinity = os.sched_getaffinity(0) if cpu is not None else None
+    stats = ethercat.run_cyclic(setpoint, cycle=0.002, duration=0.5, cpu=cpu)
+    assert stats['overruns'] > 0
+    elapsed = samples[-1][1] - samples[0][1]
+    assert samples[-1][0] == pytest.approx(elapsed, abs=0.01)
+    if affinity is not None:
+        assert os.sched_getaffinity(0) == affinity
+
+
+@pytest.mark.parametrize('set_mode, mode', [
+    ('set_cyclic_velocity_mode', ServoWorkMode.SERVO_CSV_MODE),
+    ('set_cyclic_torque_mode', ServoWorkMode.SERVO_CST_MODE),
+])
+def test_cyclic_velocity_and_torque_modes(ethercat, set_mode, mode):
+    assert getattr(ethercat, set_mode)() and ethercat.enable_motor()
+    [nRes, actual] = Nim_get_workModeDisplay(ethercat.h_master, 1, 1)
+    assert nRes == 0 and actual == mode
+    stats = ethercat.run_cyclic(lambda t: 1.0, cycle=0.002, duration=0.05)
+    assert stats['cycles'] > 0 and stats['errors'] == 0
+
+
+def test_run_cyclic_requires_cyclic_mode(ethercat):
+    assert ethercat.run_cyclic(lambda t: 0.0, duration=0.01) is None
+    assert "周期同步模式" in ethercat.status
+
+
+def test_move_planner_relative_from_last_target(motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    assert Nim_set_posLimit(motor.h_master, 1, -1.0, 8.0) == 0
+    planner = motor.enable_move_planner(max_accel=100.0, max_decel=100.0)
+    assert motor.move_by_distance(5.0)
+    # 缓冲的相对运动从上一个目标开始，终点 10 超出位置限制
+    assert not motor.move_by_distance(5.0, immediate=False)
+    assert planner.last_target == 5.0
+    assert motor.quick_stop()
+    assert planner.last_target is None
+
+
+def test_move_planner_recreated_after_master_rebuild(motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    planner = motor.enable_move_planner(max_accel=100.0, max_decel=100.0)
+    planner.h_master = None
+    assert motor.move_to_position(1.0)
+    assert motor.move_planner is not planner
+    assert motor.move_planner.h_master == motor.h_master
+
+
+@pytest.mark.parametrize('move, func', [
+    ('move_to_position', 'Nim_moveAbsolute'),
+    ('move_by_distance', 'Nim_moveRelative'),
+])
+def test_rejected_move_reports_error(sim, motor, move, func):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    planner = motor.enable_move_planner(max_accel=100.0, max_decel=100.0)
+    setattr(sim, func, lambda *args: ServoSDK_Error.ServoSDK_SlaveInternalError)
+    assert not getattr(motor, move)(1.0)
+    assert str(ServoSDK_Error.ServoSDK_SlaveInternalError) in motor.status
+    assert planner.last_target is None
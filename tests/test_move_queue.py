@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from NimServoSDK import *
+from move_queue import MoveQueue, QUEUE_DONE, QUEUE_FAILED, QUEUE_STOPPED
+
+
+@pytest.fixture
+def pp(motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    assert motor.set_motion_parameters(100.0, 1000.0, 1000.0)
+    return motor
+
+
+def _position(motor):
+    [nRes, position] = Nim_get_currentPosition(motor.h_master, 1, 1)
+    assert nRes == 0
+    return position
+
+
+def test_move_sequence_absolute(pp):
+    progress = []
+    assert pp.move_sequence([1.0, 2.0, 3.0], timeout=5.0, on_progress=lambda done, total: progress.append((done, total)))
+    assert _position(pp) == pytest.approx(3.0)
+    assert progress[-1] == (3, 3)
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+
+def test_move_sequence_relative(pp):
+    assert pp.move_sequence([1.0, 1.0, -0.5], relative=True, timeout=5.0), pp.status
+    assert _position(pp) == pytest.approx(1.5)
+
+
+def test_move_sequence_requires_pp_mode(motor):
+    assert motor.set_profile_velocity_mode()
+    assert not motor.move_sequence([1.0])
+    assert "非轮廓位置模式" in motor.status
+
+
+def test_points_buffered_without_starving(pp):
+    q = MoveQueue(pp.h_master, 1, period=0.002)
+    q.extend([0.5 * (i + 1) for i in range(10)])
+    assert q.run(timeout=5.0)
+    assert q.done == q.sent == 10
+    assert q.starved_cycles == 0
+
+
+def test_append_while_running(pp):
+    q = MoveQueue(pp.h_master, 1, period=0.002)
+    q.append(1.0)
+    q.start()
+    q.append(2.0)
+    assert q.wait(5.0)
+    assert q.state == QUEUE_DONE and q.total == 2
+    assert _position(pp) == pytest.approx(2.0)
+
+
+def test_fault_aborts_queue(sim, pp):
+    q = MoveQueue(pp.h_master, 1, period=0.002)
+    q.extend([5.0, 10.0])
+    q.start()
+    time.sleep(0.05)
+    sim.raise_alarm(1, 0x2310)
+    assert not q.wait(5.0)
+    assert q.state == QUEUE_FAILED and q.error == "驱动器故障"
+
+
+def test_stop_and_timeout(pp):
+    q = MoveQueue(pp.h_master, 1, period=0.002)
+    q.extend([50.0])
+    q.start()
+    q.stop()
+    assert q.state == QUEUE_STOPPED
+    q = MoveQueue(pp.h_master, 1, period=0.002)
+    q.extend([-50.0])
+    assert not q.run(timeout=0.05)
+    assert q.state == QUEUE_FAILED and q.error == "执行超时"
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from NimServoSDK import *
+from sdk_simulator import MASTER_OP
+from pdo_mapping import AXIS_SNAPSHOT, apply_pdo_mapping, pack_pdos, validate_pdo
+from pdo_router import PdoRouter, read_pdo_mapping
+
+TPDOS = [['statusWord', 'positionActual'], ['velocityActual', 'torqueActual']]
+
+
+def test_pack_axis_snapshot():
+    pdos = pack_pdos(AXIS_SNAPSHOT)
+    assert pdos == [[(0x6041, 0, 16), (0x6064, 0, 32), (0x6077, 0, 16)], [(0x606C, 0, 32)]]
+    with pytest.raises(ValueError):
+        pack_pdos(['statusWord', 'statusWord'])
+    with pytest.raises(ValueError):
+        # 9 个32位对象需要5个PDO
+        pack_pdos(['targetPosition', 'positionActual', 'velocityActual', 'followingError', 'profileVelocity',
+                   'velocitySensorActual', 'digitalInputs', 'digitalOutputs', 'ipPosition'])
+
+
+def test_validate_pdo():
+    with pytest.raises(ValueError):
+        validate_pdo([(0x6064, 0, 32), (0x606C, 0, 32), (0x6041, 0, 16)])
+    with pytest.raises(ValueError):
+        validate_pdo([(0x6041, 0, 16), (0x6041, 0, 16)])
+
+
+def test_apply_pdo_mapping_updates_router(sim, motor):
+    router = PdoRouter(motor.h_master)
+    assert router.load_mapping(1) == 0
+    assert router.route('Nim_get_currentTorque', 1) == 1
+    assert apply_pdo_mapping(motor.h_master, 1, tpdos=TPDOS, router=router) == 0
+    [nRes, tpdos] = read_pdo_mapping(motor.h_master, 1, 'tx')
+    assert nRes == 0
+    assert tpdos == [[(0x6041, 0, 16), (0x6064, 0, 32)], [(0x606C, 0, 32), (0x6077, 0, 16)], [], []]
+    assert router.route('Nim_get_currentTorque', 1) == 0
+    assert all(master.state == MASTER_OP for master in sim.masters.values())
+
+
+def test_write_error_restores_mapping_and_op(sim, motor):
+    before = read_pdo_mapping(motor.h_master, 1, 'tx')
+    orig = sim.Nim_set_param_value
+    calls = [0]
+
+    def failing(h, node, param, value, bSDO):
+        calls[0] += 1
+        if calls[0] == 4:
+            return ServoSDK_Error.ServoSDK_SlaveNotOnline
+        return orig(h, node, param, value, bSDO)
+
+    sim.Nim_set_param_value = failing
+    nRes = apply_pdo_mapping(motor.h_master, 1, tpdos=TPDOS)
+    sim.Nim_set_param_value = orig
+
+    assert nRes == ServoSDK_Error.ServoSDK_SlaveNotOnline
+    assert read_pdo_mapping(motor.h_master, 1, 'tx') == before
+    assert all(master.state == MASTER_OP for master in sim.masters.values())
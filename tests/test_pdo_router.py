@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from NimServoSDK import *
+from pdo_router import PdoRouter, read_pdo_mapping, encode_mapping_entry, decode_mapping_entry
+
+
+def test_mapping_entry_roundtrip():
+    entry = encode_mapping_entry(0x6064, 0, 32)
+    assert entry == 0x60640020
+    assert decode_mapping_entry(entry) == (0x6064, 0, 32)
+
+
+def test_default_mapping_routes(motor):
+    router = PdoRouter(motor.h_master)
+    assert router.load_mapping(1) == 0
+    [nRes, tpdos] = read_pdo_mapping(motor.h_master, 1, 'tx')
+    assert nRes == 0 and (0x6041, 0, 16) in tpdos[0]
+    assert router.route('Nim_get_statusWord', 1) == 0
+    assert router.route('Nim_get_currentPosition', 1) == 0
+    # 未映射的对象和不在映射表中的函数走SDO
+    assert router.route('Nim_get_currentTorque', 1) == 1
+    assert router.route('Nim_get_maxTorque', 1) == 1
+    # 未读取映射的节点全部走SDO
+    assert router.route('Nim_get_statusWord', 2) == 1
+    assert router.sdo_avoided == 2
+
+
+def test_call_and_stats(motor):
+    router = PdoRouter(motor.h_master)
+    assert router.load_mapping(1) == 0
+    [nRes, sw] = router.call(Nim_get_statusWord, 1)
+    assert nRes == 0 and sw == Nim_get_statusWord(motor.h_master, 1, 1)[1]
+    router.call(Nim_get_currentTorque, 1)
+    assert router.pdo_calls == {'Nim_get_statusWord': 1}
+    assert router.sdo_calls == {'Nim_get_currentTorque': 1}
+    assert 'Nim_get_statusWord' in router.format_stats()
+
+
+def test_set_and_clear_mapping(motor):
+    router = PdoRouter(motor.h_master)
+    router.set_mapping(2, [[(0x6077, 0, 16)]], [])
+    assert router.route('Nim_get_currentTorque', 2) == 0
+    router.clear_mapping(2)
+    assert router.route('Nim_get_currentTorque', 2) == 1
+
+
+def test_load_failure_falls_back_to_sdo(sim, motor):
+    router = PdoRouter(motor.h_master)
+    router.set_mapping(2, [[(0x6041, 0, 16)]], [])
+    sim.set_online(2, False)
+    assert router.load_mapping(2) != 0
+    assert router.route('Nim_get_statusWord', 2) == 1
+
+
+def test_motor_controller_routing(motor):
+    assert motor.enable_pdo_routing()
+    assert motor.get_motor_status() is not None
+    assert motor.pdo_router.pdo_calls.get('Nim_get_statusWord', 0) >= 1
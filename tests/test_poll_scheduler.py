@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from NimServoSDK import *
+from poll_scheduler import PollScheduler
+
+
+def test_duplicate_subscriptions_read_once(motor):
+    sched = PollScheduler(motor.h_master, cycle=0.001)
+    seen = []
+    sched.subscribe(1, 'position', 100, callback=lambda node, q, s: seen.append(('a', s.value)))
+    sched.subscribe(1, 'position', 500, callback=lambda node, q, s: seen.append(('b', s.value)))
+    assert sched.tasks() == [(1, 'position', 0, 2, 0, 2)]
+    reads = sum(sched.poll() for _ in range(10))
+    assert reads == 5
+    assert len(seen) == 10
+
+
+def test_low_rate_reads_are_staggered(motor):
+    sched = PollScheduler(motor.h_master, cycle=0.001)
+    for node in (1, 2):
+        for quantity in ('alarm', 'DIs'):
+            sched.subscribe(node, quantity, 100, sdo=True)
+    phases = sorted(task[4] for task in sched.tasks())
+    assert len(set(phases)) == 4
+    assert max(sched.cycle_load(c) for c in range(10)) == 1.0
+
+
+def test_unsubscribe_and_rate_update(motor):
+    sched = PollScheduler(motor.h_master, cycle=0.001)
+    fast = sched.subscribe(1, 'statusWord', 1000)
+    slow = sched.subscribe(1, 'statusWord', 10)
+    assert sched.tasks()[0][3] == 1
+    sched.unsubscribe(fast)
+    assert sched.tasks()[0][3] == 100
+    sched.unsubscribe(slow)
+    assert sched.tasks() == []
+
+
+def test_invalid_subscriptions_rejected(motor):
+    sched = PollScheduler(motor.h_master)
+    with pytest.raises(ValueError):
+        sched.subscribe(1, 'temperature', 10)
+    with pytest.raises(ValueError):
+        sched.subscribe(1, 'position', 0)
+    assert sched.tasks() == []
+
+
+def test_cache_and_errors(sim, motor):
+    sched = PollScheduler(motor.h_master, cycle=0.002)
+    sched.subscribe(1, 'position', 500, sdo=True)
+    sched.subscribe(2, 'position', 500, sdo=True)
+    sim.set_online(2, False)
+    sched.start()
+    try:
+        time.sleep(0.05)
+    finally:
+        sched.stop()
+    sample = sched.get(1, 'position', max_age=1.0)
+    assert sample is not None and sample.value == Nim_get_currentPosition(motor.h_master, 1, 1)[1]
+    assert sched.get(2, 'position') is None
+    time.sleep(0.02)
+    assert sched.get(1, 'position', max_age=0.01) is None
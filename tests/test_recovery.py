@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import time
+from NimServoSDK import *
+from liveness import LivenessTracker
+from recovery import BusSupervisor, CAUSE_MASTER, CAUSE_SLAVE
+
+
+def test_master_stop_recovered(sim, motor):
+    assert motor.set_profile_position_mode() and motor.enable_motor()
+    events = []
+    sup = BusSupervisor(motor, check_interval=0.02, retry_interval=0.05,
+                        on_event=lambda text, rec: events.append(text))
+    sup.start()
+    try:
+        sim.kill_master(motor.h_master)
+        deadline = time.monotonic() + 5.0
+        while not (sup.records and sup.records[-1].success) and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        sup.stop()
+    record = sup.records[-1]
+    assert record.cause == CAUSE_MASTER and record.success
+    assert motor.enabled and motor.work_mode == ServoWorkMode.SERVO_PP_MODE
+    assert sup.metrics()['recovered'] == 1
+    assert len(events) == 2
+
+
+def test_slave_loss_detected(sim, motor):
+    sup = BusSupervisor(motor)
+    assert sup.check() is None
+    sim.set_online(1, False)
+    assert sup.check() == CAUSE_SLAVE
+    sim.set_online(1, True)
+
+
+def test_rebuilt_master_handle_reaches_components(sim, motor, tmp_path):
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    assert motor.enable_pdo_routing() and motor.enable_setpoint_coalescing()
+    assert motor.start_telemetry(str(tmp_path), period=0.01), motor.status
+    tracker = LivenessTracker(motor.h_master, [1])
+    motor.attach(tracker)
+    motor.timebase.observe_change(time.monotonic_ns() - 100000, time.monotonic_ns())
+    old = motor.h_master
+    try:
+        # 主站句柄失效，只能重新创建主站
+        del sim.masters[old]
+        record = BusSupervisor(motor, max_attempts=1).recover(CAUSE_MASTER)
+        assert record.success, record.error
+        h = motor.h_master
+        assert h != old
+        assert motor.pdo_router.h_master == h
+        assert motor.coalescer.h_master == h
+        assert motor.telemetry.h_master == h
+        assert tracker.h_master == h
+        assert motor.timebase.observations == 0
+        assert motor.enabled and motor.work_mode == ServoWorkMode.SERVO_PV_MODE
+        motor.detach(tracker)
+        motor.set_master(old)
+        assert tracker.h_master == h
+        motor.set_master(h)
+    finally:
+        motor.stop_telemetry()
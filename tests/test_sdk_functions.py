@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from sdk_functions import MASTER_FUNCS, NO_HANDLE_FUNCS, LOCAL_FUNCS, sdk_function_names, sdo_arg_functions
+
+
+def test_function_sets_consistent():
+    names = set(sdk_function_names())
+    assert MASTER_FUNCS <= names and LOCAL_FUNCS <= names
+    assert NO_HANDLE_FUNCS <= MASTER_FUNCS
+    assert not MASTER_FUNCS & LOCAL_FUNCS
+
+
+def test_sdo_arg_functions():
+    funcs = sdo_arg_functions()
+    assert {'Nim_get_currentPosition', 'Nim_set_targetVelocity', 'Nim_power_on'} <= funcs
+    assert not funcs & (MASTER_FUNCS | LOCAL_FUNCS)
+    assert 'Nim_get_goHome_velocity' not in funcs
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import time
+from NimServoSDK import *
+from sdk_simulator import SimulatedServoSDK
+from session_replay import SessionRecorder, load_session, session_nodes, replay_session
+
+
+def _record(motor, path, idle=0.0):
+    rec = SessionRecorder(path)
+    rec.start()
+    time.sleep(idle)
+    for _ in range(5):
+        Nim_get_currentPosition(motor.h_master, 1, 1)
+        Nim_get_statusWord(motor.h_master, 2, 1)
+        time.sleep(0.01)
+    return rec.stop()
+
+
+def test_record_and_load(motor, tmp_path):
+    path = str(tmp_path / 'session.jsonl')
+    count = _record(motor, path)
+    calls = load_session(path)
+    assert count == len(calls) == 10
+    assert [c['f'] for c in calls[:2]] == ['Nim_get_currentPosition', 'Nim_get_statusWord']
+    assert session_nodes(calls) == {1, 2}
+
+
+def test_replay_matches_results(sim, motor, tmp_path):
+    path = str(tmp_path / 'session.jsonl')
+    _record(motor, path)
+    # 会话中没有创建主站的调用，回放到录制时使用的模拟器
+    report = replay_session(load_session(path), speed=None)
+    assert report.calls == 10
+    stats = report.functions()
+    assert stats['Nim_get_statusWord']['count'] == 5
+    assert all(s['mismatches'] == 0 for s in stats.values())
+
+
+def test_replay_into_new_simulator(tmp_path, motor):
+    path = str(tmp_path / 'session.jsonl')
+    _record(motor, path)
+    calls = load_session(path)
+    report = replay_session(calls, lib=SimulatedServoSDK(nodes=sorted(session_nodes(calls))), speed=None)
+    assert report.calls == 10
+
+
+def test_idle_before_first_call_is_not_replayed(sim, motor, tmp_path):
+    path = str(tmp_path / 'session.jsonl')
+    _record(motor, path, idle=0.3)
+    calls = load_session(path)
+    assert calls[0]['t'] >= 0.3e9
+    report = replay_session(calls, speed=1.0)
+    assert report.replayed_total_ns < 0.2e9
+    assert abs(report.replayed_total_ns - report.expected_total_ns) < 0.03e9
+
+
+def test_replay_speed(sim, motor, tmp_path):
+    path = str(tmp_path / 'session.jsonl')
+    _record(motor, path)
+    report = replay_session(load_session(path), speed=2.0)
+    assert report.expected_total_ns == report.captured_total_ns / 2.0
+    assert abs(report.replayed_total_ns - report.expected_total_ns) < 0.02e9
+    assert '2 倍速' in report.format()
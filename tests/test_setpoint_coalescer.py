@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from NimServoSDK import *
+from setpoint_coalescer import SetpointCoalescer
+
+
+def _velocity(motor):
+    [nRes, velocity] = Nim_get_currentVelocity(motor.h_master, 1, 1)
+    assert nRes == 0
+    return velocity
+
+
+def test_recommand_after_quick_stop(motor):
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    motor.enable_setpoint_coalescing()
+    assert motor.run_velocity(5.0)
+    time.sleep(0.3)
+    assert _velocity(motor) > 1.0
+
+    assert motor.quick_stop()
+    time.sleep(0.3)
+    assert _velocity(motor) == 0.0
+    assert motor.enable_motor()
+    # 与快速停止前相同的目标值也必须重新写入
+    assert motor.run_velocity(5.0)
+    time.sleep(0.3)
+    assert _velocity(motor) > 1.0
+    stats = motor.coalescer.totals()
+    assert stats['written'] == 2
+
+
+def test_unchanged_setpoint_skipped(motor):
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    motor.enable_setpoint_coalescing()
+    for _ in range(3):
+        assert motor.run_velocity(5.0)
+        motor.coalescer.flush()
+    stats = motor.coalescer.totals()
+    assert stats['written'] == 1
+    assert stats['unchanged'] == 2
+
+
+def test_run_velocity_requires_pv_mode(motor):
+    motor.enable_setpoint_coalescing()
+    assert motor.set_profile_position_mode()
+    assert not motor.run_velocity(5.0)
+
+
+def test_last_writer_wins(sim, motor):
+    co = SetpointCoalescer(motor.h_master)
+    for value in (1.0, 2.0, 3.0):
+        co.submit(1, 'velocity', value)
+    co.submit(2, 'torque', 12.7)
+    assert co.flush() == 2
+    assert sim.axes[1].target_velocity == 3.0
+    assert sim.axes[2].target_torque == 12
+    assert co.stats[(1, 'velocity')].dropped == 2
+    assert co.flush() == 0
+    with pytest.raises(ValueError):
+        co.submit(1, 'position', 0.0)
+
+
+def test_invalidate_drops_pending_values(sim, motor):
+    co = SetpointCoalescer(motor.h_master)
+    co.submit(1, 'velocity', 4.0)
+    co.submit(2, 'velocity', 4.0)
+    co.invalidate(1)
+    assert co.flush() == 1
+    assert sim.axes[1].target_velocity != 4.0
+    assert sim.axes[2].target_velocity == 4.0
+
+
+def test_failed_write_retried_with_same_value(sim, motor):
+    co = SetpointCoalescer(motor.h_master)
+    sim.set_online(1, False)
+    co.submit(1, 'velocity', 6.0)
+    co.flush()
+    assert co.totals()['errors'] == 1 and co.last_error != 0
+    sim.set_online(1, True)
+    co.submit(1, 'velocity', 6.0)
+    assert co.flush() == 1
+    assert sim.axes[1].target_velocity == 6.0
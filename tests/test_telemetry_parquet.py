@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import os, time
+import pytest
+from telemetry_parquet import TelemetrySink, TELEMETRY_VERSION, main
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def _read(paths):
+    rows = []
+    for path in paths:
+        rows.extend(pq.read_table(path).to_pylist())
+    return rows
+
+
+def test_rows_written_and_rotated(tmp_path):
+    sink = TelemetrySink(str(tmp_path), batch_rows=10, row_group_rows=20, rotate_rows=50, flush_interval=0.01)
+    with sink:
+        for i in range(120):
+            sink.record(1 + i % 2, i, statusWord=0x1237, position=i * 0.5, bus_cycle=i // 2)
+    assert sink.rows_written == 120 and sink.rows_dropped == 0
+    assert len(sink.files) >= 2
+    assert not [n for n in os.listdir(str(tmp_path)) if n.endswith('.part')]
+    rows = _read(sink.files)
+    assert [r['t_ns'] for r in rows] == list(range(120))
+    assert rows[3] == {'t_ns': 3, 'bus_cycle': 1, 'node': 2, 'statusWord': 0x1237, 'position': 1.5,
+                       'velocity': None, 'torque': None, 'DIs': None, 'alarm': None}
+    meta = pq.read_schema(sink.files[0]).metadata
+    assert meta[b'version'] == str(TELEMETRY_VERSION).encode()
+
+
+def test_pending_batches_bounded(tmp_path):
+    sink = TelemetrySink(str(tmp_path), batch_rows=2, max_pending_batches=1)
+    for i in range(6):
+        sink.record(1, i)
+    assert sink.rows_recorded == 6
+    assert sink.rows_dropped == 4
+
+
+def test_writer_survives_rotation_error(tmp_path):
+    sink = TelemetrySink(str(tmp_path), batch_rows=5, row_group_rows=5, rotate_interval=0.05, flush_interval=0.01)
+    close_file = sink._close_file
+    calls = [0]
+
+    def failing():
+        calls[0] += 1
+        if calls[0] == 1:
+            raise OSError("磁盘已满")
+        close_file()
+
+    sink._close_file = failing
+    sink.start()
+    try:
+        for i in range(10):
+            sink.record(1, i)
+        time.sleep(0.2)
+        assert isinstance(sink.last_error, OSError)
+        assert sink._thread.is_alive()
+        for i in range(10, 20):
+            sink.record(1, i)
+        time.sleep(0.1)
+    finally:
+        sink.stop()
+    assert calls[0] > 2 and len(sink.files) >= 2
+    assert [r['t_ns'] for r in _read(sink.files)] == list(range(20))
+
+
+def test_recorder_from_motor_controller(sim, motor, tmp_path, capsys):
+    assert motor.start_telemetry(str(tmp_path), period=0.01), motor.status
+    time.sleep(0.2)
+    motor.stop_telemetry()
+    assert "丢弃 0 行" in motor.status
+    rows = _read(sorted(str(p) for p in tmp_path.iterdir()))
+    assert len(rows) > 5
+    assert all(r['node'] == 1 and r['statusWord'] is not None and r['bus_cycle'] is not None for r in rows)
+    # 报警每100个周期用SDO读取一次
+    assert rows[0]['alarm'] is not None and rows[1]['alarm'] is None
+    assert main([str(tmp_path)]) == 0
+    assert f"{len(rows)} 行" in capsys.readouterr().out
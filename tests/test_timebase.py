@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import json, random, time
+import pytest
+from timebase import SyncTimebase
+
+PERIOD_NS = 1000000
+
+
+def _arrivals(tb, offset_ns, period_ns, cycles, rng):
+    # 每次观察在到达时刻前后随机宽度的检测区间
+    for k in cycles:
+        arrival = offset_ns + k * period_ns
+        tb.observe_change(arrival - rng.randint(1000, 200000), arrival + rng.randint(1000, 200000))
+
+
+def test_phase_and_drift_estimated():
+    rng = random.Random(1)
+    start = 10 ** 12
+    period = PERIOD_NS * (1 + 200e-6)
+    offset = start + 300000
+    tb = SyncTimebase(0.001, start_ns=start)
+    _arrivals(tb, offset, period, range(0, 600, 3), rng)
+    # 拟合出实际周期之前按名义周期求交集会出现无交集，之后收敛
+    assert tb.inconsistent < tb.observations // 4
+    assert tb.drift_ppm() == pytest.approx(200, abs=30)
+    last = offset + 599 * period
+    assert tb.cycle_at(last + 10000) == 599
+    assert tb.cycle_at(last - 10000) == 598
+    assert tb.cycle_time_ns(599) == pytest.approx(last, abs=10000)
+    assert "ppm" in tb.format_report()
+
+
+def test_wide_intervals_ignored():
+    tb = SyncTimebase(0.001, start_ns=0)
+    tb.observe_change(0, 600000)
+    assert tb.observations == 0
+
+
+def test_observe_value_uses_previous_read_as_lower_bound():
+    tb = SyncTimebase(0.001, start_ns=0)
+    tb.observe_value('p', 1.0, 100000, 110000)
+    tb.observe_value('p', 1.0, 400000, 410000)
+    assert tb.observations == 0
+    tb.observe_value('p', 2.0, 700000, 710000)
+    assert tb.observations == 1
+    # 到达时刻在 (400000, 710000] 之间，取区间中点
+    assert tb.cycle_time_ns(tb.cycle_at(720000)) == 555000
+    assert tb.uncertainty_ns == 155000
+
+
+def test_from_conn_str_falls_back_to_pdo_interval():
+    assert SyncTimebase.from_conn_str(json.dumps({"SyncIntervalMS": 5})).nominal_ns == 5e6
+    assert SyncTimebase.from_conn_str(json.dumps({"SyncIntervalMS": 0, "PDOIntervalMS": 2})).nominal_ns == 2e6
+
+
+def test_restart_resets_estimate():
+    rng = random.Random(2)
+    tb = SyncTimebase(0.001, start_ns=0)
+    _arrivals(tb, 250000, PERIOD_NS, range(0, 40), rng)
+    tb.restart(start_ns=5 * 10 ** 9)
+    assert tb.observations == 0 and tb.period_ns == tb.nominal_ns
+    assert tb.cycle_at(5 * 10 ** 9 + 1500000) == 1
+
+
+def test_motor_samples_share_cycle_numbers(sim, motor):
+    # PDO读取返回每个周期开始时锁存的反馈值
+    sim.cycle_aligned = True
+    assert motor.set_profile_velocity_mode() and motor.enable_motor()
+    assert motor.run_velocity(20.0)
+    time.sleep(0.1)
+    samples = []
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        samples.append(motor.get_motor_sample())
+        time.sleep(0.0005)
+    assert motor.timebase.observations > 5
+    cycles = [s['cycle'] for s in samples]
+    assert cycles == sorted(cycles)
+    # 相位估计收敛后，同一个周期序号内读到的位置相同（周期边界附近的样本在估计误差内，不比较）
+    tb = motor.timebase
+    by_cycle = {}
+    for s in samples[len(samples) // 2:]:
+        if 0.05 < tb.phase(s['timestamp_ns']) < 0.95:
+            by_cycle.setdefault(s['cycle'], set()).add(s['position'])
+    assert len(by_cycle) > 5
+    assert all(len(v) == 1 for v in by_cycle.values())
+    assert len(set(min(v) for v in by_cycle.values())) == len(by_cycle)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from NimServoSDK import *
+from typed_api import TypedSDK, MotorState, ServoSDKError, check, error_name
+
+
+def test_reads_match_list_api(sim, motor):
+    sdk = TypedSDK(motor.h_master)
+    h = motor.h_master
+    assert sdk.status_word(1) == Nim_get_statusWord(h, 1, 0)[1]
+    assert sdk.position(1) == Nim_get_currentPosition(h, 1, 0)[1]
+    assert sdk.velocity(1) == Nim_get_currentVelocity(h, 1, 0)[1]
+    assert sdk.work_mode(1) == Nim_get_workModeDisplay(h, 1, 0)[1]
+
+
+def test_read_state_fills_given_struct(sim, motor):
+    sdk = TypedSDK(motor.h_master)
+    state = MotorState()
+    assert sdk.read_state(1, state) is state
+    assert state.statusWord == sdk.status_word(1)
+    assert motor.get_motor_state(state) is state
+    assert isinstance(sdk.read_state(1), MotorState)
+
+
+def test_errors_raise_or_return_none(sim, motor):
+    sim.set_online(2, False)
+    with pytest.raises(ServoSDKError) as exc:
+        TypedSDK(motor.h_master).status_word(2)
+    assert exc.value.node == 2 and exc.value.func == 'Nim_get_statusWord'
+    assert exc.value.name == error_name(exc.value.code) and exc.value.code != 0
+
+    sdk = TypedSDK(motor.h_master, raise_errors=False)
+    assert sdk.read_state(2) is None
+    assert sdk.last_error == exc.value.code
+    assert sdk.set_target_position(2, 1.0) is False
+
+
+def test_check():
+    assert check([0, 5]) == 5
+    assert check(0) is None
+    with pytest.raises(ServoSDKError, match="Nim_power_on"):
+        check(ServoSDK_Error.ServoSDK_NotInitialized, 'Nim_power_on', 1)
+
+
+def test_rebinds_after_call_hook(sim, motor):
+    sdk = TypedSDK(motor.h_master)
+    sdk.position(1)
+    calls = []
+
+    def hook(name, args, nRes, t0_ns, t1_ns):
+        calls.append(name)
+
+    add_call_hook(hook)
+    try:
+        sdk.position(1)
+    finally:
+        remove_call_hook(hook)
+    assert calls == ['Nim_get_currentPosition']
+    sdk.position(1)
+    assert calls == ['Nim_get_currentPosition']
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SYNC 对齐的时间基准
+
+Nim_get_currentPosition 等函数返回的数值不带时间戳，不同轴、不同线程读取的数据
+无法对齐到同一个SYNC周期。SyncTimebase 按连接字符串中的 SyncIntervalMS（未启用
+SYNC 时用 PDOIntervalMS）建立主机 time.monotonic_ns() 与总线周期序号之间的映射:
+
+- 通过PDO读到的数值只在每个SYNC周期的TPDO到达后才变化。每次观察到数值变化时，
+  上一次读到旧值的时刻和这一次读到新值的时刻构成TPDO到达时刻的上下界；
+- 对窗口内的所有上下界求交集得到SYNC相位（到达时刻 = SYNC时刻 + 固定传输延时），
+  用最小二乘拟合实际周期，跟踪主机时钟与总线时钟之间的漂移；
+- cycle_at(t) 返回时刻 t 已收到的最新一个SYNC周期的序号，多轴数据按该序号对齐。
+
+没有观察数据时按名义周期和主站启动时刻推算。
+
+用法:
+    tb = SyncTimebase.from_conn_str(motor.conn_str)
+    t0 = time.monotonic_ns()
+    [res, pos] = Nim_get_currentPosition(h, 1, 0)
+    t1 = time.monotonic_ns()
+    tb.observe_value((1, 'position'), pos, t0, t1)
+    cycle = tb.cycle_at(t1)
+"""
+
+import collections, json, math, threading, time
+
+
+class SyncTimebase(object):
+    def __init__(self, sync_interval, start_ns=None, window=256):
+        """
+        初始化时间基准
+        参数:
+        sync_interval - SYNC周期(秒)
+        start_ns - 周期0的起始时刻 time.monotonic_ns()，默认为当前时刻（应在主站启动时创建）
+        window - 参与拟合的最近观察数
+        """
+        if sync_interval <= 0:
+            raise ValueError("SYNC周期必须大于0")
+        self.nominal_ns = sync_interval * 1e9
+        self.period_ns = self.nominal_ns
+        self.start_ns = start_ns if start_ns is not None else time.monotonic_ns()
+        self.offset_ns = float(self.start_ns)   # 周期0的TPDO到达时刻
+        self.uncertainty_ns = self.nominal_ns / 2.0
+        self.observations = 0
+        self.inconsistent = 0                   # 上下界无交集的拟合次数（到达时刻抖动大于检测间隔）
+        self._window = collections.deque(maxlen=window)
+        self._last = {}                         # 数据键 -> (上次读到的数值, 该次调用开始时刻)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_conn_str(cls, conn_str, start_ns=None, window=256):
+        """
+        按连接字符串建立时间基准：优先使用 SyncIntervalMS，为0或不存在时使用 PDOIntervalMS
+        """
+        conn = json.loads(conn_str)
+        interval = conn.get("SyncIntervalMS") or conn.get("PDOIntervalMS") or 10
+        return cls(interval / 1000.0, start_ns, window)
+
+    def restart(self, start_ns=None):
+        """
+        主站重新启动后SYNC周期从新的相位开始，清除观察数据，按名义周期和新的启动时刻重新估计
+        """
+        with self._lock:
+            self.start_ns = start_ns if start_ns is not None else time.monotonic_ns()
+            self.offset_ns = float(self.start_ns)
+            self.period_ns = self.nominal_ns
+            self.uncertainty_ns = self.nominal_ns / 2.0
+            self.observations = 0
+            self.inconsistent = 0
+            self._window.clear()
+            self._last = {}
+
+    def observe_change(self, lo_ns, hi_ns):
+        """
+        记录一次TPDO到达：到达时刻在 (lo_ns, hi_ns] 之间，区间宽于半个周期时不能确定相位，忽略
+        """
+        if hi_ns - lo_ns > self.nominal_ns / 2.0:
+            return
+        with self._lock:
+            self._window.append((lo_ns, hi_ns))
+            self.observations += 1
+            self._fit()
+
+    def observe_value(self, key, value, t0_ns, t1_ns):
+        """
+        记录一次PDO读取结果，数值与上次不同时视为新的TPDO已到达
+        参数:
+        key - 数据键，例如 (从站地址, 数据量)
+        value - 读到的数值
+        t0_ns, t1_ns - 读取调用开始和结束的 time.monotonic_ns()
+        """
+        last = self._last.get(key)
+        self._last[key] = (value, t0_ns)
+        if last is not None and last[0] != value:
+            # 上次读到旧值的调用开始之后、本次调用结束之前到达
+            self.observe_change(last[1], t1_ns)
+
+    def _fit(self):
+        data = self._window
+        period = self.period_ns
+        offset = self.offset_ns
+        ks = [round(((lo + hi) / 2.0 - offset) / period) for lo, hi in data]
+        # 覆盖足够多的周期后拟合实际周期
+        if len(data) >= 8 and ks[-1] - ks[0] >= 16:
+            n = len(data)
+            mk = sum(ks) / n
+            mt = sum((lo + hi) / 2.0 for lo, hi in data) / n
+            skk = sum((k - mk) ** 2 for k in ks)
+            if skk > 0:
+                fitted = sum((k - mk) * ((lo + hi) / 2.0 - mt) for k, (lo, hi) in zip(ks, data)) / skk
+                # 只接受与名义周期相差不超过 1% 的结果，防止周期序号错位导致发散
+                if abs(fitted - self.nominal_ns) < self.nominal_ns * 0.01:
+                    period = fitted
+        upper = min(hi - k * period for k, (lo, hi) in zip(ks, data))
+        lower = max(lo - k * period for k, (lo, hi) in zip(ks, data))
+        if lower <= upper:
+            self.offset_ns = (lower + upper) / 2.0
+            self.uncertainty_ns = (upper - lower) / 2.0
+        else:
+            self.inconsistent += 1
+            self.offset_ns = (lower + upper) / 2.0
+            self.uncertainty_ns = (lower - upper) / 2.0
+        self.period_ns = period
+
+    def cycle_at(self, t_ns):
+        """
+        返回时刻 t_ns 已收到的最新SYNC周期序号
+        """
+        return int(math.floor((t_ns - self.offset_ns) / self.period_ns))
+
+    def cycle_time_ns(self, cycle):
+        """
+        返回某个周期的TPDO到达时刻 time.monotonic_ns()
+        """
+        return int(self.offset_ns + cycle * self.period_ns)
+
+    def phase(self, t_ns):
+        """
+        返回时刻 t_ns 在当前周期内的相位 0~1
+        """
+        x = (t_ns - self.offset_ns) / self.period_ns
+        return x - math.floor(x)
+
+    def drift_ppm(self):
+        """
+        返回估计周期相对名义周期的偏差(ppm)，即主机时钟与总线时钟的相对漂移
+        """
+        return (self.period_ns / self.nominal_ns - 1.0) * 1e6
+
+    def format_report(self):
+        return (f"名义周期: {self.nominal_ns / 1e6:.3f} ms，估计周期: {self.period_ns / 1e6:.6f} ms "
+                f"({self.drift_ppm():+.1f} ppm)，相位不确定度: ±{self.uncertainty_ns / 1e3:.1f} us，"
+                f"观察: {self.observations}，无交集: {self.inconsistent}")
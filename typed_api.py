@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+类型化SDK接口：直接返回数值，出错时抛出 ServoSDKError
+
+NimServoSDK.py 的读取函数每次调用都要重新设置 restype/argtypes、创建一个 ctypes
+输出变量和 byref 对象，再返回一个 [nRes, value] 列表，调用方逐个解包、判断
+nRes；MotorController.get_motor_status 还要在此基础上再组一个列表。
+
+TypedSDK 在绑定库时一次性设置函数原型，输出变量和 byref 对象在实例中预先
+创建并重复使用，读取函数直接返回数值。出错时默认抛出 ServoSDKError（错误码
+按 ServoSDK_Error 命名）；raise_errors=False 时返回 None 并记录 last_error。
+read_state() 把状态字、位置、速度填入一个 __slots__ 结构 MotorState，调用方
+传入同一个结构时每次轮询不再创建列表。
+
+输出变量在实例内共享，一个 TypedSDK 只能在一个线程中使用，每个线程各建一个。
+调用钩子注册/注销或重新加载库后，下一次调用时自动重新绑定。
+
+用法:
+    sdk = TypedSDK(motor.h_master)
+    sw = sdk.status_word(1)
+    state = MotorState()
+    while running:
+        sdk.read_state(1, state)                # 不分配新的结果对象
+        if state.statusWord & ServoStatusWord.FAULT:
+            ...
+    try:
+        sdk.move_absolute(1, 100.0)
+    except ServoSDKError as e:
+        print(e.code, e.name)
+
+基准测试（模拟器，对比 [nRes, value] 接口的耗时和临时内存）:
+    python typed_api.py --polls 20000
+"""
+
+import ctypes, sys, time
+import NimServoSDK
+from NimServoSDK import *
+
+# 错误码 -> 名称
+_ERROR_NAMES = dict((value, name) for name, value in vars(ServoSDK_Error).items()
+                    if name.startswith('ServoSDK_'))
+
+
+def error_name(code):
+    """
+    返回错误码对应的 ServoSDK_Error 名称
+    """
+    return _ERROR_NAMES.get(code, f"ServoSDK_Error({code})")
+
+
+class ServoSDKError(Exception):
+    def __init__(self, code, func=None, node=None):
+        self.code = code
+        self.name = error_name(code)
+        self.func = func
+        self.node = node
+        where = f"{func} 节点{node}: " if func is not None else ""
+        super().__init__(f"{where}{self.name} ({code})")
+
+
+def check(nRes, func=None, node=None):
+    """
+    检查 NimServoSDK 函数的返回码，非0时抛出 ServoSDKError
+    参数:
+    nRes - 返回码，或读取函数返回的 [nRes, value]（此时返回 value）
+    """
+    if isinstance(nRes, list):
+        nRes, value = nRes[0], nRes[1]
+    else:
+        value = None
+    if nRes != 0:
+        raise ServoSDKError(nRes, func, node)
+    return value
+
+
+class MotorState(object):
+    __slots__ = ('statusWord', 'position', 'velocity')
+
+    def __init__(self, statusWord=0, position=0.0, velocity=0.0):
+        self.statusWord = statusWord
+        self.position = position
+        self.velocity = velocity
+
+    def __repr__(self):
+        return f"MotorState(statusWord=0x{self.statusWord:04X}, position={self.position}, velocity={self.velocity})"
+
+
+_u32 = ctypes.c_uint32
+_int = ctypes.c_int
+
+# 绑定的函数原型: SDK函数名 -> argtypes（restype 均为 c_int）
+_SIGNATURES = {
+    'Nim_get_statusWord': [_u32, _int, ctypes.POINTER(ctypes.c_uint16), _int],
+    'Nim_get_currentPosition': [_u32, _int, ctypes.POINTER(ctypes.c_double), _int],
+    'Nim_get_currentVelocity': [_u32, _int, ctypes.POINTER(ctypes.c_double), _int],
+    'Nim_get_currentTorque': [_u32, _int, ctypes.POINTER(ctypes.c_int), _int],
+    'Nim_get_DIs': [_u32, _int, ctypes.POINTER(ctypes.c_uint32), _int],
+    'Nim_get_newestAlarm': [_u32, _int, ctypes.POINTER(ctypes.c_uint32), _int],
+    'Nim_get_workModeDisplay': [_u32, _int, ctypes.POINTER(ctypes.c_int), _int],
+    'Nim_set_controlWord': [_u32, _int, ctypes.c_uint16, _int],
+    'Nim_set_targetPosition': [_u32, _int, ctypes.c_double, _int],
+    'Nim_set_targetVelocity': [_u32, _int, ctypes.c_double, _int],
+    'Nim_set_targetTorque': [_u32, _int, _int, _int],
+    'Nim_moveAbsolute': [_u32, _int, ctypes.c_double, _int, _int],
+    'Nim_moveRelative': [_u32, _int, ctypes.c_double, _int, _int],
+    'Nim_power_on': [_u32, _int, _int],
+    'Nim_power_off': [_u32, _int, _int],
+    'Nim_fastStop': [_u32, _int, _int],
+}
+
+
+class TypedSDK(object):
+    def __init__(self, h_master, raise_errors=True):
+        """
+        初始化类型化接口
+        参数:
+        h_master - 主站句柄
+        raise_errors - True 出错时抛出 ServoSDKError；False 返回 None（设置函数返回 False）并记录 last_error
+        """
+        self.h_master = h_master
+        self.raise_errors = raise_errors
+        self.last_error = 0
+        self._lib = None
+        self._f = {}
+        # 预先创建的输出变量及其 byref
+        self._u16 = ctypes.c_uint16()
+        self._u16_ref = ctypes.byref(self._u16)
+        self._u32 = ctypes.c_uint32()
+        self._u32_ref = ctypes.byref(self._u32)
+        self._int = ctypes.c_int()
+        self._int_ref = ctypes.byref(self._int)
+        self._dbl = ctypes.c_double()
+        self._dbl_ref = ctypes.byref(self._dbl)
+        self._dbl2 = ctypes.c_double()
+        self._dbl2_ref = ctypes.byref(self._dbl2)
+
+    def _bind(self):
+        lib = NimServoSDK.SDKHandle
+        if lib is None:
+            raise ServoSDKError(ServoSDK_Error.ServoSDK_NotInitialized)
+        funcs = {}
+        for name, argtypes in _SIGNATURES.items():
+            func = getattr(lib, name)
+            func.restype = ctypes.c_int
+            func.argtypes = argtypes
+            funcs[name] = func
+        self._f = funcs
+        self._lib = lib
+        return funcs
+
+    def _funcs(self):
+        if NimServoSDK.SDKHandle is not self._lib:
+            return self._bind()
+        return self._f
+
+    def _fail(self, nRes, func, node):
+        self.last_error = nRes
+        if self.raise_errors:
+            raise ServoSDKError(nRes, func, node)
+        return None
+
+    def _get(self, name, ref, out, node, bSDO):
+        nRes = self._funcs()[name](self.h_master, node, ref, bSDO)
+        if nRes:
+            return self._fail(nRes, name, node)
+        return out.value
+
+    def _set(self, name, node, *args):
+        nRes = self._funcs()[name](self.h_master, node, *args)
+        if nRes:
+            self._fail(nRes, name, node)
+            return False
+        return True
+
+    # 读取
+
+    def status_word(self, node, bSDO=0):
+        return self._get('Nim_get_statusWord', self._u16_ref, self._u16, node, bSDO)
+
+    def position(self, node, bSDO=0):
+        return self._get('Nim_get_currentPosition', self._dbl_ref, self._dbl, node, bSDO)
+
+    def velocity(self, node, bSDO=0):
+        return self._get('Nim_get_currentVelocity', self._dbl_ref, self._dbl, node, bSDO)
+
+    def torque(self, node, bSDO=0):
+        return self._get('Nim_get_currentTorque', self._int_ref, self._int, node, bSDO)
+
+    def dis(self, node, bSDO=0):
+        return self._get('Nim_get_DIs', self._u32_ref, self._u32, node, bSDO)
+
+    def newest_alarm(self, node, bSDO=1):
+        return self._get('Nim_get_newestAlarm', self._u32_ref, self._u32, node, bSDO)
+
+    def work_mode(self, node, bSDO=0):
+        return self._get('Nim_get_workModeDisplay', self._int_ref, self._int, node, bSDO)
+
+    def read_state(self, node, out=None, bSDO=0):
+        """
+        读取状态字、位置和速度
+        参数:
+        out - 用于填充的 MotorState，None 时新建
+        返回: MotorState；raise_errors=False 且读取失败时返回 None
+        """
+        f = self._funcs()
+        h = self.h_master
+        nRes = f['Nim_get_statusWord'](h, node, self._u16_ref, bSDO)
+        if nRes:
+            return self._fail(nRes, 'Nim_get_statusWord', node)
+        nRes = f['Nim_get_currentPosition'](h, node, self._dbl_ref, bSDO)
+        if nRes:
+            return self._fail(nRes, 'Nim_get_currentPosition', node)
+        nRes = f['Nim_get_currentVelocity'](h, node, self._dbl2_ref, bSDO)
+        if nRes:
+            return self._fail(nRes, 'Nim_get_currentVelocity', node)
+        if out is None:
+            return MotorState(self._u16.value, self._dbl.value, self._dbl2.value)
+        out.statusWord = self._u16.value
+        out.position = self._dbl.value
+        out.velocity = self._dbl2.value
+        return out
+
+    # 设置，成功返回 True
+
+    def set_control_word(self, node, value, bSDO=0):
+        return self._set('Nim_set_controlWord', node, value, bSDO)
+
+    def set_target_position(self, node, position, bSDO=0):
+        return self._set('Nim_set_targetPosition', node, position, bSDO)
+
+    def set_target_velocity(self, node, velocity, bSDO=0):
+        return self._set('Nim_set_targetVelocity', node, velocity, bSDO)
+
+    def set_target_torque(self, node, torque, bSDO=0):
+        return self._set('Nim_set_targetTorque', node, int(torque), bSDO)
+
+    def move_absolute(self, node, position, immediate=True, bSDO=0):
+        return self._set('Nim_moveAbsolute', node, position, 1 if immediate else 0, bSDO)
+
+    def move_relative(self, node, distance, immediate=True, bSDO=0):
+        return self._set('Nim_moveRelative', node, distance, 1 if immediate else 0, bSDO)
+
+    def power_on(self, node, bSDO=1):
+        return self._set('Nim_power_on', node, bSDO)
+
+    def power_off(self, node, bSDO=1):
+        return self._set('Nim_power_off', node, bSDO)
+
+    def fast_stop(self, node, bSDO=1):
+        return self._set('Nim_fastStop', node, bSDO)
+
+
+def _time_poll(poll, polls):
+    """
+    返回每次轮询的平均耗时(ns)
+    """
+    t0 = time.perf_counter_ns()
+    for _ in range(polls):
+        poll()
+    return (time.perf_counter_ns() - t0) / polls
+
+
+def _transient_bytes(poll, polls):
+    """
+    返回每次轮询中临时对象占用内存的平均峰值(字节)
+    """
+    import tracemalloc
+    tracemalloc.start()
+    total = 0
+    for _ in range(polls):
+        # 每次轮询前重置峰值，峰值与轮询前的当前值之差为本次轮询的临时内存
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        poll()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / polls
+
+
+def main(argv=None):
+    import argparse
+    from sdk_simulator import install_simulator
+    parser = argparse.ArgumentParser(description="对比 [nRes, value] 接口与类型化接口的轮询开销（模拟器）")
+    parser.add_argument('--polls', type=int, default=20000, help="轮询次数")
+    parser.add_argument('--node', type=int, default=1, help="从站地址")
+    args = parser.parse_args(argv)
+
+    install_simulator(nodes=[args.node])
+    from motor_control import MotorController
+    motor = MotorController(comm_type=0, node_id=args.node)
+    if not (motor.connect_canopen() and motor.initialize_motor()):
+        print(motor.status)
+        motor.close()
+        return 1
+    h, node = motor.h_master, args.node
+    sdk = TypedSDK(h)
+    state = MotorState()
+
+    def poll_lists():
+        [r1, sw] = Nim_get_statusWord(h, node, 0)
+        [r2, pos] = Nim_get_currentPosition(h, node, 0)
+        [r3, vel] = Nim_get_currentVelocity(h, node, 0)
+        if r1 != 0 or r2 != 0 or r3 != 0:
+            raise RuntimeError("读取失败")
+        return sw, pos, vel
+
+    def poll_typed():
+        return sdk.read_state(node, state)
+
+    cases = [("[nRes, value] x3", poll_lists),
+             ("get_motor_status()", motor.get_motor_status),
+             ("get_motor_state(state)", lambda: motor.get_motor_state(state)),
+             ("TypedSDK.read_state", poll_typed)]
+    # 各接口轮流测量5轮取最快的一轮，避免模拟器状态随时间变化带来的偏差
+    best = [None] * len(cases)
+    for _ in range(5):
+        for i, (name, poll) in enumerate(cases):
+            t = _time_poll(poll, args.polls)
+            best[i] = t if best[i] is None else min(best[i], t)
+    print(f"{'接口':<24}{'耗时(us)':>10}{'临时内存(字节)':>16}")
+    for (name, poll), elapsed in zip(cases, best):
+        transient = _transient_bytes(poll, min(args.polls, 2000))
+        print(f"{name:<24}{elapsed / 1e3:>10.2f}{transient:>16.0f}")
+    motor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())